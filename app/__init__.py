@@ -3,6 +3,7 @@ from typing import Optional
 
 from PySide6 import QtCore, QtWidgets, QtGui
 
+from .service.logger import setup_logging
 from .view.main_window import MainWindow
 
 
@@ -11,6 +12,7 @@ APP: Optional[QtWidgets.QApplication] = None
 
 def run():
     global APP
+    setup_logging()
     APP = QtWidgets.QApplication([])
 
     window = MainWindow()
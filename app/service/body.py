@@ -0,0 +1,274 @@
+import mimetypes
+import os
+import time
+import uuid
+from typing import Optional, Dict, Any, List, Callable, Union, Tuple
+
+
+"""
+request bodies other than the inline text of the body tab. a file, or the files of a multipart form, are read
+block by block while the request is being sent, so their size does not matter. the total size is known up front,
+so Content-Length is set unless chunked transfer encoding is asked for
+"""
+
+_READ_SIZE = 256 * 1024
+
+
+class BodyKind:
+    TEXT = 'text'
+    FILE = 'file'
+    MULTIPART = 'multipart'
+
+
+class FormPart:
+    def __init__(self, name: str = '', value: str = '', file_path: str = '', content_type: str = ''):
+        self.name = name
+        self.value = value  # for a text field
+        self.file_path = file_path  # for a file field, value is ignored then
+        self.content_type = content_type  # guessed from the file name when empty
+
+    def __str__(self):
+        return str(self.__dict__)
+
+    @property
+    def is_file(self) -> bool:
+        return bool(self.file_path)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> 'FormPart':
+        part = cls()
+        for k, v in d.items():
+            if hasattr(part, k):
+                setattr(part, k, v)
+        return part
+
+
+class BodySource:
+    """where the body comes from, the inline text itself stays in Request.body"""
+    def __init__(self,
+                 kind: str = BodyKind.TEXT,
+                 file_path: str = '',
+                 parts: Optional[List[FormPart]] = None,
+                 chunked: bool = False):
+        self.kind = kind
+        self.file_path = file_path
+        self.parts = parts if isinstance(parts, list) else []
+        self.chunked = chunked  # Transfer-Encoding: chunked instead of Content-Length
+
+    def __str__(self):
+        return str({**self.__dict__, 'parts': [str(part) for part in self.parts]})
+
+    @property
+    def streamed(self) -> bool:
+        """false for plain inline text, which is sent the way it always was"""
+        return self.kind != BodyKind.TEXT or self.chunked
+
+    def validate(self) -> Optional[Exception]:
+        if self.kind == BodyKind.FILE:
+            if not os.path.isfile(self.file_path):
+                return FileNotFoundError(f'body file not found: {self.file_path}')
+        elif self.kind == BodyKind.MULTIPART:
+            for part in self.parts:
+                if not part.name:
+                    return ValueError('form field name is required')
+                if part.is_file and not os.path.isfile(part.file_path):
+                    return FileNotFoundError(f'form file not found: {part.file_path}')
+        elif self.kind != BodyKind.TEXT:
+            return ValueError(f'unknown body kind: {self.kind}')
+        return None
+
+    def describe(self) -> str:
+        chunked = ', chunked' if self.chunked else ''
+        if self.kind == BodyKind.FILE:
+            size = os.path.getsize(self.file_path) if os.path.isfile(self.file_path) else -1
+            return f'file {self.file_path} ({size}B{chunked})'
+        if self.kind == BodyKind.MULTIPART:
+            files = sum(1 for part in self.parts if part.is_file)
+            return f'multipart, {len(self.parts)} fields, {files} files{chunked}'
+        return f'text{chunked}'
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'kind': self.kind,
+            'file_path': self.file_path,
+            'parts': [part.to_dict() for part in self.parts],
+            'chunked': self.chunked,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Optional[Dict[str, Any]]) -> 'BodySource':
+        if not isinstance(d, dict):
+            return cls()
+        return cls(
+            kind=d.get('kind', BodyKind.TEXT),
+            file_path=d.get('file_path', ''),
+            parts=[FormPart.from_dict(part) for part in d.get('parts', [])],
+            chunked=d.get('chunked', False),
+        )
+
+
+Segment = Union[bytes, Tuple[str, int]]  # inline bytes, or (file path, size)
+
+
+class UploadStream:
+    """
+    file-like over a list of segments, only the file being sent is open. requests sends it with Content-Length
+    taken from len(), iterating it instead gives chunked transfer encoding
+    """
+    def __init__(self, segments: List[Segment], on_progress: Optional[Callable[[int, int], None]] = None):
+        self._segments = segments
+        self._on_progress = on_progress
+        self._index = 0
+        self._offset = 0  # in the current inline segment
+        self._file = None
+        self.size = sum(len(s) if isinstance(s, bytes) else s[1] for s in segments)
+        self.sent = 0
+        self.first_read_time = 0.0  # perf_counter, upload starts
+        self.last_read_time = 0.0  # upload ends once everything is read
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        try:
+            while True:
+                block = self.read(_READ_SIZE)
+                if not block:
+                    return
+                yield block
+        finally:
+            self.close()
+
+    def read(self, n: int = -1) -> bytes:
+        if n is None or n < 0:
+            n = self.size - self.sent
+        now = time.perf_counter()
+        if not self.first_read_time:
+            self.first_read_time = now
+        blocks = []
+        remain = n
+        while remain > 0 and self._index < len(self._segments):
+            segment = self._segments[self._index]
+            if isinstance(segment, bytes):
+                block = segment[self._offset:self._offset + remain]
+                self._offset += len(block)
+            else:
+                if self._file is None:
+                    self._file = open(segment[0], 'rb')
+                block = self._file.read(remain)
+            if block:
+                blocks.append(block)
+                remain -= len(block)
+                continue
+            # the segment is exhausted
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._index += 1
+            self._offset = 0
+        data = b''.join(blocks)
+        self.sent += len(data)
+        self.last_read_time = time.perf_counter()
+        if data and self._on_progress is not None:
+            self._on_progress(self.sent, self.size)
+        return data
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _quote(name: str) -> str:
+    """the escaping browsers use for field names and file names"""
+    return name.replace('\r', '%0D').replace('\n', '%0A').replace('"', '%22')
+
+
+def _multipart_segments(parts: List[FormPart], boundary: str) -> List[Segment]:
+    segments: List[Segment] = []
+    for part in parts:
+        disposition = f'form-data; name="{_quote(part.name)}"'
+        content_type = part.content_type
+        if part.is_file:
+            disposition += f'; filename="{_quote(os.path.basename(part.file_path))}"'
+            content_type = content_type or mimetypes.guess_type(part.file_path)[0] or 'application/octet-stream'
+        head = f'--{boundary}\r\nContent-Disposition: {disposition}\r\n'
+        if content_type:
+            head += f'Content-Type: {content_type}\r\n'
+        segments.append((head + '\r\n').encode('utf-8'))
+        if part.is_file:
+            segments.append((part.file_path, os.path.getsize(part.file_path)))
+        else:
+            segments.append(part.value.encode('utf-8'))
+        segments.append(b'\r\n')
+    segments.append(f'--{boundary}--\r\n'.encode('utf-8'))
+    return segments
+
+
+def open_stream(source: BodySource,
+                text: str = '',
+                on_progress: Optional[Callable[[int, int], None]] = None) -> (UploadStream, str, Exception):
+    """the stream to send and the Content-Type it requires, empty if the request headers decide"""
+    err = source.validate()
+    if err is not None:
+        return None, '', err
+    try:
+        if source.kind == BodyKind.FILE:
+            return UploadStream([(source.file_path, os.path.getsize(source.file_path))], on_progress), '', None
+        if source.kind == BodyKind.MULTIPART:
+            boundary = uuid.uuid4().hex
+            segments = _multipart_segments(source.parts, boundary)
+            return UploadStream(segments, on_progress), f'multipart/form-data; boundary={boundary}', None
+        return UploadStream([text.encode('utf-8')], on_progress), '', None
+    except Exception as e:
+        return None, '', e
+
+
+def _curl_typed_value(value: str) -> bool:
+    """whether -F passes value on as it is, followed by ;type="""
+    return not value.startswith(('@', '<')) and ';' not in value and '"' not in value
+
+
+def curl_args(source: BodySource, text: str = '') -> List[Tuple[str, str]]:
+    """
+    curl options for the body, files are referenced with @ rather than inlined.
+    text fields go with --form-string, which never reads a value starting with @ or < as a file
+    """
+    if source.kind == BodyKind.FILE:
+        return [('--data-binary', f'@{source.file_path}')]
+    if source.kind == BodyKind.MULTIPART:
+        args = []
+        for part in source.parts:
+            if part.is_file:
+                value = f'{part.name}=@{part.file_path}'
+                if part.content_type:
+                    value += f';type={part.content_type}'
+                args.append(('-F', value))
+            elif part.content_type and _curl_typed_value(part.value):
+                args.append(('-F', f'{part.name}={part.value};type={part.content_type}'))
+            else:
+                # --form-string cannot carry a content type, a value -F would misread is sent without it
+                args.append(('--form-string', f'{part.name}={part.value}'))
+        return args
+    return [('--data-binary', text)] if text else []
+
+
+def _debug():
+    import tempfile
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'data.bin')
+    with open(path, 'wb') as f:
+        f.write(os.urandom(1024 * 1024))
+    source = BodySource(BodyKind.MULTIPART, parts=[FormPart('note', 'hello'), FormPart('file', file_path=path)])
+    stream, content_type, err = open_stream(source, on_progress=lambda sent, total: None)
+    data = b''.join(stream)
+    print(content_type, len(stream), len(data), err)
+    print(data[:200])
+    print(curl_args(source))
+
+
+if __name__ == '__main__':
+    _debug()
@@ -0,0 +1,485 @@
+import calendar
+import codecs
+import email.utils
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict
+
+from app.service.logger import get_logger
+
+
+"""
+a private http cache for GET requests (RFC 9111, the parts that matter to a single user client).
+fresh entries are served without a request, stale ones or those without an explicit lifetime are revalidated
+with If-None-Match/If-Modified-Since and a 304 is answered from the stored body.
+small bodies are kept in a memory LRU bounded by bytes, large ones in files under cfg/cache, bounded as well
+"""
+
+LOGGER = get_logger(__name__)
+
+CACHE_DIR = os.path.join('cfg', 'cache')
+
+_BODY_SUFFIX = '.body'
+_META_SUFFIX = '.json'
+
+
+class CacheStatus:
+    NONE = ''  # the cache was not consulted
+    HIT = 'hit'
+    REVALIDATED = 'revalidated'
+    MISS = 'miss'
+
+
+class CacheSettings:
+    def __init__(self,
+                 memory_bytes: int = 32 * 1024 * 1024,
+                 memory_entry_bytes: int = 1024 * 1024,
+                 disk_bytes: int = 256 * 1024 * 1024,
+                 directory: str = CACHE_DIR):
+        self.memory_bytes = memory_bytes
+        self.memory_entry_bytes = memory_entry_bytes  # larger bodies go to the disk tier
+        self.disk_bytes = disk_bytes
+        self.directory = directory
+
+    def __str__(self):
+        return str(self.__dict__)
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.stored = 0
+        self.bytes_saved = 0  # body bytes that did not cross the network
+
+    @property
+    def lookups(self) -> int:
+        return self.hits + self.revalidated + self.misses
+
+    def __str__(self):
+        return str(self.__dict__)
+
+
+class CacheEntry:
+    def __init__(self,
+                 key: str = '',
+                 url: str = '',
+                 status_code: int = 200,
+                 headers: Optional[Dict[str, str]] = None,
+                 vary: Optional[Dict[str, str]] = None,
+                 body_size: int = 0,
+                 stored_at: float = 0.0,
+                 age: float = 0.0,
+                 lifetime: float = 0.0,
+                 encoding: str = 'utf-8'):
+        self.key = key
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers if isinstance(headers, dict) else {}
+        self.vary = vary if isinstance(vary, dict) else {}  # request header values the response varies on
+        self.body_size = body_size
+        self.stored_at = stored_at
+        self.age = age  # Age of the response when it was stored
+        self.lifetime = lifetime  # freshness lifetime in seconds, 0 means always revalidate
+        self.encoding = encoding  # charset of the body file, a spilled body is copied as received
+        self.body: Optional[str] = None  # memory tier only
+        self.body_file = ''  # disk tier only
+
+    def __str__(self):
+        return str({k: v for k, v in self.__dict__.items() if k != 'body'})
+
+    def header(self, name: str) -> str:
+        return _get_header(self.headers, name)
+
+    def is_fresh(self, now: float) -> bool:
+        return self.age + (now - self.stored_at) < self.lifetime
+
+    def validators(self) -> Dict[str, str]:
+        """conditional request headers for revalidation"""
+        headers = {}
+        etag = self.header('ETag')
+        if etag:
+            headers['If-None-Match'] = etag
+        last_modified = self.header('Last-Modified')
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def to_dict(self) -> dict:
+        return {k: v for k, v in self.__dict__.items() if k not in ('body', 'body_file')}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> 'CacheEntry':
+        entry = cls()
+        for k, v in d.items():
+            if hasattr(entry, k):
+                setattr(entry, k, v)
+        return entry
+
+
+def _decode(data: bytes, encoding: str, partial: bool) -> str:
+    """a preview may end in the middle of a character"""
+    try:
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    except (LookupError, TypeError):
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    return decoder.decode(data, final=not partial)
+
+
+def _get_header(headers: Dict[str, str], name: str) -> str:
+    name = name.lower()
+    for k, v in headers.items():
+        if k.lower() == name:
+            return v
+    return ''
+
+
+def parse_cache_control(value: str) -> Dict[str, str]:
+    """directives in lower case, those without an argument map to an empty string"""
+    directives = {}
+    for part in value.split(','):
+        name, _, arg = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = arg.strip().strip('"')
+    return directives
+
+
+def _parse_date(value: str) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        t = email.utils.parsedate_tz(value)
+    except (TypeError, ValueError):
+        return None
+    if t is None:
+        return None
+    return calendar.timegm(t[:9]) - (t[9] or 0)
+
+
+def _parse_seconds(value: str) -> Optional[float]:
+    try:
+        return max(0.0, float(int(value)))
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness(headers: Dict[str, str]) -> (float, bool):
+    """(lifetime, storable) of a 200 response from its headers"""
+    directives = parse_cache_control(_get_header(headers, 'Cache-Control'))
+    if 'no-store' in directives or _get_header(headers, 'Vary').strip() == '*':
+        return 0.0, False
+    if 'no-cache' in directives:
+        lifetime = 0.0
+    elif 'max-age' in directives:
+        lifetime = _parse_seconds(directives['max-age']) or 0.0
+    else:
+        expires = _parse_date(_get_header(headers, 'Expires'))
+        date = _parse_date(_get_header(headers, 'Date')) or time.time()
+        lifetime = max(0.0, expires - date) if expires is not None else 0.0
+    has_validator = bool(_get_header(headers, 'ETag') or _get_header(headers, 'Last-Modified'))
+    return lifetime, lifetime > 0 or has_validator
+
+
+def cache_key(method: str, url: str) -> str:
+    return f'{method.upper()} {url}'
+
+
+class ResponseCache:
+    """thread safe, shared by every request worker of the process"""
+    def __init__(self, settings: Optional[CacheSettings] = None):
+        self.settings = settings if isinstance(settings, CacheSettings) else CacheSettings()
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: Optional[OrderedDict[str, CacheEntry]] = None  # loaded on first use
+        self._disk_bytes = 0
+
+    @staticmethod
+    def cacheable_request(method: str, headers: Dict[str, str]) -> bool:
+        directives = parse_cache_control(_get_header(headers, 'Cache-Control'))
+        return method.upper() == 'GET' and 'no-store' not in directives
+
+    @staticmethod
+    def _must_revalidate(headers: Dict[str, str]) -> bool:
+        directives = parse_cache_control(_get_header(headers, 'Cache-Control'))
+        return 'no-cache' in directives or 'max-age' in directives and directives['max-age'] == '0' or \
+            'no-cache' in _get_header(headers, 'Pragma').lower()
+
+    def lookup(self, method: str, url: str, headers: Dict[str, str]) -> (Optional[CacheEntry], bool):
+        """(entry, fresh), entry is None on a miss. an entry that is not fresh needs revalidation"""
+        if not self.cacheable_request(method, headers):
+            return None, False
+        key = cache_key(method, url)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            else:
+                disk = self._disk_index()
+                entry = disk.get(key)
+                if entry is not None:
+                    disk.move_to_end(key)
+        if entry is None or any(_get_header(headers, k) != v for k, v in entry.vary.items()):
+            return None, False
+        return entry, entry.is_fresh(time.time()) and not self._must_revalidate(headers)
+
+    def read_body(self, entry: CacheEntry, memory_limit: int) -> (str, str, Exception):
+        """(body, body_file, err), the body is a preview of memory_limit bytes when body_file is set"""
+        if entry.body is not None:
+            return entry.body, '', None
+        try:
+            with open(entry.body_file, 'rb') as f:
+                if entry.body_size <= memory_limit:
+                    return _decode(f.read(), entry.encoding, False), '', None
+                return _decode(f.read(memory_limit), entry.encoding, True), entry.body_file, None
+        except Exception as e:
+            return '', '', e
+
+    def record(self, status: str, entry: Optional[CacheEntry] = None):
+        with self._lock:
+            if status == CacheStatus.HIT:
+                self.stats.hits += 1
+            elif status == CacheStatus.REVALIDATED:
+                self.stats.revalidated += 1
+            elif status == CacheStatus.MISS:
+                self.stats.misses += 1
+            if entry is not None and status in (CacheStatus.HIT, CacheStatus.REVALIDATED):
+                self.stats.bytes_saved += entry.body_size
+
+    def store(self,
+              method: str,
+              url: str,
+              req_headers: Dict[str, str],
+              status_code: int,
+              headers: Dict[str, str],
+              body: str,
+              body_size: int,
+              body_file: str = '',
+              encoding: str = 'utf-8') -> Optional[CacheEntry]:
+        """
+        store a 200 response if its headers allow it, body_file holds the whole body in the given encoding when set.
+        the entry is None when not stored
+        """
+        if status_code != 200 or not self.cacheable_request(method, req_headers):
+            return None
+        lifetime, storable = freshness(headers)
+        if not storable:
+            return None
+        vary = {}
+        for name in _get_header(headers, 'Vary').split(','):
+            name = name.strip()
+            if name:
+                vary[name] = _get_header(req_headers, name)
+        entry = CacheEntry(
+            key=cache_key(method, url),
+            url=url,
+            status_code=status_code,
+            headers=dict(headers),
+            vary=vary,
+            body_size=body_size,
+            stored_at=time.time(),
+            age=_parse_seconds(_get_header(headers, 'Age')) or 0.0,
+            lifetime=lifetime,
+        )
+        if body_size <= self.settings.memory_entry_bytes and not body_file:
+            entry.body = body
+            with self._lock:
+                self._remove_locked(entry.key)
+                self._memory[entry.key] = entry
+                self._memory_bytes += entry.body_size
+                self._evict_memory_locked()
+                if self._memory.get(entry.key) is not entry:
+                    return None
+                self.stats.stored += 1
+            return entry
+        if body_size > self.settings.disk_bytes:
+            # it would push every other entry out before being evicted itself, an older entry is outdated anyway
+            with self._lock:
+                self._remove_locked(entry.key)
+            return None
+        if body_file:
+            entry.encoding = encoding
+        err = self._write_disk(entry, body, body_file)
+        if err is not None:
+            LOGGER.warning('cache store -> %s failed, err: %s', url, err)
+            return None
+        with self._lock:
+            # the files of an older entry of the key were just replaced, only its accounting is left
+            old = self._memory.pop(entry.key, None)
+            if old is not None:
+                self._memory_bytes -= old.body_size
+            disk = self._disk_index()
+            old = disk.pop(entry.key, None)
+            if old is not None:
+                self._disk_bytes -= old.body_size
+            disk[entry.key] = entry
+            self._disk_bytes += entry.body_size
+            self._evict_disk_locked()
+            if disk.get(entry.key) is not entry:
+                return None
+            self.stats.stored += 1
+        return entry
+
+    def revalidate(self, entry: CacheEntry, headers: Dict[str, str]) -> CacheEntry:
+        """the server answered 304, refresh the stored headers and lifetime"""
+        with self._lock:
+            for k, v in headers.items():
+                if k.lower() in ('content-length', 'content-encoding', 'transfer-encoding'):
+                    continue
+                for old in [old for old in entry.headers if old.lower() == k.lower()]:
+                    del entry.headers[old]
+                entry.headers[k] = v
+            entry.lifetime, _ = freshness(entry.headers)
+            entry.stored_at = time.time()
+            entry.age = _parse_seconds(_get_header(headers, 'Age')) or 0.0
+            if entry.body is None and self._disk_index().get(entry.key) is entry:
+                self._write_meta(entry)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            for key in list(self._disk_index().keys()):
+                self._remove_locked(key)
+            self.stats = CacheStats()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.settings.directory, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def _disk_index(self) -> 'OrderedDict[str, CacheEntry]':
+        """entries of previous runs are found by their metadata files, least recently stored first"""
+        if self._disk is not None:
+            return self._disk
+        entries = []
+        try:
+            names = os.listdir(self.settings.directory)
+        except OSError:
+            names = []
+        for name in names:
+            if not name.endswith(_META_SUFFIX):
+                continue
+            path = os.path.join(self.settings.directory, name)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = CacheEntry.from_dict(json.load(f))
+                entry.body_file = path[:-len(_META_SUFFIX)] + _BODY_SUFFIX
+                if os.path.getsize(entry.body_file) == entry.body_size:
+                    entries.append(entry)
+                    continue
+            except Exception as e:
+                LOGGER.debug('cache index -> skip %s, err: %s', path, e)
+            self._remove_files(path[:-len(_META_SUFFIX)])
+        entries.sort(key=lambda x: x.stored_at)
+        self._disk = OrderedDict((entry.key, entry) for entry in entries)
+        self._disk_bytes = sum(entry.body_size for entry in entries)
+        return self._disk
+
+    def _write_meta(self, entry: CacheEntry):
+        path = self._path(entry.key) + _META_SUFFIX
+        try:
+            with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(entry.to_dict(), f, ensure_ascii=False)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            LOGGER.warning('cache meta -> write %s failed, err: %s', path, e)
+
+    def _write_disk(self, entry: CacheEntry, body: str, body_file: str) -> Optional[Exception]:
+        """the body is written to a temporary file first, so a half written body is never indexed"""
+        base = self._path(entry.key)
+        try:
+            os.makedirs(self.settings.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix='.cache-', dir=self.settings.directory)
+        except Exception as e:
+            return e
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if body_file:
+                    with open(body_file, 'rb') as src:
+                        shutil.copyfileobj(src, f)
+                else:
+                    f.write(body.encode('utf-8'))
+                entry.body_size = f.tell()
+            with self._lock:
+                # an entry of the same key may be served from the old file right now
+                os.replace(tmp_path, base + _BODY_SUFFIX)
+                entry.body_file = base + _BODY_SUFFIX
+                self._write_meta(entry)
+            return None
+        except Exception as e:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return e
+
+    @staticmethod
+    def _remove_files(base: str):
+        for suffix in (_META_SUFFIX, _BODY_SUFFIX):
+            try:
+                os.remove(base + suffix)
+            except OSError:
+                pass
+
+    def _remove_locked(self, key: str):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry.body_size
+        entry = self._disk_index().pop(key, None)
+        if entry is not None:
+            self._disk_bytes -= entry.body_size
+            self._remove_files(entry.body_file[:-len(_BODY_SUFFIX)])
+
+    def _evict_memory_locked(self):
+        while self._memory_bytes > self.settings.memory_bytes and self._memory:
+            _, entry = self._memory.popitem(last=False)
+            self._memory_bytes -= entry.body_size
+
+    def _evict_disk_locked(self):
+        disk = self._disk_index()
+        while self._disk_bytes > self.settings.disk_bytes and disk:
+            _, entry = disk.popitem(last=False)
+            self._disk_bytes -= entry.body_size
+            self._remove_files(entry.body_file[:-len(_BODY_SUFFIX)])
+
+    def sizes(self) -> (int, int):
+        """bytes held by the memory and the disk tier"""
+        with self._lock:
+            self._disk_index()
+            return self._memory_bytes, self._disk_bytes
+
+
+_RESPONSE_CACHE: Optional[ResponseCache] = None
+_RESPONSE_CACHE_LOCK = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    global _RESPONSE_CACHE
+    with _RESPONSE_CACHE_LOCK:
+        if _RESPONSE_CACHE is None:
+            _RESPONSE_CACHE = ResponseCache()
+        return _RESPONSE_CACHE
+
+
+def _debug():
+    cache = ResponseCache(CacheSettings(memory_entry_bytes=8, directory=os.path.join(tempfile.gettempdir(), 'cache')))
+    headers = {'Cache-Control': 'max-age=60', 'ETag': '"v1"'}
+    print(cache.store('GET', 'http://a/small', {}, 200, headers, 'tiny', 4))
+    print(cache.store('GET', 'http://a/large', {}, 200, headers, 'x' * 100, 100))
+    for url in ('http://a/small', 'http://a/large', 'http://a/none'):
+        entry, fresh = cache.lookup('GET', url, {})
+        print(url, fresh, entry.validators() if entry else None, cache.read_body(entry, 16) if entry else None)
+    print(cache.sizes())
+    cache.clear()
+
+
+if __name__ == '__main__':
+    _debug()
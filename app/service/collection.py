@@ -0,0 +1,462 @@
+import csv
+import json
+import os
+import queue
+import re
+import threading
+import time
+from typing import Optional, Dict, List, Any, Iterator
+
+from app.service.body import BodySource
+from app.service.loadtest import LoadTestStats, LatencyHistogram
+from app.service.logger import get_logger
+from app.service.request import Request, RequestSettings
+from app.service.session import SessionManager, SessionSettings
+
+
+"""
+a collection is a named list of request definitions whose url, header values and body may hold {{name}}
+variables. the runner renders the collection once per row of a csv/jsonl data file, rows are read as the
+workers need them and the results are written to a jsonl file as they complete, so memory does not grow
+with the number of iterations
+"""
+
+LOGGER = get_logger(__name__)
+
+COLLECTION_DIR = os.path.join('cfg', 'collections')
+
+_VARIABLE_PATTERN = re.compile(r'\{\{\s*([A-Za-z_$][\w.$-]*)\s*\}\}')
+_ITERATION_VARIABLE = '$iteration'
+_WRITE_BUFFER = 256 * 1024
+
+
+class DataFormat:
+    CSV = 'csv'
+    JSONL = 'jsonl'
+
+
+class Template:
+    """
+    compiled once, rendering joins the literal parts with the values without scanning the text again.
+    the literals are at the even positions of parts, the variable names at the odd ones
+    """
+    __slots__ = ('source', 'parts', 'names')
+
+    def __init__(self, source: str):
+        self.source = source
+        self.parts = _VARIABLE_PATTERN.split(source)
+        self.names = self.parts[1::2]
+
+    def render(self, variables: Dict[str, Any]) -> str:
+        if not self.names:
+            return self.source
+        parts = self.parts[:]
+        try:
+            parts[1::2] = [str(variables[name]) for name in self.names]
+        except KeyError as e:
+            raise ValueError(f'variable {e} is not defined') from None
+        return ''.join(parts)
+
+
+class CollectionItem:
+    def __init__(self,
+                 name: str = '',
+                 method: str = 'GET',
+                 url: str = '',
+                 headers: Optional[Dict[str, str]] = None,
+                 body: str = '',
+                 settings: Optional[Dict[str, Any]] = None,
+                 body_source: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.method = method
+        self.url = url
+        self.headers = headers if isinstance(headers, dict) else {}
+        self.body = body
+        self.settings = settings if isinstance(settings, dict) else {}
+        self.body_source = body_source if isinstance(body_source, dict) else {}  # file/multipart, not templated
+
+    def __str__(self):
+        return str(self.__dict__)
+
+    @classmethod
+    def from_request(cls, name: str, req: Request) -> 'CollectionItem':
+        body_source = req.body_source.to_dict() if req.body_source.streamed else {}
+        return cls(name, req.method, req.url, dict(req.headers), req.body, dict(req.settings.__dict__), body_source)
+
+    def to_request(self) -> Request:
+        """the item as it is, variables not rendered"""
+        return _CompiledItem(self).render({}, strict=False)
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> 'CollectionItem':
+        item = cls()
+        for k, v in d.items():
+            if hasattr(item, k):
+                setattr(item, k, v)
+        return item
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+
+class _CompiledItem:
+    def __init__(self, item: CollectionItem):
+        self.name = item.name
+        self.method = item.method
+        self.url = Template(item.url)
+        self.headers = [(k, Template(v)) for k, v in item.headers.items()]
+        self.body = Template(item.body)
+        self.settings = RequestSettings()
+        for k, v in item.settings.items():
+            if hasattr(self.settings, k):
+                setattr(self.settings, k, v)
+        self.settings.use_cache = False
+        self.body_source = BodySource.from_dict(item.body_source)
+
+    def render(self, variables: Dict[str, Any], strict: bool = True) -> Request:
+        if not strict:
+            variables = _KeepMissing(variables)
+        return Request(
+            url=self.url.render(variables),
+            method=self.method,
+            headers={k: v.render(variables) for k, v in self.headers},
+            body=self.body.render(variables),
+            settings=self.settings,
+            body_source=self.body_source,
+        )
+
+
+class _KeepMissing(dict):
+    def __missing__(self, key):
+        return '{{' + key + '}}'
+
+
+class Collection:
+    def __init__(self,
+                 name: str = '',
+                 items: Optional[List[CollectionItem]] = None,
+                 variables: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.items = items if isinstance(items, list) else []
+        self.variables = variables if isinstance(variables, dict) else {}  # defaults, data rows override them
+
+    def __str__(self):
+        return str(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> 'Collection':
+        return cls(
+            name=d.get('name', ''),
+            items=[CollectionItem.from_dict(item) for item in d.get('items', [])],
+            variables=d.get('variables', {}),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'items': [item.to_dict() for item in self.items],
+            'variables': self.variables,
+        }
+
+
+def _collection_path(name: str, directory: str) -> str:
+    return os.path.join(directory, re.sub(r'[\\/:*?"<>|]', '_', name) + '.json')
+
+
+def list_collections(directory: str = COLLECTION_DIR) -> (List[str], Exception):
+    try:
+        if not os.path.isdir(directory):
+            return [], None
+        return sorted(name[:-len('.json')] for name in os.listdir(directory) if name.endswith('.json')), None
+    except Exception as e:
+        return [], e
+
+
+def load_collection(name: str, directory: str = COLLECTION_DIR) -> (Collection, Exception):
+    try:
+        with open(_collection_path(name, directory), 'r', encoding='utf-8') as f:
+            collection = Collection.from_dict(json.load(f))
+        collection.name = collection.name or name
+        return collection, None
+    except Exception as e:
+        return None, e
+
+
+def save_collection(collection: Collection, directory: str = COLLECTION_DIR) -> Optional[Exception]:
+    if not collection.name:
+        return ValueError('collection name is required')
+    path = _collection_path(collection.name, directory)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(collection.to_dict(), f, ensure_ascii=False, indent=2)
+        os.replace(path + '.tmp', path)
+        return None
+    except Exception as e:
+        return e
+
+
+def delete_collection(name: str, directory: str = COLLECTION_DIR) -> Optional[Exception]:
+    try:
+        os.remove(_collection_path(name, directory))
+        return None
+    except Exception as e:
+        return e
+
+
+def iter_data(path: str, data_format: str = '') -> Iterator[Dict[str, Any]]:
+    """rows of a csv file with a header line, or objects of a jsonl file, read lazily"""
+    if not data_format:
+        data_format = DataFormat.CSV if path.lower().endswith('.csv') else DataFormat.JSONL
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if data_format == DataFormat.CSV:
+            yield from csv.DictReader(f)
+            return
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError(f'line {n} of {path} is not an object')
+            yield row
+
+
+class CollectionRunSettings:
+    def __init__(self,
+                 data_path: str = '',
+                 output_path: str = '',
+                 concurrency: int = 4,
+                 iterations: int = 0):
+        self.data_path = data_path  # csv or jsonl, each row is an iteration
+        self.output_path = output_path  # results in jsonl, one line per request
+        self.concurrency = max(1, concurrency)
+        self.iterations = max(0, iterations)  # required without a data file, with one 0 means every row
+
+    def __str__(self):
+        return str(self.__dict__)
+
+    def validate(self):
+        if not self.data_path and self.iterations <= 0:
+            return ValueError('iterations is required without a data file')
+        return None
+
+
+class CollectionRunStats:
+    def __init__(self,
+                 elapsed: float = 0.0,
+                 iterations: int = 0,
+                 items: Optional[Dict[str, LoadTestStats]] = None,
+                 finished: bool = False):
+        self.elapsed = elapsed
+        self.iterations = iterations  # completed
+        self.items = items if isinstance(items, dict) else {}  # item name -> stats, in collection order
+        self.finished = finished
+
+    def summary(self) -> str:
+        total = sum(stats.total for stats in self.items.values())
+        failed = sum(stats.failed for stats in self.items.values())
+        return f'iterations: {self.iterations}, requests: {total}, failed: {failed}, elapsed: {self.elapsed:.2f}s'
+
+
+class CollectionRunner:
+    """
+    iterations run in parallel on a pool of threads, the requests of one iteration run in collection order.
+    rows are handed over through a bounded queue, so at most a few rows per thread are in memory
+    """
+    def __init__(self, collection: Collection, settings: Optional[CollectionRunSettings] = None):
+        self.collection = collection
+        self.settings = settings if isinstance(settings, CollectionRunSettings) else CollectionRunSettings()
+        self._items = [_CompiledItem(item) for item in collection.items]
+        self._names = [item.name or f'#{i + 1}' for i, item in enumerate(collection.items)]
+        self._session_manager = SessionManager(SessionSettings(
+            pool_maxsize=self.settings.concurrency,
+            pool_block=True,
+        ))
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._rows: queue.Queue = queue.Queue(self.settings.concurrency * 2)
+        self._histograms = [LatencyHistogram() for _ in self._items]
+        self._errors = [0] * len(self._items)
+        self._status_codes: List[Dict[int, int]] = [{} for _ in self._items]
+        self._iterations = 0
+        self._output = None
+        self._read_err: Optional[Exception] = None
+        self._start_time = 0.0
+        self._end_time = 0.0
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self) -> CollectionRunStats:
+        with self._lock:
+            end = self._end_time if self._end_time else time.perf_counter()
+            items = {}
+            for i, name in enumerate(self._names):
+                items[name] = LoadTestStats(
+                    elapsed=end - self._start_time if self._start_time else 0.0,
+                    histogram=self._histograms[i].copy(),
+                    errors=self._errors[i],
+                    status_codes=dict(self._status_codes[i]),
+                    finished=self._end_time > 0,
+                )
+            return CollectionRunStats(
+                elapsed=end - self._start_time if self._start_time else 0.0,
+                iterations=self._iterations,
+                items=items,
+                finished=self._end_time > 0,
+            )
+
+    def _rows_source(self) -> Iterator[Dict[str, Any]]:
+        settings = self.settings
+        if not settings.data_path:
+            for _ in range(settings.iterations):
+                yield {}
+            return
+        for n, row in enumerate(iter_data(settings.data_path)):
+            if settings.iterations and n >= settings.iterations:
+                return
+            yield row
+
+    def _produce(self):
+        """called at reader thread, blocks while the workers are busy"""
+        try:
+            for n, row in enumerate(self._rows_source()):
+                while not self._stop.is_set():
+                    try:
+                        self._rows.put((n, row), timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if self._stop.is_set():
+                    break
+        except Exception as e:
+            self._read_err = e
+            self._stop.set()
+        for _ in range(self.settings.concurrency):
+            self._rows.put(None)
+
+    def _write(self, record: Dict[str, Any]):
+        if self._output is None:
+            return
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._output.write(line)
+
+    def _run_iteration(self, n: int, row: Dict[str, Any]):
+        variables = dict(self.collection.variables)
+        variables.update(row)
+        variables[_ITERATION_VARIABLE] = n
+        for i, item in enumerate(self._items):
+            if self._stop.is_set():
+                return
+            start = time.perf_counter()
+            try:
+                req = item.render(variables)
+                resp, err = req.invoke(self._session_manager)
+            except Exception as e:
+                req, resp, err = None, None, e
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self._histograms[i].record(seconds)
+                if err is not None:
+                    self._errors[i] += 1
+                else:
+                    codes = self._status_codes[i]
+                    codes[resp.status_code] = codes.get(resp.status_code, 0) + 1
+            self._write({
+                'iteration': n,
+                'item': self._names[i],
+                'method': item.method,
+                'url': req.url if req is not None else item.url.source,
+                'status_code': resp.status_code if resp is not None else 0,
+                'seconds': round(seconds, 6),
+                'size': resp.body_size if resp is not None else 0,
+                'error': str(err) if err is not None else '',
+            })
+            if resp is not None:
+                # only the record is kept, a spilled body would otherwise stay on disk until exit
+                resp.discard()
+        with self._lock:
+            self._iterations += 1
+
+    def _work(self):
+        while True:
+            task = self._rows.get()
+            if task is None:
+                return
+            if not self._stop.is_set():
+                self._run_iteration(*task)
+
+    def run(self) -> (CollectionRunStats, Exception):
+        err = self.settings.validate()
+        if err is None and not self._items:
+            err = ValueError('collection has no requests')
+        if err is not None:
+            return None, err
+        try:
+            if self.settings.output_path:
+                self._output = open(self.settings.output_path, 'w', encoding='utf-8', buffering=_WRITE_BUFFER)
+        except Exception as e:
+            return None, e
+        self._start_time = time.perf_counter()
+        threads = [threading.Thread(target=self._produce, name='collection-reader', daemon=True)]
+        threads.extend(
+            threading.Thread(target=self._work, name=f'collection-{i}', daemon=True)
+            for i in range(self.settings.concurrency)
+        )
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        with self._lock:
+            self._end_time = time.perf_counter()
+            if self._output is not None:
+                self._output.close()
+                self._output = None
+        self._session_manager.close()
+        return self.snapshot(), self._read_err
+
+
+def _debug():
+    import socket
+    import tempfile
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            body = json.dumps({'path': self.path}).encode()
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    collection = Collection('debug', [
+        CollectionItem('user', url='{{host}}/users/{{id}}'),
+        CollectionItem('orders', url='{{host}}/users/{{id}}/orders?i={{$iteration}}', headers={'X-Id': '{{id}}'}),
+    ], {'host': f'http://127.0.0.1:{server.server_address[1]}'})
+    directory = tempfile.mkdtemp()
+    data_path = os.path.join(directory, 'data.csv')
+    with open(data_path, 'w', encoding='utf-8') as f:
+        f.write('id\n' + '\n'.join(str(i) for i in range(1000)) + '\n')
+    settings = CollectionRunSettings(data_path, os.path.join(directory, 'result.jsonl'), concurrency=8)
+    stats, err = CollectionRunner(collection, settings).run()
+    print(stats.summary(), err)
+    for name, item_stats in stats.items.items():
+        print(name, item_stats.summary())
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    _debug()
@@ -0,0 +1,248 @@
+import gzip
+import importlib
+import importlib.util
+import zlib
+from typing import Optional, Dict, Any, List
+
+
+"""
+content codings for the request tab. gzip and deflate come with zlib, br and zstd are used only when the optional
+brotli (or brotlicffi) and zstandard packages are installed, and only then are they offered in Accept-Encoding.
+responses are decompressed chunk by chunk as they arrive, only the decompressed chunks are kept
+"""
+
+
+class Encoding:
+    IDENTITY = 'identity'
+    GZIP = 'gzip'
+    DEFLATE = 'deflate'
+    BR = 'br'
+    ZSTD = 'zstd'
+
+
+_BROTLI_MODULES = ['brotli', 'brotlicffi']
+_ZSTD_MODULE = 'zstandard'
+
+MIN_COMPRESS_BODY_SIZE = 1024  # smaller request bodies grow rather than shrink with gzip
+_COMPRESS_LEVEL = 6
+_BROTLI_QUALITY = 5  # the default 11 is far too slow for bodies of a few MB
+
+
+def _find_brotli() -> str:
+    for name in _BROTLI_MODULES:
+        if importlib.util.find_spec(name) is not None:
+            return name
+    return ''
+
+
+_BROTLI_MODULE = _find_brotli()
+_HAS_ZSTD = importlib.util.find_spec(_ZSTD_MODULE) is not None
+
+
+def supported_encodings() -> List[str]:
+    """in order of preference"""
+    encodings = []
+    if _HAS_ZSTD:
+        encodings.append(Encoding.ZSTD)
+    if _BROTLI_MODULE:
+        encodings.append(Encoding.BR)
+    encodings.extend([Encoding.GZIP, Encoding.DEFLATE])
+    return encodings
+
+
+def accept_encoding() -> str:
+    return ', '.join(supported_encodings())
+
+
+class _IdentityDecoder:
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+    def flush(self) -> bytes:
+        return b''
+
+
+class _GzipDecoder:
+    """gzip bodies may hold several members, each one is decompressed in turn"""
+    def __init__(self):
+        self._obj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def decompress(self, data: bytes) -> bytes:
+        out = []
+        while data:
+            out.append(self._obj.decompress(data))
+            data = self._obj.unused_data
+            if not data:
+                break
+            self._obj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return b''.join(out)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+
+class _DeflateDecoder:
+    """deflate should be zlib wrapped, some servers send raw deflate, decided by the first chunk"""
+    def __init__(self):
+        self._obj: Optional[zlib.Decompress] = None
+
+    def decompress(self, data: bytes) -> bytes:
+        if not data:
+            return b''
+        if self._obj is None:
+            self._obj = zlib.decompressobj()
+            try:
+                return self._obj.decompress(data)
+            except zlib.error:
+                self._obj = zlib.decompressobj(-zlib.MAX_WBITS)
+        return self._obj.decompress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush() if self._obj is not None else b''
+
+
+class _BrotliDecoder:
+    def __init__(self):
+        brotli = importlib.import_module(_BROTLI_MODULE)
+        self._obj = brotli.Decompressor()
+        self._process = getattr(self._obj, 'process', None) or self._obj.decompress
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._process(data) if data else b''
+
+    def flush(self) -> bytes:
+        return b''
+
+
+class _ZstdDecoder:
+    def __init__(self):
+        zstandard = importlib.import_module(_ZSTD_MODULE)
+        self._obj = zstandard.ZstdDecompressor().decompressobj()
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._obj.decompress(data) if data else b''
+
+    def flush(self) -> bytes:
+        return b''
+
+
+class _ChainDecoder:
+    """Content-Encoding: gzip, br means gzip was applied first, so br is undone first"""
+    def __init__(self, decoders: list):
+        self._decoders = decoders
+
+    def decompress(self, data: bytes) -> bytes:
+        for decoder in self._decoders:
+            data = decoder.decompress(data)
+        return data
+
+    def flush(self) -> bytes:
+        data = b''
+        for decoder in self._decoders:
+            data = decoder.decompress(data) + decoder.flush() if data else decoder.flush()
+        return data
+
+
+def _create_single_decoder(encoding: str):
+    if encoding in ('', Encoding.IDENTITY):
+        return _IdentityDecoder()
+    if encoding in (Encoding.GZIP, 'x-gzip'):
+        return _GzipDecoder()
+    if encoding == Encoding.DEFLATE:
+        return _DeflateDecoder()
+    if encoding == Encoding.BR and _BROTLI_MODULE:
+        return _BrotliDecoder()
+    if encoding == Encoding.ZSTD and _HAS_ZSTD:
+        return _ZstdDecoder()
+    return None
+
+
+def create_decoder(content_encoding: str) -> (Any, Exception):
+    """a decoder with decompress(chunk) -> bytes and flush() -> bytes for the Content-Encoding header value"""
+    encodings = [e.strip().lower() for e in content_encoding.split(',') if e.strip()]
+    decoders = []
+    for encoding in reversed(encodings):
+        decoder = _create_single_decoder(encoding)
+        if decoder is None:
+            return None, ValueError(f'unsupported content encoding: {encoding}')
+        decoders.append(decoder)
+    if len(decoders) == 1:
+        return decoders[0], None
+    return _ChainDecoder(decoders) if decoders else _IdentityDecoder(), None
+
+
+def compress(data: bytes, encoding: str = Encoding.GZIP) -> (bytes, Exception):
+    """request bodies are small enough to be compressed at once"""
+    try:
+        if encoding == Encoding.GZIP:
+            return gzip.compress(data, _COMPRESS_LEVEL, mtime=0), None
+        if encoding == Encoding.DEFLATE:
+            return zlib.compress(data, _COMPRESS_LEVEL), None
+        if encoding == Encoding.BR and _BROTLI_MODULE:
+            return importlib.import_module(_BROTLI_MODULE).compress(data, quality=_BROTLI_QUALITY), None
+        if encoding == Encoding.ZSTD and _HAS_ZSTD:
+            return importlib.import_module(_ZSTD_MODULE).ZstdCompressor().compress(data), None
+    except Exception as e:
+        return b'', e
+    return b'', ValueError(f'unsupported content encoding: {encoding}')
+
+
+class TransferStats:
+    """body bytes on the wire versus in use, for both directions of a single request"""
+    def __init__(self):
+        self.content_encoding = ''  # of the response
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+        self.decompress_seconds = 0.0
+        self.request_encoding = ''
+        self.request_bytes = 0
+        self.request_wire_bytes = 0
+
+    def __str__(self):
+        return str(self.__dict__)
+
+    @property
+    def ratio(self) -> float:
+        """decoded / wire of the response, 1 when not compressed"""
+        return self.decoded_bytes / self.wire_bytes if self.wire_bytes else 1.0
+
+    def summary(self) -> str:
+        parts = [f'response {self.wire_bytes}B on the wire']
+        if self.content_encoding:
+            parts[0] += f', {self.decoded_bytes}B decoded ({self.content_encoding}, {self.ratio:.2f}x), ' \
+                        f'decompress {self.decompress_seconds * 1e3:.3f}ms'
+        if self.request_encoding:
+            parts.append(f'request body {self.request_bytes}B -> {self.request_wire_bytes}B ({self.request_encoding})')
+        elif self.request_bytes:
+            parts.append(f'request body {self.request_bytes}B')
+        return '; '.join(parts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+    @classmethod
+    def from_dict(cls, d: Optional[Dict[str, Any]]) -> 'TransferStats':
+        stats = cls()
+        if isinstance(d, dict):
+            for k, v in d.items():
+                if hasattr(stats, k):
+                    setattr(stats, k, v)
+        return stats
+
+
+def _debug():
+    print(f'accept encoding: {accept_encoding()}')
+    data = b'{"key": "value"}\n' * 100000
+    for encoding in supported_encodings():
+        compressed, err = compress(data, encoding)
+        decoder, err = create_decoder(encoding)
+        out = [decoder.decompress(compressed[i:i + 8192]) for i in range(0, len(compressed), 8192)]
+        out.append(decoder.flush())
+        print(f'{encoding}: {len(data)} -> {len(compressed)}, roundtrip: {b"".join(out) == data}')
+    decoder, err = create_decoder('gzip, deflate')
+    print(f'gzip, deflate: {decoder.decompress(zlib.compress(gzip.compress(data))) == data}')
+    print(create_decoder('compress'))
+
+
+if __name__ == '__main__':
+    _debug()
@@ -0,0 +1,78 @@
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Optional, Callable, Dict
+
+
+class ExecutorBackend:
+    THREAD = 'thread'
+    PROCESS = 'process'  # opt-in, pickles every request and response across processes
+
+
+_DEFAULT_BACKEND = ExecutorBackend.THREAD
+_DEFAULT_MAX_WORKERS = {
+    ExecutorBackend.THREAD: 8,
+    ExecutorBackend.PROCESS: 3,
+}
+
+_BACKENDS: Dict[str, Callable[[int], Executor]] = {
+    ExecutorBackend.THREAD: lambda n: ThreadPoolExecutor(max_workers=n, thread_name_prefix='request'),
+    ExecutorBackend.PROCESS: lambda n: ProcessPoolExecutor(max_workers=n),
+}
+
+
+def register_backend(name: str, factory: Callable[[int], Executor], max_workers: int = 4):
+    _BACKENDS[name] = factory
+    _DEFAULT_MAX_WORKERS.setdefault(name, max_workers)
+
+
+def backends():
+    return list(_BACKENDS.keys())
+
+
+def create_executor(backend: str = _DEFAULT_BACKEND, max_workers: Optional[int] = None) -> (Executor, Exception):
+    factory = _BACKENDS.get(backend)
+    if factory is None:
+        return None, ValueError(f'unknown executor backend: {backend}')
+    if not isinstance(max_workers, int) or max_workers <= 0:
+        max_workers = _DEFAULT_MAX_WORKERS.get(backend, 4)
+    try:
+        return factory(max_workers), None
+    except Exception as e:
+        return None, e
+
+
+_EXECUTOR: Optional[Executor] = None
+_EXECUTOR_BACKEND = ''
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def get_executor() -> Executor:
+    global _EXECUTOR, _EXECUTOR_BACKEND
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR, _ = create_executor(_DEFAULT_BACKEND)
+            _EXECUTOR_BACKEND = _DEFAULT_BACKEND
+        return _EXECUTOR
+
+
+def get_executor_backend() -> str:
+    get_executor()
+    return _EXECUTOR_BACKEND
+
+
+def in_process() -> bool:
+    """whether tasks of the shared executor run in this process and may take callbacks"""
+    return not isinstance(get_executor(), ProcessPoolExecutor)
+
+
+def set_executor_backend(backend: str, max_workers: Optional[int] = None) -> Optional[Exception]:
+    """switch the shared request executor, in-flight tasks of the previous one still finish"""
+    global _EXECUTOR, _EXECUTOR_BACKEND
+    executor, err = create_executor(backend, max_workers)
+    if err is not None:
+        return err
+    with _EXECUTOR_LOCK:
+        prev, _EXECUTOR, _EXECUTOR_BACKEND = _EXECUTOR, executor, backend
+    if prev is not None:
+        prev.shutdown(wait=False)
+    return None
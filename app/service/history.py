@@ -0,0 +1,510 @@
+import atexit
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Optional, Dict, List, Any
+
+from app.service.body import BodySource
+from app.service.logger import get_logger
+from app.service.request import Request, RequestSettings, Response
+from app.service.session import ConnectionTrace
+
+
+"""
+request history is a set of append-only jsonl segments, the active one is cfg/history/requests.jsonl.
+cfg/history/index.db (sqlite) keeps the segment/offset/length of every entry together with the searchable
+fields, so browsing and searching never scans the segments, and a single entry is read back by one seek.
+the segments are the source of truth, the index can always be rebuilt from them
+"""
+
+LOGGER = get_logger(__name__)
+
+HISTORY_DIR = os.path.join('cfg', 'history')
+ACTIVE_SEGMENT = 'requests.jsonl'
+INDEX_DB = 'index.db'
+
+_MAX_STORED_BODY = 64 * 1024  # request bodies larger than this only keep the digest
+
+
+class HistoryStatus:
+    """status filters, besides an exact status code"""
+    ALL = ''
+    SUCCESS = '2xx'
+    REDIRECT = '3xx'
+    CLIENT_ERROR = '4xx'
+    SERVER_ERROR = '5xx'
+    FAILED = 'failed'  # no response at all
+
+
+class HistoryEntry:
+    def __init__(self,
+                 id: int = 0,
+                 timestamp: float = 0.0,
+                 method: str = '',
+                 url: str = '',
+                 headers: Optional[Dict[str, str]] = None,
+                 body: str = '',
+                 body_size: int = 0,
+                 body_digest: str = '',
+                 settings: Optional[Dict[str, Any]] = None,
+                 status_code: int = 0,
+                 error: str = '',
+                 seconds: float = 0.0,
+                 resp_size: int = 0,
+                 connect_seconds: float = 0.0,
+                 reused: bool = False,
+                 timings: Optional[Dict[str, float]] = None,
+                 transfer: Optional[Dict[str, Any]] = None,
+                 body_source: Optional[Dict[str, Any]] = None):
+        self.id = id
+        self.timestamp = timestamp
+        self.method = method
+        self.url = url
+        self.headers = headers if isinstance(headers, dict) else {}
+        self.body = body
+        self.body_size = body_size
+        self.body_digest = body_digest
+        self.settings = settings if isinstance(settings, dict) else {}
+        self.status_code = status_code  # 0 if there was no response
+        self.error = error
+        self.seconds = seconds
+        self.resp_size = resp_size
+        self.connect_seconds = connect_seconds
+        self.reused = reused
+        self.timings = timings if isinstance(timings, dict) else {}  # RequestPhase -> seconds
+        self.transfer = transfer if isinstance(transfer, dict) else {}  # TransferStats.to_dict
+        self.body_source = body_source if isinstance(body_source, dict) else {}  # BodySource.to_dict
+
+    def __str__(self):
+        return str(self.__dict__)
+
+    @property
+    def body_stored(self) -> bool:
+        return len(self.body.encode('utf-8')) == self.body_size
+
+    @classmethod
+    def from_request(cls,
+                     req: Request,
+                     resp: Optional[Response],
+                     err: Optional[BaseException],
+                     seconds: float,
+                     trace: Optional[ConnectionTrace] = None,
+                     timestamp: float = 0.0) -> 'HistoryEntry':
+        body = req.body.encode('utf-8')
+        if trace is None and resp is not None:
+            trace = resp.trace
+        return cls(
+            timestamp=timestamp or time.time(),
+            method=req.method,
+            url=req.url,
+            headers=dict(req.headers),
+            body=req.body if len(body) <= _MAX_STORED_BODY else '',
+            body_size=len(body),
+            body_digest=hashlib.sha256(body).hexdigest(),
+            settings=dict(req.settings.__dict__),
+            status_code=resp.status_code if resp is not None else 0,
+            error=str(err) if err is not None else '',
+            seconds=seconds,
+            resp_size=resp.body_size if resp is not None else 0,
+            connect_seconds=trace.connect_seconds if trace is not None else 0.0,
+            reused=trace.reused if trace is not None else False,
+            timings=resp.timings.to_dict() if resp is not None else {},
+            transfer=resp.transfer.to_dict() if resp is not None else {},
+            body_source=req.body_source.to_dict() if req.body_source.streamed else {},
+        )
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> 'HistoryEntry':
+        entry = cls()
+        for k, v in d.items():
+            if hasattr(entry, k):
+                setattr(entry, k, v)
+        return entry
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.__dict__)
+
+    def to_request(self) -> Request:
+        settings = RequestSettings()
+        for k, v in self.settings.items():
+            if hasattr(settings, k):
+                setattr(settings, k, v)
+        return Request(
+            url=self.url,
+            method=self.method,
+            headers=dict(self.headers),
+            body=self.body,
+            settings=settings,
+            body_source=BodySource.from_dict(self.body_source),
+        )
+
+
+class HistorySettings:
+    def __init__(self,
+                 max_segment_bytes: int = 32 * 1024 * 1024,
+                 max_segments: int = 16):
+        self.max_segment_bytes = max_segment_bytes  # the active segment is rotated beyond this size
+        self.max_segments = max_segments  # oldest rotated segments are dropped beyond this count
+
+    def __str__(self):
+        return str(self.__dict__)
+
+
+_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS entries (
+        id INTEGER PRIMARY KEY,
+        segment TEXT NOT NULL,
+        offset INTEGER NOT NULL,
+        length INTEGER NOT NULL,
+        ts REAL NOT NULL,
+        method TEXT NOT NULL,
+        url TEXT NOT NULL,
+        status INTEGER NOT NULL,
+        seconds REAL NOT NULL,
+        error TEXT NOT NULL
+    )''',
+    'CREATE INDEX IF NOT EXISTS entries_ts ON entries (ts)',
+    'CREATE INDEX IF NOT EXISTS entries_status ON entries (status)',
+    'CREATE INDEX IF NOT EXISTS entries_segment ON entries (segment)',
+]
+
+# substring search needs the trigram tokenizer (sqlite 3.34+), plain fts5 matches whole tokens only
+_FTS_SCHEMAS = [
+    ('trigram', "CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(url, tokenize='trigram')"),
+    ('fts5', 'CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(url)'),
+]
+
+_SUMMARY_COLUMNS = 'id, ts, method, url, status, seconds, error'
+
+
+class HistoryStore:
+    """
+    append() only enqueues, a writer thread appends the lines and indexes them in batches.
+    query() and load() read the index/segments directly and are safe from any thread
+    """
+    def __init__(self, root: str = HISTORY_DIR, settings: Optional[HistorySettings] = None):
+        self.root = root
+        self.settings = settings if isinstance(settings, HistorySettings) else HistorySettings()
+        self.fts = ''  # fts flavor in use, empty for plain LIKE search
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._next_id = 1
+        self._queue: 'queue.Queue[Optional[HistoryEntry]]' = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+
+    def open(self) -> Optional[Exception]:
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            db_path = os.path.join(self.root, INDEX_DB)
+            fresh = not os.path.exists(db_path)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            for sql in _SCHEMA:
+                self._db.execute(sql)
+            for fts, sql in _FTS_SCHEMAS:
+                try:
+                    self._db.execute(sql)
+                    self.fts = fts
+                    break
+                except sqlite3.OperationalError:
+                    continue
+            self._db.commit()
+            if fresh and self.segments():
+                self._rebuild_index()
+            else:
+                self._recover_tail()
+            self._next_id = self._db.execute('SELECT COALESCE(MAX(id), 0) FROM entries').fetchone()[0] + 1
+        except Exception as e:
+            return e
+        self._writer = threading.Thread(target=self._write_loop, name='history-writer', daemon=True)
+        self._writer.start()
+        LOGGER.debug('history open -> root: %s, next id: %s, fts: %s', self.root, self._next_id, self.fts)
+        return None
+
+    def close(self):
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def append(self, entry: HistoryEntry):
+        self._queue.put(entry)
+
+    def flush(self):
+        """wait until every appended entry is written and indexed"""
+        self._queue.join()
+
+    def segments(self) -> List[str]:
+        """rotated segments from old to new, then the active one"""
+        rotated = []
+        for name in os.listdir(self.root):
+            if name.startswith('requests-') and name.endswith('.jsonl'):
+                rotated.append(name)
+        rotated.sort(key=lambda n: int(n[len('requests-'):-len('.jsonl')]))
+        if os.path.exists(os.path.join(self.root, ACTIVE_SEGMENT)):
+            rotated.append(ACTIVE_SEGMENT)
+        return rotated
+
+    # writing
+
+    def _write_loop(self):
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            entries = [e for e in batch if e is not None]
+            stopping = len(entries) < len(batch)
+            try:
+                if entries:
+                    self._write(entries)
+            except Exception as e:
+                LOGGER.error('history write failed -> entries: %s, err: %s', len(entries), e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, entries: List[HistoryEntry]):
+        path = os.path.join(self.root, ACTIVE_SEGMENT)
+        while entries:
+            rows = []
+            with open(path, 'ab') as f:
+                while entries and f.tell() < self.settings.max_segment_bytes:
+                    entry = entries.pop(0)
+                    entry.id = self._next_id
+                    self._next_id += 1
+                    line = (json.dumps(entry.to_dict(), ensure_ascii=False) + '\n').encode('utf-8')
+                    offset = f.tell()
+                    f.write(line)
+                    rows.append(self._index_row(entry, ACTIVE_SEGMENT, offset, len(line)))
+                full = f.tell() >= self.settings.max_segment_bytes
+            with self._db_lock:
+                self._insert_rows(rows)
+                self._db.commit()
+            if full:
+                self._rotate()
+
+    @staticmethod
+    def _index_row(entry: HistoryEntry, segment: str, offset: int, length: int) -> tuple:
+        return (entry.id, segment, offset, length, entry.timestamp, entry.method, entry.url,
+                entry.status_code, entry.seconds, entry.error)
+
+    def _insert_rows(self, rows: List[tuple]):
+        self._db.executemany('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        if self.fts:
+            self._db.executemany('INSERT INTO entries_fts (rowid, url) VALUES (?, ?)', [(r[0], r[6]) for r in rows])
+
+    def _rotate(self):
+        """rename the active segment after its first entry id, then drop segments beyond the limit"""
+        with self._db_lock:
+            first_id = self._db.execute(
+                'SELECT MIN(id) FROM entries WHERE segment = ?', (ACTIVE_SEGMENT,)).fetchone()[0] or self._next_id
+            name = f'requests-{first_id}.jsonl'
+            os.replace(os.path.join(self.root, ACTIVE_SEGMENT), os.path.join(self.root, name))
+            self._db.execute('UPDATE entries SET segment = ? WHERE segment = ?', (name, ACTIVE_SEGMENT))
+            self._db.commit()
+        LOGGER.info('history rotate -> segment: %s', name)
+        self.compact()
+
+    def compact(self):
+        """drop the oldest rotated segments together with their index rows"""
+        rotated = [s for s in self.segments() if s != ACTIVE_SEGMENT]
+        dropped = rotated[:max(0, len(rotated) - self.settings.max_segments)]
+        if not dropped:
+            return
+        with self._db_lock:
+            for segment in dropped:
+                if self.fts:
+                    self._db.execute(
+                        'DELETE FROM entries_fts WHERE rowid IN (SELECT id FROM entries WHERE segment = ?)',
+                        (segment,))
+                self._db.execute('DELETE FROM entries WHERE segment = ?', (segment,))
+            self._db.commit()
+        for segment in dropped:
+            try:
+                os.remove(os.path.join(self.root, segment))
+            except OSError as e:
+                LOGGER.warning('history compact -> remove %s failed: %s', segment, e)
+        LOGGER.info('history compact -> dropped segments: %s', dropped)
+
+    # indexing existing segments
+
+    def _index_segment(self, segment: str, start: int = 0) -> int:
+        """index the complete lines of a segment from start, a torn last line is cut off. returns lines indexed"""
+        path = os.path.join(self.root, segment)
+        rows = []
+        end = start
+        with open(path, 'rb') as f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    entry = HistoryEntry.from_dict(json.loads(line))
+                    rows.append(self._index_row(entry, segment, end, len(line)))
+                except Exception as e:
+                    LOGGER.warning('history index -> skip bad line at %s:%s, err: %s', segment, end, e)
+                end += len(line)
+        if end < os.path.getsize(path):
+            with open(path, 'r+b') as f:
+                f.truncate(end)
+        with self._db_lock:
+            self._insert_rows(rows)
+            self._db.commit()
+        return len(rows)
+
+    def _recover_tail(self):
+        """lines written but not indexed before an unclean exit"""
+        path = os.path.join(self.root, ACTIVE_SEGMENT)
+        if not os.path.exists(path):
+            return
+        end = self._db.execute(
+            'SELECT COALESCE(MAX(offset + length), 0) FROM entries WHERE segment = ?', (ACTIVE_SEGMENT,)
+        ).fetchone()[0]
+        if end < os.path.getsize(path):
+            n = self._index_segment(ACTIVE_SEGMENT, end)
+            LOGGER.info('history recover -> indexed %s entries from offset %s', n, end)
+
+    def _rebuild_index(self):
+        with self._db_lock:
+            self._db.execute('DELETE FROM entries')
+            if self.fts:
+                self._db.execute('DELETE FROM entries_fts')
+            self._db.commit()
+        total = 0
+        for segment in self.segments():
+            total += self._index_segment(segment)
+        LOGGER.info('history rebuild index -> entries: %s', total)
+
+    # reading
+
+    def query(self,
+              url: str = '',
+              status: str = HistoryStatus.ALL,
+              since: float = 0.0,
+              until: float = 0.0,
+              before_id: int = 0,
+              limit: int = 200) -> (List[HistoryEntry], Exception):
+        """newest first summaries, pass the last id as before_id to get the next page"""
+        where, params = [], []
+        if url:
+            if self.fts == 'trigram' and len(url) >= 3 or self.fts == 'fts5':
+                where.append('id IN (SELECT rowid FROM entries_fts WHERE entries_fts MATCH ?)')
+                params.append('"' + url.replace('"', '""') + '"')
+            else:
+                where.append('url LIKE ?')
+                params.append(f'%{url}%')
+        if status == HistoryStatus.FAILED:
+            where.append('status = 0')
+        elif status.endswith('xx') and status[:1].isdigit():
+            base = int(status[0]) * 100
+            where.append('status >= ? AND status < ?')
+            params.extend([base, base + 100])
+        elif status.isdigit():
+            where.append('status = ?')
+            params.append(int(status))
+        if since > 0:
+            where.append('ts >= ?')
+            params.append(since)
+        if until > 0:
+            where.append('ts < ?')
+            params.append(until)
+        if before_id > 0:
+            where.append('id < ?')
+            params.append(before_id)
+        sql = f'SELECT {_SUMMARY_COLUMNS} FROM entries'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY id DESC LIMIT ?'
+        params.append(limit)
+        try:
+            with self._db_lock:
+                rows = self._db.execute(sql, params).fetchall()
+        except Exception as e:
+            return [], e
+        return [HistoryEntry(id=r[0], timestamp=r[1], method=r[2], url=r[3], status_code=r[4], seconds=r[5],
+                             error=r[6]) for r in rows], None
+
+    def load(self, entry_id: int) -> (HistoryEntry, Exception):
+        """the full entry, read from its segment by offset"""
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    'SELECT segment, offset, length FROM entries WHERE id = ?', (entry_id,)).fetchone()
+            if row is None:
+                return None, KeyError(f'history entry not found: {entry_id}')
+            segment, offset, length = row
+            with open(os.path.join(self.root, segment), 'rb') as f:
+                f.seek(offset)
+                line = f.read(length)
+            return HistoryEntry.from_dict(json.loads(line)), None
+        except Exception as e:
+            return None, e
+
+
+_STORE: Optional[HistoryStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_history_store() -> (HistoryStore, Exception):
+    """the shared store, opened on first use"""
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            store = HistoryStore()
+            err = store.open()
+            if err is not None:
+                return None, err
+            _STORE = store
+        return _STORE, None
+
+
+def close_history_store():
+    """the writer is a daemon thread, entries still queued at exit would be lost without this"""
+    global _STORE
+    with _STORE_LOCK:
+        store, _STORE = _STORE, None
+    if store is not None:
+        store.close()
+
+
+atexit.register(close_history_store)
+
+
+def _debug():
+    import shutil
+    import tempfile
+    root = tempfile.mkdtemp(prefix='homemade-history-')
+    store = HistoryStore(root, HistorySettings(max_segment_bytes=256 * 1024, max_segments=2))
+    print(f'open: {store.open()}, fts: {store.fts}')
+    start = time.perf_counter()
+    for i in range(5000):
+        req = Request(url=f'https://example.com/api/items/{i}?q={i % 7}', body='{"i": %d}' % i)
+        resp = Response(status_code=200 if i % 10 else 500, body='ok')
+        store.append(HistoryEntry.from_request(req, resp, None, 0.01 * (i % 50)))
+    store.flush()
+    print(f'append 5000 entries: {time.perf_counter() - start:.3f}s, segments: {store.segments()}')
+    start = time.perf_counter()
+    entries, err = store.query(url='items/49', status=HistoryStatus.SERVER_ERROR)
+    print(f'query: {len(entries)} entries in {time.perf_counter() - start:.4f}s, err: {err}')
+    if entries:
+        entry, err = store.load(entries[0].id)
+        print(f'load latest: {entry}, err: {err}')
+    store.close()
+    shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    _debug()
@@ -0,0 +1,269 @@
+import bisect
+import math
+import threading
+import time
+from typing import Optional, Dict, List
+
+from app.service.request import Request
+from app.service.session import SessionManager, SessionSettings
+
+
+_HISTOGRAM_MIN_SECONDS = 1e-5
+_HISTOGRAM_GROWTH = 1.02  # each bucket is 2% wider than the previous one
+
+
+class LatencyHistogram:
+    """log-bucketed latency histogram, percentiles are accurate to about 1%"""
+    def __init__(self):
+        self._log_growth = math.log(_HISTOGRAM_GROWTH)
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.sum = 0.0
+        self.min = 0.0
+        self.max = 0.0
+
+    def _bucket(self, seconds: float) -> int:
+        if seconds <= _HISTOGRAM_MIN_SECONDS:
+            return 0
+        return int(math.log(seconds / _HISTOGRAM_MIN_SECONDS) / self._log_growth) + 1
+
+    def _bucket_upper(self, bucket: int) -> float:
+        return _HISTOGRAM_MIN_SECONDS * (_HISTOGRAM_GROWTH ** bucket)
+
+    def record(self, seconds: float):
+        bucket = self._bucket(seconds)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        if self.total == 0 or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.total += 1
+        self.sum += seconds
+
+    def merge(self, other: 'LatencyHistogram'):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        if other.total:
+            self.min = other.min if self.total == 0 else min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self.total += other.total
+        self.sum += other.sum
+
+    def copy(self) -> 'LatencyHistogram':
+        h = LatencyHistogram()
+        h.merge(self)
+        return h
+
+    def mean(self) -> float:
+        return self.sum / self.total if self.total else 0.0
+
+    def percentile(self, p: float) -> float:
+        if self.total == 0:
+            return 0.0
+        rank = max(1, math.ceil(self.total * p / 100))
+        seen = 0
+        for bucket in sorted(self.counts.keys()):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self._bucket_upper(bucket), self.max)
+        return self.max
+
+    def bars(self, edges: List[float]) -> List[int]:
+        """counts per latency range, edges are upper bounds in seconds"""
+        result = [0] * (len(edges) + 1)
+        for bucket, count in self.counts.items():
+            result[bisect.bisect_left(edges, self._bucket_upper(bucket))] += count
+        return result
+
+
+class LoadTestSettings:
+    def __init__(self,
+                 rps: float = 0,
+                 concurrency: int = 10,
+                 duration: float = 10.0,
+                 count: int = 0):
+        self.rps = max(0.0, rps)  # 0 means as fast as the workers go
+        self.concurrency = max(1, concurrency)
+        self.duration = max(0.0, duration)  # seconds, 0 means no limit
+        self.count = max(0, count)  # total requests, 0 means no limit
+
+    def __str__(self):
+        return str(self.__dict__)
+
+    def validate(self):
+        if self.duration <= 0 and self.count <= 0:
+            return ValueError('duration or count is required')
+        return None
+
+
+class LoadTestStats:
+    def __init__(self,
+                 elapsed: float = 0.0,
+                 histogram: Optional[LatencyHistogram] = None,
+                 errors: int = 0,
+                 status_codes: Optional[Dict[int, int]] = None,
+                 finished: bool = False):
+        self.elapsed = elapsed
+        self.histogram = histogram if isinstance(histogram, LatencyHistogram) else LatencyHistogram()
+        self.errors = errors
+        self.status_codes = status_codes if isinstance(status_codes, dict) else {}
+        self.finished = finished
+
+    @property
+    def total(self) -> int:
+        return self.histogram.total
+
+    @property
+    def failed(self) -> int:
+        """exceptions plus responses outside of 2xx/3xx"""
+        return self.errors + sum(n for code, n in self.status_codes.items() if code >= 400)
+
+    @property
+    def throughput(self) -> float:
+        return self.total / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        return self.failed / self.total if self.total else 0.0
+
+    def percentiles(self) -> Dict[str, float]:
+        return {
+            'p50': self.histogram.percentile(50),
+            'p90': self.histogram.percentile(90),
+            'p99': self.histogram.percentile(99),
+            'p999': self.histogram.percentile(99.9),
+        }
+
+    def summary(self) -> str:
+        p = self.percentiles()
+        return (f'requests: {self.total}, elapsed: {self.elapsed:.2f}s, throughput: {self.throughput:.1f}/s, '
+                f'error rate: {self.error_rate * 100:.2f}%, '
+                f'p50: {p["p50"] * 1e3:.2f}ms, p90: {p["p90"] * 1e3:.2f}ms, '
+                f'p99: {p["p99"] * 1e3:.2f}ms, p999: {p["p999"] * 1e3:.2f}ms')
+
+
+class LoadTestRunner:
+    """
+    fire one request repeatedly from a pool of threads sharing keep-alive connections.
+    every request goes through requests under the GIL, so expect hundreds of requests per second, not thousands
+    """
+    def __init__(self, req: Request, settings: Optional[LoadTestSettings] = None):
+        self.req = req
+        self.settings = settings if isinstance(settings, LoadTestSettings) else LoadTestSettings()
+        self._session_manager = SessionManager(SessionSettings(
+            pool_maxsize=self.settings.concurrency,
+            pool_block=True,
+        ))
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._histogram = LatencyHistogram()
+        self._errors = 0
+        self._status_codes: Dict[int, int] = {}
+        self._issued = 0
+        self._start_time = 0.0
+        self._end_time = 0.0
+        self._next_send = 0.0
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self) -> LoadTestStats:
+        with self._lock:
+            end = self._end_time if self._end_time else time.perf_counter()
+            return LoadTestStats(
+                elapsed=end - self._start_time if self._start_time else 0.0,
+                histogram=self._histogram.copy(),
+                errors=self._errors,
+                status_codes=dict(self._status_codes),
+                finished=self._end_time > 0,
+            )
+
+    def _acquire_slot(self) -> bool:
+        """reserve the next request, waiting for its send time when rate limited"""
+        settings = self.settings
+        with self._lock:
+            if settings.count and self._issued >= settings.count:
+                return False
+            self._issued += 1
+            send_at = 0.0
+            if settings.rps > 0:
+                send_at = max(self._next_send, time.perf_counter())
+                self._next_send = send_at + 1 / settings.rps
+        if send_at:
+            delay = send_at - time.perf_counter()
+            if delay > 0 and self._stop.wait(delay):
+                return False
+        if settings.duration and time.perf_counter() - self._start_time >= settings.duration:
+            return False
+        return not self._stop.is_set()
+
+    def _work(self):
+        while self._acquire_slot():
+            start = time.perf_counter()
+            resp, err = self.req.invoke(self._session_manager)
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self._histogram.record(seconds)
+                if err is not None:
+                    self._errors += 1
+                else:
+                    code = resp.status_code
+                    self._status_codes[code] = self._status_codes.get(code, 0) + 1
+            if resp is not None:
+                resp.discard()
+
+    def run(self) -> (LoadTestStats, Exception):
+        err = self.settings.validate() or self.req.validate()
+        if err is not None:
+            return None, err
+        self._start_time = time.perf_counter()
+        self._next_send = self._start_time
+        threads = [
+            threading.Thread(target=self._work, name=f'loadtest-{i}', daemon=True)
+            for i in range(self.settings.concurrency)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        with self._lock:
+            self._end_time = time.perf_counter()
+        self._session_manager.close()
+        return self.snapshot(), None
+
+
+def _debug():
+    import socket
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            super().setup()
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            body = b'{"ok": true}'
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    req = Request(url=f'http://127.0.0.1:{server.server_address[1]}/')
+
+    stats, err = LoadTestRunner(req, LoadTestSettings(concurrency=8, duration=3)).run()
+    print(f'fixed concurrency -> {stats.summary() if err is None else err}')
+    stats, err = LoadTestRunner(req, LoadTestSettings(rps=200, concurrency=8, count=400)).run()
+    print(f'target rps 200 -> {stats.summary() if err is None else err}')
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    _debug()
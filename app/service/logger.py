@@ -1,8 +1,211 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from typing import Optional, Dict, Any
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='[%(asctime)s] [%(name)s] [%(levelname)s] %(message)s'
-)
 
-LOGGER = logging.getLogger()
+"""
+records are handed to a QueueListener thread that formats and writes them, the calling thread (usually the gui)
+only checks the level, merges the message and puts it into a bounded queue. when the writer falls behind,
+records are dropped instead of blocking the caller.
+levels per logger name, the log file and its rotation are read from cfg/logger.json
+"""
+
+LOGGER_CONFIG_PATH = os.path.join('cfg', 'logger.json')
+
+_FORMAT = '[%(asctime)s] [%(name)s] [%(levelname)s] %(message)s'
+_QUEUE_SIZE = 10000
+_TRUNCATE_MARK = '...(%d more)'
+
+
+class LoggerSettings:
+    def __init__(self):
+        self.level = 'INFO'
+        self.levels: Dict[str, str] = {}  # logger name -> level, e.g. {"app.view.worker": "DEBUG"}
+        self.console = True
+        self.file = os.path.join('cfg', 'log', 'app.log')  # empty to disable
+        self.max_bytes = 5 * 1024 * 1024
+        self.backup_count = 3
+        self.max_message_length = 4096  # longer messages are truncated before queued, 0 to keep all
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> 'LoggerSettings':
+        settings = cls()
+        for k, v in d.items():
+            if hasattr(settings, k):
+                setattr(settings, k, v)
+        return settings
+
+    def __str__(self):
+        return str(self.__dict__)
+
+
+def load_settings(path: str = LOGGER_CONFIG_PATH) -> (LoggerSettings, Exception):
+    """a missing config file is not an error, the defaults apply"""
+    if not os.path.isfile(path):
+        return LoggerSettings(), None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return LoggerSettings.from_dict(json.load(f)), None
+    except Exception as e:
+        return LoggerSettings(), e
+
+
+def truncate(s: str, limit: int) -> str:
+    if limit <= 0 or len(s) <= limit:
+        return s
+    return s[:limit] + _TRUNCATE_MARK % (len(s) - limit)
+
+
+class Truncated:
+    """
+    log argument that is converted to str only when the record is emitted, and then cut to limit chars.
+    LOGGER.debug('body: %s', Truncated(body)) costs nothing while debug is disabled
+    """
+    __slots__ = ('value', 'limit')
+
+    def __init__(self, value: Any, limit: int = 256):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self):
+        value = self.value
+        if isinstance(value, (bytes, bytearray)):
+            s = bytes(value[:self.limit]).decode('utf-8', errors='replace')
+            return s + _TRUNCATE_MARK % (len(value) - self.limit) if len(value) > self.limit else s
+        if not isinstance(value, str):
+            value = str(value)
+        return truncate(value, self.limit)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, q: queue.Queue, max_message_length: int):
+        super(_QueueHandler, self).__init__(q)
+        self.max_message_length = max_message_length
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        unlike the base class, the formatter runs at the listener thread. only the message is merged here,
+        the args may be changed by the caller after this returns
+        """
+        record.msg = truncate(record.getMessage(), self.max_message_length)
+        record.args = None
+        if record.exc_info:
+            # traceback objects keep whole frames alive, render them now
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _LoggingState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self.handler: Optional[_QueueHandler] = None
+        self.settings: Optional[LoggerSettings] = None
+
+
+_STATE = _LoggingState()
+
+
+def _create_handlers(settings: LoggerSettings) -> (list, Exception):
+    formatter = logging.Formatter(_FORMAT)
+    handlers = []
+    if settings.console:
+        handlers.append(logging.StreamHandler(sys.stderr))
+    if settings.file:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(settings.file)), exist_ok=True)
+            handlers.append(logging.handlers.RotatingFileHandler(
+                settings.file, maxBytes=settings.max_bytes, backupCount=settings.backup_count, encoding='utf-8'))
+        except Exception as e:
+            return handlers, e
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers, None
+
+
+def setup_logging(settings: Optional[LoggerSettings] = None) -> Optional[Exception]:
+    """
+    replace the handlers of the root logger with the queue handler, settings are loaded from cfg/logger.json
+    when not given. calling it again applies new settings
+    """
+    err = None
+    if settings is None:
+        settings, err = load_settings()
+    with _STATE.lock:
+        shutdown_logging()
+        handlers, e = _create_handlers(settings)
+        err = err or e
+
+        q = queue.Queue(_QUEUE_SIZE)
+        handler = _QueueHandler(q, settings.max_message_length)
+        root = logging.getLogger()
+        for h in root.handlers[:]:
+            root.removeHandler(h)
+        root.addHandler(handler)
+        try:
+            root.setLevel(settings.level)
+            for name, level in settings.levels.items():
+                logging.getLogger(name).setLevel(level)
+        except (ValueError, TypeError) as e:
+            err = err or e
+
+        _STATE.listener = logging.handlers.QueueListener(q, *handlers)
+        _STATE.listener.start()
+        _STATE.handler = handler
+        _STATE.settings = settings
+    if err is not None:
+        LOGGER.warning('logger setup -> fall back to defaults partly, err: %s', err)
+    return err
+
+
+def shutdown_logging():
+    """flush the queue and close the handlers, records logged afterwards stay in the queue"""
+    listener, _STATE.listener = _STATE.listener, None
+    if listener is None:
+        return
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+    if _STATE.handler is not None and _STATE.handler.dropped:
+        print(f'logger -> {_STATE.handler.dropped} records dropped', file=sys.stderr)
+
+
+atexit.register(shutdown_logging)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """loggers are named after the module, so cfg/logger.json can set levels per module or package"""
+    return logging.getLogger(name)
+
+
+LOGGER = get_logger('app')
+
+
+def _debug():
+    setup_logging()
+    logger = get_logger('app.debug')
+    logger.info('settings: %s', _STATE.settings)
+    logger.debug('hidden unless app.debug is at DEBUG: %s', Truncated('x' * 100000))
+    logger.info('body: %s', Truncated('x' * 100000, 16))
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        logger.exception('exception')
+
+
+if __name__ == '__main__':
+    _debug()
@@ -0,0 +1,274 @@
+import collections
+import datetime
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from typing import Optional, Callable, Dict, Collection
+
+from app.util import time as timeutil
+
+
+class RewriteMode:
+    ANNOTATE = 'annotate'  # keep the epoch, append the time string after it
+    NORMALIZE = 'normalize'  # replace every epoch and time string with the target format
+
+
+_READ_BUFFER = 1024 * 1024
+_MAX_LINE = 1024 * 1024  # longer lines are cut at a whitespace so memory stays bounded
+_BLOCK_BYTES = 256 * 1024
+_PROGRESS_BYTES = 4 * 1024 * 1024
+_MAX_CACHE = 65536
+
+# the log is handled as bytes, decoding is neither needed nor safe for logs of unknown encoding.
+# 10 digits epoch seconds (2001-09-09 ~ 2286-11-20), optionally with a fraction, 13 digits epoch
+# milliseconds and ISO-8601 like time strings. the look-arounds keep ids and hex strings untouched
+_EPOCH_PATTERN = re.compile(rb'(?<![0-9A-Za-z_.-])(\d{13}|\d{10}(?:\.\d{1,6})?)(?![0-9A-Za-z_])')
+_TIMESTAMP_PATTERN = re.compile(
+    rb'(?<![0-9A-Za-z_.-])('
+    rb'\d{13}'
+    rb'|\d{10}(?:\.\d{1,6})?'
+    rb'|\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(?:\.\d{1,6})?Z?'
+    rb')(?![0-9A-Za-z_])'
+)
+_WHITESPACE = re.compile(rb'\s')
+
+
+class RewriteSettings:
+    def __init__(self, mode: str = RewriteMode.ANNOTATE, fmt_type: str = 'rfc3339', custom_format: str = ''):
+        self.mode = mode
+        self.fmt_type = fmt_type
+        self.custom_format = custom_format  # overrides fmt_type when set
+
+    def get_format(self, p: str) -> str:
+        if self.custom_format:
+            return self.custom_format
+        return timeutil.get_format(p, self.fmt_type)
+
+    def __str__(self):
+        return str(self.__dict__)
+
+
+class RewriteStats:
+    def __init__(self):
+        self.total_bytes = 0
+        self.read_bytes = 0
+        self.lines = 0
+        self.epochs = 0
+        self.strings = 0
+        self.failed = 0  # matched but not convertible, left as they are
+        self.seconds = 0.0
+
+    def summary(self) -> str:
+        return f'{self.lines} lines, {self.epochs} epochs, {self.strings} time strings, ' \
+               f'{self.failed} failed, {self.seconds:.3f}s'
+
+    def __str__(self):
+        return str(self.__dict__)
+
+
+class LogRewriter:
+    """rewrite timestamps of a log file block by block of whole lines, memory use does not depend on the file size"""
+    def __init__(self, settings: RewriteSettings):
+        self.settings = settings
+        self.stats = RewriteStats()
+        self._stop_event = threading.Event()
+        self._cache: Dict[bytes, Optional[bytes]] = {}
+        # time strings are already readable, annotating looks for epochs only
+        self._pattern = _EPOCH_PATTERN if settings.mode == RewriteMode.ANNOTATE else _TIMESTAMP_PATTERN
+        self._formats = {
+            timeutil.Precision.SECOND: settings.get_format(timeutil.Precision.SECOND),
+            timeutil.Precision.MILLISECOND: settings.get_format(timeutil.Precision.MILLISECOND),
+        }
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _convert_fraction(self, token: bytes) -> Optional[str]:
+        """epoch seconds with a fraction, finer than the batch api handles"""
+        secs, _, frac = token.partition(b'.')
+        tm, err = timeutil.from_seconds(int(secs))
+        if err is not None:
+            return None
+        s, err = timeutil.to_string(tm.replace(microsecond=int(frac.ljust(6, b'0'))),
+                                    self._formats[timeutil.Precision.MILLISECOND])
+        return s if err is None else None
+
+    def _convert_string(self, token: bytes) -> Optional[str]:
+        try:
+            tm = datetime.datetime.fromisoformat(token.rstrip(b'Z').decode())
+        except ValueError:
+            return None
+        p = timeutil.Precision.SECOND if len(token.rstrip(b'Z')) == 19 else timeutil.Precision.MILLISECOND
+        s, err = timeutil.to_string(tm, self._formats[p])
+        return s if err is None else None
+
+    def _resolve(self, tokens: Collection[bytes]):
+        """convert the tokens missing from the cache, plain epochs go through the batch api together"""
+        batches = {timeutil.Precision.SECOND: [], timeutil.Precision.MILLISECOND: []}
+        annotate = self.settings.mode == RewriteMode.ANNOTATE
+        results = {}
+        if len(self._cache) + len(tokens) > _MAX_CACHE:
+            self._cache.clear()
+        for token in tokens:
+            if token in self._cache:
+                continue
+            if token[4:5] == b'-':
+                results[token] = self._convert_string(token)
+            elif len(token) == 13:
+                batches[timeutil.Precision.MILLISECOND].append(token)
+            elif len(token) == 10:
+                batches[timeutil.Precision.SECOND].append(token)
+            else:
+                results[token] = self._convert_fraction(token)
+        for p, batch in batches.items():
+            if not batch:
+                continue
+            strs, err = timeutil.timestamps_to_strings([t.decode() for t in batch], p, self._formats[p])
+            if err is not None:
+                strs = [None] * len(batch)
+            results.update(zip(batch, strs))
+
+        for token, s in results.items():
+            if s is None:
+                self._cache[token] = None
+            elif annotate:
+                self._cache[token] = token + b' [' + s.encode() + b']'
+            else:
+                self._cache[token] = s.encode()
+
+    def rewrite_block(self, data: bytes) -> bytes:
+        """data holds whole lines, or at least never ends inside a timestamp"""
+        # one scan: text and tokens alternate, the tokens are at the odd positions
+        parts = self._pattern.split(data)
+        if len(parts) == 1:
+            return data
+        tokens = parts[1::2]
+        counts = collections.Counter(tokens)
+        self._resolve(counts)
+        for token, count in counts.items():
+            if token[4:5] == b'-':
+                self.stats.strings += count
+            else:
+                self.stats.epochs += count
+            if self._cache[token] is None:
+                self.stats.failed += count
+        cache = self._cache
+        parts[1::2] = [cache[token] or token for token in tokens]
+        return b''.join(parts)
+
+    def _lines(self, src):
+        """lines of src, a line longer than _MAX_LINE is yielded in pieces split at a whitespace"""
+        pending = b''
+        while True:
+            chunk = src.readline(_MAX_LINE - len(pending))
+            if not chunk:
+                if pending:
+                    yield pending
+                return
+            chunk = pending + chunk
+            pending = b''
+            if not chunk.endswith(b'\n') and len(chunk) >= _MAX_LINE:
+                # do not cut a timestamp in half
+                last = None
+                for last in _WHITESPACE.finditer(chunk, len(chunk) - 64 if len(chunk) > 64 else 0):
+                    pass
+                if last is not None:
+                    pending = chunk[last.end():]
+                    chunk = chunk[:last.end()]
+            yield chunk
+
+    def _blocks(self, src):
+        """about _BLOCK_BYTES of lines at a time, so the batch conversion has enough to work with"""
+        block = []
+        size = 0
+        for line in self._lines(src):
+            block.append(line)
+            size += len(line)
+            if size >= _BLOCK_BYTES:
+                yield b''.join(block)
+                block = []
+                size = 0
+        if block:
+            yield b''.join(block)
+
+    def run(self, src, dst, on_progress: Callable[[RewriteStats], None] = None) -> Optional[Exception]:
+        """src and dst are binary file objects"""
+        start = time.perf_counter()
+        next_progress = _PROGRESS_BYTES
+        ends_with_newline = True
+        try:
+            for block in self._blocks(src):
+                if self._stop_event.is_set():
+                    return InterruptedError('rewrite stopped')
+                dst.write(self.rewrite_block(block))
+                self.stats.read_bytes += len(block)
+                self.stats.lines += block.count(b'\n')
+                ends_with_newline = block.endswith(b'\n')
+                if on_progress is not None and self.stats.read_bytes >= next_progress:
+                    next_progress = self.stats.read_bytes + _PROGRESS_BYTES
+                    self.stats.seconds = time.perf_counter() - start
+                    on_progress(self.stats)
+            if not ends_with_newline:
+                self.stats.lines += 1
+            return None
+        except Exception as e:
+            return e
+        finally:
+            self.stats.seconds = time.perf_counter() - start
+            if on_progress is not None:
+                on_progress(self.stats)
+
+    def rewrite_file(self, src_path: str, dst_path: str = '',
+                     on_progress: Callable[[RewriteStats], None] = None) -> Optional[Exception]:
+        """
+        write the rewritten copy of src_path to dst_path, src_path itself is replaced when dst_path is empty.
+        the output goes to a temporary file next to the destination first, a stopped or failed rewrite
+        leaves the destination untouched
+        """
+        dst_path = dst_path or src_path
+        try:
+            self.stats.total_bytes = os.path.getsize(src_path)
+            fd, tmp_path = tempfile.mkstemp(prefix='.rewrite-', dir=os.path.dirname(os.path.abspath(dst_path)))
+        except Exception as e:
+            return e
+        try:
+            with open(src_path, 'rb', buffering=_READ_BUFFER) as src, \
+                    os.fdopen(fd, 'wb', buffering=_READ_BUFFER) as dst:
+                err = self.run(src, dst, on_progress)
+            if err is None:
+                shutil.copymode(src_path, tmp_path)
+                os.replace(tmp_path, dst_path)
+                return None
+        except Exception as e:
+            err = e
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return err
+
+
+def rewrite_file(src_path: str, dst_path: str = '', settings: RewriteSettings = None,
+                 on_progress: Callable[[RewriteStats], None] = None) -> (RewriteStats, Exception):
+    rewriter = LogRewriter(settings or RewriteSettings())
+    err = rewriter.rewrite_file(src_path, dst_path, on_progress)
+    return rewriter.stats, err
+
+
+def _debug():
+    import io
+    src = io.BytesIO(b'1724815353 GET /a took 12ms at 1724815353123\n'
+                     b'id=abc1724815353 ts=1724815353.5 at 2024-08-28 11:22:33.250\n')
+    for mode in (RewriteMode.ANNOTATE, RewriteMode.NORMALIZE):
+        dst = io.BytesIO()
+        src.seek(0)
+        rewriter = LogRewriter(RewriteSettings(mode))
+        print(rewriter.run(src, dst), rewriter.stats.summary())
+        print(dst.getvalue().decode())
+
+
+if __name__ == '__main__':
+    _debug()
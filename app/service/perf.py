@@ -0,0 +1,249 @@
+import collections
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Deque
+
+from app.service.logger import get_logger
+
+
+LOGGER = get_logger(__name__)
+
+_MAX_SPANS = 10000
+_PROFILE_TOP = 30
+_MEMORY_TOP = 20
+
+
+class SpanCategory:
+    NETWORK = 'network'
+    PARSE = 'parse'
+    RENDER = 'render'
+    PAINT = 'paint'
+
+
+class Span:
+    __slots__ = ('name', 'category', 'start_ns', 'duration_ns', 'thread_id', 'thread_name', 'args')
+
+    def __init__(self, name: str, category: str, start_ns: int, duration_ns: int, args: Optional[dict] = None):
+        thread = threading.current_thread()
+        self.name = name
+        self.category = category
+        self.start_ns = start_ns  # time.perf_counter_ns, only comparable to other spans
+        self.duration_ns = duration_ns
+        self.thread_id = thread.ident or 0
+        self.thread_name = thread.name
+        self.args = args or {}
+
+    @property
+    def seconds(self) -> float:
+        return self.duration_ns / 1e9
+
+    def __str__(self):
+        return str({k: getattr(self, k) for k in self.__slots__})
+
+
+class SpanSummary:
+    def __init__(self, name: str, category: str):
+        self.name = name
+        self.category = category
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    @property
+    def avg_seconds(self) -> float:
+        return self.total_seconds / self.count if self.count else 0.0
+
+    def __str__(self):
+        return str(self.__dict__)
+
+
+class ProfileReport:
+    def __init__(self):
+        self.seconds = 0.0
+        self.cpu = ''  # pstats output sorted by cumulative time
+        self.memory = ''  # tracemalloc top allocations since the capture started
+
+    def text(self) -> str:
+        parts = [f'capture: {self.seconds:.3f}s']
+        if self.cpu:
+            parts.append(self.cpu)
+        if self.memory:
+            parts.append(self.memory)
+        return '\n\n'.join(parts)
+
+    def __str__(self):
+        return str(self.__dict__)
+
+
+class Tracer:
+    """
+    spans of the hot paths, kept in a ring buffer so tracing can stay on all the time.
+    a span costs two perf_counter_ns calls and an append, the buffer is read by the performance dialog
+    """
+    def __init__(self, max_spans: int = _MAX_SPANS):
+        self.enabled = True
+        self._spans: Deque[Span] = collections.deque(maxlen=max_spans)
+        self._lock = threading.Lock()  # deque appends are atomic, only snapshots need it
+        self._profiler: Optional[cProfile.Profile] = None
+        self._memory_snapshot: Optional[tracemalloc.Snapshot] = None
+        self._capture_start = 0.0
+
+    @contextmanager
+    def span(self, name: str, category: str = '', **args):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self._spans.append(Span(name, category, start, time.perf_counter_ns() - start, args))
+
+    def traced(self, name: str = '', category: str = ''):
+        """decorator form of span, the span is named after the function by default"""
+        def decorator(fn):
+            span_name = name or fn.__qualname__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name, category):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+    def summary(self) -> List[SpanSummary]:
+        """per span name, the slowest on average first"""
+        summaries: Dict[str, SpanSummary] = {}
+        for s in self.spans():
+            summary = summaries.get(s.name)
+            if summary is None:
+                summary = summaries[s.name] = SpanSummary(s.name, s.category)
+            summary.count += 1
+            summary.total_seconds += s.seconds
+            summary.max_seconds = max(summary.max_seconds, s.seconds)
+        return sorted(summaries.values(), key=lambda x: x.avg_seconds, reverse=True)
+
+    def to_chrome_trace(self) -> dict:
+        """https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU, open it in chrome://tracing"""
+        pid = os.getpid()
+        events = []
+        threads = {}
+        for s in self.spans():
+            threads[s.thread_id] = s.thread_name
+            events.append({
+                'name': s.name,
+                'cat': s.category,
+                'ph': 'X',
+                'ts': s.start_ns / 1000,
+                'dur': s.duration_ns / 1000,
+                'pid': pid,
+                'tid': s.thread_id,
+                'args': {k: str(v) for k, v in s.args.items()},
+            })
+        for tid, thread_name in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': thread_name}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, path: str) -> Optional[Exception]:
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.to_chrome_trace(), f)
+            return None
+        except Exception as e:
+            return e
+
+    def is_capturing(self) -> bool:
+        return self._profiler is not None or self._memory_snapshot is not None
+
+    def start_capture(self, cpu: bool = True, memory: bool = False) -> Optional[Exception]:
+        """
+        cProfile only sees the thread that starts it, so start the capture at the thread of interest (the gui).
+        tracemalloc sees every thread but slows the whole process down noticeably
+        """
+        if self.is_capturing():
+            return RuntimeError('capture is already running')
+        try:
+            if memory:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                self._memory_snapshot = tracemalloc.take_snapshot()
+            if cpu:
+                self._profiler = cProfile.Profile()
+                self._profiler.enable()
+        except Exception as e:
+            self._profiler = None
+            self._memory_snapshot = None
+            return e
+        self._capture_start = time.perf_counter()
+        LOGGER.info('profile capture started, cpu: %s, memory: %s', cpu, memory)
+        return None
+
+    def stop_capture(self) -> (ProfileReport, Exception):
+        if not self.is_capturing():
+            return None, RuntimeError('no capture is running')
+        report = ProfileReport()
+        report.seconds = time.perf_counter() - self._capture_start
+        profiler, self._profiler = self._profiler, None
+        snapshot, self._memory_snapshot = self._memory_snapshot, None
+        try:
+            if profiler is not None:
+                profiler.disable()
+                out = io.StringIO()
+                pstats.Stats(profiler, stream=out).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(_PROFILE_TOP)
+                report.cpu = out.getvalue().strip()
+            if snapshot is not None:
+                stats = tracemalloc.take_snapshot().compare_to(snapshot, 'lineno')
+                tracemalloc.stop()
+                lines = [f'top {_MEMORY_TOP} allocations:']
+                lines.extend(str(stat) for stat in stats[:_MEMORY_TOP])
+                report.memory = '\n'.join(lines)
+        except Exception as e:
+            return report, e
+        LOGGER.info('profile capture stopped after %.3fs', report.seconds)
+        return report, None
+
+
+_TRACER = Tracer()
+
+
+def get_tracer() -> Tracer:
+    return _TRACER
+
+
+def span(name: str, category: str = '', **args):
+    return _TRACER.span(name, category, **args)
+
+
+def traced(name: str = '', category: str = ''):
+    return _TRACER.traced(name, category)
+
+
+def _debug():
+    tracer = get_tracer()
+    with tracer.span('outer', SpanCategory.RENDER, rows=3):
+        for i in range(3):
+            with tracer.span('inner', SpanCategory.PARSE, i=i):
+                time.sleep(0.01)
+    for summary in tracer.summary():
+        print(summary)
+    print(json.dumps(tracer.to_chrome_trace(), indent=2))
+
+
+if __name__ == '__main__':
+    _debug()
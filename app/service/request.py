@@ -1,25 +1,330 @@
+import atexit
+import codecs
+import io
+import itertools
+import os
+import shlex
+import tempfile
+import threading
 import time
-from typing import Optional, Dict
+from typing import Optional, Dict, Callable, List, Tuple
 
 import curlify
 import requests
+from requests.compat import chardet
+from requests.exceptions import ChunkedEncodingError, ContentDecodingError, SSLError
+from urllib3.exceptions import ProtocolError, ReadTimeoutError, SSLError as Urllib3SSLError
+
+from app.service import perf, compression, body
+from app.service.body import BodySource, UploadStream
+from app.service.cache import ResponseCache, CacheEntry, CacheStatus
+from app.service.compression import Encoding, TransferStats
+from app.service.logger import get_logger
+from app.service.session import ConnectionTrace, SessionManager, get_session_manager, tracing
+
+
+LOGGER = get_logger(__name__)
+
+_MAX_SPILL_BYTES = 2 * 1024 * 1024 * 1024  # bytes of spilled bodies kept on disk at once
+
+
+class _SpillFiles:
+    """temp files of the spilled bodies alive in this process, removed with their responses or at exit"""
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.total = 0
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def grow(self, path: str, size: int) -> bool:
+        """account size more bytes to path, false if that goes over max_bytes"""
+        with self._lock:
+            if self.total + size > self.max_bytes:
+                return False
+            self._sizes[path] = self._sizes.get(path, 0) + size
+            self.total += size
+            return True
+
+    def adopt(self, path: str, size: int):
+        """take over a file spilled by another process, it is counted even over max_bytes"""
+        with self._lock:
+            self.total += size - self._sizes.get(path, 0)
+            self._sizes[path] = size
+
+    def release(self, path: str):
+        """forget path without removing it, another process takes it over"""
+        with self._lock:
+            self.total -= self._sizes.pop(path, 0)
+
+    def remove(self, path: str):
+        with self._lock:
+            if path not in self._sizes:
+                return
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            # a file still mapped somewhere cannot be removed on windows, try again at exit
+            LOGGER.warning('remove spill file -> %s failed, err: %s', path, e)
+            return
+        self.release(path)
+
+    def remove_all(self):
+        with self._lock:
+            paths = list(self._sizes.keys())
+        for path in paths:
+            self.remove(path)
+
+
+_SPILL_FILES = _SpillFiles(_MAX_SPILL_BYTES)
+atexit.register(_SPILL_FILES.remove_all)
+
+
+class _BodyBuffer:
+    """keep the body in memory up to a cap, then spill everything to a temp file"""
+    def __init__(self, memory_limit: int):
+        self.memory_limit = memory_limit
+        self.size = 0
+        self.path = ''
+        self._memory = io.BytesIO()
+        self._file = None
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self._file is None and self.size > self.memory_limit:
+            fd, self.path = tempfile.mkstemp(prefix='homemade-resp-', suffix='.body')
+            # tracked from its creation, so it goes away with discard even if it is over the limit
+            _SPILL_FILES.adopt(self.path, 0)
+            self._file = os.fdopen(fd, 'wb')
+            self._grow(self.size)
+            self._file.write(self._memory.getbuffer())
+        elif self._file is not None:
+            self._grow(len(chunk))
+        if self._file is not None:
+            self._file.write(chunk)
+            # keep only the preview part in memory
+            remain = self.memory_limit - self._memory.tell()
+            if remain > 0:
+                self._memory.write(chunk[:remain])
+        else:
+            self._memory.write(chunk)
+
+    def _grow(self, size: int):
+        if not _SPILL_FILES.grow(self.path, size):
+            raise OSError(f'spilled response bodies reached the limit of {_SPILL_FILES.max_bytes} bytes, '
+                          f'remove finished requests to free them')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        self.close()
+        if self.path:
+            _SPILL_FILES.remove(self.path)
+
+    def content(self) -> bytes:
+        return self._memory.getvalue()
+
+
+def _iter_raw(resp: requests.Response, chunk_size: int):
+    """body bytes as they are on the wire, errors translated the same way as iter_content"""
+    try:
+        yield from resp.raw.stream(chunk_size, decode_content=False)
+    except ProtocolError as e:
+        raise ChunkedEncodingError(e)
+    except ReadTimeoutError as e:
+        raise requests.ConnectionError(e)
+    except Urllib3SSLError as e:
+        raise SSLError(e)
+
+
+def _decode(data: bytes, encoding: Optional[str], partial: bool = False) -> (str, str):
+    """
+    decode like requests' Response.text, with the charset of the headers or else a detected one, and return the
+    encoding used. a partial body may end in the middle of a character
+    """
+    if not encoding:
+        try:
+            return codecs.getincrementaldecoder('utf-8')().decode(data, final=not partial), 'utf-8'
+        except UnicodeDecodeError:
+            # only bodies that are not utf-8 pay for the detection
+            encoding = (chardet.detect(data)['encoding'] if chardet is not None else None) or 'utf-8'
+    try:
+        return str(data, encoding, errors='replace'), encoding
+    except (LookupError, TypeError):
+        return str(data, 'utf-8', errors='replace'), 'utf-8'
+
+
+def _has_header(headers: Dict[str, str], name: str) -> bool:
+    name = name.lower()
+    return any(k.lower() == name for k in headers.keys())
+
+
+class RequestPhase:
+    DNS = 'dns'
+    TCP = 'tcp'
+    TLS = 'tls'
+    UPLOAD = 'upload'  # streamed bodies only, inline text is sent along with the headers
+    TTFB = 'ttfb'  # from the request written to the response headers received
+    DOWNLOAD = 'download'
+    DECODE = 'decode'
+
+
+class RequestTimings:
+    """
+    phases of a single request in order, each starts where the previous one ends.
+    dns, tcp and tls are zero for a reused connection
+    """
+    PHASES = [RequestPhase.DNS, RequestPhase.TCP, RequestPhase.TLS, RequestPhase.UPLOAD,
+              RequestPhase.TTFB, RequestPhase.DOWNLOAD, RequestPhase.DECODE]
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {phase: 0.0 for phase in self.PHASES}
+
+    def __str__(self):
+        return str(self.__dict__)
+
+    def __getitem__(self, phase: str) -> float:
+        return self.seconds.get(phase, 0.0)
+
+    def __setitem__(self, phase: str, seconds: float):
+        self.seconds[phase] = max(0.0, seconds)
+
+    @property
+    def total_seconds(self) -> float:
+        return sum(self.seconds.values())
+
+    def phases(self) -> List[Tuple[str, float, float]]:
+        """(phase, start, seconds) for a waterfall"""
+        result = []
+        start = 0.0
+        for phase in self.PHASES:
+            seconds = self[phase]
+            result.append((phase, start, seconds))
+            start += seconds
+        return result
+
+    def to_dict(self) -> Dict[str, float]:
+        return dict(self.seconds)
+
+    @classmethod
+    def from_dict(cls, d: Optional[Dict[str, float]]) -> 'RequestTimings':
+        timings = cls()
+        if isinstance(d, dict):
+            for phase, seconds in d.items():
+                if phase in timings.seconds:
+                    timings[phase] = float(seconds)
+        return timings
 
 
 class Response:
     def __init__(self,
                  status_code: int = 200,
                  headers: Optional[Dict[str, str]] = None,
-                 body: str = None):
+                 body: str = None,
+                 trace: Optional[ConnectionTrace] = None,
+                 body_size: int = -1,
+                 body_file: str = '',
+                 timings: Optional[RequestTimings] = None,
+                 transfer: Optional[TransferStats] = None,
+                 encoding: str = 'utf-8'):
         self.status_code = status_code
         self.headers = headers if isinstance(headers, dict) else {}
-        self.body = body
+        self.body = body  # the whole body, or its leading part when spilled to body_file
+        self.trace = trace if isinstance(trace, ConnectionTrace) else ConnectionTrace()
+        self.body_size = body_size if body_size >= 0 else len(body or '')
+        self.body_file = body_file
+        self.timings = timings if isinstance(timings, RequestTimings) else RequestTimings()
+        self.transfer = transfer if isinstance(transfer, TransferStats) else TransferStats()
+        self.encoding = encoding  # how the body was decoded
+        self.cache_status = CacheStatus.NONE
+        self.spilled = False  # body_file is a temp file of this response rather than a cache file
+
+    @property
+    def truncated(self) -> bool:
+        return bool(self.body_file)
+
+    def read_body(self) -> (str, Exception):
+        """full body text, read back from the spill file if needed"""
+        if not self.body_file:
+            return self.body, None
+        try:
+            with open(self.body_file, 'rb') as f:
+                return _decode(f.read(), self.encoding)[0], None
+        except Exception as e:
+            return '', e
+
+    def discard(self):
+        """remove the spill file once the response is no longer needed, read_body fails afterwards"""
+        if self.spilled:
+            _SPILL_FILES.remove(self.body_file)
+
+    def release_body_file(self):
+        """before the response is handed to another process, which calls adopt_body_file"""
+        if self.spilled:
+            _SPILL_FILES.release(self.body_file)
+
+    def adopt_body_file(self):
+        if self.spilled:
+            _SPILL_FILES.adopt(self.body_file, self.body_size)
 
     @classmethod
-    def from_response(cls, resp: requests.Response):
+    def from_response(cls,
+                      resp: requests.Response,
+                      trace: Optional[ConnectionTrace] = None,
+                      on_chunk: Optional[Callable[[bytes, int], None]] = None,
+                      memory_limit: int = -1,
+                      chunk_size: int = -1):
+        """
+        read a stream=True response chunk by chunk, on_chunk gets each decompressed chunk and the decompressed bytes
+        so far. decompression is done here rather than by urllib3 to tell the wire size from the decoded size
+        """
         status_code = resp.status_code
         headers = dict(resp.headers)
-        body = resp.text
-        return cls(status_code, headers, body)
+        if memory_limit < 0:
+            memory_limit = _DEFAULT_BODY_MEMORY_LIMIT
+        if chunk_size <= 0:
+            chunk_size = _DEFAULT_CHUNK_SIZE
+        transfer = TransferStats()
+        transfer.content_encoding = resp.headers.get('Content-Encoding', '')
+        decoder, err = compression.create_decoder(transfer.content_encoding)
+        if err is not None:
+            resp.close()
+            raise ContentDecodingError(err)
+        buffer = _BodyBuffer(memory_limit)
+        timings = RequestTimings()
+        start = time.perf_counter()
+        try:
+            for chunk in itertools.chain(_iter_raw(resp, chunk_size), [b'']):
+                transfer.wire_bytes += len(chunk)
+                decompress_start = time.perf_counter()
+                try:
+                    chunk = decoder.decompress(chunk) if chunk else decoder.flush()
+                except Exception as e:
+                    raise ContentDecodingError(e)
+                transfer.decompress_seconds += time.perf_counter() - decompress_start
+                if not chunk:
+                    continue
+                buffer.write(chunk)
+                if on_chunk is not None:
+                    on_chunk(chunk, buffer.size)
+        except BaseException:
+            buffer.discard()
+            raise
+        finally:
+            buffer.close()
+            resp.close()
+        downloaded = time.perf_counter()
+        transfer.decoded_bytes = buffer.size
+        timings[RequestPhase.DOWNLOAD] = downloaded - start
+        body, encoding = _decode(buffer.content(), resp.encoding, bool(buffer.path))
+        timings[RequestPhase.DECODE] = time.perf_counter() - downloaded
+        response = cls(status_code, headers, body, trace, buffer.size, buffer.path, timings, transfer, encoding)
+        response.spilled = bool(buffer.path)
+        return response
 
 
 class RequestMethod:
@@ -36,6 +341,9 @@ def _default_request_headers():
     }
 
 
+_DEFAULT_BODY_MEMORY_LIMIT = 16 * 1024 * 1024
+_DEFAULT_CHUNK_SIZE = 64 * 1024
+
 _MIN_TIMEOUT = 1000
 _DEFAULT_TIMEOUT = 5000
 _MAX_TIMEOUT = 120000
@@ -52,9 +360,19 @@ def _fixed_timeout(timeout: int) -> int:
 
 
 class RequestSettings:
-    def __init__(self, connect_timeout: int = _DEFAULT_TIMEOUT, read_timeout: int = _DEFAULT_TIMEOUT):
+    def __init__(self,
+                 connect_timeout: int = _DEFAULT_TIMEOUT,
+                 read_timeout: int = _DEFAULT_TIMEOUT,
+                 body_memory_limit: int = _DEFAULT_BODY_MEMORY_LIMIT,
+                 use_cache: bool = True,
+                 compression: bool = True,
+                 compress_body: bool = False):
         self.connect_timeout = _fixed_timeout(connect_timeout)
         self.read_timeout = _fixed_timeout(read_timeout)
+        self.body_memory_limit = body_memory_limit  # response bytes kept in memory before spilling to disk
+        self.use_cache = use_cache  # false bypasses the response cache, neither read nor written
+        self.compression = compression  # offer the supported encodings in Accept-Encoding, identity if false
+        self.compress_body = compress_body  # gzip request bodies from MIN_COMPRESS_BODY_SIZE bytes
 
     def __str__(self):
         return str(self.__dict__)
@@ -72,38 +390,149 @@ class Request:
                  method: str = RequestMethod.GET,
                  headers: Optional[Dict[str, str]] = None,
                  body: str = '',
-                 settings: Optional[RequestSettings] = None):
+                 settings: Optional[RequestSettings] = None,
+                 body_source: Optional[BodySource] = None):
         self.url = url
         self.method = method
         self.headers = headers if isinstance(headers, dict) else _default_request_headers()
         self.body = body
         self.settings = settings if isinstance(settings, RequestSettings) else RequestSettings()
+        self.body_source = body_source if isinstance(body_source, BodySource) else BodySource()
 
     def validate(self):
         if not self.url:
             return ValueError('url is required')
         if not self.method:
             return ValueError('method is required')
-        return None
+        return self.body_source.validate()
+
+    def _encode_body(self) -> (str, str):
+        """the body to send and its content encoding, headers set by the user are left as they are"""
+        body = self.body.strip()
+        if not self.settings.compress_body or _has_header(self.headers, 'Content-Encoding'):
+            return body, ''
+        data = body.encode('utf-8')
+        if len(data) < compression.MIN_COMPRESS_BODY_SIZE:
+            return body, ''
+        compressed, err = compression.compress(data, Encoding.GZIP)
+        if err is not None or len(compressed) >= len(data):
+            return body, ''
+        return compressed, Encoding.GZIP
 
-    def args(self):
-        return {
+    def _args(self, on_upload: Optional[Callable[[int, int], None]] = None) -> (dict, Optional[UploadStream]):
+        headers = dict(self.headers)
+        if not _has_header(headers, 'Accept-Encoding'):
+            headers['Accept-Encoding'] = compression.accept_encoding() if self.settings.compression \
+                else Encoding.IDENTITY
+        stream = None
+        if self.body_source.streamed:
+            stream, content_type, err = body.open_stream(self.body_source, self.body.strip(), on_upload)
+            if err is not None:
+                raise err
+            if content_type:
+                headers = {k: v for k, v in headers.items() if k.lower() != 'content-type'}
+                headers['Content-Type'] = content_type
+            # requests sets Content-Length from len() of the stream, a generator has none so it goes chunked
+            data = iter(stream) if self.body_source.chunked else stream
+        else:
+            data, encoding = self._encode_body()
+            if encoding:
+                headers['Content-Encoding'] = encoding
+        args = {
             'method': self.method,
             'url': self.url,
-            'headers': self.headers,
-            'data': self.body.strip(),
+            'headers': headers,
+            'data': data,
             'timeout': (
                 self.settings.connect_timeout_seconds(),
                 self.settings.read_timeout_seconds()
             )
         }
+        return args, stream
 
-    def invoke(self) -> (Response, Exception):
+    def args(self, on_upload: Optional[Callable[[int, int], None]] = None):
+        """a file or multipart body is opened as a stream here, call args['data'].close() when not sent"""
+        return self._args(on_upload)[0]
+
+    def _cached_response(self, cache: ResponseCache, entry: CacheEntry, status: str,
+                         trace: Optional[ConnectionTrace] = None) -> (Response, Exception):
+        body, body_file, err = cache.read_body(entry, self.settings.body_memory_limit)
+        if err is not None:
+            return None, err
+        cache.record(status, entry)
+        resp = Response(entry.status_code, dict(entry.headers), body, trace, entry.body_size, body_file,
+                        encoding=entry.encoding)
+        resp.cache_status = status
+        return resp, None
+
+    def invoke(self,
+               session_manager: Optional[SessionManager] = None,
+               on_chunk: Optional[Callable[[bytes, int], None]] = None,
+               cache: Optional[ResponseCache] = None,
+               on_upload: Optional[Callable[[int, int], None]] = None) -> (Response, Exception):
+        """
+        with a cache, fresh responses are served from it and stale ones are revalidated.
+        on_upload gets the bytes sent so far and the total of a streamed body
+        """
+        if not isinstance(session_manager, SessionManager):
+            session_manager = get_session_manager()
+        entry, fresh = cache.lookup(self.method, self.url, self.headers) if cache is not None else (None, False)
+        if entry is not None and fresh:
+            resp, err = self._cached_response(cache, entry, CacheStatus.HIT)
+            if err is None:
+                return resp, None
+            LOGGER.warning('cache read -> %s failed, err: %s', self.url, err)
+            entry = None
+        try:
+            args, stream = self._args(on_upload)
+        except Exception as e:
+            return None, e
+        if entry is not None:
+            args['headers'].update(entry.validators())
         try:
-            resp = requests.request(**self.args())
-            return Response.from_response(resp), None
+            with perf.span('request.invoke', perf.SpanCategory.NETWORK, method=self.method, url=self.url), \
+                    session_manager.session(self.url) as session, tracing(ConnectionTrace()) as trace:
+                # sending ends at the response headers, the body is read afterwards
+                start = time.perf_counter()
+                with perf.span('request.send', perf.SpanCategory.NETWORK):
+                    resp = session.request(stream=True, **args)
+                send_seconds = time.perf_counter() - start
+                with perf.span('request.read_body', perf.SpanCategory.NETWORK):
+                    response = Response.from_response(resp, trace, on_chunk, self.settings.body_memory_limit)
+                response.timings[RequestPhase.DNS] = trace.dns_seconds
+                response.timings[RequestPhase.TCP] = trace.tcp_seconds
+                response.timings[RequestPhase.TLS] = trace.tls_seconds
+                upload_seconds = stream.last_read_time - stream.first_read_time if stream is not None else 0.0
+                response.timings[RequestPhase.UPLOAD] = upload_seconds
+                response.timings[RequestPhase.TTFB] = send_seconds - trace.connect_seconds - upload_seconds
+                response.transfer.request_encoding = args['headers'].get('Content-Encoding', '')
+                if stream is not None:
+                    response.transfer.request_bytes = response.transfer.request_wire_bytes = stream.sent
+                else:
+                    response.transfer.request_bytes = len(self.body.strip().encode('utf-8'))
+                    response.transfer.request_wire_bytes = len(args['data']) if isinstance(args['data'], bytes) \
+                        else response.transfer.request_bytes
         except Exception as e:
             return None, e
+        finally:
+            if stream is not None:
+                args['data'].close()
+        if cache is None:
+            return response, None
+
+        if response.status_code == 304 and entry is not None:
+            cache.revalidate(entry, response.headers)
+            cached, err = self._cached_response(cache, entry, CacheStatus.REVALIDATED, trace)
+            if err is not None:
+                return None, err
+            cached.timings = response.timings
+            cached.transfer = response.transfer
+            return cached, None
+        cache.record(CacheStatus.MISS)
+        cache.store(self.method, self.url, self.headers, response.status_code, response.headers,
+                    response.body, response.body_size, response.body_file, response.encoding)
+        response.cache_status = CacheStatus.MISS
+        return response, None
 
     def to_curl(self) -> (str, Exception):
         try:
@@ -111,11 +540,29 @@ class Request:
             prepared_request.prepare_method(self.method)
             prepared_request.prepare_url(self.url, None)
             prepared_request.prepare_headers(self.headers)
-            prepared_request.prepare_body(self.body.strip(), None)
-            return curlify.to_curl(prepared_request), None
+            if not self.body_source.streamed:
+                prepared_request.prepare_body(self.body.strip(), None)
+                return curlify.to_curl(prepared_request), None
+            return self._streamed_curl(prepared_request), None
         except Exception as e:
             return '', e
 
+    def _streamed_curl(self, prepared_request: requests.PreparedRequest) -> str:
+        """same layout as curlify, files are passed as @path for curl to read"""
+        headers = dict(prepared_request.headers)
+        if self.body_source.kind == body.BodyKind.MULTIPART:
+            # curl generates the boundary
+            headers = {k: v for k, v in headers.items() if k.lower() != 'content-type'}
+        if self.body_source.chunked:
+            headers['Transfer-Encoding'] = 'chunked'
+        parts = ['curl', '-X', shlex.quote(prepared_request.method)]
+        for k, v in sorted(headers.items()):
+            parts += ['-H', shlex.quote(f'{k}: {v}')]
+        for option, value in body.curl_args(self.body_source, self.body.strip()):
+            parts += [option, shlex.quote(value)]
+        parts.append(shlex.quote(prepared_request.url))
+        return ' '.join(parts)
+
 
 def _debug():
     req = Request(
@@ -130,6 +577,11 @@ def _debug():
         print(f'request error: {err}')
     else:
         print(f'response status code: {resp.status_code}, headers: {resp.headers}, body: {resp.body}')
+    resp, err = req.invoke()
+    if not err:
+        print(f'second response connection trace: {resp.trace}, reused: {resp.trace.reused}')
+        print(f'second response timings: {resp.timings}')
+        print(f'second response transfer: {resp.transfer}')
 
 
 
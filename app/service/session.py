@@ -0,0 +1,265 @@
+import ipaddress
+import socket
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from http.cookiejar import DefaultCookiePolicy
+from typing import Optional, Tuple, List
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NameResolutionError, ConnectTimeoutError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+
+class ConnectionTrace:
+    """connection usage of a single request, filled by the timed connections below"""
+    def __init__(self):
+        self.new_connections = 0
+        self.connect_seconds = 0.0  # the whole handshake, dns + tcp + tls
+        self.dns_seconds = 0.0
+        self.tcp_seconds = 0.0
+        self.tls_seconds = 0.0
+
+    def __str__(self):
+        return str(self.__dict__)
+
+    @property
+    def reused(self) -> bool:
+        return self.new_connections == 0
+
+
+_TRACE_LOCAL = threading.local()
+
+
+def current_trace() -> Optional[ConnectionTrace]:
+    return getattr(_TRACE_LOCAL, 'trace', None)
+
+
+@contextmanager
+def tracing(trace: ConnectionTrace):
+    """collect connection stats of requests issued by current thread into trace"""
+    prev = current_trace()
+    _TRACE_LOCAL.trace = trace
+    try:
+        yield trace
+    finally:
+        _TRACE_LOCAL.trace = prev
+
+
+def _resolve(host: str, port: int) -> List[str]:
+    """addresses of host in the order getaddrinfo returns them, an ip address is returned as it is"""
+    host = host.strip('[]')
+    try:
+        ipaddress.ip_address(host)
+        return [host]
+    except ValueError:
+        pass
+    addresses = []
+    for _, _, _, _, sa in socket.getaddrinfo(host, port, allowed_gai_family(), socket.SOCK_STREAM):
+        if sa[0] not in addresses:
+            addresses.append(sa[0])
+    return addresses
+
+
+class _TimedConnectMixin:
+    def _new_conn(self):
+        """
+        resolve the host first so the lookup and the tcp connect are timed apart. the addresses are tried
+        in turn like urllib3 does, by pointing the dns host of the connection at each of them
+        """
+        trace = current_trace()
+        if trace is None:
+            return super()._new_conn()
+        start = time.perf_counter()
+        host = self._dns_host
+        try:
+            addresses = _resolve(host, self.port)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+        resolved = time.perf_counter()
+        trace.dns_seconds += resolved - start
+
+        err = None
+        try:
+            for address in addresses:
+                self._dns_host = address
+                try:
+                    sock = super()._new_conn()
+                    break
+                except (ConnectTimeoutError, NewConnectionError) as e:
+                    err = e
+            else:
+                raise err or NewConnectionError(self, f'no address found for {host}')
+        finally:
+            self._dns_host = host
+            trace.tcp_seconds += time.perf_counter() - resolved
+        return sock
+
+    def connect(self):
+        trace = current_trace()
+        if trace is None:
+            return super().connect()
+        start = time.perf_counter()
+        before = trace.dns_seconds + trace.tcp_seconds
+        super().connect()
+        seconds = time.perf_counter() - start
+        trace.new_connections += 1
+        trace.connect_seconds += seconds
+        if isinstance(self, HTTPSConnection):
+            # what is left after resolving and connecting is the tls handshake (and a proxy tunnel if any)
+            trace.tls_seconds += max(0.0, seconds - (trace.dns_seconds + trace.tcp_seconds - before))
+
+
+class _TimedHTTPConnection(_TimedConnectMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+
+
+class _NoCookiePolicy(DefaultCookiePolicy):
+    """pooled sessions are shared by every request, so never keep cookies between calls"""
+    def set_ok(self, cookie, request):
+        return False
+
+    def return_ok(self, cookie, request):
+        return False
+
+
+class SessionSettings:
+    def __init__(self,
+                 pool_maxsize: int = 4,
+                 pool_block: bool = False,
+                 idle_timeout: float = 60.0,
+                 max_hosts: int = 32):
+        self.pool_maxsize = max(1, pool_maxsize)  # keep-alive connections kept per host
+        self.pool_block = pool_block  # wait for a free connection instead of opening extra ones
+        self.idle_timeout = idle_timeout  # seconds before an unused host pool is closed
+        self.max_hosts = max(1, max_hosts)
+
+    def __str__(self):
+        return str(self.__dict__)
+
+
+def _host_key(url: str) -> Tuple[str, str, int]:
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    port = parts.port
+    if port is None:
+        port = 443 if scheme == 'https' else 80
+    return scheme, (parts.hostname or '').lower(), port
+
+
+class _HostSession:
+    def __init__(self, settings: SessionSettings):
+        adapter = _TimedHTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=settings.pool_maxsize,
+            pool_block=settings.pool_block,
+        )
+        self.session = requests.Session()
+        self.session.cookies.set_policy(_NoCookiePolicy())
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.in_flight = 0
+        self.last_used = time.monotonic()
+
+    def close(self):
+        self.session.close()
+
+
+class SessionManager:
+    """keep-alive sessions, one connection pool per scheme/host/port"""
+    def __init__(self, settings: Optional[SessionSettings] = None):
+        self.settings = settings if isinstance(settings, SessionSettings) else SessionSettings()
+        self._lock = threading.Lock()
+        self._sessions: OrderedDict[Tuple[str, str, int], _HostSession] = OrderedDict()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    @contextmanager
+    def session(self, url: str):
+        key = _host_key(url)
+        with self._lock:
+            self._evict_locked(time.monotonic(), key)
+            host_session = self._sessions.get(key)
+            if host_session is None:
+                host_session = _HostSession(self.settings)
+                self._sessions[key] = host_session
+            self._sessions.move_to_end(key)
+            host_session.in_flight += 1
+        try:
+            yield host_session.session
+        finally:
+            with self._lock:
+                host_session.in_flight -= 1
+                host_session.last_used = time.monotonic()
+
+    def _evict_locked(self, now: float, incoming: Optional[Tuple[str, str, int]] = None):
+        """close idle pools, and the least recently used ones while there is no room for the incoming host"""
+        max_hosts = self.settings.max_hosts
+        if incoming is not None and incoming not in self._sessions:
+            max_hosts -= 1
+        for key in list(self._sessions.keys()):
+            host_session = self._sessions[key]
+            if host_session.in_flight > 0 or key == incoming:
+                continue
+            too_many = len(self._sessions) > max_hosts
+            if too_many or now - host_session.last_used > self.settings.idle_timeout:
+                del self._sessions[key]
+                host_session.close()
+
+    def evict_idle(self):
+        with self._lock:
+            self._evict_locked(time.monotonic())
+
+    def close(self):
+        with self._lock:
+            for host_session in self._sessions.values():
+                host_session.close()
+            self._sessions.clear()
+
+
+_SESSION_MANAGER: Optional[SessionManager] = None
+_SESSION_MANAGER_LOCK = threading.Lock()
+
+
+def get_session_manager() -> SessionManager:
+    global _SESSION_MANAGER
+    with _SESSION_MANAGER_LOCK:
+        if _SESSION_MANAGER is None:
+            _SESSION_MANAGER = SessionManager()
+        return _SESSION_MANAGER
+
+
+def set_session_manager(manager: SessionManager):
+    global _SESSION_MANAGER
+    with _SESSION_MANAGER_LOCK:
+        prev, _SESSION_MANAGER = _SESSION_MANAGER, manager
+    if prev is not None and prev is not manager:
+        prev.close()
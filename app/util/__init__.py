@@ -1,18 +1,28 @@
-import json
-import yaml
-from typing import Any, Optional
+from typing import Any, Optional, List, Tuple, Union
+
+from . import json_backend
+
+
+# inputs larger than this go through the libyaml based loader/dumper
+LARGE_INPUT_THRESHOLD = 1024 * 1024
+
+
+def _yaml():
+    """pyyaml is imported on first use, only the json tab needs it"""
+    import yaml
+    return yaml
 
 
 def json_dump(o: Any, indent: Optional[int] = 2, ensure_ascii: bool = False, **kwargs) -> (str, Exception):
     try:
-        return json.dumps(o, indent=indent, ensure_ascii=ensure_ascii, **kwargs), None
+        return json_backend.current().dumps(o, indent, ensure_ascii, **kwargs), None
     except Exception as e:
         return '', e
 
 
-def json_load(s: str) -> (Any, Exception):
+def json_load(s: Union[str, bytes]) -> (Any, Exception):
     try:
-        return json.loads(s), None
+        return json_backend.current().loads(s), None
     except Exception as e:
         return None, e
 
@@ -27,8 +37,42 @@ def json_pretty(s: str) -> str:
     return p
 
 
-def yaml_dump(o: Any, indent: Optional[int] = 2, allow_unicode: bool = True, **kwargs) -> (str, Exception):
+def format_bytes(n: float) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(n) < 1024 or unit == 'GB':
+            return f'{n:.0f}{unit}' if unit == 'B' else f'{n:.1f}{unit}'
+        n /= 1024
+    return f'{n:.1f}GB'
+
+
+def format_waterfall(rows: List[Tuple[str, float, float]], bar_width: int = 40) -> List[str]:
+    """rows of (label, start seconds, seconds) as text bars on a shared time axis"""
+    end = max((start + seconds for _, start, seconds in rows), default=0.0)
+    label_width = max((len(label) for label, _, _ in rows), default=0)
+    lines = []
+    for label, start, seconds in rows:
+        offset = min(bar_width, int(start / end * bar_width)) if end > 0 else 0
+        width = round(seconds / end * bar_width) if end > 0 else 0
+        if seconds > 0:
+            width = max(1, width)
+        width = min(width, bar_width - offset)
+        offset = min(offset, bar_width - width)
+        bar = ' ' * offset + '#' * width + ' ' * (bar_width - offset - width)
+        lines.append(f'{label:<{label_width}} |{bar}| {seconds * 1e3:9.3f}ms')
+    return lines
+
+
+def yaml_dump(o: Any,
+              indent: Optional[int] = 2,
+              allow_unicode: bool = True,
+              fast: bool = False,
+              **kwargs) -> (str, Exception):
     try:
+        yaml = _yaml()
+        if fast:
+            # libyaml bindings, only present when pyyaml is built against libyaml
+            dumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+            return yaml.dump(o, Dumper=dumper, indent=indent, allow_unicode=allow_unicode, **kwargs), None
         return yaml.safe_dump(o, indent=indent, allow_unicode=allow_unicode, **kwargs), None
     except Exception as e:
         return '', e
@@ -36,6 +80,9 @@ def yaml_dump(o: Any, indent: Optional[int] = 2, allow_unicode: bool = True, **k
 
 def yaml_load(s: str) -> (Any, Exception):
     try:
+        yaml = _yaml()
+        if len(s) > LARGE_INPUT_THRESHOLD:
+            return yaml.load(s, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader)), None
         return yaml.safe_load(s), None
     except Exception as e:
         return None, e
@@ -0,0 +1,172 @@
+import json
+import math
+import os
+import re
+from typing import Any, Optional, Callable, Dict, List, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+"""
+json backends share the stdlib semantics: whenever a fast backend cannot produce exactly
+what json.dumps/json.loads would (ensure_ascii, compact separators, extra kwargs, big ints, NaN...),
+it falls back to stdlib json. the only visible difference is the spelling of float exponents:
+orjson writes 1e20 and 1e-7, ujson writes 1e+20 and 1e-7, where stdlib writes 1e+20 and 1e-07.
+ujson only dumps, its parser takes things stdlib rejects (01, raw control characters in strings).
+loads takes a str or its utf-8 bytes, parsing bytes saves decoding a copy of a large body
+"""
+
+ENV_JSON_BACKEND = 'HOMEMADE_JSON_BACKEND'
+
+
+class JsonBackendName:
+    AUTO = 'auto'
+    STDLIB = 'stdlib'
+    UJSON = 'ujson'
+    ORJSON = 'orjson'
+
+
+def _stdlib_dumps(o: Any, indent: Optional[int], ensure_ascii: bool, **kwargs) -> str:
+    return json.dumps(o, indent=indent, ensure_ascii=ensure_ascii, **kwargs)
+
+
+_LEADING_SPACES = re.compile(r'^( +)', re.MULTILINE)
+
+
+def _reindent(s: str, indent: int) -> str:
+    """turn 2-space indented json into indent-space indented json, strings never contain raw newlines"""
+    if indent == 2:
+        return s
+    return _LEADING_SPACES.sub(lambda m: ' ' * (len(m.group(1)) // 2 * indent), s)
+
+
+# orjson silently turns integers beyond int64/uint64 into floats
+_LONG_INT = re.compile(r'-?[0-9][0-9]{18}[0-9]*')  # same as -?[0-9]{19,}, but the re engine scans it faster
+_LONG_INT_BYTES = re.compile(rb'-?[0-9][0-9]{18}[0-9]*')
+_INT_MIN = -2 ** 63
+_INT_MAX = 2 ** 64 - 1
+
+
+def _has_big_int(s: Union[str, bytes]) -> bool:
+    for m in (_LONG_INT if isinstance(s, str) else _LONG_INT_BYTES).finditer(s):
+        token = m.group()
+        # 20 characters cover -[0-9]{19} and [0-9]{20}, longer ones never fit
+        if len(token) > 20 or not _INT_MIN <= int(token) <= _INT_MAX:
+            return True
+    return False
+
+
+def _has_non_finite(o: Any) -> bool:
+    stack = [o]
+    while stack:
+        v = stack.pop()
+        if isinstance(v, float):
+            if not math.isfinite(v):
+                return True
+        elif isinstance(v, dict):
+            stack.extend(v.values())
+        elif isinstance(v, (list, tuple)):
+            stack.extend(v)
+    return False
+
+
+def _orjson_loads(s: Union[str, bytes]) -> Any:
+    if _has_big_int(s):
+        return json.loads(s)
+    try:
+        return orjson.loads(s)
+    except Exception:
+        return json.loads(s)
+
+
+def _orjson_dumps(o: Any, indent: Optional[int], ensure_ascii: bool, **kwargs) -> str:
+    # the stdlib c encoder already handles the compact case fast
+    if kwargs or ensure_ascii or not indent or indent < 0:
+        return _stdlib_dumps(o, indent, ensure_ascii, **kwargs)
+    try:
+        b = orjson.dumps(o, option=orjson.OPT_INDENT_2)
+    except Exception:
+        return _stdlib_dumps(o, indent, ensure_ascii)
+    # orjson writes NaN and infinities as null, only a document with null can hide one
+    if b'null' in b and _has_non_finite(o):
+        return _stdlib_dumps(o, indent, ensure_ascii)
+    return _reindent(b.decode('utf-8'), indent)
+
+
+def _ujson_dumps(o: Any, indent: Optional[int], ensure_ascii: bool, **kwargs) -> str:
+    # ujson uses compact separators without indent, so leave that case to stdlib
+    if kwargs or not indent or indent < 0:
+        return _stdlib_dumps(o, indent, ensure_ascii, **kwargs)
+    try:
+        return ujson.dumps(o, indent=indent, ensure_ascii=ensure_ascii, escape_forward_slashes=False)
+    except Exception:
+        return _stdlib_dumps(o, indent, ensure_ascii)
+
+
+class JsonBackend:
+    def __init__(self,
+                 name: str,
+                 loads: Callable[[Union[str, bytes]], Any],
+                 dumps: Callable[..., str]):
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+
+    def __str__(self):
+        return self.name
+
+
+# in order of preference, orjson parses as strictly as stdlib
+_BACKENDS: Dict[str, JsonBackend] = {}
+if orjson is not None:
+    _BACKENDS[JsonBackendName.ORJSON] = JsonBackend(JsonBackendName.ORJSON, _orjson_loads, _orjson_dumps)
+if ujson is not None:
+    _BACKENDS[JsonBackendName.UJSON] = JsonBackend(JsonBackendName.UJSON, json.loads, _ujson_dumps)
+_BACKENDS[JsonBackendName.STDLIB] = JsonBackend(JsonBackendName.STDLIB, json.loads, _stdlib_dumps)
+
+
+def register_backend(backend: JsonBackend):
+    _BACKENDS[backend.name] = backend
+
+
+def backends() -> List[str]:
+    return list(_BACKENDS.keys())
+
+
+def get_backend(name: str) -> (JsonBackend, Exception):
+    if name == JsonBackendName.AUTO or not name:
+        return next(iter(_BACKENDS.values())), None
+    backend = _BACKENDS.get(name)
+    if backend is None:
+        return None, ValueError(f'json backend not available: {name}')
+    return backend, None
+
+
+_CURRENT: Optional[JsonBackend] = None
+
+
+def current() -> JsonBackend:
+    global _CURRENT
+    if _CURRENT is None:
+        backend, e = get_backend(os.environ.get(ENV_JSON_BACKEND, JsonBackendName.AUTO))
+        if e is not None:
+            backend, _ = get_backend(JsonBackendName.AUTO)
+        _CURRENT = backend
+    return _CURRENT
+
+
+def set_backend(name: str) -> Optional[Exception]:
+    global _CURRENT
+    backend, e = get_backend(name)
+    if e is not None:
+        return e
+    _CURRENT = backend
+    return None
@@ -0,0 +1,879 @@
+import functools
+import itertools
+import re
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+
+"""
+queries over a parsed json document, either JSONPath (starting with $) or a subset of jq (starting with .).
+both compile into a chain of generator functions, one per step, so results come out one at a time as the
+document is walked and nothing in between is collected: $..id over a huge array holds the path to the current
+value and nothing else. compiled queries are cached by their text.
+
+JSONPath: $ .name ['name'] [n] [start:end:step] [*] .* ..name ..* [a,b] [?(@.x > 1 && !@.y)]
+jq: . .name .["name"] .[n] .[n:m] .[] .. | , ? // select() map() first() limit() keys length type not test()
+    {a, b: .c} [...] literals, comparisons, and, or
+"""
+
+_CACHE_SIZE = 256
+
+
+class QuerySyntax:
+    JSONPATH = 'jsonpath'
+    JQ = 'jq'
+
+
+class QuerySyntaxError(ValueError):
+    def __init__(self, msg: str, position: int):
+        super(QuerySyntaxError, self).__init__(f'{msg} at position {position}')
+        self.msg = msg
+        self.position = position
+
+
+class QueryError(ValueError):
+    """raised while evaluating, jq indexing a value of the wrong type for example"""
+    pass
+
+
+Filter = Callable[[Any], Iterator[Any]]
+
+_MISSING = object()
+
+_TOKEN = re.compile(r'''\s*(?:
+    (?P<number>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+  | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<name>[^\W\d]\w*)
+  | (?P<op>\.\.|==|!=|<=|>=|&&|\|\||//|[.$@\[\]():,|;?*<>!{}])
+)''', re.VERBOSE)
+
+_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', '/': '/', '\\': '\\', '"': '"', "'": "'"}
+_ESCAPE = re.compile(r'\\(u[0-9a-fA-F]{4}|.)')
+
+
+def _unquote(token: str) -> str:
+    def replace(m):
+        e = m.group(1)
+        return chr(int(e[1:], 16)) if e[0] == 'u' else _ESCAPES.get(e, e)
+    return _ESCAPE.sub(replace, token[1:-1])
+
+
+class _Token:
+    __slots__ = ('kind', 'text', 'position')
+
+    def __init__(self, kind: str, text: str, position: int):
+        self.kind = kind  # number, string, name, op or end
+        self.text = text
+        self.position = position
+
+
+def _tokenize(expression: str) -> List[_Token]:
+    tokens = []
+    pos = 0
+    while True:
+        m = _TOKEN.match(expression, pos)
+        if m is None:
+            rest = expression[pos:]
+            if not rest.strip():
+                break
+            position = pos + len(rest) - len(rest.lstrip())
+            raise QuerySyntaxError(f'unexpected character {expression[position]!r}', position)
+        kind = m.lastgroup
+        tokens.append(_Token(kind, m.group(kind), m.start(kind)))
+        pos = m.end()
+    tokens.append(_Token('end', '', len(expression)))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, expression: str):
+        self._tokens = _tokenize(expression)
+        self._pos = 0
+
+    def peek(self, offset: int = 0) -> _Token:
+        return self._tokens[min(self._pos + offset, len(self._tokens) - 1)]
+
+    def next(self) -> _Token:
+        token = self.peek()
+        self._pos += 1
+        return token
+
+    def at(self, text: str, offset: int = 0) -> bool:
+        token = self.peek(offset)
+        return token.kind in ('op', 'name') and token.text == text
+
+    def accept(self, text: str) -> bool:
+        if self.at(text):
+            self._pos += 1
+            return True
+        return False
+
+    def expect(self, text: str) -> _Token:
+        token = self.peek()
+        if not self.at(text):
+            self.fail(f'expected {text!r}', token)
+        self._pos += 1
+        return token
+
+    def expect_end(self):
+        if self.peek().kind != 'end':
+            self.fail('unexpected token', self.peek())
+
+    @staticmethod
+    def fail(msg: str, token: _Token):
+        shown = repr(token.text) if token.kind != 'end' else 'end of query'
+        raise QuerySyntaxError(f'{msg}, got {shown}', token.position)
+
+    def literal(self) -> Tuple[bool, Any]:
+        """number, string, true, false or null"""
+        token = self.peek()
+        if token.kind == 'number':
+            self._pos += 1
+            text = token.text
+            return True, float(text) if '.' in text or 'e' in text or 'E' in text else int(text)
+        if token.kind == 'string':
+            self._pos += 1
+            return True, _unquote(token.text)
+        if token.kind == 'name' and token.text in ('true', 'false', 'null'):
+            self._pos += 1
+            return True, {'true': True, 'false': False, 'null': None}[token.text]
+        return False, None
+
+
+# values
+
+
+def _is_number(v: Any) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+def _equal(a: Any, b: Any) -> bool:
+    """json equality, true is not 1"""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return type(a) is type(b) and a == b
+    if _is_number(a) and _is_number(b):
+        return a == b
+    return type(a) is type(b) and a == b
+
+
+def _less(a: Any, b: Any) -> Optional[bool]:
+    """None when the values are not comparable, only numbers with numbers and strings with strings are"""
+    if _is_number(a) and _is_number(b):
+        return a < b
+    if isinstance(a, str) and isinstance(b, str):
+        return a < b
+    return None
+
+
+def _compare(op: str, a: Any, b: Any) -> bool:
+    if op == '==':
+        return _equal(a, b)
+    if op == '!=':
+        return not _equal(a, b)
+    if op in ('<', '>='):
+        less = _less(a, b)
+    else:
+        less = _less(b, a)
+    if less is None:
+        return False
+    if op in ('<', '>'):
+        return less
+    return not less
+
+
+_COMPARISONS = ('==', '!=', '<', '<=', '>', '>=')
+
+
+def _children(v: Any) -> Iterator[Any]:
+    if isinstance(v, dict):
+        return iter(v.values())
+    if isinstance(v, list):
+        return iter(v)
+    return iter(())
+
+
+def _descendants(v: Any) -> Iterator[Any]:
+    """v and everything nested in it in document order, only one iterator per level is kept"""
+    yield v
+    stack = [_children(v)]
+    while stack:
+        for child in stack[-1]:
+            yield child
+            if isinstance(child, (dict, list)):
+                stack.append(_children(child))
+                break
+        else:
+            stack.pop()
+
+
+def _slice_indices(size: int, start: Optional[int], end: Optional[int], step: Optional[int]) -> range:
+    return range(*slice(start, end, step).indices(size))
+
+
+def _pipe(first: Filter, second: Filter) -> Filter:
+    def run(v):
+        for x in first(v):
+            yield from second(x)
+    return run
+
+
+def _chain(steps: List[Filter]) -> Filter:
+    if not steps:
+        return lambda v: iter((v,))
+    result = steps[0]
+    for step in steps[1:]:
+        result = _pipe(result, step)
+    return result
+
+
+# JSONPath
+
+
+def _jp_name(name: str) -> Filter:
+    def run(v):
+        if isinstance(v, dict) and name in v:
+            yield v[name]
+    return run
+
+
+def _jp_index(i: int) -> Filter:
+    def run(v):
+        if isinstance(v, list) and -len(v) <= i < len(v):
+            yield v[i]
+    return run
+
+
+def _jp_slice(start: Optional[int], end: Optional[int], step: Optional[int]) -> Filter:
+    if step == 0:
+        return lambda v: iter(())
+
+    def run(v):
+        if isinstance(v, list):
+            for i in _slice_indices(len(v), start, end, step):
+                yield v[i]
+    return run
+
+
+def _jp_filter(predicate: Callable[[Any], bool]) -> Filter:
+    def run(v):
+        for child in _children(v):
+            if predicate(child):
+                yield child
+    return run
+
+
+def _jp_union(selectors: List[Filter]) -> Filter:
+    if len(selectors) == 1:
+        return selectors[0]
+
+    def run(v):
+        for selector in selectors:
+            yield from selector(v)
+    return run
+
+
+def _jp_descendant(selector: Filter) -> Filter:
+    def run(v):
+        for x in _descendants(v):
+            yield from selector(x)
+    return run
+
+
+def _jp_descendant_name(name: str) -> Filter:
+    """..name is the common case, it skips a generator per visited value"""
+    def run(v):
+        for x in _descendants(v):
+            if isinstance(x, dict) and name in x:
+                yield x[name]
+    return run
+
+
+class _JsonPathParser(_Parser):
+    def parse(self) -> Filter:
+        self.expect('$')
+        steps = self.segments()
+        self.expect_end()
+        return _chain(steps)
+
+    def segments(self) -> List[Filter]:
+        steps = []
+        while True:
+            if self.accept('..'):
+                if self.peek().kind == 'name':
+                    steps.append(_jp_descendant_name(self.next().text))
+                else:
+                    steps.append(_jp_descendant(self.bracket() if self.at('[') else self.dot_selector()))
+            elif self.accept('.'):
+                steps.append(self.dot_selector())
+            elif self.at('['):
+                steps.append(self.bracket())
+            else:
+                return steps
+
+    def dot_selector(self) -> Filter:
+        token = self.next()
+        if token.kind == 'op' and token.text == '*':
+            return _children
+        if token.kind == 'name':
+            return _jp_name(token.text)
+        self.fail('expected a member name or *', token)
+
+    def bracket(self) -> Filter:
+        self.expect('[')
+        selectors = [self.selector()]
+        while self.accept(','):
+            selectors.append(self.selector())
+        self.expect(']')
+        return _jp_union(selectors)
+
+    def selector(self) -> Filter:
+        token = self.peek()
+        if self.accept('*'):
+            return _children
+        if self.accept('?'):
+            return _jp_filter(self.predicate())
+        if token.kind == 'string':
+            self.next()
+            return _jp_name(_unquote(token.text))
+        if token.kind == 'number' or self.at(':'):
+            bounds = [self.integer()]
+            while self.accept(':') and len(bounds) < 3:
+                bounds.append(self.integer())
+            if len(bounds) == 1:
+                if bounds[0] is None:
+                    self.fail('expected an index', token)
+                return _jp_index(bounds[0])
+            bounds += [None] * (3 - len(bounds))
+            return _jp_slice(*bounds)
+        self.fail('expected a selector', token)
+
+    def integer(self) -> Optional[int]:
+        token = self.peek()
+        if token.kind != 'number':
+            return None
+        try:
+            value = int(token.text)
+        except ValueError:
+            self.fail('expected an integer', token)
+        self.next()
+        return value
+
+    # filters, a value is a function of the current node returning a value or _MISSING
+
+    def predicate(self) -> Callable[[Any], bool]:
+        expr = self.or_expr()
+        return lambda v: _jp_truthy(expr(v))
+
+    def or_expr(self):
+        operands = [self.and_expr()]
+        while self.accept('||'):
+            operands.append(self.and_expr())
+        if len(operands) == 1:
+            return operands[0]
+        return lambda v: any(_jp_truthy(operand(v)) for operand in operands)
+
+    def and_expr(self):
+        operands = [self.not_expr()]
+        while self.accept('&&'):
+            operands.append(self.not_expr())
+        if len(operands) == 1:
+            return operands[0]
+        return lambda v: all(_jp_truthy(operand(v)) for operand in operands)
+
+    def not_expr(self):
+        if self.accept('!'):
+            operand = self.not_expr()
+            return lambda v: not _jp_truthy(operand(v))
+        return self.comparison()
+
+    def comparison(self):
+        left = self.operand()
+        token = self.peek()
+        if token.kind == 'op' and token.text in _COMPARISONS:
+            self.next()
+            right = self.operand()
+            op = token.text
+            return lambda v: _compare(op, _jp_value(left(v)), _jp_value(right(v)))
+        return left
+
+    def operand(self):
+        token = self.peek()
+        if self.accept('('):
+            expr = self.or_expr()
+            self.expect(')')
+            return expr
+        if token.kind == 'op' and token.text == '$':
+            self.fail('$ inside a filter is not supported, use @', token)
+        if self.accept('@'):
+            path = _chain(self.segments())
+            return lambda v: _JsonPathNodes(path, v)
+        ok, value = self.literal()
+        if ok:
+            return lambda v: value
+        self.fail('expected @, a literal or (', token)
+
+
+class _JsonPathNodes:
+    """the nodes a path inside a filter selects, lazily"""
+    __slots__ = ('_path', '_value')
+
+    def __init__(self, path: Filter, value: Any):
+        self._path = path
+        self._value = value
+
+    def first(self) -> Any:
+        return next(self._path(self._value), _MISSING)
+
+
+def _jp_value(v: Any) -> Any:
+    return v.first() if isinstance(v, _JsonPathNodes) else v
+
+
+def _jp_truthy(v: Any) -> bool:
+    """a path is true when it selects anything, the value of a comparison is itself"""
+    if isinstance(v, _JsonPathNodes):
+        return v.first() is not _MISSING
+    return v is True
+
+
+# jq
+
+
+def _jq_truthy(v: Any) -> bool:
+    return v is not None and v is not False
+
+
+def _type_name(v: Any) -> str:
+    if v is None:
+        return 'null'
+    if isinstance(v, bool):
+        return 'boolean'
+    if _is_number(v):
+        return 'number'
+    if isinstance(v, str):
+        return 'string'
+    if isinstance(v, list):
+        return 'array'
+    return 'object'
+
+
+def _jq_identity(v):
+    yield v
+
+
+def _jq_name(name: str) -> Filter:
+    def run(v):
+        if isinstance(v, dict):
+            yield v.get(name)
+        elif v is None:
+            yield None
+        else:
+            raise QueryError(f'cannot index {_type_name(v)} with "{name}"')
+    return run
+
+
+def _jq_index(index: Filter) -> Filter:
+    def run(v):
+        for i in index(v):
+            if isinstance(i, str):
+                yield from _jq_name(i)(v)
+            elif not _is_number(i):
+                raise QueryError(f'cannot index {_type_name(v)} with {_type_name(i)}')
+            elif isinstance(v, list):
+                i = int(i)
+                yield v[i] if -len(v) <= i < len(v) else None
+            elif v is None:
+                yield None
+            else:
+                raise QueryError(f'cannot index {_type_name(v)} with number')
+    return run
+
+
+def _jq_slice(start: Optional[Filter], end: Optional[Filter]) -> Filter:
+    def bounds(f, v):
+        return f(v) if f is not None else iter((None,))
+
+    def run(v):
+        for s in bounds(start, v):
+            for e in bounds(end, v):
+                if v is None:
+                    yield None
+                elif isinstance(v, (list, str)):
+                    yield v[None if s is None else int(s):None if e is None else int(e)]
+                else:
+                    raise QueryError(f'cannot slice {_type_name(v)}')
+    return run
+
+
+def _jq_iterate(v):
+    if isinstance(v, (dict, list)):
+        return _children(v)
+    raise QueryError(f'cannot iterate over {_type_name(v)}')
+
+
+def _jq_optional(f: Filter) -> Filter:
+    def run(v):
+        try:
+            yield from f(v)
+        except QueryError:
+            return
+    return run
+
+
+def _jq_comma(filters: List[Filter]) -> Filter:
+    def run(v):
+        for f in filters:
+            yield from f(v)
+    return run
+
+
+def _jq_comparison(op: str, left: Filter, right: Filter) -> Filter:
+    def run(v):
+        for b in right(v):
+            for a in left(v):
+                yield _compare(op, a, b)
+    return run
+
+
+def _jq_and(left: Filter, right: Filter) -> Filter:
+    def run(v):
+        for a in left(v):
+            if not _jq_truthy(a):
+                yield False
+                continue
+            for b in right(v):
+                yield _jq_truthy(b)
+    return run
+
+
+def _jq_or(left: Filter, right: Filter) -> Filter:
+    def run(v):
+        for a in left(v):
+            if _jq_truthy(a):
+                yield True
+                continue
+            for b in right(v):
+                yield _jq_truthy(b)
+    return run
+
+
+def _jq_alternative(left: Filter, right: Filter) -> Filter:
+    """a // b, the truthy outputs of a, or else those of b"""
+    def run(v):
+        found = False
+        try:
+            for a in left(v):
+                if _jq_truthy(a):
+                    found = True
+                    yield a
+        except QueryError:
+            pass
+        if not found:
+            yield from right(v)
+    return run
+
+
+def _jq_select(condition: Filter) -> Filter:
+    def run(v):
+        for c in condition(v):
+            if _jq_truthy(c):
+                yield v
+    return run
+
+
+def _jq_map(f: Filter) -> Filter:
+    def run(v):
+        yield [y for x in _jq_iterate(v) for y in f(x)]
+    return run
+
+
+def _jq_limit(n: Filter, f: Filter) -> Filter:
+    def run(v):
+        for count in n(v):
+            if not _is_number(count):
+                raise QueryError('limit count must be a number')
+            yield from itertools.islice(f(v), max(0, int(count)))
+    return run
+
+
+def _jq_test(pattern: Filter) -> Filter:
+    def run(v):
+        for p in pattern(v):
+            if not isinstance(v, str) or not isinstance(p, str):
+                raise QueryError(f'{_type_name(v)} cannot be matched, as it is not a string')
+            yield _compiled_regex(p).search(v) is not None
+    return run
+
+
+@functools.lru_cache(maxsize=64)
+def _compiled_regex(pattern: str):
+    try:
+        return re.compile(pattern)
+    except re.error as e:
+        raise QueryError(f'invalid regex {pattern!r}: {e}')
+
+
+def _jq_keys(v):
+    if isinstance(v, dict):
+        yield sorted(v.keys())
+    elif isinstance(v, list):
+        yield list(range(len(v)))
+    else:
+        raise QueryError(f'{_type_name(v)} has no keys')
+
+
+def _jq_length(v):
+    if v is None:
+        yield 0
+    elif isinstance(v, bool):
+        raise QueryError('boolean has no length')
+    elif _is_number(v):
+        yield abs(v)
+    else:
+        yield len(v)
+
+
+def _jq_object(entries: List[Tuple[str, Filter]]) -> Filter:
+    def run(v):
+        keys = [k for k, _ in entries]
+        for values in itertools.product(*[list(f(v)) for _, f in entries]):
+            yield dict(zip(keys, values))
+    return run
+
+
+def _jq_array(f: Optional[Filter]) -> Filter:
+    def run(v):
+        yield list(f(v)) if f is not None else []
+    return run
+
+
+def _jq_constant(value: Any) -> Filter:
+    def run(v):
+        yield value
+    return run
+
+
+_JQ_BUILTINS = {
+    'keys': _jq_keys,
+    'length': _jq_length,
+    'type': lambda v: iter((_type_name(v),)),
+    'not': lambda v: iter((not _jq_truthy(v),)),
+    'empty': lambda v: iter(()),
+    'values': lambda v: iter((v,)) if v is not None else iter(()),
+}
+_JQ_FUNCTIONS = {
+    # name: (argument count, factory)
+    'select': (1, _jq_select),
+    'map': (1, _jq_map),
+    'first': (1, lambda f: lambda v: itertools.islice(f(v), 1)),
+    'limit': (2, _jq_limit),
+    'test': (1, _jq_test),
+}
+
+
+class _JqParser(_Parser):
+    def parse(self) -> Filter:
+        f = self.pipe()
+        self.expect_end()
+        return f
+
+    def pipe(self) -> Filter:
+        f = self.comma()
+        while self.accept('|'):
+            f = _pipe(f, self.comma())
+        return f
+
+    def comma(self) -> Filter:
+        filters = [self.alternative()]
+        while self.accept(','):
+            filters.append(self.alternative())
+        return filters[0] if len(filters) == 1 else _jq_comma(filters)
+
+    def alternative(self) -> Filter:
+        f = self.or_expr()
+        while self.accept('//'):
+            f = _jq_alternative(f, self.or_expr())
+        return f
+
+    def or_expr(self) -> Filter:
+        f = self.and_expr()
+        while self.accept('or'):
+            f = _jq_or(f, self.and_expr())
+        return f
+
+    def and_expr(self) -> Filter:
+        f = self.comparison()
+        while self.accept('and'):
+            f = _jq_and(f, self.comparison())
+        return f
+
+    def comparison(self) -> Filter:
+        left = self.postfix()
+        token = self.peek()
+        if token.kind == 'op' and token.text in _COMPARISONS:
+            self.next()
+            return _jq_comparison(token.text, left, self.postfix())
+        return left
+
+    def postfix(self) -> Filter:
+        steps = [self.primary()]
+        while True:
+            if self.at('.') and self.peek(1).kind in ('name', 'string'):
+                self.next()
+                steps.append(self.member())
+            elif self.at('.') and self.at('[', 1):
+                self.next()
+            elif self.at('['):
+                steps.append(self.bracket())
+            elif self.accept('?'):
+                steps = [_jq_optional(_chain(steps))]
+            else:
+                return _chain(steps)
+
+    def member(self) -> Filter:
+        token = self.next()
+        return _jq_name(token.text if token.kind == 'name' else _unquote(token.text))
+
+    def bracket(self) -> Filter:
+        self.expect('[')
+        if self.accept(']'):
+            return _jq_iterate
+        start = None if self.at(':') else self.pipe()
+        if self.accept(':'):
+            end = None if self.at(']') else self.pipe()
+            self.expect(']')
+            return _jq_slice(start, end)
+        self.expect(']')
+        return _jq_index(start)
+
+    def primary(self) -> Filter:
+        token = self.peek()
+        if self.accept('..'):
+            return _descendants
+        if self.accept('.'):
+            if self.peek().kind in ('name', 'string'):
+                return self.member()
+            return _jq_identity
+        if self.accept('('):
+            f = self.pipe()
+            self.expect(')')
+            return f
+        if self.accept('['):
+            if self.accept(']'):
+                return _jq_array(None)
+            f = self.pipe()
+            self.expect(']')
+            return _jq_array(f)
+        if self.accept('{'):
+            return self.object()
+        ok, value = self.literal()
+        if ok:
+            return _jq_constant(value)
+        if token.kind == 'name':
+            self.next()
+            if token.text in _JQ_FUNCTIONS:
+                count, factory = _JQ_FUNCTIONS[token.text]
+                self.expect('(')
+                args = [self.pipe()]
+                while len(args) < count and self.accept(';'):
+                    args.append(self.pipe())
+                if len(args) < count:
+                    self.fail(f'{token.text} takes {count} arguments', self.peek())
+                self.expect(')')
+                return factory(*args)
+            if token.text in _JQ_BUILTINS:
+                return _JQ_BUILTINS[token.text]
+            self.fail('unknown function', token)
+        self.fail('expected a filter', token)
+
+    def object(self) -> Filter:
+        entries = []
+        while not self.accept('}'):
+            if entries:
+                self.expect(',')
+            token = self.next()
+            if token.kind == 'name':
+                key = token.text
+            elif token.kind == 'string':
+                key = _unquote(token.text)
+            else:
+                self.fail('expected an object key', token)
+            if self.accept(':'):
+                entries.append((key, self.or_expr()))
+            else:
+                entries.append((key, _jq_name(key)))
+        return _jq_object(entries)
+
+
+class Query:
+    def __init__(self, expression: str, syntax: str, evaluate: Filter):
+        self.expression = expression
+        self.syntax = syntax
+        self._evaluate = evaluate
+
+    def __str__(self):
+        return str({'expression': self.expression, 'syntax': self.syntax})
+
+    def evaluate(self, document: Any) -> Iterator[Any]:
+        """a generator of the results, QueryError may be raised while it runs"""
+        return self._evaluate(document)
+
+
+def detect_syntax(expression: str) -> str:
+    return QuerySyntax.JSONPATH if expression.lstrip().startswith('$') else QuerySyntax.JQ
+
+
+@functools.lru_cache(maxsize=_CACHE_SIZE)
+def _compile(expression: str) -> Query:
+    syntax = detect_syntax(expression)
+    parser = _JsonPathParser(expression) if syntax == QuerySyntax.JSONPATH else _JqParser(expression)
+    return Query(expression, syntax, parser.parse())
+
+
+def compile_query(expression: str) -> (Query, Exception):
+    """compiled once, later calls with the same text get the cached query"""
+    if not expression.strip():
+        return None, QuerySyntaxError('empty query', 0)
+    try:
+        return _compile(expression), None
+    except QuerySyntaxError as e:
+        return None, e
+
+
+def _debug():
+    import time
+    doc = {
+        'store': {
+            'book': [
+                {'category': 'reference', 'author': 'Nigel Rees', 'title': 'Sayings of the Century', 'price': 8.95},
+                {'category': 'fiction', 'author': 'Evelyn Waugh', 'title': 'Sword of Honour', 'price': 12.99},
+                {'category': 'fiction', 'author': 'Herman Melville', 'title': 'Moby Dick', 'isbn': '0-553-21311-3',
+                 'price': 8.99},
+            ],
+            'bicycle': {'color': 'red', 'price': 19.95},
+        },
+    }
+    for expression in ['$.store.book[*].author', '$..price', '$.store.book[-1:]', "$..book[?(@.price < 10)].title",
+                       '$..book[?(@.isbn)]', "$['store']['bicycle']", '$..book[0,2].title', '$.store.*',
+                       '.store.book[] | select(.price > 9) | .title', '.store.book | map(.price)', '[.. | .price?]',
+                       '.store.book[] | {title, cheap: (.price < 10)}', 'first(.. | .author? // empty)', '.missing // "default"',
+                       '.store.book[] | select(.author | test("^H")) | .title', '.store | keys, length',
+                       '$.store.book[?(@.price > 10 || @.category == "reference")].title', '.[0]', '$[']:
+        q, err = compile_query(expression)
+        if err is not None:
+            print(f'{expression} -> {err}')
+            continue
+        try:
+            print(f'{expression} -> {list(q.evaluate(doc))}')
+        except QueryError as e:
+            print(f'{expression} -> error: {e}')
+    big = [{'id': i, 'tags': [{'id': -i}]} for i in range(1000000)]
+    q, _ = compile_query('$..id')
+    start = time.perf_counter()
+    results = q.evaluate(big)
+    print(f'first result in {time.perf_counter() - start:.6f}s: {next(results)}')
+    count = sum(1 for _ in results) + 1
+    print(f'{count} results in {time.perf_counter() - start:.3f}s, cached: {compile_query("$..id")[0] is q}')
+
+
+if __name__ == '__main__':
+    _debug()
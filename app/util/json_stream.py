@@ -0,0 +1,493 @@
+import json
+import re
+from typing import Any, Optional, List, Tuple, Iterable, Iterator, Union
+
+from . import json_backend
+
+
+"""
+incremental json parsing over bytes as they arrive. JsonStreamParser turns chunks into ijson-style events,
+each with the byte offset where its token starts, and reports syntax errors with the exact byte offset.
+JsonIndex builds a lazy tree on top of it: only the direct children of the parsed value are kept, containers
+among them remember their byte range and are parsed the same way when expanded, so a huge document costs one
+pass of the tokenizer and memory for its top level only. decoding a value is left to the json backend, which
+is orjson or ujson when installed
+"""
+
+_READ_SIZE = 1024 * 1024
+_RESCAN_SIZE = 64 * 1024
+
+
+class JsonEvent:
+    START_MAP = 'start_map'
+    MAP_KEY = 'map_key'
+    END_MAP = 'end_map'
+    START_ARRAY = 'start_array'
+    END_ARRAY = 'end_array'
+    STRING = 'string'
+    NUMBER = 'number'
+    BOOLEAN = 'boolean'
+    NULL = 'null'
+
+
+class JsonSyntaxError(ValueError):
+    def __init__(self, msg: str, offset: int):
+        super(JsonSyntaxError, self).__init__(f'{msg} at byte {offset}')
+        self.msg = msg
+        self.offset = offset  # from the start of the document, in bytes
+        self.events = []  # those completed before the error
+
+
+_WHITESPACE = b' \t\n\r'
+_TOKEN = re.compile(rb'''[ \t\n\r]*(?:
+    ([{}\[\]:,])
+  | "([^"\\\x00-\x1f]*+(?:\\.[^"\\\x00-\x1f]*+)*+)"
+  | (-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?)
+  | (true|false|null)
+)''', re.VERBOSE | re.DOTALL)
+# everything but brackets and the start of a string, or whole strings
+_SKIP = re.compile(rb'(?:[^"\[\]{}]++|"[^"\\]*+(?:\\.[^"\\]*+)*+")*+', re.DOTALL)
+_STRING_PREFIX = re.compile(rb'"[^"\\\x00-\x1f]*(?:\\.[^"\\\x00-\x1f]*)*\\?')
+_NUMBER_PREFIX = re.compile(rb'-?[0-9]*(?:\.[0-9]*)?(?:[eE][-+]?[0-9]*)?')
+_LITERALS = {b'true': True, b'false': False, b'null': None}
+
+# what the parser expects next
+_VALUE = 0
+_VALUE_OR_END = 1  # right after [
+_KEY_OR_END = 2  # right after {
+_KEY = 3
+_COLON = 4
+_COMMA_OR_END = 5
+_DONE = 6
+
+_EXPECTED = {
+    _VALUE: 'value',
+    _VALUE_OR_END: 'value or ]',
+    _KEY_OR_END: 'string key or }',
+    _KEY: 'string key',
+    _COLON: ':',
+    _COMMA_OR_END: ', or closing bracket',
+    _DONE: 'end of data',
+}
+
+Event = Tuple[str, Any, int]
+
+
+class JsonStreamParser:
+    """
+    push parser, feed it chunks of any size and get back the events they complete. with skip_depth, containers
+    opened deeper than that are passed over by a scan that only keeps track of strings and brackets, they produce
+    just their start and end events and are checked for bracket balance only
+    """
+    def __init__(self, base_offset: int = 0, skip_depth: int = 0):
+        self._pending: List[bytes] = []
+        self._pending_size = 0
+        self._wait_size = 0  # do not parse again before that much is pending, for tokens split over many chunks
+        self._base = base_offset  # document offset of the first pending byte
+        self._state = _VALUE
+        self._stack: List[bytes] = []  # open brackets
+        self._skip_depth = skip_depth
+        self.err: Optional[JsonSyntaxError] = None
+
+    @property
+    def offset(self) -> int:
+        """bytes fully consumed so far"""
+        return self._base
+
+    @property
+    def position(self) -> int:
+        """bytes fed so far, the tail of an incomplete token is kept until the rest of it arrives"""
+        return self._base + self._pending_size
+
+    @property
+    def done(self) -> bool:
+        return self._state == _DONE
+
+    def feed(self, data: bytes) -> List[Event]:
+        if self.err is not None:
+            raise self.err
+        if not data:
+            return []
+        self._pending.append(bytes(data))
+        self._pending_size += len(data)
+        if self._pending_size < self._wait_size:
+            return []
+        return self._parse(False)
+
+    def close(self) -> List[Event]:
+        """the end of data, an incomplete document is an error"""
+        if self.err is not None:
+            raise self.err
+        events = self._parse(True)
+        if self._state != _DONE:
+            self.err = JsonSyntaxError('unexpected end of data', self._base)
+            self.err.events = events
+            raise self.err
+        return events
+
+    def _fail(self, msg: str, offset: int):
+        self.err = JsonSyntaxError(msg, offset)
+        raise self.err
+
+    def _parse(self, final: bool) -> List[Event]:
+        buf = self._pending[0] if len(self._pending) == 1 else b''.join(self._pending)
+        size = len(buf)
+        pos = 0
+        state = self._state
+        stack = self._stack
+        skip_depth = self._skip_depth
+        events = []
+        append = events.append
+        match = _TOKEN.match
+        skip = _SKIP.match
+        try:
+            while True:
+                if skip_depth and len(stack) > skip_depth:
+                    pos = skip(buf, pos).end()
+                    if pos == size:
+                        break
+                    c = buf[pos:pos + 1]
+                    if c == b'"':
+                        if final:
+                            self._fail('unterminated string', self._base + pos)
+                        break
+                    if c == b'{' or c == b'[':
+                        stack.append(c)
+                    else:
+                        if stack[-1] != (b'{' if c == b'}' else b'['):
+                            self._fail(f'unexpected "{c.decode()}"', self._base + pos)
+                        stack.pop()
+                        if len(stack) == skip_depth:
+                            append((JsonEvent.END_MAP if c == b'}' else JsonEvent.END_ARRAY, None, self._base + pos))
+                            state = _COMMA_OR_END
+                    pos += 1
+                    continue
+                m = match(buf, pos)
+                if m is None or (m.lastindex == 3 and not final and
+                                 _NUMBER_PREFIX.match(buf, m.start(3)).end() == size):
+                    # nothing recognizable, or a number that may go on in the next chunk
+                    start = pos
+                    while start < size and buf[start] in _WHITESPACE:
+                        start += 1
+                    if start == size:
+                        pos = size
+                        break
+                    if self._incomplete(buf, start):
+                        if final:
+                            self._fail('unexpected end of data', self._base + size)
+                        pos = start
+                        break
+                    if state == _DONE:
+                        self._fail('extra data after the document', self._base + start)
+                    self._fail(f'invalid token, expected {_EXPECTED[state]}', self._base + self._bad_offset(buf, start))
+                group = m.lastindex
+                start = m.start(group)
+                offset = self._base + start - (1 if group == 2 else 0)
+                if group == 1:
+                    c = buf[start:start + 1]
+                    if c == b',':
+                        if state != _COMMA_OR_END:
+                            self._fail(f'unexpected ",", expected {_EXPECTED[state]}', offset)
+                        state = _KEY if stack[-1] == b'{' else _VALUE
+                    elif c == b':':
+                        if state != _COLON:
+                            self._fail(f'unexpected ":", expected {_EXPECTED[state]}', offset)
+                        state = _VALUE
+                    elif c == b'{' or c == b'[':
+                        if state != _VALUE and state != _VALUE_OR_END:
+                            self._fail(f'unexpected "{c.decode()}", expected {_EXPECTED[state]}', offset)
+                        stack.append(c)
+                        append((JsonEvent.START_MAP if c == b'{' else JsonEvent.START_ARRAY, None, offset))
+                        state = _KEY_OR_END if c == b'{' else _VALUE_OR_END
+                    else:
+                        opening = b'{' if c == b'}' else b'['
+                        if not stack or stack[-1] != opening or state not in (
+                                _COMMA_OR_END, _KEY_OR_END if c == b'}' else _VALUE_OR_END):
+                            self._fail(f'unexpected "{c.decode()}", expected {_EXPECTED[state]}', offset)
+                        stack.pop()
+                        append((JsonEvent.END_MAP if c == b'}' else JsonEvent.END_ARRAY, None, offset))
+                        state = _COMMA_OR_END if stack else _DONE
+                elif group == 2:
+                    value = self._decode_string(m.group(2), offset)
+                    if state == _KEY or state == _KEY_OR_END:
+                        append((JsonEvent.MAP_KEY, value, offset))
+                        state = _COLON
+                    elif state == _VALUE or state == _VALUE_OR_END:
+                        append((JsonEvent.STRING, value, offset))
+                        state = _COMMA_OR_END if stack else _DONE
+                    else:
+                        self._fail(f'unexpected string, expected {_EXPECTED[state]}', offset)
+                else:
+                    if state != _VALUE and state != _VALUE_OR_END:
+                        self._fail(f'unexpected value, expected {_EXPECTED[state]}', offset)
+                    token = m.group(group)
+                    if group == 3:
+                        if b'.' in token or b'e' in token or b'E' in token:
+                            append((JsonEvent.NUMBER, float(token), offset))
+                        else:
+                            append((JsonEvent.NUMBER, int(token), offset))
+                    else:
+                        value = _LITERALS[token]
+                        append((JsonEvent.NULL if value is None else JsonEvent.BOOLEAN, value, offset))
+                    state = _COMMA_OR_END if stack else _DONE
+                pos = m.end()
+        except JsonSyntaxError as e:
+            e.events = events
+            raise
+        finally:
+            self._state = state
+            self._base += pos
+            rest = buf[pos:]
+            self._pending = [rest] if rest else []
+            self._pending_size = len(rest)
+            # a long token still incomplete is not scanned again until the pending data doubles
+            self._wait_size = 2 * len(rest) if len(rest) >= _RESCAN_SIZE else 0
+        return events
+
+    @staticmethod
+    def _incomplete(buf: bytes, start: int) -> bool:
+        """whether the rest of buf may become a valid token with more data"""
+        c = buf[start:start + 1]
+        if c == b'"':
+            return _STRING_PREFIX.match(buf, start).end() == len(buf)
+        if c == b'-' or c.isdigit():
+            return _NUMBER_PREFIX.match(buf, start).end() == len(buf)
+        rest = buf[start:]
+        return any(literal.startswith(rest) for literal in _LITERALS)
+
+    @staticmethod
+    def _bad_offset(buf: bytes, start: int) -> int:
+        """the first byte that makes the token invalid"""
+        c = buf[start:start + 1]
+        if c == b'"':
+            return _STRING_PREFIX.match(buf, start).end()
+        if c == b'-' or c.isdigit():
+            return max(start, _NUMBER_PREFIX.match(buf, start).end() - 1)
+        for literal in _LITERALS:
+            n = 0
+            while n < len(literal) and buf[start + n:start + n + 1] == literal[n:n + 1]:
+                n += 1
+            if n:
+                return start + n
+        return start
+
+    def _decode_string(self, raw: bytes, offset: int) -> str:
+        try:
+            if b'\\' not in raw:
+                return raw.decode('utf-8')
+            return json.loads(b'"' + raw + b'"')
+        except UnicodeDecodeError as e:
+            self._fail('invalid utf-8 in string', offset + 1 + e.start)
+        except json.JSONDecodeError as e:
+            # the position is in characters of the decoded text
+            prefix = raw.decode('utf-8', errors='replace')[:max(0, e.pos - 1)]
+            self._fail('invalid escape in string', offset + 1 + len(prefix.encode('utf-8')))
+
+
+def iter_events(chunks: Iterable[bytes]) -> Iterator[Event]:
+    parser = JsonStreamParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+class JsonKind:
+    OBJECT = 'object'
+    ARRAY = 'array'
+    STRING = 'string'
+    NUMBER = 'number'
+    BOOLEAN = 'boolean'
+    NULL = 'null'
+
+
+_SCALAR_KINDS = {
+    JsonEvent.STRING: JsonKind.STRING,
+    JsonEvent.NUMBER: JsonKind.NUMBER,
+    JsonEvent.BOOLEAN: JsonKind.BOOLEAN,
+    JsonEvent.NULL: JsonKind.NULL,
+}
+
+
+class LazyNode:
+    """a value of the document, containers know their byte range and get their children once indexed"""
+    __slots__ = ('key', 'kind', 'value', 'start', 'end', 'count', 'children')
+
+    def __init__(self, key: Union[str, int], kind: str, start: int, value: Any = None):
+        self.key = key  # member name, or the position in the array
+        self.kind = kind
+        self.value = value  # scalars only
+        self.start = start
+        self.end = -1  # past the closing bracket, -1 until it is parsed
+        self.count = -1  # number of children, -1 until they are indexed
+        self.children: Optional[List['LazyNode']] = None  # not indexed yet
+
+    @property
+    def is_container(self) -> bool:
+        return self.kind == JsonKind.OBJECT or self.kind == JsonKind.ARRAY
+
+    @property
+    def complete(self) -> bool:
+        return not self.is_container or self.end >= 0
+
+    def __str__(self):
+        return str({k: getattr(self, k) for k in self.__slots__ if k != 'children'})
+
+
+class JsonIndex:
+    """
+    feed it the document, or the byte range of a container, as it arrives. root is the parsed value and gets its
+    children appended as soon as they start, so a reader at another thread sees the top level grow
+    """
+    def __init__(self, base_offset: int = 0):
+        # the children of the value are containers at depth 2, only their byte range is taken
+        self._parser = JsonStreamParser(base_offset, skip_depth=1)
+        self._depth = 0
+        self._key: Union[str, int] = ''
+        self._child: Optional[LazyNode] = None  # the container child being parsed
+        self.root: Optional[LazyNode] = None
+        self.err: Optional[JsonSyntaxError] = None
+
+    @property
+    def position(self) -> int:
+        return self._parser.position
+
+    @property
+    def done(self) -> bool:
+        return self._parser.done or self.err is not None
+
+    def feed(self, data: bytes) -> Optional[JsonSyntaxError]:
+        if self.done:
+            return self.err
+        try:
+            self._consume(self._parser.feed(data))
+        except JsonSyntaxError as e:
+            self._consume(e.events)
+            self.err = e
+        return self.err
+
+    def close(self) -> Optional[JsonSyntaxError]:
+        if self.err is not None:
+            return self.err
+        try:
+            self._consume(self._parser.close())
+        except JsonSyntaxError as e:
+            self._consume(e.events)
+            self.err = e
+        return self.err
+
+    def feed_all(self, source: Union[bytes, memoryview], start: int = 0, end: int = -1,
+                 read_size: int = _READ_SIZE, cancelled=None) -> Optional[JsonSyntaxError]:
+        """index source[start:end] block by block and close, the source is usually a memory-mapped file"""
+        if end < 0:
+            end = len(source)
+        for pos in range(start, end, read_size):
+            if self.done or (cancelled is not None and cancelled()):
+                return self.err
+            self.feed(source[pos:min(end, pos + read_size)])
+        return self.close()
+
+    def _consume(self, events: List[Event]):
+        depth = self._depth
+        root = self.root
+        for event, value, offset in events:
+            if event == JsonEvent.START_MAP or event == JsonEvent.START_ARRAY:
+                kind = JsonKind.OBJECT if event == JsonEvent.START_MAP else JsonKind.ARRAY
+                if depth == 0:
+                    root = self.root = LazyNode('', kind, offset)
+                    root.count = 0
+                    root.children = []
+                else:
+                    self._child = self._add_child(root, LazyNode(self._key, kind, offset))
+                depth += 1
+            elif event == JsonEvent.END_MAP or event == JsonEvent.END_ARRAY:
+                depth -= 1
+                if depth == 0:
+                    root.end = offset + 1
+                else:
+                    self._child.end = offset + 1
+                    self._child = None
+            elif event == JsonEvent.MAP_KEY:
+                self._key = value
+            elif depth == 0:
+                root = self.root = LazyNode('', _SCALAR_KINDS[event], offset, value)
+            else:
+                self._add_child(root, LazyNode(self._key, _SCALAR_KINDS[event], offset, value))
+        self._depth = depth
+
+    @staticmethod
+    def _add_child(parent: LazyNode, node: LazyNode) -> LazyNode:
+        if parent.kind == JsonKind.ARRAY:
+            node.key = len(parent.children)
+        # a reader at another thread only looks at the children below count
+        parent.children.append(node)
+        parent.count += 1
+        return node
+
+
+def index_children(node: LazyNode, source: Union[bytes, memoryview], cancelled=None) -> Optional[JsonSyntaxError]:
+    """fill node.children by parsing its byte range of source"""
+    if not node.is_container or node.children is not None:
+        return None
+    if node.end < 0:
+        return JsonSyntaxError('container is not complete', node.start)
+    index = JsonIndex(node.start)
+    err = index.feed_all(source, node.start, node.end, cancelled=cancelled)
+    if err is not None or index.root is None or not index.root.complete:
+        return err  # or cancelled
+    node.children = index.root.children
+    node.count = len(node.children)
+    return None
+
+
+def from_decode_error(err: json.JSONDecodeError) -> JsonSyntaxError:
+    """the same error with its position in characters turned into a byte offset"""
+    return JsonSyntaxError(err.msg, len(err.doc[:err.pos].encode('utf-8', errors='replace')))
+
+
+def node_value(node: LazyNode, source: Union[bytes, memoryview]) -> (Any, Exception):
+    """the decoded value, containers are parsed at once by the json backend"""
+    if not node.is_container:
+        return node.value, None
+    if node.end < 0:
+        return None, JsonSyntaxError('container is not complete', node.start)
+    try:
+        return json_backend.current().loads(bytes(source[node.start:node.end])), None
+    except Exception as e:
+        return None, e
+
+
+def _debug():
+    import time
+    doc = json.dumps({
+        'meta': {'count': 200000, 'tags': ['a', 'b']},
+        'items': [{'id': i, 'name': f'item-{i}', 'ok': i % 2 == 0, 'score': i / 7, 'ref': None}
+                  for i in range(200000)],
+        'text': 'escaped \\"quote\\" 中文',
+    }, ensure_ascii=False).encode('utf-8')
+    start = time.perf_counter()
+    index = JsonIndex()
+    for pos in range(0, len(doc), 65536):
+        index.feed(doc[pos:pos + 65536])
+    index.close()
+    seconds = time.perf_counter() - start
+    print(f'{len(doc)} bytes in {seconds:.3f}s, {len(doc) / seconds / 1024 / 1024:.1f}MB/s, err: {index.err}')
+    for child in index.root.children:
+        print(child)
+    items = index.root.children[1]
+    start = time.perf_counter()
+    err = index_children(items, doc)
+    print(f'items indexed in {time.perf_counter() - start:.3f}s, err: {err}, {items.children[1]}')
+    print(index_children(items.children[1], doc), [str(child) for child in items.children[1].children])
+    print(node_value(items.children[3], doc))
+    small = doc[:doc.index(b'{"id": 100,')] + b'{}]}'
+    events = list(iter_events(small[pos:pos + 7] for pos in range(0, len(small), 7)))
+    print(len(events), events[:8], events[-3:])
+    for bad in [b'{"a": [1, {"b": 2]}', b'{"a": "\xff"}', b'{"a": 1,}', b'[1, 2', b'{"a" 1}', b'[tru]', b'{"a": "x\x01"}', b'[1] 2', b'[01]', b'{"a": "\\q"}', b'{"a": "abc']:
+        try:
+            list(iter_events([bad[:3], bad[3:]]))
+        except JsonSyntaxError as e:
+            print(bad, '->', e)
+
+
+if __name__ == '__main__':
+    _debug()
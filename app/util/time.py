@@ -1,4 +1,11 @@
 import datetime
+import functools
+import importlib.util
+import re
+from typing import List, Optional, Sequence, Callable
+
+# numpy takes longer to import than the rest of the app, it is imported by the first batch conversion
+np = None
 
 
 class Format:
@@ -33,9 +40,154 @@ def get_format(p: str, fmt_type: str = '') -> str:
         return ''
 
 
+# compiled formats
+#
+# strptime goes through the locale aware _strptime module (lock, cache check, regex) on every call and
+# strftime re-scans the format. a format made of plain numeric directives is compiled once into a regex
+# with a field list for parsing and a str.format template for formatting, anything else (locale names,
+# %y, %z, ...) keeps using strptime/strftime. formats with a fixed layout skip the regex and are sliced
+
+# directive -> (datetime field, regex as in _strptime, format spec)
+_DIRECTIVES = {
+    'Y': ('year', r'\d\d\d\d', '{0.year}'),
+    'm': ('month', r'1[0-2]|0[1-9]|[1-9]', '{0.month:02d}'),
+    'd': ('day', r'3[01]|[12]\d|0[1-9]|[1-9]| [1-9]', '{0.day:02d}'),
+    'H': ('hour', r'2[0-3]|[0-1]\d|\d', '{0.hour:02d}'),
+    'M': ('minute', r'[0-5]\d|\d', '{0.minute:02d}'),
+    'S': ('second', r'6[0-1]|[0-5]\d|\d', '{0.second:02d}'),
+    'f': ('microsecond', r'[0-9]{1,6}', '{0.microsecond:06d}'),
+}
+_DIRECTIVE_PATTERN = re.compile(r'%(.)')
+
+
+class _CompiledFormat:
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        fields = []
+        pattern = []
+        template = []
+        pos = 0
+        for m in _DIRECTIVE_PATTERN.finditer(fmt):
+            literal = fmt[pos:m.start()]
+            pattern.append(re.sub(r'\\\s+', r'\\s+', re.escape(literal)))
+            template.append(literal.replace('{', '{{').replace('}', '}}'))
+            pos = m.end()
+            directive = m.group(1)
+            if directive == '%':
+                pattern.append('%')
+                template.append('%')
+                continue
+            if directive not in _DIRECTIVES or _DIRECTIVES[directive][0] in fields:
+                raise ValueError(f'directive not compilable: %{directive}')
+            field, regex, spec = _DIRECTIVES[directive]
+            fields.append(field)
+            pattern.append(f'({regex})')
+            template.append(spec)
+        literal = fmt[pos:]
+        pattern.append(re.sub(r'\\\s+', r'\\s+', re.escape(literal)))
+        template.append(literal.replace('{', '{{').replace('}', '}}'))
+        self._fields = fields
+        self._regex = re.compile(''.join(pattern), re.IGNORECASE)
+        self._template = ''.join(template)
+
+    def parse(self, s: str) -> Optional[datetime.datetime]:
+        """None if s does not match, strptime then reports the error"""
+        m = self._regex.fullmatch(s)
+        if m is None:
+            return None
+        values = {'year': 1900, 'month': 1, 'day': 1}
+        for field, v in zip(self._fields, m.groups()):
+            values[field] = int(v.ljust(6, '0')) if field == 'microsecond' else int(v)
+        return datetime.datetime(**values)
+
+    def format(self, tm: datetime.datetime) -> str:
+        return self._template.format(tm)
+
+
+@functools.lru_cache(maxsize=64)
+def _compile_format(fmt: str) -> Optional[_CompiledFormat]:
+    try:
+        return _CompiledFormat(fmt)
+    except Exception:
+        return None
+
+
+def _fixed_parser(sep: str, suffix: str, fraction: bool) -> Callable[[str], Optional[datetime.datetime]]:
+    """
+    parser of YYYY-MM-DD?HH:MM:SS[.ffffff][suffix], None when the layout differs or the value is invalid.
+    the layout and the ascii digits are checked here, so fromisoformat never sees what strptime would reject
+    (a utc offset or Z after the fraction), datetime.fromisoformat (c) then does the ranges
+    """
+    end = 19 + len(suffix)
+
+    def parse(s: str) -> Optional[datetime.datetime]:
+        n = len(s)
+        if n < end or s[4] != '-' or s[7] != '-' or s[10] != sep or s[13] != ':' or s[16] != ':':
+            return None
+        if suffix:
+            if not s.endswith(suffix):
+                return None
+            s = s[:-len(suffix)]
+            n -= len(suffix)
+        if fraction:
+            if n < 21 or n > 26 or s[19] != '.':
+                return None
+        elif n != 19:
+            return None
+        digits = s[:4] + s[5:7] + s[8:10] + s[11:13] + s[14:16] + s[17:19] + s[20:n]
+        if not (digits.isascii() and digits.isdigit()):
+            return None
+        try:
+            return datetime.datetime.fromisoformat(s)
+        except ValueError:
+            return None
+
+    return parse
+
+
+_FAST_PARSERS = {
+    Format.SECONDS: _fixed_parser(' ', '', False),
+    Format.MILLISECONDS: _fixed_parser(' ', '', True),
+    Format.SECONDS_RFC3339: _fixed_parser('T', 'Z', False),
+    Format.MILLISECONDS_RFC3339: _fixed_parser('T', 'Z', True),
+}
+
+
+def _parse(s: str, fmt: str) -> datetime.datetime:
+    parser = _FAST_PARSERS.get(fmt)
+    tm = parser(s) if parser is not None else None
+    if tm is None:
+        compiled = _compile_format(fmt)
+        tm = compiled.parse(s) if compiled is not None else None
+    if tm is None:
+        tm = datetime.datetime.strptime(s, fmt)
+    return tm
+
+
+# (isoformat separator, timespec, suffix) producing exactly the fixed formats for naive datetimes
+_FAST_FORMATTERS = {
+    Format.SECONDS: (' ', 'seconds', ''),
+    Format.MILLISECONDS: (' ', 'microseconds', ''),
+    Format.SECONDS_RFC3339: ('T', 'seconds', 'Z'),
+    Format.MILLISECONDS_RFC3339: ('T', 'microseconds', 'Z'),
+}
+
+
+def _format(tm: datetime.datetime, fmt: str) -> str:
+    # platforms disagree on how %Y pads years before 1000, leave those to strftime
+    if tm.year >= 1000:
+        fast = _FAST_FORMATTERS.get(fmt)
+        if fast is not None and tm.tzinfo is None:
+            return tm.isoformat(fast[0], fast[1]) + fast[2]
+        compiled = _compile_format(fmt)
+        if compiled is not None:
+            return compiled.format(tm)
+    return tm.strftime(fmt)
+
+
 def from_string(s: str, fmt: str = Format.SECONDS) -> (datetime.datetime, Exception):
     try:
-        return datetime.datetime.strptime(s, fmt), None
+        return _parse(s, fmt), None
     except Exception as e:
         return None, e
 
@@ -65,7 +217,7 @@ def from_timestamp(ts: int, p: str) -> (datetime.datetime, Exception):
 
 def to_string(tm: datetime.datetime, fmt: str = Format.SECONDS) -> (str, Exception):
     try:
-        return tm.strftime(fmt), None
+        return _format(tm, fmt), None
     except Exception as e:
         return '', e
 
@@ -75,7 +227,9 @@ def to_seconds(tm: datetime.datetime) -> int:
 
 
 def to_milliseconds(tm: datetime.datetime) -> int:
-    return int(tm.timestamp() * 1e3)
+    # whole seconds are exact as float, multiplying the full timestamp by 1e3 is not
+    secs = int(tm.replace(microsecond=0).timestamp())
+    return secs * 1000 + tm.microsecond // 1000
 
 
 def to_timestamp(tm: datetime.datetime, p: str) -> (int, Exception):
@@ -90,6 +244,352 @@ def now() -> datetime.datetime:
     return datetime.datetime.now()
 
 
+# batch conversion
+
+class BatchBackend:
+    NUMPY = 'numpy'
+    PYTHON = 'python'
+
+
+BATCH_BACKEND = BatchBackend.NUMPY if importlib.util.find_spec('numpy') is not None else BatchBackend.PYTHON
+
+
+def _load_numpy() -> bool:
+    global np
+    if np is None and BATCH_BACKEND == BatchBackend.NUMPY:
+        import numpy
+        np = numpy
+    return np is not None
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_DAY_SECONDS = 86400
+# utc offsets only change on quarter-hour boundaries, so one lookup per quarter-hour is exact
+_OFFSET_BUCKET = 900
+# datetime only covers year 1 to 9999
+_MIN_SECONDS = -62135596800
+_MAX_SECONDS = 253402300799
+
+# formats with a fixed layout, (date/time separator, suffix, has fraction)
+_FIXED_FORMATS = {
+    Format.SECONDS: (' ', '', False),
+    Format.MILLISECONDS: (' ', '', True),
+    Format.SECONDS_RFC3339: ('T', 'Z', False),
+    Format.MILLISECONDS_RFC3339: ('T', 'Z', True),
+}
+
+
+def _utc_offset(bucket: int) -> int:
+    """local utc offset in seconds at the utc quarter-hour bucket"""
+    tm = datetime.datetime.fromtimestamp(bucket * _OFFSET_BUCKET, datetime.timezone.utc).astimezone()
+    return int(tm.utcoffset().total_seconds())
+
+
+def _local_offset(bucket: int) -> int:
+    """utc offset in seconds of the naive local quarter-hour bucket, the way datetime.timestamp() sees it"""
+    local = bucket * _OFFSET_BUCKET
+    return local - int((_EPOCH + datetime.timedelta(seconds=local)).timestamp())
+
+
+_BUCKETS_PER_DAY = _DAY_SECONDS // _OFFSET_BUCKET
+
+
+class _OffsetCache:
+    """
+    utc offsets looked up per day, a day where the offset changes (dst) falls back to quarter-hour lookups.
+    offset_of_bucket is _utc_offset for utc seconds or _local_offset for naive local seconds
+    """
+    def __init__(self, offset_of_bucket):
+        self._offset_of_bucket = offset_of_bucket
+        self._days = {}
+        self._buckets = {}
+
+    def day(self, day: int) -> Optional[int]:
+        """offset shared by the whole day, None if it changes during the day"""
+        if day in self._days:
+            return self._days[day]
+        first = self._offset_of_bucket(day * _BUCKETS_PER_DAY)
+        last = self._offset_of_bucket(day * _BUCKETS_PER_DAY + _BUCKETS_PER_DAY - 1)
+        offset = self._days[day] = first if first == last else None
+        return offset
+
+    def get(self, seconds: int) -> int:
+        offset = self.day(seconds // _DAY_SECONDS)
+        if offset is not None:
+            return offset
+        bucket = seconds // _OFFSET_BUCKET
+        offset = self._buckets.get(bucket)
+        if offset is None:
+            offset = self._buckets[bucket] = self._offset_of_bucket(bucket)
+        return offset
+
+
+def _timestamps_to_strings_python(values: Sequence[str], p: str, fmt: str) -> List[Optional[str]]:
+    milli = p == Precision.MILLISECOND
+    fixed = _FIXED_FORMATS.get(fmt)
+    sep, suffix, fraction = fixed if fixed is not None else ('', '', False)
+    offsets = _OffsetCache(_utc_offset)
+    dates, clocks = {}, {}
+    result = []
+    append = result.append
+    for v in values:
+        if not v:
+            append('')
+            continue
+        try:
+            n = int(v)
+            secs, ms = divmod(n, 1000) if milli else (n, 0)
+            local = secs + offsets.get(secs)
+            if fixed is None:
+                append(_format(_EPOCH + datetime.timedelta(seconds=local, milliseconds=ms), fmt))
+                continue
+            day, rem = divmod(local, _DAY_SECONDS)
+            date = dates.get(day)
+            if date is None:
+                date = dates[day] = (_EPOCH + datetime.timedelta(days=day)).strftime('%Y-%m-%d') + sep
+            clock = clocks.get(rem)
+            if clock is None:
+                clock = clocks[rem] = f'{rem // 3600:02d}:{rem // 60 % 60:02d}:{rem % 60:02d}'
+            if fraction:
+                append(f'{date}{clock}.{ms:03d}000{suffix}')
+            else:
+                append(date + clock + suffix)
+        except Exception:
+            append(None)
+    return result
+
+
+def _strings_to_timestamps_python(values: Sequence[str], fmt: str, p: str) -> List[Optional[int]]:
+    milli = p == Precision.MILLISECOND
+    fixed = _FIXED_FORMATS.get(fmt)
+    sep, suffix, fraction = fixed if fixed is not None else ('', '', False)
+    end = -len(suffix) if suffix else None
+    offsets = _OffsetCache(_local_offset)
+    days, clocks = {}, {}
+    result = []
+    append = result.append
+    for s in values:
+        if not s:
+            append(None)
+            continue
+        try:
+            local = None
+            micro = 0
+            # fixed layouts are cut into date/time/fraction, each date and clock is parsed only once
+            if fixed is not None and len(s) >= 19 and s[10] == sep and s.endswith(suffix):
+                day = days.get(s[:10])
+                if day is None:
+                    day = days[s[:10]] = (datetime.datetime.strptime(s[:10], '%Y-%m-%d') - _EPOCH).days
+                clock = clocks.get(s[11:19])
+                if clock is None:
+                    tm = datetime.datetime.strptime(s[11:19], '%H:%M:%S')
+                    clock = clocks[s[11:19]] = tm.hour * 3600 + tm.minute * 60 + tm.second
+                rest = s[19:end]
+                if not fraction and not rest:
+                    local = day * _DAY_SECONDS + clock
+                elif fraction and 2 <= len(rest) <= 7 and rest[0] == '.' and rest[1:].isdigit():
+                    local = day * _DAY_SECONDS + clock
+                    micro = int(rest[1:].ljust(6, '0'))
+            if local is None:
+                tm = _parse(s, fmt)
+                delta = tm - _EPOCH
+                local = delta.days * _DAY_SECONDS + delta.seconds
+                micro = delta.microseconds
+            secs = local - offsets.get(local)
+            append(secs * 1000 + micro // 1000 if milli else secs)
+        except Exception:
+            append(None)
+    return result
+
+
+def _offsets_numpy(seconds, offset_of_bucket):
+    """vectorized _OffsetCache.get"""
+    days, inverse = np.unique(seconds // _DAY_SECONDS, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    cache = _OffsetCache(offset_of_bucket)
+    day_offsets = [cache.day(int(d)) for d in days]
+    mixed_days = np.array([o is None for o in day_offsets])
+    offsets = np.array([o or 0 for o in day_offsets], dtype=np.int64)[inverse]
+    mixed = mixed_days[inverse]
+    if mixed.any():
+        offsets[mixed] = [cache.get(int(t)) for t in seconds[mixed]]
+    return offsets
+
+
+def _civil_from_days(days):
+    """(year, month, day) of days since 1970-01-01, http://howardhinnant.github.io/date_algorithms.html"""
+    z = days + 719468
+    era = z // 146097
+    doe = z - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    d = doy - (153 * mp + 2) // 5 + 1
+    m = np.where(mp < 10, mp + 3, mp - 9)
+    y = yoe + era * 400 + (m <= 2)
+    return y, m, d
+
+
+def _days_from_civil(y, m, d):
+    y = y - (m <= 2)
+    era = y // 400
+    yoe = y - era * 400
+    doy = (153 * ((m + 9) % 12) + 2) // 5 + d - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+# character columns of YYYY-MM-DD?HH:MM:SS.ffffff, (first column, digits)
+_YEAR, _MONTH, _DAY, _HOUR, _MINUTE, _SECOND, _FRACTION = (0, 4), (5, 2), (8, 2), (11, 2), (14, 2), (17, 2), (20, 6)
+
+
+def _put_digits(codes, field, v):
+    col, width = field
+    for i in range(width):
+        codes[:, col + width - 1 - i] = 48 + v // 10 ** i % 10
+
+
+def _get_digits(codes, field):
+    col, width = field
+    digits = codes[:, col:col + width].astype(np.int64) - 48
+    if ((digits < 0) | (digits > 9)).any():
+        raise ValueError('not a digit')
+    return digits @ (10 ** np.arange(width - 1, -1, -1, dtype=np.int64))
+
+
+def _timestamps_to_strings_numpy(values: Sequence[str], p: str, fmt: str) -> List[str]:
+    """only the fixed formats, raises whenever the batch needs per-value handling"""
+    sep, suffix, fraction = _FIXED_FORMATS[fmt]
+    n = np.array(values).astype(np.int64)
+    if p == Precision.MILLISECOND:
+        secs, ms = np.divmod(n, 1000)
+    else:
+        secs, ms = n, None
+    local = secs + _offsets_numpy(secs, _utc_offset)
+    if local.min() < _MIN_SECONDS or local.max() > _MAX_SECONDS:
+        raise ValueError('timestamp out of range')
+
+    # the strings are assembled as a matrix of ucs4 code points, one row per value
+    day, rem = np.divmod(local, _DAY_SECONDS)
+    y, m, d = _civil_from_days(day)
+    width = 19 + (7 if fraction else 0) + len(suffix)
+    codes = np.empty((len(local), width), dtype=np.uint32)
+    _put_digits(codes, _YEAR, y)
+    _put_digits(codes, _MONTH, m)
+    _put_digits(codes, _DAY, d)
+    _put_digits(codes, _HOUR, rem // 3600)
+    _put_digits(codes, _MINUTE, rem // 60 % 60)
+    _put_digits(codes, _SECOND, rem % 60)
+    codes[:, [4, 7]] = ord('-')
+    codes[:, 10] = ord(sep)
+    codes[:, [13, 16]] = ord(':')
+    if fraction:
+        codes[:, 19] = ord('.')
+        _put_digits(codes, _FRACTION, ms * 1000 if ms is not None else np.zeros_like(local))
+    for i, c in enumerate(suffix):
+        codes[:, width - len(suffix) + i] = ord(c)
+    return codes.view(f'U{width}').reshape(-1).tolist()
+
+
+def _strings_to_timestamps_numpy(values: Sequence[str], fmt: str, p: str) -> List[int]:
+    """only the fixed formats with one common layout, raises whenever the batch needs per-value handling"""
+    sep, suffix, fraction = _FIXED_FORMATS[fmt]
+    s = np.array(values)
+    width = s.dtype.itemsize // 4
+    digits = width - 20 - len(suffix) if fraction else 0
+    if fraction and not 1 <= digits <= 6 or not fraction and width != 19 + len(suffix):
+        raise ValueError('unexpected layout')
+    codes = s.view(np.uint32).reshape(-1, width)
+    expected = {4: '-', 7: '-', 10: sep, 13: ':', 16: ':'}
+    if fraction:
+        expected[19] = '.'
+    for i, c in enumerate(suffix):
+        expected[width - len(suffix) + i] = c
+    cols = list(expected.keys())
+    if not (codes[:, cols] == np.array([ord(c) for c in expected.values()], dtype=np.uint32)).all():
+        raise ValueError('unexpected layout')
+
+    y, m, d = _get_digits(codes, _YEAR), _get_digits(codes, _MONTH), _get_digits(codes, _DAY)
+    hh, mm, ss = _get_digits(codes, _HOUR), _get_digits(codes, _MINUTE), _get_digits(codes, _SECOND)
+    day = _days_from_civil(y, m, d)
+    cy, cm, cd = _civil_from_days(day)
+    if not ((y >= 1) & (m >= 1) & (m <= 12) & (cy == y) & (cm == m) & (cd == d)
+            & (hh < 24) & (mm < 60) & (ss < 60)).all():
+        raise ValueError('invalid date or time')
+    local = day * _DAY_SECONDS + hh * 3600 + mm * 60 + ss
+    secs = local - _offsets_numpy(local, _local_offset)
+    if p != Precision.MILLISECOND:
+        return secs.tolist()
+    micro = _get_digits(codes, (20, digits)) * 10 ** (6 - digits)
+    return (secs * 1000 + micro // 1000).tolist()
+
+
+def _is_integer(v: str) -> bool:
+    return v.isdigit() or v[:1] == '-' and v[1:].isdigit()
+
+
+def _convert_batch(values: Sequence[str], numpy_fn, python_fn, accept) -> list:
+    """numpy_fn takes the values passing accept all at once, python_fn the rest or everything numpy_fn rejects"""
+    if not values or not _load_numpy():
+        return python_fn(values)
+    accepted = [accept(v) for v in values]
+    if not any(accepted):
+        return python_fn(values)
+    if all(accepted):
+        try:
+            return numpy_fn(values)
+        except Exception:
+            return python_fn(values)
+    try:
+        converted = iter(numpy_fn([v for v, a in zip(values, accepted) if a]))
+    except Exception:
+        return python_fn(values)
+    rest = iter(python_fn([v for v, a in zip(values, accepted) if not a]))
+    return [next(converted) if a else next(rest) for a in accepted]
+
+
+def timestamps_to_strings(values: Sequence[str],
+                          p: str,
+                          fmt: str = Format.SECONDS,
+                          backend: str = BATCH_BACKEND) -> (List[Optional[str]], Exception):
+    """
+    convert a column of timestamps the same way as from_timestamp + to_string.
+    an empty value stays empty, a value that fails to convert becomes None
+    """
+    if p not in (Precision.SECOND, Precision.MILLISECOND):
+        return [], Exception('unknown precision')
+    if not fmt:
+        return [], Exception('empty format')
+    if backend == BatchBackend.NUMPY and fmt in _FIXED_FORMATS:
+        return _convert_batch(
+            values,
+            lambda vs: _timestamps_to_strings_numpy(vs, p, fmt),
+            lambda vs: _timestamps_to_strings_python(vs, p, fmt),
+            _is_integer
+        ), None
+    return _timestamps_to_strings_python(values, p, fmt), None
+
+
+def strings_to_timestamps(values: Sequence[str],
+                          fmt: str,
+                          p: str,
+                          backend: str = BATCH_BACKEND) -> (List[Optional[int]], Exception):
+    """convert a column of time strings the same way as from_string + to_timestamp, failures become None"""
+    if p not in (Precision.SECOND, Precision.MILLISECOND):
+        return [], Exception('unknown precision')
+    if not fmt:
+        return [], Exception('empty format')
+    if backend == BatchBackend.NUMPY and fmt in _FIXED_FORMATS:
+        # the numpy path needs one common layout, take the length of the first value as the layout
+        width = len(next((v for v in values if v), ''))
+        return _convert_batch(
+            values,
+            lambda vs: _strings_to_timestamps_numpy(vs, fmt, p),
+            lambda vs: _strings_to_timestamps_python(vs, fmt, p),
+            lambda v: len(v) == width
+        ), None
+    return _strings_to_timestamps_python(values, fmt, p), None
+
+
 def _debug():
     s = '2024-08-28 11:22:33.444'
     tm, e = from_string(s, Format.MILLISECONDS)
@@ -104,6 +604,9 @@ def _debug():
     print(msec)
     msec_to_tm, _ = from_milliseconds(msec)
     print(msec_to_tm)
+    strs, e = timestamps_to_strings([str(msec), '', 'x'], Precision.MILLISECOND, Format.MILLISECONDS)
+    print(strs, e)
+    print(strings_to_timestamps(strs[:1], Format.MILLISECONDS, Precision.MILLISECOND))
 
 
 if __name__ == '__main__':
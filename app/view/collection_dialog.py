@@ -0,0 +1,386 @@
+import json
+from typing import Optional, Callable, List, Any, Tuple
+
+from PySide6.QtCore import Qt, Signal, QAbstractTableModel, QModelIndex
+from PySide6.QtGui import QFont
+from PySide6.QtWidgets import QDialog, QFormLayout, QVBoxLayout, QHBoxLayout, QPushButton, QSpinBox, QLabel, \
+    QComboBox, QListWidget, QPlainTextEdit, QLineEdit, QFileDialog, QInputDialog, QMessageBox, QSplitter, \
+    QTableView, QAbstractItemView, QWidget
+
+from app.service.collection import Collection, CollectionItem, CollectionRunSettings, CollectionRunStats, \
+    list_collections, load_collection, save_collection, delete_collection
+from app.service.loadtest import LoadTestStats
+from app.service.request import Request
+from .worker.collection import CollectionRunWorker
+
+
+class CollectionStatsTableModel(QAbstractTableModel):
+    """one row per request of the collection"""
+    _COLUMNS = ['名称', '请求数', '失败', '错误率', '平均', 'p50', 'p90', 'p99', '状态码']
+
+    def __init__(self, parent=None):
+        super(CollectionStatsTableModel, self).__init__(parent)
+        self._rows: List[Tuple[str, LoadTestStats]] = []
+
+    def set_stats(self, stats: Optional[CollectionRunStats]):
+        self.beginResetModel()
+        self._rows = list(stats.items.items()) if stats is not None else []
+        self.endResetModel()
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return len(self._COLUMNS)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        name, stats = self._rows[index.row()]
+        column = index.column()
+        if column == 0:
+            return name
+        if column == 1:
+            return stats.total
+        if column == 2:
+            return stats.failed
+        if column == 3:
+            return f'{stats.error_rate * 100:.2f}%'
+        if column == 4:
+            return f'{stats.histogram.mean() * 1e3:.2f}ms'
+        if column in (5, 6, 7):
+            p = (50, 90, 99)[column - 5]
+            return f'{stats.histogram.percentile(p) * 1e3:.2f}ms'
+        return ', '.join(f'{code}: {n}' for code, n in sorted(stats.status_codes.items()))
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self._COLUMNS[section]
+        return None
+
+
+class CollectionDialog(QDialog):
+    """
+    requests are added from the request tab as they are, {{name}} in url, header values and body are variables.
+    variables come from the data file rows, falling back to the defaults of the collection
+    """
+    load_requested = Signal(object)  # Request
+
+    def __init__(self, current_request: Callable[[], Request], parent=None):
+        super(CollectionDialog, self).__init__(parent)
+        self.setWindowTitle('集合')
+        self.resize(860, 680)
+        self._current_request = current_request
+        self._collection: Optional[Collection] = None
+        self._worker: Optional[CollectionRunWorker] = None
+
+        # collections
+        self._collection_combo_box = QComboBox(self)
+        self._collection_combo_box.currentTextChanged.connect(self._on_collection_changed)
+        self._new_button = QPushButton('新建', self)
+        self._new_button.clicked.connect(self.new_collection)
+        self._delete_button = QPushButton('删除', self)
+        self._delete_button.clicked.connect(self.delete_collection)
+        self._save_button = QPushButton('保存', self)
+        self._save_button.clicked.connect(self.save_collection)
+        collection_layout = QHBoxLayout()
+        collection_layout.addWidget(QLabel('集合：', self))
+        collection_layout.addWidget(self._collection_combo_box, 1)
+        collection_layout.addWidget(self._new_button)
+        collection_layout.addWidget(self._delete_button)
+        collection_layout.addWidget(self._save_button)
+
+        # requests and variables
+        self._item_list_widget = QListWidget(self)
+        self._item_list_widget.itemDoubleClicked.connect(lambda *_: self.load_item())
+        self._add_item_button = QPushButton('添加当前请求', self)
+        self._add_item_button.clicked.connect(self.add_current_request)
+        self._remove_item_button = QPushButton('移除', self)
+        self._remove_item_button.clicked.connect(self.remove_item)
+        self._move_up_button = QPushButton('上移', self)
+        self._move_up_button.clicked.connect(lambda: self.move_item(-1))
+        self._move_down_button = QPushButton('下移', self)
+        self._move_down_button.clicked.connect(lambda: self.move_item(1))
+        self._load_item_button = QPushButton('载入到请求页', self)
+        self._load_item_button.clicked.connect(self.load_item)
+        item_button_layout = QHBoxLayout()
+        for button in (self._add_item_button, self._remove_item_button, self._move_up_button,
+                       self._move_down_button, self._load_item_button):
+            item_button_layout.addWidget(button)
+        item_button_layout.addStretch(1)
+        item_widget = QWidget(self)
+        item_layout = QVBoxLayout(item_widget)
+        item_layout.setContentsMargins(0, 0, 0, 0)
+        item_layout.addWidget(QLabel('请求（按顺序执行）', self))
+        item_layout.addWidget(self._item_list_widget)
+        item_layout.addLayout(item_button_layout)
+
+        font = QFont()
+        font.setFamilies(['Consolas'])
+        self._variables_text_edit = QPlainTextEdit(self)
+        self._variables_text_edit.setFont(font)
+        self._variables_text_edit.setPlaceholderText('{"host": "http://127.0.0.1:8080"}')
+        variables_widget = QWidget(self)
+        variables_layout = QVBoxLayout(variables_widget)
+        variables_layout.setContentsMargins(0, 0, 0, 0)
+        variables_layout.addWidget(QLabel('默认变量（JSON，数据文件的列覆盖同名变量，{{$iteration}}为迭代序号）', self))
+        variables_layout.addWidget(self._variables_text_edit)
+
+        edit_splitter = QSplitter(Qt.Orientation.Horizontal, self)
+        edit_splitter.addWidget(item_widget)
+        edit_splitter.addWidget(variables_widget)
+        edit_splitter.setSizes([500, 360])
+
+        # run
+        self._data_line_edit = QLineEdit(self)
+        self._data_line_edit.setPlaceholderText('CSV（首行为列名）或JSONL，不选则按迭代次数执行')
+        data_button = QPushButton('浏览...', self)
+        data_button.clicked.connect(self.choose_data_file)
+        data_layout = QHBoxLayout()
+        data_layout.addWidget(self._data_line_edit, 1)
+        data_layout.addWidget(data_button)
+        self._output_line_edit = QLineEdit(self)
+        self._output_line_edit.setPlaceholderText('JSONL，每个请求一行，不选则不保存')
+        output_button = QPushButton('浏览...', self)
+        output_button.clicked.connect(self.choose_output_file)
+        output_layout = QHBoxLayout()
+        output_layout.addWidget(self._output_line_edit, 1)
+        output_layout.addWidget(output_button)
+        self._concurrency_spin_box = QSpinBox(self)
+        self._concurrency_spin_box.setRange(1, 256)
+        self._concurrency_spin_box.setValue(4)
+        self._iterations_spin_box = QSpinBox(self)
+        self._iterations_spin_box.setRange(0, 100000000)
+        self._iterations_spin_box.setSpecialValueText('全部数据行')
+
+        form_layout = QFormLayout()
+        form_layout.addRow('数据文件', data_layout)
+        form_layout.addRow('结果文件', output_layout)
+        form_layout.addRow('并发数', self._concurrency_spin_box)
+        form_layout.addRow('迭代次数', self._iterations_spin_box)
+
+        self._start_button = QPushButton('开始', self)
+        self._start_button.clicked.connect(self.start)
+        self._stop_button = QPushButton('停止', self)
+        self._stop_button.setEnabled(False)
+        self._stop_button.clicked.connect(self.stop)
+        action_layout = QHBoxLayout()
+        action_layout.addWidget(self._start_button)
+        action_layout.addWidget(self._stop_button)
+        action_layout.addStretch(1)
+
+        self._summary_label = QLabel(self)
+        self._stats_model = CollectionStatsTableModel(self)
+        self._stats_table_view = QTableView(self)
+        self._stats_table_view.setModel(self._stats_model)
+        self._stats_table_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self._stats_table_view.verticalHeader().setVisible(False)
+        self._stats_table_view.verticalHeader().setDefaultSectionSize(22)
+        self._stats_table_view.horizontalHeader().setStretchLastSection(True)
+        for column, width in enumerate([160, 70, 60, 70, 80, 80, 80, 80]):
+            self._stats_table_view.setColumnWidth(column, width)
+
+        splitter = QSplitter(Qt.Orientation.Vertical, self)
+        splitter.addWidget(edit_splitter)
+        splitter.addWidget(self._stats_table_view)
+        splitter.setSizes([320, 200])
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(collection_layout)
+        layout.addWidget(splitter, 1)
+        layout.addLayout(form_layout)
+        layout.addLayout(action_layout)
+        layout.addWidget(self._summary_label)
+
+        self._reload_collections()
+
+    def _reload_collections(self, current: str = ''):
+        names, err = list_collections()
+        if err is not None:
+            self._summary_label.setText(f'读取集合失败：{err}')
+        self._collection_combo_box.blockSignals(True)
+        self._collection_combo_box.clear()
+        self._collection_combo_box.addItems(names)
+        if current in names:
+            self._collection_combo_box.setCurrentText(current)
+        self._collection_combo_box.blockSignals(False)
+        self._on_collection_changed(self._collection_combo_box.currentText())
+
+    def _on_collection_changed(self, name: str):
+        self._collection = None
+        if name:
+            self._collection, err = load_collection(name)
+            if err is not None:
+                self._summary_label.setText(f'读取集合失败：{err}')
+        self._show_collection()
+
+    def _show_collection(self):
+        collection = self._collection
+        self._item_list_widget.clear()
+        self._variables_text_edit.setPlainText('')
+        self._stats_model.set_stats(None)
+        enabled = collection is not None
+        for widget in (self._delete_button, self._save_button, self._add_item_button, self._remove_item_button,
+                       self._move_up_button, self._move_down_button, self._load_item_button, self._start_button):
+            widget.setEnabled(enabled)
+        if collection is None:
+            return
+        for item in collection.items:
+            self._item_list_widget.addItem(f'{item.name}    {item.method} {item.url}')
+        if collection.variables:
+            self._variables_text_edit.setPlainText(json.dumps(collection.variables, ensure_ascii=False, indent=2))
+
+    def _read_variables(self) -> bool:
+        text = self._variables_text_edit.toPlainText().strip()
+        try:
+            variables = json.loads(text) if text else {}
+            if not isinstance(variables, dict):
+                raise ValueError('variables must be an object')
+        except ValueError as e:
+            QMessageBox.critical(self, '集合', f'默认变量格式错误！错误信息：{e}')
+            return False
+        self._collection.variables = variables
+        return True
+
+    def new_collection(self):
+        name, ok = QInputDialog.getText(self, '新建集合', '名称')
+        name = name.strip()
+        if not ok or not name:
+            return
+        names, _ = list_collections()
+        if name in names:
+            QMessageBox.warning(self, '新建集合', f'集合{name}已存在')
+            return
+        err = save_collection(Collection(name))
+        if err is not None:
+            QMessageBox.critical(self, '新建集合', f'新建集合失败！错误信息：{err}')
+            return
+        self._reload_collections(name)
+
+    def delete_collection(self):
+        if self._collection is None:
+            return
+        name = self._collection.name
+        if QMessageBox.question(self, '删除集合', f'确定删除集合{name}吗？') != QMessageBox.StandardButton.Yes:
+            return
+        err = delete_collection(name)
+        if err is not None:
+            QMessageBox.critical(self, '删除集合', f'删除集合失败！错误信息：{err}')
+        self._reload_collections()
+
+    def save_collection(self) -> bool:
+        if self._collection is None or not self._read_variables():
+            return False
+        err = save_collection(self._collection)
+        if err is not None:
+            QMessageBox.critical(self, '保存集合', f'保存集合失败！错误信息：{err}')
+            return False
+        self._summary_label.setText(f'已保存集合{self._collection.name}')
+        return True
+
+    def add_current_request(self):
+        if self._collection is None:
+            return
+        req = self._current_request()
+        name, ok = QInputDialog.getText(self, '添加当前请求', '名称', text=f'请求{len(self._collection.items) + 1}')
+        if not ok:
+            return
+        self._collection.items.append(CollectionItem.from_request(name.strip(), req))
+        self._show_items(len(self._collection.items) - 1)
+
+    def _show_items(self, current_row: int):
+        """variables being edited are kept"""
+        text = self._variables_text_edit.toPlainText()
+        self._show_collection()
+        self._variables_text_edit.setPlainText(text)
+        self._item_list_widget.setCurrentRow(current_row)
+
+    def remove_item(self):
+        row = self._item_list_widget.currentRow()
+        if self._collection is None or row < 0:
+            return
+        del self._collection.items[row]
+        self._show_items(min(row, len(self._collection.items) - 1))
+
+    def move_item(self, offset: int):
+        row = self._item_list_widget.currentRow()
+        if self._collection is None or row < 0 or not 0 <= row + offset < len(self._collection.items):
+            return
+        items = self._collection.items
+        items[row], items[row + offset] = items[row + offset], items[row]
+        self._show_items(row + offset)
+
+    def load_item(self):
+        row = self._item_list_widget.currentRow()
+        if self._collection is None or row < 0:
+            return
+        self.load_requested.emit(self._collection.items[row].to_request())
+
+    def choose_data_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, '数据文件', '', 'CSV/JSONL (*.csv *.jsonl *.ndjson);;所有文件 (*)')
+        if path:
+            self._data_line_edit.setText(path)
+
+    def choose_output_file(self):
+        path, _ = QFileDialog.getSaveFileName(self, '结果文件', 'result.jsonl', 'JSONL (*.jsonl)')
+        if path:
+            self._output_line_edit.setText(path)
+
+    def _settings(self) -> CollectionRunSettings:
+        return CollectionRunSettings(
+            data_path=self._data_line_edit.text().strip(),
+            output_path=self._output_line_edit.text().strip(),
+            concurrency=self._concurrency_spin_box.value(),
+            iterations=self._iterations_spin_box.value(),
+        )
+
+    def start(self):
+        if self._collection is None or (self._worker is not None and self._worker.is_running()):
+            return
+        if not self.save_collection():
+            return
+        settings = self._settings()
+        err = settings.validate()
+        if err is None and not self._collection.items:
+            err = ValueError('集合中没有请求')
+        if err is not None:
+            self._summary_label.setText(f'参数错误：{err}')
+            return
+        self._worker = CollectionRunWorker(self._collection, settings, parent=self)
+        self._worker.signals.progress.connect(self.on_progress)
+        self._worker.signals.finish.connect(self.on_finish)
+        self._set_running(True)
+        self._summary_label.setText('执行中')
+        self._worker.start()
+
+    def stop(self):
+        if self._worker is not None:
+            self._worker.stop()
+
+    def _set_running(self, running: bool):
+        self._start_button.setEnabled(not running)
+        self._stop_button.setEnabled(running)
+        self._collection_combo_box.setEnabled(not running)
+
+    def _show_stats(self, stats: CollectionRunStats):
+        total = sum(s.total for s in stats.items.values())
+        failed = sum(s.failed for s in stats.items.values())
+        throughput = stats.iterations / stats.elapsed if stats.elapsed > 0 else 0.0
+        self._summary_label.setText(
+            f'迭代：{stats.iterations}  请求数：{total}  失败：{failed}  用时：{stats.elapsed:.2f}s  '
+            f'迭代速率：{throughput:.1f}/s'
+        )
+        self._stats_model.set_stats(stats)
+
+    def on_progress(self, stats: CollectionRunStats):
+        self._show_stats(stats)
+
+    def on_finish(self, stats: CollectionRunStats, err: Optional[Exception]):
+        self._set_running(False)
+        self._show_stats(stats)
+        if err is not None:
+            self._summary_label.setText(f'{self._summary_label.text()}  执行失败：{err}')
+
+    def closeEvent(self, event):
+        self.stop()
+        event.accept()
@@ -1,16 +1,35 @@
 from PySide6 import QtCore, QtGui, QtWidgets
-from PySide6.QtCore import QPoint, QTimer, QTime, Qt
-from PySide6.QtGui import QGuiApplication, QPainter, QPalette, QPolygon
+from PySide6.QtCore import QPoint, QTimer, QTime, Qt, QEvent
+from PySide6.QtGui import QGuiApplication, QPainter, QPalette, QPolygon, QPixmap, QAction
+
+from app.service import perf
+from ..tick import get_tick_service
+
+_SMOOTH_FPS = 30
+
 
 class AnalogClock(QtWidgets.QWidget):
-    """https://doc.qt.io/qtforpython-6/examples/example_gui_analogclock.html"""
+    """
+    https://doc.qt.io/qtforpython-6/examples/example_gui_analogclock.html
+    the dial never changes between frames, it is rendered once into a pixmap and only the hands are painted
+    """
 
     def __init__(self, parent=None):
         super(AnalogClock, self).__init__(parent)
 
-        self._timer = QtCore.QTimer(self)
-        self._timer.timeout.connect(self.update)
-        self._timer.start(1000)
+        tick_service = get_tick_service()
+        tick_service.second.connect(self._on_tick)
+        tick_service.watch(self)
+
+        # smooth seconds hand, repaints at _SMOOTH_FPS while visible
+        self._smooth_timer = QTimer(self)
+        self._smooth_timer.setInterval(1000 // _SMOOTH_FPS)
+        self._smooth_timer.timeout.connect(self._on_frame)
+        self._smooth_action = QAction('平滑秒针', self)
+        self._smooth_action.setCheckable(True)
+        self._smooth_action.toggled.connect(self.set_smooth_seconds)
+        self.addAction(self._smooth_action)
+        self.setContextMenuPolicy(Qt.ContextMenuPolicy.ActionsContextMenu)
 
         self._hour_hand = QPolygon([
             QPoint(4, 14),
@@ -31,58 +50,134 @@ class AnalogClock(QtWidgets.QWidget):
             QPoint(1, -90)
         ])
 
+        self._dial = QPixmap()
+        self._load_colors()
+
+    def _load_colors(self):
         palette = qApp.palette()  # noqa: F821
         self._background_color = palette.color(QPalette.ColorRole.Base)
         self._hour_color = palette.color(QPalette.ColorRole.Text)
         self._minute_color = palette.color(QPalette.ColorRole.Text)
         self._seconds_color = palette.color(QPalette.ColorRole.Accent)
 
-    def paintEvent(self, event):
-        width = self.width()
-        height = self.height()
-        side = min(width, height)
-
-        with QPainter(self) as painter:
-            painter.fillRect(0, 0, width, height, self._background_color)
-            painter.setRenderHint(QPainter.Antialiasing)
-            painter.translate(width / 2, height / 2)
-            painter.scale(side / 200.0, side / 200.0)
-
-            time = QTime.currentTime()
-
-            painter.setPen(Qt.NoPen)
-            painter.setBrush(self._hour_color)
-
+    def smooth_seconds(self) -> bool:
+        return self._smooth_action.isChecked()
+
+    def set_smooth_seconds(self, enabled: bool):
+        if self._smooth_action.isChecked() != enabled:
+            self._smooth_action.setChecked(enabled)  # toggled calls back here
+            return
+        if enabled and self.isVisible():
+            self._smooth_timer.start()
+        else:
+            self._smooth_timer.stop()
+        self.update()
+
+    def _on_tick(self, _):
+        if self.smooth_seconds() and not self._smooth_timer.isActive():
+            self._smooth_timer.start()  # ticks resume when the window is restored
+        self.update()
+
+    def _on_frame(self):
+        if self.window().isMinimized():
+            self._smooth_timer.stop()
+            return
+        self.update()
+
+    def showEvent(self, event):
+        super(AnalogClock, self).showEvent(event)
+        if self.smooth_seconds():
+            self._smooth_timer.start()
+
+    def hideEvent(self, event):
+        super(AnalogClock, self).hideEvent(event)
+        self._smooth_timer.stop()
+
+    def resizeEvent(self, event):
+        super(AnalogClock, self).resizeEvent(event)
+        self._dial = QPixmap()
+
+    def changeEvent(self, event):
+        super(AnalogClock, self).changeEvent(event)
+        if event.type() in (QEvent.Type.PaletteChange, QEvent.Type.ApplicationPaletteChange,
+                            QEvent.Type.StyleChange):
+            self._load_colors()
+            self._dial = QPixmap()
+            self.update()
+
+    def _transform(self, painter: QPainter):
+        side = min(self.width(), self.height())
+        painter.translate(self.width() / 2, self.height() / 2)
+        painter.scale(side / 200.0, side / 200.0)
+
+    def _paint_dial(self, painter: QPainter):
+        painter.fillRect(0, 0, self.width(), self.height(), self._background_color)
+        painter.setRenderHint(QPainter.Antialiasing)
+        self._transform(painter)
+
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(self._hour_color)
+        for _ in range(0, 12):
+            painter.drawRect(73, -3, 16, 6)
+            painter.rotate(30.0)
+
+        painter.setPen(self._minute_color)
+        for _ in range(0, 60):
+            painter.drawLine(92, 0, 96, 0)
+            painter.rotate(6.0)
+
+    def _dial_pixmap(self) -> QPixmap:
+        """rendered at device pixels, moving to a screen of another scale factor renders it again"""
+        ratio = self.devicePixelRatioF()
+        if self._dial.isNull() or self._dial.devicePixelRatio() != ratio:
+            self._dial = QPixmap(round(self.width() * ratio), round(self.height() * ratio))
+            self._dial.setDevicePixelRatio(ratio)
+            with QPainter(self._dial) as painter:
+                self._paint_dial(painter)
+        return self._dial
+
+    def _paint_hands(self, painter: QPainter, time: QTime):
+        painter.setRenderHint(QPainter.Antialiasing)
+        self._transform(painter)
+        painter.setPen(Qt.NoPen)
+
+        painter.setBrush(self._hour_color)
+        painter.save()
+        painter.rotate(30.0 * ((time.hour() + time.minute() / 60.0)))
+        painter.drawConvexPolygon(self._hour_hand)
+        painter.restore()
+
+        painter.setBrush(self._minute_color)
+        painter.save()
+        painter.rotate(6.0 * time.minute())
+        painter.drawConvexPolygon(self._minute_hand)
+        painter.restore()
+
+        seconds = time.second()
+        if self.smooth_seconds():
+            seconds += time.msec() / 1000.0
+        painter.setBrush(self._seconds_color)
+        painter.save()
+        painter.rotate(6.0 * seconds)
+        painter.drawConvexPolygon(self._seconds_hand)
+        painter.drawEllipse(-3, -3, 6, 6)
+        painter.drawEllipse(-5, -68, 10, 10)
+        painter.restore()
+
+    def paint(self, painter: QPainter, time: QTime, cached: bool = True):
+        """cached=False draws the dial directly as well, for comparison in etc/script/bench_clock.py"""
+        if cached:
+            painter.drawPixmap(0, 0, self._dial_pixmap())
+        else:
             painter.save()
-            painter.rotate(30.0 * ((time.hour() + time.minute() / 60.0)))
-            painter.drawConvexPolygon(self._hour_hand)
+            self._paint_dial(painter)
             painter.restore()
+        self._paint_hands(painter, time)
 
-            for _ in range(0, 12):
-                painter.drawRect(73, -3, 16, 6)
-                painter.rotate(30.0)
-
-            painter.setBrush(self._minute_color)
-
-            painter.save()
-            painter.rotate(6.0 * time.minute())
-            painter.drawConvexPolygon(self._minute_hand)
-            painter.restore()
-
-            painter.setBrush(self._seconds_color)
-
-            painter.save()
-            painter.rotate(6.0 * time.second())
-            painter.drawConvexPolygon(self._seconds_hand)
-            painter.drawEllipse(-3, -3, 6, 6)
-            painter.drawEllipse(-5, -68, 10, 10)
-            painter.restore()
-
-            painter.setPen(self._minute_color)
-
-            for _ in range(0, 60):
-                painter.drawLine(92, 0, 96, 0)
-                painter.rotate(6.0)
+    @perf.traced('paint.analog_clock', perf.SpanCategory.PAINT)
+    def paintEvent(self, event):
+        with QPainter(self) as painter:
+            self.paint(painter, QTime.currentTime())
 
 
 if __name__ == '__main__':
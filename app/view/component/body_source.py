@@ -0,0 +1,141 @@
+import os
+
+from PySide6.QtCore import Signal
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QComboBox, QCheckBox, QLineEdit, QPushButton, \
+    QLabel, QTableWidget, QTableWidgetItem, QFileDialog
+
+from app import util
+from app.service.body import BodySource, BodyKind, FormPart
+
+
+class BodySourceEditor(QWidget):
+    """
+    source of the request body above the text edit of the body tab, the text edit is only used for inline text.
+    in the form table, a value starting with @ is the path of a file to upload, as in curl -F
+    """
+    kind_changed = Signal(str)
+
+    _FORM_COLUMNS = ['名称', '值（@开头为文件路径）']
+
+    def __init__(self, parent=None):
+        super(BodySourceEditor, self).__init__(parent)
+
+        self._kind_combo_box = QComboBox(self)
+        self._kind_combo_box.addItem('文本', BodyKind.TEXT)
+        self._kind_combo_box.addItem('文件', BodyKind.FILE)
+        self._kind_combo_box.addItem('表单（multipart）', BodyKind.MULTIPART)
+        self._kind_combo_box.currentIndexChanged.connect(self._on_kind_changed)
+        self._chunked_check_box = QCheckBox('分块传输（chunked）', self)
+        self._chunked_check_box.setToolTip('以Transfer-Encoding: chunked发送，不设置Content-Length')
+        kind_layout = QHBoxLayout()
+        kind_layout.setContentsMargins(0, 0, 0, 0)
+        kind_layout.addWidget(QLabel('类型', self))
+        kind_layout.addWidget(self._kind_combo_box)
+        kind_layout.addWidget(self._chunked_check_box)
+        kind_layout.addStretch(1)
+
+        # file
+        self._file_widget = QWidget(self)
+        self._file_line_edit = QLineEdit(self._file_widget)
+        self._file_line_edit.setPlaceholderText('发送时从磁盘逐块读取，不会载入内存')
+        self._file_line_edit.textChanged.connect(self._update_file_size)
+        file_button = QPushButton('浏览...', self._file_widget)
+        file_button.clicked.connect(self._choose_file)
+        self._file_size_label = QLabel(self._file_widget)
+        file_layout = QHBoxLayout(self._file_widget)
+        file_layout.setContentsMargins(0, 0, 0, 0)
+        file_layout.addWidget(self._file_line_edit, 1)
+        file_layout.addWidget(self._file_size_label)
+        file_layout.addWidget(file_button)
+
+        # multipart
+        self._form_widget = QWidget(self)
+        self._form_table = QTableWidget(0, len(self._FORM_COLUMNS), self._form_widget)
+        self._form_table.setHorizontalHeaderLabels(self._FORM_COLUMNS)
+        self._form_table.verticalHeader().setVisible(False)
+        self._form_table.horizontalHeader().setStretchLastSection(True)
+        self._form_table.setColumnWidth(0, 160)
+        add_field_button = QPushButton('添加字段', self._form_widget)
+        add_field_button.clicked.connect(lambda: self._add_form_row('', ''))
+        add_file_button = QPushButton('添加文件...', self._form_widget)
+        add_file_button.clicked.connect(self._add_form_file)
+        remove_button = QPushButton('删除', self._form_widget)
+        remove_button.clicked.connect(self._remove_form_row)
+        form_action_layout = QHBoxLayout()
+        form_action_layout.setContentsMargins(0, 0, 0, 0)
+        form_action_layout.addWidget(add_field_button)
+        form_action_layout.addWidget(add_file_button)
+        form_action_layout.addWidget(remove_button)
+        form_action_layout.addStretch(1)
+        form_layout = QVBoxLayout(self._form_widget)
+        form_layout.setContentsMargins(0, 0, 0, 0)
+        form_layout.addLayout(form_action_layout)
+        form_layout.addWidget(self._form_table)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(kind_layout)
+        layout.addWidget(self._file_widget)
+        layout.addWidget(self._form_widget)
+        self._on_kind_changed()
+
+    def kind(self) -> str:
+        return self._kind_combo_box.currentData()
+
+    def _on_kind_changed(self, *_):
+        kind = self.kind()
+        self._file_widget.setVisible(kind == BodyKind.FILE)
+        self._form_widget.setVisible(kind == BodyKind.MULTIPART)
+        self.kind_changed.emit(kind)
+
+    def _choose_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, '选择文件')
+        if path:
+            self._file_line_edit.setText(path)
+
+    def _update_file_size(self, path: str):
+        self._file_size_label.setText(util.format_bytes(os.path.getsize(path)) if os.path.isfile(path) else '')
+
+    def _add_form_row(self, name: str, value: str):
+        r = self._form_table.rowCount()
+        self._form_table.setRowCount(r + 1)
+        self._form_table.setItem(r, 0, QTableWidgetItem(name))
+        self._form_table.setItem(r, 1, QTableWidgetItem(value))
+
+    def _add_form_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, '选择文件')
+        if path:
+            self._add_form_row('file', f'@{path}')
+
+    def _remove_form_row(self):
+        row = self._form_table.currentRow()
+        if row >= 0:
+            self._form_table.removeRow(row)
+
+    def source(self) -> BodySource:
+        parts = []
+        for r in range(self._form_table.rowCount()):
+            name_item, value_item = self._form_table.item(r, 0), self._form_table.item(r, 1)
+            name = name_item.text().strip() if name_item is not None else ''
+            value = value_item.text() if value_item is not None else ''
+            if not name:
+                continue
+            if value.startswith('@'):
+                parts.append(FormPart(name, file_path=value[1:].strip()))
+            else:
+                parts.append(FormPart(name, value))
+        return BodySource(
+            kind=self.kind(),
+            file_path=self._file_line_edit.text().strip(),
+            parts=parts,
+            chunked=self._chunked_check_box.isChecked(),
+        )
+
+    def set_source(self, source: BodySource):
+        index = self._kind_combo_box.findData(source.kind)
+        self._kind_combo_box.setCurrentIndex(max(index, 0))
+        self._chunked_check_box.setChecked(source.chunked)
+        self._file_line_edit.setText(source.file_path)
+        self._form_table.setRowCount(0)
+        for part in source.parts:
+            self._add_form_row(part.name, f'@{part.file_path}' if part.is_file else part.value)
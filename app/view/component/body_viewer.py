@@ -0,0 +1,345 @@
+import json
+import mmap
+from typing import Optional
+
+from PySide6.QtCore import Signal, QTimer
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QComboBox, QLabel, QStackedWidget, QTreeView, \
+    QLineEdit
+
+from app import util
+from app.util.json_stream import JsonIndex, JsonSyntaxError, from_decode_error
+from .json_tree import JsonTreeModel, LazyJsonTreeModel
+from .text_viewer import TextBuffer, TextViewer
+from ..worker.convert import ConvertWorker, ConvertType, ConvertFinishEvent
+from ..worker.json_index import JsonIndexWorker, JsonIndexFinishEvent
+from ..worker.query import QueryWorker, QueryPhase, QueryProgressEvent, QueryFinishEvent, clear_documents
+
+
+_TREE_SYNC_INTERVAL = 200
+
+
+def _syntax_error_text(err: Exception) -> str:
+    if isinstance(err, JsonSyntaxError):
+        return f'不是合法的JSON：第 {err.offset} 字节，{err.msg}'
+    return f'不是合法的JSON：{err}'
+
+
+class BodyViewMode:
+    TEXT = 'text'
+    TREE = 'tree'
+    QUERY = 'query'
+
+
+class BodyViewer(QWidget):
+    """
+    response body as virtualized text or as a lazily expanded json tree.
+    json bodies are pretty printed at background thread, a body spilled to disk is memory-mapped.
+    the viewer keeps no copy of the body besides the bytes shown, the tree and the query read those or the file.
+    the tree is built by the incremental parser, from the index the request worker fed while downloading
+    when there is one, so the top level shows up before the body is complete.
+    the query box runs JSONPath or jq against the body at background thread, results show up as a tree of their own
+    """
+    formatted = Signal(float)  # seconds spent pretty printing the body
+
+    def __init__(self, parent=None):
+        super(BodyViewer, self).__init__(parent)
+        self._loaded = False  # the whole body is set, not only streamed
+        self._formatted = False  # the text shown is pretty printed rather than the body as received
+        self._file = ''
+        self._generation = 0
+        self._format_worker: Optional[ConvertWorker] = None
+        self._tree_worker: Optional[JsonIndexWorker] = None
+        self._json_index: Optional[JsonIndex] = None
+        self._source_map: Optional[mmap.mmap] = None  # the tree source of a body spilled to disk
+        self._tree_sync_timer = QTimer(self)
+        self._tree_sync_timer.setInterval(_TREE_SYNC_INTERVAL)
+        self._tree_sync_timer.timeout.connect(self._sync_tree)
+        self._query_worker: Optional[QueryWorker] = None
+
+        self._mode_combo_box = QComboBox(self)
+        self._mode_combo_box.addItem('文本', BodyViewMode.TEXT)
+        self._mode_combo_box.addItem('树', BodyViewMode.TREE)
+        self._mode_combo_box.addItem('查询结果', BodyViewMode.QUERY)
+        self._mode_combo_box.currentIndexChanged.connect(self._on_mode_changed)
+        self._query_line_edit = QLineEdit(self)
+        self._query_line_edit.setPlaceholderText('查询：$.items[*].id 或 .items[] | .id，回车执行')
+        self._query_line_edit.setClearButtonEnabled(True)
+        self._query_line_edit.returnPressed.connect(self.run_query)
+        self._status_label = QLabel(self)
+
+        self.text_viewer = TextViewer(self)
+        self.tree_view = QTreeView(self)
+        self.tree_view.setUniformRowHeights(True)
+        self.tree_view.setColumnWidth(0, 240)
+        self.query_view = QTreeView(self)
+        self.query_view.setUniformRowHeights(True)
+        self.query_view.setColumnWidth(0, 240)
+        self._stack = QStackedWidget(self)
+        self._stack.addWidget(self.text_viewer)
+        self._stack.addWidget(self.tree_view)
+        self._stack.addWidget(self.query_view)
+
+        action_layout = QHBoxLayout()
+        action_layout.setContentsMargins(0, 0, 0, 0)
+        action_layout.addWidget(self._mode_combo_box)
+        action_layout.addWidget(self._query_line_edit, 1)
+        action_layout.addWidget(self._status_label, 1)
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(action_layout)
+        layout.addWidget(self._stack)
+
+    def mode(self) -> str:
+        return self._mode_combo_box.currentData()
+
+    def setFont(self, font):
+        super(BodyViewer, self).setFont(font)
+        self.text_viewer.setFont(font)
+
+    def setPlaceholderText(self, text: str):
+        self.text_viewer.setPlaceholderText(text)
+
+    def _reset(self, keep_tree: bool = False):
+        """keep_tree keeps the tree built while the body was streamed, along with what the user expanded"""
+        self._generation += 1
+        if self._format_worker is not None:
+            self._format_worker.cancel()
+        self._format_worker = None
+        self._clear_query()
+        clear_documents()
+        self._loaded = False
+        self._formatted = False
+        self._file = ''
+        self._status_label.clear()
+        if not keep_tree:
+            self._clear_tree()
+
+    def _clear_tree(self):
+        if self._tree_worker is not None:
+            self._tree_worker.cancel()
+        self._tree_worker = None
+        self._tree_sync_timer.stop()
+        self._json_index = None
+        old_model = self.tree_view.model()
+        self.tree_view.setModel(None)
+        if old_model is not None:
+            old_model.close()
+            old_model.deleteLater()
+        if self._source_map is not None:
+            self._source_map.close()
+            self._source_map = None
+
+    def clear(self):
+        self._reset()
+        self.text_viewer.clear()
+
+    def append_text(self, text: str):
+        """streamed body, shown as it is"""
+        self.text_viewer.append_text(text)
+
+    def set_stream_index(self, index: JsonIndex):
+        """the index the request worker is feeding with the body being streamed"""
+        if index is self._json_index:
+            return
+        self._clear_tree()
+        self._json_index = index
+        if self.mode() == BodyViewMode.TREE:
+            self._show_tree()
+
+    def set_text(self, text: str, note: str = '', json_index: Optional[JsonIndex] = None):
+        self._reset(keep_tree=json_index is not None and json_index is self._json_index)
+        self._json_index = json_index
+        self._loaded = True
+        self.text_viewer.setPlainText(text)
+        self._status_label.setText(note)
+        if text[:64].lstrip()[:1] in ('{', '['):
+            # the text is the one the response holds, the worker drops it when done
+            self._format_worker = self._start_worker(ConvertType.JSON_FORMAT, text, 2, self._on_format_finish)
+        if self.mode() == BodyViewMode.TREE:
+            self._load_tree()
+        elif self.mode() == BodyViewMode.QUERY:
+            self.run_query()
+
+    def set_file(self, path: str, note: str = '', json_index: Optional[JsonIndex] = None) -> Optional[Exception]:
+        """map the file instead of reading it, only the visible lines are ever decoded"""
+        self._reset(keep_tree=json_index is not None and json_index is self._json_index)
+        buffer, err = TextBuffer.from_file(path)
+        if err is not None:
+            self._reset()
+            self.text_viewer.clear()
+            return err
+        self._json_index = json_index
+        self._loaded = True
+        self._file = path
+        self.text_viewer.set_buffer(buffer)
+        self._status_label.setText(note)
+        if self.mode() == BodyViewMode.TREE:
+            self._load_tree()
+        elif self.mode() == BodyViewMode.QUERY:
+            self.run_query()
+        return None
+
+    def _start_worker(self, convert_type: str, content: str, indent: Optional[int], slot) -> ConvertWorker:
+        generation = self._generation
+        worker = ConvertWorker(convert_type, content, indent)
+        worker.signals.finish.connect(lambda evt: slot(evt) if generation == self._generation else None)
+        worker.start()
+        return worker
+
+    def _on_format_finish(self, evt: ConvertFinishEvent):
+        self._format_worker = None
+        if evt.cancelled:
+            return
+        if evt.err is not None:
+            err = from_decode_error(evt.err) if isinstance(evt.err, json.JSONDecodeError) else evt.err
+            self._status_label.setText(_syntax_error_text(err))
+            return
+        model = self.tree_view.model()
+        if model is None or model.source() is None:
+            # the streamed index points into the body as received, the tree is built from the pretty text instead
+            self._clear_tree()
+        self._formatted = True
+        self.text_viewer.set_buffer(TextBuffer.from_text(evt.result))
+        self.formatted.emit(evt.seconds)
+
+    def _show_tree(self):
+        model = self.tree_view.model()
+        if model is None:
+            model = LazyJsonTreeModel(self._json_index, self.tree_view)
+            self.tree_view.setModel(model)
+        self._sync_tree()
+        if not self._json_index.done:
+            self._tree_sync_timer.start()
+
+    def _tree_source(self):
+        """the bytes shown, or the mapped file, a tree built before pretty printing keeps the body as received"""
+        if not self._file:
+            return self.text_viewer.buffer().data()
+        if self._source_map is None:
+            try:
+                with open(self._file, 'rb') as f:
+                    self._source_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                return b''
+        return self._source_map
+
+    def _load_tree(self):
+        model = self.tree_view.model()
+        if self._tree_worker is not None or (model is not None and model.source() is not None):
+            return
+        source = self._tree_source()
+        if not source:
+            return
+        index = self._json_index
+        # the streamed index only matches a text body that encodes back to the bytes received
+        if index is None or (not self._file and (self._formatted or not index.done or index.position != len(source))):
+            if model is not None:
+                self._clear_tree()
+                source = self._tree_source()
+            index = self._json_index = JsonIndex()
+        self._show_tree()
+        self.tree_view.model().set_source(source)
+        if index.done:
+            # complete by the time the download was
+            self._tree_sync_timer.stop()
+            self._sync_tree()
+            return
+        generation = self._generation
+        self._status_label.setText('解析中...')
+        self._tree_worker = JsonIndexWorker(source, index=index)
+        self._tree_worker.signals.finish.connect(
+            lambda evt: self._on_tree_finish(evt) if generation == self._generation else None)
+        self._tree_worker.start()
+
+    def _sync_tree(self):
+        model = self.tree_view.model()
+        if model is None:
+            return
+        expand = model.rowCount() == 0
+        model.sync()
+        if expand and model.rowCount() > 0:
+            self.tree_view.expandToDepth(0)
+        index = self._json_index
+        if index.err is not None:
+            self._status_label.setText(_syntax_error_text(index.err))
+        elif self._tree_worker is not None:
+            source = model.source()
+            total = util.format_bytes(len(source)) if source is not None else '?'
+            self._status_label.setText(f'解析中... {util.format_bytes(index.position)}/{total}')
+        if index.done:
+            self._tree_sync_timer.stop()
+
+    def _on_tree_finish(self, evt: JsonIndexFinishEvent):
+        self._tree_worker = None
+        if evt.cancelled:
+            return
+        self._tree_sync_timer.stop()
+        self._sync_tree()
+        err = evt.err or self._json_index.err
+        if err is not None:
+            self._status_label.setText(_syntax_error_text(err))
+            return
+        self._status_label.setText(f'解析用时：{evt.seconds:.3f}s')
+
+    def run_query(self):
+        expression = self._query_line_edit.text().strip()
+        if not expression or not self._loaded:
+            return
+        self._clear_query()
+        generation = self._generation
+        data = self.text_viewer.buffer().data() if not self._file else b''
+        self._query_worker = QueryWorker(expression, data, self._file)
+        self._query_worker.signals.progress.connect(
+            lambda evt: self._on_query_progress(evt) if generation == self._generation else None)
+        self._query_worker.signals.finish.connect(
+            lambda evt: self._on_query_finish(evt) if generation == self._generation else None)
+        self._mode_combo_box.setCurrentIndex(self._mode_combo_box.findData(BodyViewMode.QUERY))
+        self._status_label.setText('查询中...')
+        self._query_worker.start()
+
+    def _clear_query(self):
+        if self._query_worker is not None:
+            self._query_worker.cancel()
+        self._query_worker = None
+        old_model = self.query_view.model()
+        self.query_view.setModel(None)
+        if old_model is not None:
+            old_model.deleteLater()
+
+    def _on_query_progress(self, evt: QueryProgressEvent):
+        if evt.phase == QueryPhase.PARSE:
+            self._status_label.setText('查询中... 解析Body')
+        else:
+            self._status_label.setText(f'查询中... 已找到 {evt.count} 个结果')
+
+    def _on_query_finish(self, evt: QueryFinishEvent):
+        self._query_worker = None
+        if evt.cancelled:
+            return
+        if evt.err is not None and evt.phase == QueryPhase.PARSE:
+            err = from_decode_error(evt.err) if isinstance(evt.err, json.JSONDecodeError) else evt.err
+            self._status_label.setText(_syntax_error_text(err))
+            return
+        self.query_view.setModel(JsonTreeModel(evt.results, self.query_view))
+        self.query_view.expandToDepth(0)
+        status = f'{evt.count} 个结果'
+        if evt.truncated:
+            status += f'（仅展示前 {len(evt.results)} 个）'
+        status += f'，用时：{evt.seconds:.3f}s'
+        if evt.err is not None:
+            status = f'查询失败：{evt.err}；' + status
+        self._status_label.setText(status)
+
+    def _on_mode_changed(self, _):
+        mode = self.mode()
+        if mode == BodyViewMode.TREE:
+            self._stack.setCurrentWidget(self.tree_view)
+            if self._loaded:
+                self._load_tree()
+            elif self._json_index is not None:
+                self._show_tree()
+        elif mode == BodyViewMode.QUERY:
+            self._stack.setCurrentWidget(self.query_view)
+        else:
+            self._stack.setCurrentWidget(self.text_viewer)
@@ -2,9 +2,11 @@
 # SPDX-License-Identifier: LicenseRef-Qt-Commercial OR BSD-3-Clause
 import sys
 
-from PySide6.QtCore import QTime, QTimer, Slot
+from PySide6.QtCore import QTime, Slot
 from PySide6.QtWidgets import QApplication, QLCDNumber
 
+from ..tick import get_tick_service
+
 
 class DigitalClock(QLCDNumber):
     def __init__(self, parent=None):
@@ -12,14 +14,14 @@ class DigitalClock(QLCDNumber):
         self.setSegmentStyle(QLCDNumber.Flat)
         self.setDigitCount(8)
 
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.show_time)
-        self.timer.start(1000)
+        tick_service = get_tick_service()
+        tick_service.second.connect(self.show_time)
+        tick_service.watch(self)
 
         self.show_time()
 
     @Slot()
-    def show_time(self):
+    def show_time(self, *_):
         time = QTime.currentTime()
         text = time.toString("hh:mm:ss")
 
@@ -0,0 +1,322 @@
+import json
+from typing import Any, Dict, Optional, List, Union
+
+from PySide6.QtCore import Qt, QAbstractItemModel, QModelIndex
+
+from app.util.json_stream import JsonIndex, JsonKind, LazyNode, index_children
+from ..worker.json_index import JsonIndexWorker, JsonIndexFinishEvent
+
+
+_FETCH_BATCH = 1000
+_MAX_PREVIEW = 200
+
+
+class _JsonNode:
+    """one value of the json document, children are created the first time they are asked for"""
+    __slots__ = ('key', 'value', 'parent', 'row', 'fetched', '_keys', '_children')
+
+    def __init__(self, key: str, value: Any, parent: Optional['_JsonNode'], row: int):
+        self.key = key
+        self.value = value
+        self.parent = parent
+        self.row = row
+        self.fetched = 0  # number of children exposed to the view so far
+        self._keys = None
+        self._children: Dict[int, _JsonNode] = {}
+
+    @property
+    def total(self) -> int:
+        if isinstance(self.value, (dict, list)):
+            return len(self.value)
+        return 0
+
+    def child(self, row: int) -> '_JsonNode':
+        node = self._children.get(row)
+        if node is None:
+            if isinstance(self.value, dict):
+                if self._keys is None:
+                    self._keys = list(self.value.keys())
+                key = self._keys[row]
+                node = _JsonNode(str(key), self.value[key], self, row)
+            else:
+                node = _JsonNode(f'[{row}]', self.value[row], self, row)
+            self._children[row] = node
+        return node
+
+    def preview(self) -> str:
+        if isinstance(self.value, dict):
+            return f'{{{len(self.value)}}}'
+        if isinstance(self.value, list):
+            return f'[{len(self.value)}]'
+        s = json.dumps(self.value, ensure_ascii=False)
+        if len(s) > _MAX_PREVIEW:
+            s = s[:_MAX_PREVIEW] + ' …'
+        return s
+
+
+class JsonTreeModel(QAbstractItemModel):
+    """read-only tree over a parsed json document, large containers are fetched in batches"""
+    _COLUMNS = ['Key', 'Value']
+
+    def __init__(self, document: Any, parent=None):
+        super(JsonTreeModel, self).__init__(parent)
+        self._root = _JsonNode('', {'$': document}, None, 0)
+        self._root.fetched = 1
+
+    def _node(self, index: QModelIndex) -> _JsonNode:
+        return index.internalPointer() if index.isValid() else self._root
+
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        node = self._node(parent)
+        if row < 0 or row >= node.fetched or column < 0 or column >= len(self._COLUMNS):
+            return QModelIndex()
+        return self.createIndex(row, column, node.child(row))
+
+    def parent(self, index: QModelIndex = QModelIndex()) -> QModelIndex:
+        if not index.isValid():
+            return QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is None or parent is self._root:
+            return QModelIndex()
+        return self.createIndex(parent.row, 0, parent)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.column() > 0:
+            return 0
+        return self._node(parent).fetched
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return len(self._COLUMNS)
+
+    def hasChildren(self, parent: QModelIndex = QModelIndex()) -> bool:
+        return self._node(parent).total > 0
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        node = self._node(parent)
+        return node.fetched < node.total
+
+    def fetchMore(self, parent: QModelIndex):
+        node = self._node(parent)
+        count = min(_FETCH_BATCH, node.total - node.fetched)
+        if count <= 0:
+            return
+        self.beginInsertRows(parent, node.fetched, node.fetched + count - 1)
+        node.fetched += count
+        self.endInsertRows()
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid() or role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole):
+            return None
+        node = index.internalPointer()
+        if index.column() == 0:
+            return node.key
+        return node.preview()
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self._COLUMNS[section]
+        return None
+
+
+_SYNC_INDEX_SIZE = 256 * 1024  # containers smaller than this are indexed right away when expanded
+
+
+class _LazyItem:
+    """a row of LazyJsonTreeModel, created the first time the view asks for it"""
+    __slots__ = ('node', 'parent', 'row', 'fetched', 'worker', 'err', '_children')
+
+    def __init__(self, node: Optional[LazyNode], parent: Optional['_LazyItem'], row: int):
+        self.node = node  # None for the invisible root
+        self.parent = parent
+        self.row = row
+        self.fetched = 0
+        self.worker: Optional[JsonIndexWorker] = None  # indexing the children
+        self.err: Optional[Exception] = None
+        self._children: Dict[int, _LazyItem] = {}
+
+    def child(self, row: int, nodes: List[LazyNode]) -> '_LazyItem':
+        item = self._children.get(row)
+        if item is None:
+            item = _LazyItem(nodes[row], self, row)
+            self._children[row] = item
+        return item
+
+    def key(self) -> str:
+        if self.parent.node is None:
+            return '$'
+        if isinstance(self.node.key, int):
+            return f'[{self.node.key}]'
+        return self.node.key
+
+    def preview(self) -> str:
+        node = self.node
+        if self.err is not None:
+            return f'解析失败：{self.err}'
+        if self.worker is not None:
+            return '解析中...'
+        if node.is_container:
+            brackets = '{}' if node.kind == JsonKind.OBJECT else '[]'
+            count = str(node.count) if node.count >= 0 else ''
+            more = '' if node.complete and node.count >= 0 else '…'
+            return f'{brackets[0]}{count}{more}{brackets[1]}'
+        s = json.dumps(node.value, ensure_ascii=False)
+        if len(s) > _MAX_PREVIEW:
+            s = s[:_MAX_PREVIEW] + ' …'
+        return s
+
+
+class LazyJsonTreeModel(QAbstractItemModel):
+    """
+    read-only tree over a JsonIndex which may still be growing while the body downloads, call sync to show what
+    was added. containers are indexed from the source bytes the first time they are expanded, once it is set
+    """
+    _COLUMNS = ['Key', 'Value']
+
+    def __init__(self, index: JsonIndex, parent=None):
+        super(LazyJsonTreeModel, self).__init__(parent)
+        self._index = index
+        self._source = None
+        self._root = _LazyItem(None, None, 0)
+
+    def json_index(self) -> JsonIndex:
+        return self._index
+
+    def source(self):
+        return self._source
+
+    def set_source(self, source: Union[bytes, memoryview]):
+        """the document bytes the offsets of the index refer to"""
+        self._source = source
+
+    def close(self):
+        for item in self._pending_items():
+            item.worker.cancel()
+        self._source = None
+
+    def _pending_items(self) -> List[_LazyItem]:
+        items, stack = [], [self._root]
+        while stack:
+            item = stack.pop()
+            if item.worker is not None:
+                items.append(item)
+            stack.extend(item._children.values())
+        return items
+
+    def _nodes(self, item: _LazyItem) -> List[LazyNode]:
+        if item.node is None:
+            return [self._index.root] if self._index.root is not None else []
+        return item.node.children or []
+
+    def _item(self, index: QModelIndex) -> _LazyItem:
+        return index.internalPointer() if index.isValid() else self._root
+
+    def _model_index(self, item: _LazyItem) -> QModelIndex:
+        return QModelIndex() if item.node is None else self.createIndex(item.row, 0, item)
+
+    def sync(self):
+        """show the top level rows added since the last call"""
+        if self._root.fetched == 0 and self._index.root is not None:
+            self.beginInsertRows(QModelIndex(), 0, 0)
+            self._root.fetched = 1
+            self.endInsertRows()
+        if self._root.fetched == 0:
+            return
+        document = self._root.child(0, self._nodes(self._root))
+        document_index = self._model_index(document)
+        total = len(self._nodes(document))
+        if document.fetched < min(total, _FETCH_BATCH):
+            count = min(total, _FETCH_BATCH) - document.fetched
+            self.beginInsertRows(document_index, document.fetched, document.fetched + count - 1)
+            document.fetched += count
+            self.endInsertRows()
+        self.dataChanged.emit(document_index.siblingAtColumn(1), document_index.siblingAtColumn(1))
+        if document.fetched > 0:
+            self.dataChanged.emit(self.index(0, 1, document_index),
+                                  self.index(document.fetched - 1, 1, document_index))
+
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        item = self._item(parent)
+        if row < 0 or row >= item.fetched or column < 0 or column >= len(self._COLUMNS):
+            return QModelIndex()
+        return self.createIndex(row, column, item.child(row, self._nodes(item)))
+
+    def parent(self, index: QModelIndex = QModelIndex()) -> QModelIndex:
+        if not index.isValid():
+            return QModelIndex()
+        return self._model_index(index.internalPointer().parent)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.column() > 0:
+            return 0
+        return self._item(parent).fetched
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return len(self._COLUMNS)
+
+    def hasChildren(self, parent: QModelIndex = QModelIndex()) -> bool:
+        item = self._item(parent)
+        if item.node is None:
+            return item.fetched > 0
+        return item.node.is_container and item.node.count != 0
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        item = self._item(parent)
+        node = item.node
+        if node is not None and node.children is None:
+            return node.is_container and node.complete and self._source is not None \
+                and item.worker is None and item.err is None
+        return item.fetched < len(self._nodes(item))
+
+    def fetchMore(self, parent: QModelIndex):
+        item = self._item(parent)
+        node = item.node
+        if node is not None and node.children is None:
+            if not self.canFetchMore(parent):
+                return
+            if node.end - node.start > _SYNC_INDEX_SIZE:
+                self._start_indexing(item)
+                return
+            item.err = index_children(node, self._source)
+            if item.err is not None:
+                self.dataChanged.emit(parent.siblingAtColumn(1), parent.siblingAtColumn(1))
+                return
+        self._fetch_batch(item, parent)
+
+    def _fetch_batch(self, item: _LazyItem, parent: QModelIndex):
+        count = min(_FETCH_BATCH, len(self._nodes(item)) - item.fetched)
+        if count <= 0:
+            return
+        self.beginInsertRows(parent, item.fetched, item.fetched + count - 1)
+        item.fetched += count
+        self.endInsertRows()
+
+    def _start_indexing(self, item: _LazyItem):
+        worker = JsonIndexWorker(self._source, node=item.node)
+        worker.signals.finish.connect(lambda evt: self._on_indexed(item, evt))
+        item.worker = worker
+        worker.start()
+        index = self._model_index(item)
+        self.dataChanged.emit(index.siblingAtColumn(1), index.siblingAtColumn(1))
+
+    def _on_indexed(self, item: _LazyItem, evt: JsonIndexFinishEvent):
+        item.worker = None
+        if evt.cancelled:
+            return
+        item.err = evt.err
+        index = self._model_index(item)
+        self.dataChanged.emit(index.siblingAtColumn(1), index.siblingAtColumn(1))
+        if evt.err is None:
+            self._fetch_batch(item, index)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid() or role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ToolTipRole):
+            return None
+        item = index.internalPointer()
+        if index.column() == 0:
+            return item.key()
+        return item.preview()
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self._COLUMNS[section]
+        return None
@@ -0,0 +1,91 @@
+from typing import List
+
+from PySide6.QtCore import Qt, Signal
+from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QTableWidget, QTableWidgetItem, \
+    QAbstractItemView
+
+
+class RequestQueueWidget(QWidget):
+    """results list of queued requests, one row per job"""
+    job_selected = Signal(int)
+    cancel_requested = Signal(int)
+    clear_requested = Signal()
+
+    _COLUMNS = ['ID', 'Method', 'URL', '状态', '用时']
+
+    def __init__(self, parent=None):
+        super(RequestQueueWidget, self).__init__(parent)
+
+        self._table = QTableWidget(0, len(self._COLUMNS), self)
+        self._table.setHorizontalHeaderLabels(self._COLUMNS)
+        self._table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self._table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self._table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self._table.verticalHeader().setVisible(False)
+        self._table.horizontalHeader().setStretchLastSection(True)
+        self._table.setColumnWidth(0, 40)
+        self._table.setColumnWidth(1, 60)
+        self._table.setColumnWidth(2, 240)
+        self._table.itemSelectionChanged.connect(self._on_selection_changed)
+
+        self._cancel_button = QPushButton('取消', self)
+        self._cancel_button.clicked.connect(self._on_cancel)
+        self._clear_button = QPushButton('清空已完成', self)
+        self._clear_button.clicked.connect(self.clear_requested.emit)
+
+        action_layout = QHBoxLayout()
+        action_layout.setContentsMargins(0, 0, 0, 0)
+        action_layout.addWidget(self._cancel_button)
+        action_layout.addWidget(self._clear_button)
+        action_layout.addStretch(1)
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(action_layout)
+        layout.addWidget(self._table)
+
+    def _find_row(self, job_id: int) -> int:
+        for r in range(self._table.rowCount()):
+            if self._table.item(r, 0).data(Qt.ItemDataRole.UserRole) == job_id:
+                return r
+        return -1
+
+    def selected_job(self) -> int:
+        for item in self._table.selectedItems():
+            return self._table.item(item.row(), 0).data(Qt.ItemDataRole.UserRole)
+        return 0
+
+    def add_job(self, job_id: int, method: str, url: str, status: str):
+        r = self._table.rowCount()
+        self._table.setRowCount(r + 1)
+        id_item = QTableWidgetItem(str(job_id))
+        id_item.setData(Qt.ItemDataRole.UserRole, job_id)
+        self._table.setItem(r, 0, id_item)
+        self._table.setItem(r, 1, QTableWidgetItem(method))
+        self._table.setItem(r, 2, QTableWidgetItem(url))
+        self._table.setItem(r, 3, QTableWidgetItem(status))
+        self._table.setItem(r, 4, QTableWidgetItem(''))
+
+    def update_job(self, job_id: int, status: str = '', seconds: float = -1):
+        r = self._find_row(job_id)
+        if r < 0:
+            return
+        if status:
+            self._table.item(r, 3).setText(status)
+        if seconds >= 0:
+            self._table.item(r, 4).setText(f'{seconds:.3f}s')
+
+    def remove_jobs(self, job_ids: List[int]):
+        ids = set(job_ids)
+        for r in reversed(range(self._table.rowCount())):
+            if self._table.item(r, 0).data(Qt.ItemDataRole.UserRole) in ids:
+                self._table.removeRow(r)
+
+    def _on_selection_changed(self):
+        job_id = self.selected_job()
+        if job_id:
+            self.job_selected.emit(job_id)
+
+    def _on_cancel(self):
+        job_id = self.selected_job()
+        if job_id:
+            self.cancel_requested.emit(job_id)
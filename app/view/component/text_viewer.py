@@ -0,0 +1,260 @@
+import mmap
+from array import array
+from itertools import accumulate, islice
+from typing import Union
+
+from PySide6.QtCore import Qt, QRect
+from PySide6.QtGui import QPainter, QFontDatabase, QKeySequence, QPalette
+from PySide6.QtWidgets import QAbstractScrollArea, QApplication, QMenu
+
+from app.service import perf
+
+
+_INDEX_BLOCK = 4 * 1024 * 1024
+_MAX_LINE_BYTES = 64 * 1024  # longer lines are cut when displayed
+_MAX_COPY_BYTES = 64 * 1024 * 1024
+
+
+class TextBuffer:
+    """utf-8 text kept as raw bytes (in memory or memory-mapped) with an index of line offsets"""
+    def __init__(self, data: Union[bytes, bytearray, mmap.mmap, None] = None):
+        self._data = data if data is not None else bytearray()
+        self._file = None
+        self._offsets = array('Q', [0])  # start offset of every line
+        self._indexed = 0
+        self.max_line_length = 0
+        self._index()
+
+    @classmethod
+    def from_text(cls, text: str) -> 'TextBuffer':
+        return cls(text.encode('utf-8'))
+
+    @classmethod
+    def from_file(cls, path: str) -> ('TextBuffer', Exception):
+        try:
+            f = open(path, 'rb')
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files cannot be mapped
+                data = bytearray()
+            buf = cls(data)
+            buf._file = f
+            return buf, None
+        except Exception as e:
+            return None, e
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._data = bytearray()
+        self._offsets = array('Q', [0])
+        self._indexed = 0
+
+    @property
+    def size(self) -> int:
+        return len(self._data)
+
+    def data(self) -> Union[bytes, bytearray, mmap.mmap]:
+        """the raw bytes, to be read without copying them"""
+        return self._data
+
+    def append(self, data: bytes):
+        if isinstance(self._data, mmap.mmap):
+            raise ValueError('memory-mapped buffer is read-only')
+        if isinstance(self._data, bytes):
+            self._data = bytearray(self._data)
+        self._data += data
+        self._index()
+
+    def _index(self):
+        data = self._data
+        end = len(data)
+        pos = self._indexed
+        while pos < end:
+            parts = data[pos:pos + _INDEX_BLOCK].split(b'\n')
+            # the first part continues the last line of the previous block
+            first_length = pos + len(parts[0]) - self._offsets[-1]
+            self.max_line_length = max(self.max_line_length, first_length, max(len(p) for p in parts))
+            # every part but the last one ends with a newline, so the next line starts right after it
+            starts = accumulate((len(p) + 1 for p in parts[:-1]), initial=pos)
+            self._offsets.extend(islice(starts, 1, None))
+            pos += sum(len(p) + 1 for p in parts) - 1
+        self._indexed = end
+
+    def line_count(self) -> int:
+        return len(self._offsets)
+
+    def line(self, i: int, limit: int = _MAX_LINE_BYTES) -> str:
+        if i < 0 or i >= len(self._offsets):
+            return ''
+        start = self._offsets[i]
+        end = self._offsets[i + 1] - 1 if i + 1 < len(self._offsets) else len(self._data)
+        if end - start > limit:
+            return bytes(self._data[start:start + limit]).decode('utf-8', errors='ignore') + ' …'
+        return bytes(self._data[start:end]).decode('utf-8', errors='replace').rstrip('\r')
+
+    def text(self, first: int = 0, last: int = -1) -> str:
+        """text of lines [first, last], the whole buffer by default"""
+        if last < 0 or last >= len(self._offsets):
+            last = len(self._offsets) - 1
+        start = self._offsets[max(0, first)]
+        end = self._offsets[last + 1] - 1 if last + 1 < len(self._offsets) else len(self._data)
+        return bytes(self._data[start:end]).decode('utf-8', errors='replace')
+
+
+class TextViewer(QAbstractScrollArea):
+    """read-only text view that only lays out the visible lines of a TextBuffer"""
+    def __init__(self, parent=None):
+        super(TextViewer, self).__init__(parent)
+        self._buffer = TextBuffer()
+        self._placeholder = ''
+        self._anchor = -1
+        self._cursor = -1
+        font = QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont)
+        font.setFamilies(['Consolas', font.family()])
+        self.setFont(font)
+        self.setFocusPolicy(Qt.FocusPolicy.StrongFocus)
+        self.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.customContextMenuRequested.connect(self._show_context_menu)
+        self.verticalScrollBar().valueChanged.connect(self.viewport().update)
+        self.horizontalScrollBar().valueChanged.connect(self.viewport().update)
+
+    def buffer(self) -> TextBuffer:
+        return self._buffer
+
+    def set_buffer(self, buffer: TextBuffer):
+        if buffer is not self._buffer:
+            self._buffer.close()
+        self._buffer = buffer
+        self._anchor = self._cursor = -1
+        self.verticalScrollBar().setValue(0)
+        self.horizontalScrollBar().setValue(0)
+        self._update_scroll_bars()
+        self.viewport().update()
+
+    def setPlainText(self, text: str):
+        self.set_buffer(TextBuffer.from_text(text))
+
+    def setPlaceholderText(self, text: str):
+        self._placeholder = text
+        self.viewport().update()
+
+    def clear(self):
+        self.set_buffer(TextBuffer())
+
+    def append_text(self, text: str):
+        at_bottom = self.verticalScrollBar().value() >= self.verticalScrollBar().maximum()
+        self._buffer.append(text.encode('utf-8'))
+        self._update_scroll_bars()
+        if at_bottom and self.verticalScrollBar().value() > 0:
+            self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
+        self.viewport().update()
+
+    def toPlainText(self) -> str:
+        return self._buffer.text()
+
+    def _line_height(self) -> int:
+        return self.fontMetrics().lineSpacing()
+
+    def _char_width(self) -> int:
+        return max(1, self.fontMetrics().horizontalAdvance('M'))
+
+    def _visible_lines(self) -> int:
+        return max(1, self.viewport().height() // self._line_height())
+
+    def _update_scroll_bars(self):
+        visible = self._visible_lines()
+        self.verticalScrollBar().setRange(0, max(0, self._buffer.line_count() - visible))
+        self.verticalScrollBar().setPageStep(visible)
+        columns = max(1, self.viewport().width() // self._char_width())
+        max_columns = min(self._buffer.max_line_length, _MAX_LINE_BYTES)
+        self.horizontalScrollBar().setRange(0, max(0, max_columns - columns + 2))
+        self.horizontalScrollBar().setPageStep(columns)
+
+    def resizeEvent(self, event):
+        super(TextViewer, self).resizeEvent(event)
+        self._update_scroll_bars()
+
+    @perf.traced('paint.text_viewer', perf.SpanCategory.PAINT)
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        palette = self.palette()
+        painter.fillRect(self.viewport().rect(), palette.color(QPalette.ColorRole.Base))
+        line_height = self._line_height()
+        ascent = self.fontMetrics().ascent()
+
+        if self._buffer.size == 0:
+            if self._placeholder:
+                painter.setPen(palette.color(QPalette.ColorRole.PlaceholderText))
+                painter.drawText(4, ascent + 2, self._placeholder)
+            painter.end()
+            return
+
+        first = self.verticalScrollBar().value()
+        last = min(self._buffer.line_count(), first + self._visible_lines() + 1)
+        column = self.horizontalScrollBar().value()
+        columns = self.viewport().width() // self._char_width() + 2
+        selection = self._selection()
+        width = self.viewport().width()
+        for i in range(first, last):
+            y = (i - first) * line_height
+            if selection[0] <= i <= selection[1]:
+                painter.fillRect(QRect(0, y, width, line_height), palette.color(QPalette.ColorRole.Highlight))
+                painter.setPen(palette.color(QPalette.ColorRole.HighlightedText))
+            else:
+                painter.setPen(palette.color(QPalette.ColorRole.Text))
+            text = self._buffer.line(i)[column:column + columns]
+            painter.drawText(4, y + ascent, text)
+        painter.end()
+
+    def _line_at(self, y: int) -> int:
+        line = self.verticalScrollBar().value() + y // self._line_height()
+        return min(line, self._buffer.line_count() - 1)
+
+    def _selection(self):
+        if self._anchor < 0 or self._cursor < 0:
+            return -1, -2
+        return min(self._anchor, self._cursor), max(self._anchor, self._cursor)
+
+    def mousePressEvent(self, event):
+        line = self._line_at(int(event.position().y()))
+        if event.modifiers() & Qt.KeyboardModifier.ShiftModifier and self._anchor >= 0:
+            self._cursor = line
+        else:
+            self._anchor = self._cursor = line
+        self.viewport().update()
+
+    def mouseMoveEvent(self, event):
+        if self._anchor >= 0:
+            self._cursor = self._line_at(int(event.position().y()))
+            self.viewport().update()
+
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.StandardKey.Copy):
+            self.copy()
+        elif event.matches(QKeySequence.StandardKey.SelectAll):
+            self.selectAll()
+        else:
+            super(TextViewer, self).keyPressEvent(event)
+
+    def selectAll(self):
+        self._anchor, self._cursor = 0, self._buffer.line_count() - 1
+        self.viewport().update()
+
+    def copy(self):
+        first, last = self._selection()
+        if last < first:
+            return
+        if self._buffer.size > _MAX_COPY_BYTES and last - first + 1 == self._buffer.line_count():
+            return
+        QApplication.clipboard().setText(self._buffer.text(first, last))
+
+    def _show_context_menu(self, pos):
+        menu = QMenu(self)
+        menu.addAction('复制', self.copy)
+        menu.addAction('全选', self.selectAll)
+        menu.exec(self.viewport().mapToGlobal(pos))
@@ -0,0 +1,234 @@
+import datetime
+from typing import List, Any
+
+from PySide6.QtCore import Qt, Signal, QAbstractTableModel, QModelIndex, QDateTime
+from PySide6.QtGui import QFont
+from PySide6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QComboBox, QLabel, \
+    QTableView, QAbstractItemView, QPlainTextEdit, QDateTimeEdit, QMessageBox, QSplitter
+
+from app import util
+from app.service.compression import TransferStats
+from app.service.history import HistoryStore, HistoryEntry, HistoryStatus
+from app.service.request import RequestTimings
+
+
+_PAGE_SIZE = 200
+
+
+class HistoryTableModel(QAbstractTableModel):
+    """newest first, pages are queried from the index only when the view scrolls to them"""
+    _COLUMNS = ['ID', '时间', 'Method', 'URL', '状态', '用时']
+
+    def __init__(self, store: HistoryStore, parent=None):
+        super(HistoryTableModel, self).__init__(parent)
+        self._store = store
+        self._entries: List[HistoryEntry] = []
+        self._filters = {}
+        self._exhausted = True
+        self.err = None
+
+    def search(self, **filters):
+        self.beginResetModel()
+        self._entries = []
+        self._filters = filters
+        self._exhausted = False
+        self.err = None
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    def entry(self, row: int) -> HistoryEntry:
+        return self._entries[row]
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._entries)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return len(self._COLUMNS)
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent: QModelIndex):
+        before_id = self._entries[-1].id if self._entries else 0
+        entries, err = self._store.query(before_id=before_id, limit=_PAGE_SIZE, **self._filters)
+        if err is not None:
+            self.err = err
+        if len(entries) < _PAGE_SIZE:
+            self._exhausted = True
+        if not entries:
+            return
+        self.beginInsertRows(QModelIndex(), len(self._entries), len(self._entries) + len(entries) - 1)
+        self._entries.extend(entries)
+        self.endInsertRows()
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        entry = self._entries[index.row()]
+        column = index.column()
+        if column == 0:
+            return entry.id
+        if column == 1:
+            return datetime.datetime.fromtimestamp(entry.timestamp).strftime('%Y-%m-%d %H:%M:%S')
+        if column == 2:
+            return entry.method
+        if column == 3:
+            return entry.url
+        if column == 4:
+            return str(entry.status_code) if entry.status_code else '失败'
+        return f'{entry.seconds:.3f}s'
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self._COLUMNS[section]
+        return None
+
+
+class HistoryDialog(QDialog):
+    rerun_requested = Signal(object)  # Request
+
+    def __init__(self, store: HistoryStore, parent=None):
+        super(HistoryDialog, self).__init__(parent)
+        self.setWindowTitle('请求历史')
+        self.resize(900, 600)
+        self._store = store
+
+        self._url_line_edit = QLineEdit(self)
+        self._url_line_edit.setPlaceholderText('URL包含...')
+        self._url_line_edit.returnPressed.connect(self.search)
+        self._status_combo_box = QComboBox(self)
+        for text, status in [('全部', HistoryStatus.ALL), ('2xx', HistoryStatus.SUCCESS),
+                             ('3xx', HistoryStatus.REDIRECT), ('4xx', HistoryStatus.CLIENT_ERROR),
+                             ('5xx', HistoryStatus.SERVER_ERROR), ('失败', HistoryStatus.FAILED)]:
+            self._status_combo_box.addItem(text, status)
+        self._since_date_time_edit = self._create_date_time_edit()
+        self._until_date_time_edit = self._create_date_time_edit()
+        self._search_button = QPushButton('搜索', self)
+        self._search_button.clicked.connect(self.search)
+
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(self._url_line_edit, 1)
+        filter_layout.addWidget(self._status_combo_box)
+        filter_layout.addWidget(QLabel('从', self))
+        filter_layout.addWidget(self._since_date_time_edit)
+        filter_layout.addWidget(QLabel('到', self))
+        filter_layout.addWidget(self._until_date_time_edit)
+        filter_layout.addWidget(self._search_button)
+
+        self._model = HistoryTableModel(store, self)
+        self._table_view = QTableView(self)
+        self._table_view.setModel(self._model)
+        self._table_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self._table_view.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self._table_view.verticalHeader().setVisible(False)
+        self._table_view.verticalHeader().setDefaultSectionSize(22)
+        self._table_view.horizontalHeader().setStretchLastSection(True)
+        self._table_view.setColumnWidth(0, 60)
+        self._table_view.setColumnWidth(1, 150)
+        self._table_view.setColumnWidth(2, 60)
+        self._table_view.setColumnWidth(3, 400)
+        self._table_view.selectionModel().currentRowChanged.connect(self._on_current_row_changed)
+        self._table_view.doubleClicked.connect(self.rerun)
+
+        self._detail_text_edit = QPlainTextEdit(self)
+        self._detail_text_edit.setReadOnly(True)
+        font = QFont()
+        font.setFamilies(['Consolas'])
+        self._detail_text_edit.setFont(font)
+        splitter = QSplitter(Qt.Orientation.Vertical, self)
+        splitter.addWidget(self._table_view)
+        splitter.addWidget(self._detail_text_edit)
+        splitter.setSizes([400, 200])
+
+        self._summary_label = QLabel(self)
+        self._rerun_button = QPushButton('重新执行', self)
+        self._rerun_button.clicked.connect(self.rerun)
+        action_layout = QHBoxLayout()
+        action_layout.addWidget(self._summary_label, 1)
+        action_layout.addWidget(self._rerun_button)
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(filter_layout)
+        layout.addWidget(splitter)
+        layout.addLayout(action_layout)
+
+        self.search()
+
+    def _create_date_time_edit(self) -> QDateTimeEdit:
+        edit = QDateTimeEdit(self)
+        edit.setCalendarPopup(True)
+        edit.setDisplayFormat('yyyy-MM-dd HH:mm')
+        edit.setMinimumDateTime(QDateTime.fromSecsSinceEpoch(0))
+        edit.setSpecialValueText('不限')
+        edit.setDateTime(edit.minimumDateTime())
+        return edit
+
+    @staticmethod
+    def _timestamp(edit: QDateTimeEdit) -> float:
+        if edit.dateTime() == edit.minimumDateTime():
+            return 0.0
+        return edit.dateTime().toSecsSinceEpoch()
+
+    def search(self):
+        self._model.search(
+            url=self._url_line_edit.text().strip(),
+            status=self._status_combo_box.currentData(),
+            since=self._timestamp(self._since_date_time_edit),
+            until=self._timestamp(self._until_date_time_edit),
+        )
+        if self._model.err is not None:
+            self._summary_label.setText(f'查询失败：{self._model.err}')
+        else:
+            more = '（滚动加载更多）' if self._model.canFetchMore(QModelIndex()) else ''
+            self._summary_label.setText(f'已加载 {self._model.rowCount()} 条{more}')
+        self._detail_text_edit.clear()
+
+    def _selected_entry(self) -> (HistoryEntry, Exception):
+        index = self._table_view.currentIndex()
+        if not index.isValid():
+            return None, ValueError('no entry selected')
+        return self._store.load(self._model.entry(index.row()).id)
+
+    def _on_current_row_changed(self, current: QModelIndex, _):
+        if not current.isValid():
+            return
+        entry, err = self._store.load(self._model.entry(current.row()).id)
+        if err is not None:
+            self._detail_text_edit.setPlainText(f'读取失败：{err}')
+            return
+        lines = [
+            f'{entry.method} {entry.url}',
+            f'Status Code: {entry.status_code or "-"}  Seconds: {entry.seconds:.3f}  '
+            f'Connection: {"reused" if entry.reused else "new"}, handshake {entry.connect_seconds:.3f}s',
+            f'Response Size: {util.format_bytes(entry.resp_size)}',
+        ]
+        if entry.transfer:
+            lines.append(f'Transfer: {TransferStats.from_dict(entry.transfer).summary()}')
+        if entry.error:
+            lines.append(f'Error: {entry.error}')
+        if entry.timings:
+            lines.append('')
+            lines.extend(util.format_waterfall(RequestTimings.from_dict(entry.timings).phases()))
+        lines.append('')
+        for k, v in entry.headers.items():
+            lines.append(f'{k}: {v}')
+        lines.append('')
+        if entry.body_stored:
+            lines.append(entry.body)
+        else:
+            lines.append(f'(body of {util.format_bytes(entry.body_size)} not stored, sha256: {entry.body_digest})')
+        self._detail_text_edit.setPlainText('\n'.join(lines))
+
+    def rerun(self):
+        entry, err = self._selected_entry()
+        if err is not None:
+            QMessageBox.warning(self, '重新执行', f'读取历史记录失败：{err}')
+            return
+        if not entry.body_stored:
+            reply = QMessageBox.question(
+                self, '重新执行', '该请求的Body过大未被保存，是否以空Body重新执行？',
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+                QMessageBox.StandardButton.No)
+            if reply != QMessageBox.StandardButton.Yes:
+                return
+        self.rerun_requested.emit(entry.to_request())
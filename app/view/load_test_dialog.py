@@ -0,0 +1,142 @@
+from typing import Optional
+
+from PySide6.QtGui import QFont
+from PySide6.QtWidgets import QDialog, QFormLayout, QVBoxLayout, QHBoxLayout, QPushButton, QSpinBox, \
+    QDoubleSpinBox, QLabel, QPlainTextEdit
+
+from app.service.loadtest import LoadTestSettings, LoadTestStats
+from app.service.request import Request
+from .worker.loadtest import LoadTestWorker
+
+
+_HISTOGRAM_EDGES = [0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5]
+_HISTOGRAM_BAR_WIDTH = 40
+
+
+def _format_seconds(seconds: float) -> str:
+    if seconds < 1:
+        return f'{seconds * 1e3:g}ms'
+    return f'{seconds:g}s'
+
+
+class LoadTestDialog(QDialog):
+    def __init__(self, req: Request, parent=None):
+        super(LoadTestDialog, self).__init__(parent)
+        self.setWindowTitle('压测')
+        self.resize(640, 520)
+        self._req = req
+        self._worker: Optional[LoadTestWorker] = None
+
+        self._rps_spin_box = QDoubleSpinBox(self)
+        self._rps_spin_box.setRange(0, 100000)
+        self._rps_spin_box.setDecimals(1)
+        self._rps_spin_box.setSpecialValueText('不限')
+        self._concurrency_spin_box = QSpinBox(self)
+        self._concurrency_spin_box.setRange(1, 512)
+        self._concurrency_spin_box.setValue(10)
+        self._duration_spin_box = QDoubleSpinBox(self)
+        self._duration_spin_box.setRange(0, 3600)
+        self._duration_spin_box.setValue(10)
+        self._duration_spin_box.setSpecialValueText('不限')
+        self._count_spin_box = QSpinBox(self)
+        self._count_spin_box.setRange(0, 100000000)
+        self._count_spin_box.setSpecialValueText('不限')
+
+        form_layout = QFormLayout()
+        form_layout.addRow('URL', QLabel(f'{req.method} {req.url}', self))
+        form_layout.addRow('目标RPS', self._rps_spin_box)
+        form_layout.addRow('并发数', self._concurrency_spin_box)
+        form_layout.addRow('持续时间（s）', self._duration_spin_box)
+        form_layout.addRow('请求总数', self._count_spin_box)
+
+        self._start_button = QPushButton('开始', self)
+        self._start_button.clicked.connect(self.start)
+        self._stop_button = QPushButton('停止', self)
+        self._stop_button.setEnabled(False)
+        self._stop_button.clicked.connect(self.stop)
+        action_layout = QHBoxLayout()
+        action_layout.addWidget(self._start_button)
+        action_layout.addWidget(self._stop_button)
+        action_layout.addStretch(1)
+
+        self._summary_label = QLabel(self)
+        self._result_text_edit = QPlainTextEdit(self)
+        self._result_text_edit.setReadOnly(True)
+        font = QFont()
+        font.setFamilies(['Consolas'])
+        self._result_text_edit.setFont(font)
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(form_layout)
+        layout.addLayout(action_layout)
+        layout.addWidget(self._summary_label)
+        layout.addWidget(self._result_text_edit)
+
+    def _settings(self) -> LoadTestSettings:
+        return LoadTestSettings(
+            rps=self._rps_spin_box.value(),
+            concurrency=self._concurrency_spin_box.value(),
+            duration=self._duration_spin_box.value(),
+            count=self._count_spin_box.value(),
+        )
+
+    def start(self):
+        if self._worker is not None and self._worker.is_running():
+            return
+        settings = self._settings()
+        err = settings.validate()
+        if err is not None:
+            self._summary_label.setText(f'参数错误：{err}')
+            return
+        self._worker = LoadTestWorker(self._req, settings, parent=self)
+        self._worker.signals.progress.connect(self.on_progress)
+        self._worker.signals.finish.connect(self.on_finish)
+        self._start_button.setEnabled(False)
+        self._stop_button.setEnabled(True)
+        self._summary_label.setText('执行中')
+        self._worker.start()
+
+    def stop(self):
+        if self._worker is not None:
+            self._worker.stop()
+
+    def _show_stats(self, stats: LoadTestStats):
+        p = stats.percentiles()
+        self._summary_label.setText(
+            f'请求数：{stats.total}  用时：{stats.elapsed:.2f}s  吞吐：{stats.throughput:.1f}/s  '
+            f'错误率：{stats.error_rate * 100:.2f}%'
+        )
+        lines = [
+            f'p50: {p["p50"] * 1e3:.2f}ms  p90: {p["p90"] * 1e3:.2f}ms  '
+            f'p99: {p["p99"] * 1e3:.2f}ms  p999: {p["p999"] * 1e3:.2f}ms',
+            f'min: {stats.histogram.min * 1e3:.2f}ms  mean: {stats.histogram.mean() * 1e3:.2f}ms  '
+            f'max: {stats.histogram.max * 1e3:.2f}ms',
+            '',
+        ]
+        bars = stats.histogram.bars(_HISTOGRAM_EDGES)
+        top = max(bars) if bars else 0
+        for i, count in enumerate(bars):
+            label = f'<= {_format_seconds(_HISTOGRAM_EDGES[i])}' if i < len(_HISTOGRAM_EDGES) \
+                else f'>  {_format_seconds(_HISTOGRAM_EDGES[-1])}'
+            width = round(count / top * _HISTOGRAM_BAR_WIDTH) if top else 0
+            lines.append(f'{label:>10} | {"#" * width:<{_HISTOGRAM_BAR_WIDTH}} {count}')
+        lines.append('')
+        lines.append(f'exceptions: {stats.errors}')
+        for code in sorted(stats.status_codes.keys()):
+            lines.append(f'{code}: {stats.status_codes[code]}')
+        self._result_text_edit.setPlainText('\n'.join(lines))
+
+    def on_progress(self, stats: LoadTestStats):
+        self._show_stats(stats)
+
+    def on_finish(self, stats: LoadTestStats, err: Optional[Exception]):
+        self._start_button.setEnabled(True)
+        self._stop_button.setEnabled(False)
+        if err is not None:
+            self._summary_label.setText(f'压测失败：{err}')
+            return
+        self._show_stats(stats)
+
+    def closeEvent(self, event):
+        self.stop()
+        event.accept()
@@ -1,8 +1,15 @@
+from typing import Optional, TYPE_CHECKING
+
 from PySide6 import QtWidgets
-from PySide6.QtWidgets import QMainWindow, QMessageBox
+from PySide6.QtWidgets import QMainWindow, QMessageBox, QMenu
 from .ui.main_window import Ui_MainWindow
 from .tool_widget import ToolWidget
-from PySide6.QtGui import QScreen
+from PySide6.QtGui import QScreen, QAction
+
+from app.service.perf import get_tracer
+
+if TYPE_CHECKING:
+    from .performance_dialog import PerformanceDialog
 
 
 class MainWindow(QMainWindow):
@@ -10,6 +17,7 @@ class MainWindow(QMainWindow):
         super(MainWindow, self).__init__()
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
+        self._performance_dialog: Optional['PerformanceDialog'] = None
 
         self._init_actions()
         self._init_widget()
@@ -20,6 +28,12 @@ class MainWindow(QMainWindow):
 
         self.ui.actionSupport.triggered.connect(self.show_support)
 
+        self.menuTools = QMenu('工具', self.ui.menubar)
+        self.ui.menubar.insertMenu(self.ui.menuHelp.menuAction(), self.menuTools)
+        self.actionPerformance = QAction('性能', self)
+        self.actionPerformance.triggered.connect(self.show_performance)
+        self.menuTools.addAction(self.actionPerformance)
+
     def _init_widget(self):
         self.setCentralWidget(ToolWidget())
 
@@ -47,3 +61,12 @@ class MainWindow(QMainWindow):
     def show_support(self):
         title = self.ui.actionSupport.text()
         QMessageBox.information(self, title, '请联系HiKari以获取官方支持')
+
+    def show_performance(self):
+        from .performance_dialog import PerformanceDialog
+        if self._performance_dialog is None:
+            self._performance_dialog = PerformanceDialog(get_tracer(), self)
+        self._performance_dialog.refresh()
+        self._performance_dialog.show()
+        self._performance_dialog.raise_()
+        self._performance_dialog.activateWindow()
@@ -0,0 +1,238 @@
+import datetime
+import time
+from typing import List, Any
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer
+from PySide6.QtGui import QFont
+from PySide6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QCheckBox, QLabel, QTableView, \
+    QAbstractItemView, QPlainTextEdit, QSplitter, QFileDialog, QMessageBox, QTabWidget
+
+from app.service.perf import Tracer, Span, SpanSummary
+
+
+_REFRESH_INTERVAL_MS = 1000
+
+
+def _format_ms(seconds: float) -> str:
+    return f'{seconds * 1e3:.3f}ms'
+
+
+class SpanTableModel(QAbstractTableModel):
+    """newest first"""
+    _COLUMNS = ['时间', '名称', '类别', '用时', '线程', '参数']
+
+    def __init__(self, parent=None):
+        super(SpanTableModel, self).__init__(parent)
+        self._spans: List[Span] = []
+        self._wall_offset = 0.0  # wall clock seconds minus perf_counter seconds
+
+    def set_spans(self, spans: List[Span]):
+        self.beginResetModel()
+        self._spans = spans[::-1]
+        self._wall_offset = time.time() - time.perf_counter_ns() / 1e9
+        self.endResetModel()
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._spans)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return len(self._COLUMNS)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        s = self._spans[index.row()]
+        column = index.column()
+        if column == 0:
+            tm = datetime.datetime.fromtimestamp(self._wall_offset + s.start_ns / 1e9)
+            return tm.strftime('%H:%M:%S.%f')[:-3]
+        if column == 1:
+            return s.name
+        if column == 2:
+            return s.category
+        if column == 3:
+            return _format_ms(s.seconds)
+        if column == 4:
+            return s.thread_name
+        return ', '.join(f'{k}={v}' for k, v in s.args.items())
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self._COLUMNS[section]
+        return None
+
+
+class SpanSummaryTableModel(QAbstractTableModel):
+    _COLUMNS = ['名称', '类别', '次数', '平均', '最大', '合计']
+
+    def __init__(self, parent=None):
+        super(SpanSummaryTableModel, self).__init__(parent)
+        self._summaries: List[SpanSummary] = []
+
+    def set_summaries(self, summaries: List[SpanSummary]):
+        self.beginResetModel()
+        self._summaries = summaries
+        self.endResetModel()
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._summaries)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return len(self._COLUMNS)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        summary = self._summaries[index.row()]
+        column = index.column()
+        if column == 0:
+            return summary.name
+        if column == 1:
+            return summary.category
+        if column == 2:
+            return summary.count
+        if column == 3:
+            return _format_ms(summary.avg_seconds)
+        if column == 4:
+            return _format_ms(summary.max_seconds)
+        return _format_ms(summary.total_seconds)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self._COLUMNS[section]
+        return None
+
+
+class PerformanceDialog(QDialog):
+    """recent spans of the tracer, and a cProfile/tracemalloc capture of the gui thread"""
+    def __init__(self, tracer: Tracer, parent=None):
+        super(PerformanceDialog, self).__init__(parent)
+        self.setWindowTitle('性能')
+        self.resize(900, 640)
+        self._tracer = tracer
+
+        self._refresh_button = QPushButton('刷新', self)
+        self._refresh_button.clicked.connect(self.refresh)
+        self._auto_refresh_check_box = QCheckBox('自动刷新', self)
+        self._auto_refresh_check_box.toggled.connect(self._on_auto_refresh_toggled)
+        self._clear_button = QPushButton('清空', self)
+        self._clear_button.clicked.connect(self.clear)
+        self._export_button = QPushButton('导出Chrome Trace...', self)
+        self._export_button.clicked.connect(self.export_chrome_trace)
+        self._summary_label = QLabel(self)
+        top_layout = QHBoxLayout()
+        top_layout.addWidget(self._refresh_button)
+        top_layout.addWidget(self._auto_refresh_check_box)
+        top_layout.addWidget(self._clear_button)
+        top_layout.addWidget(self._summary_label, 1)
+        top_layout.addWidget(self._export_button)
+
+        self._summary_model = SpanSummaryTableModel(self)
+        self._span_model = SpanTableModel(self)
+        tab_widget = QTabWidget(self)
+        tab_widget.addTab(self._create_table_view(self._summary_model, [200, 80, 60, 100, 100]), '汇总')
+        tab_widget.addTab(self._create_table_view(self._span_model, [100, 200, 80, 100, 100]), '最近')
+
+        self._cpu_check_box = QCheckBox('CPU (cProfile)', self)
+        self._cpu_check_box.setChecked(True)
+        self._memory_check_box = QCheckBox('内存 (tracemalloc)', self)
+        self._capture_button = QPushButton('开始采集', self)
+        self._capture_button.clicked.connect(self.toggle_capture)
+        capture_layout = QHBoxLayout()
+        capture_layout.addWidget(QLabel('采集：', self))
+        capture_layout.addWidget(self._cpu_check_box)
+        capture_layout.addWidget(self._memory_check_box)
+        capture_layout.addStretch(1)
+        capture_layout.addWidget(self._capture_button)
+
+        self._report_text_edit = QPlainTextEdit(self)
+        self._report_text_edit.setReadOnly(True)
+        self._report_text_edit.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        self._report_text_edit.setPlaceholderText('采集期间在界面上重现慢操作，停止后在此查看报告')
+        font = QFont()
+        font.setFamilies(['Consolas'])
+        self._report_text_edit.setFont(font)
+        splitter = QSplitter(Qt.Orientation.Vertical, self)
+        splitter.addWidget(tab_widget)
+        splitter.addWidget(self._report_text_edit)
+        splitter.setSizes([400, 200])
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(top_layout)
+        layout.addWidget(splitter)
+        layout.addLayout(capture_layout)
+
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setInterval(_REFRESH_INTERVAL_MS)
+        self._refresh_timer.timeout.connect(self.refresh)
+
+        self._set_capturing(self._tracer.is_capturing())
+        self.refresh()
+
+    def _create_table_view(self, model: QAbstractTableModel, widths: List[int]) -> QTableView:
+        table_view = QTableView(self)
+        table_view.setModel(model)
+        table_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        table_view.verticalHeader().setVisible(False)
+        table_view.verticalHeader().setDefaultSectionSize(22)
+        table_view.horizontalHeader().setStretchLastSection(True)
+        for column, width in enumerate(widths):
+            table_view.setColumnWidth(column, width)
+        return table_view
+
+    def _on_auto_refresh_toggled(self, checked: bool):
+        if checked:
+            self._refresh_timer.start()
+        else:
+            self._refresh_timer.stop()
+
+    def refresh(self):
+        spans = self._tracer.spans()
+        self._span_model.set_spans(spans)
+        self._summary_model.set_summaries(self._tracer.summary())
+        self._summary_label.setText(f'共 {len(spans)} 条记录')
+
+    def clear(self):
+        self._tracer.clear()
+        self.refresh()
+
+    def export_chrome_trace(self):
+        path, _ = QFileDialog.getSaveFileName(self, '导出Chrome Trace', 'trace.json', 'JSON (*.json)')
+        if not path:
+            return
+        err = self._tracer.export_chrome_trace(path)
+        if err is not None:
+            QMessageBox.warning(self, '导出Chrome Trace', f'导出失败：{err}')
+            return
+        self._summary_label.setText(f'已导出到 {path}，可在 chrome://tracing 或 Perfetto 中打开')
+
+    def _set_capturing(self, capturing: bool):
+        self._capture_button.setText('停止采集' if capturing else '开始采集')
+        self._cpu_check_box.setEnabled(not capturing)
+        self._memory_check_box.setEnabled(not capturing)
+
+    def toggle_capture(self):
+        if self._tracer.is_capturing():
+            report, err = self._tracer.stop_capture()
+            self._set_capturing(False)
+            if report is not None:
+                self._report_text_edit.setPlainText(report.text())
+            if err is not None:
+                self._report_text_edit.appendPlainText(f'\n采集报告生成失败：{err}')
+            return
+        cpu = self._cpu_check_box.isChecked()
+        memory = self._memory_check_box.isChecked()
+        if not cpu and not memory:
+            QMessageBox.information(self, '采集', '请至少选择一种采集方式')
+            return
+        err = self._tracer.start_capture(cpu, memory)
+        if err is not None:
+            QMessageBox.warning(self, '采集', f'开始采集失败：{err}')
+            return
+        self._set_capturing(True)
+        self._report_text_edit.clear()
+
+    def closeEvent(self, event):
+        self._refresh_timer.stop()
+        self._auto_refresh_check_box.setChecked(False)
+        super(PerformanceDialog, self).closeEvent(event)
@@ -0,0 +1,124 @@
+from typing import Optional, Dict
+
+from PySide6.QtCore import QObject, Signal, QTimer, QDate, QDateTime, QTime, QEvent, Qt
+from PySide6.QtWidgets import QWidget
+
+
+_TICK_MARGIN_MS = 2  # fire just after the boundary so the current time reads the new second
+
+
+class TickService(QObject):
+    """
+    one timer for every clock-like widget instead of a timer each.
+    ticks are aligned to wall-clock seconds and stop while none of the watched widgets can be seen,
+    the day change is a single timer armed for the next midnight
+    """
+    second = Signal(QDateTime)
+    day_changed = Signal(QDate)
+
+    def __init__(self, parent=None):
+        super(TickService, self).__init__(parent)
+        self._date = QDate.currentDate()
+        self._watched: Dict[int, QWidget] = {}
+        self._windows: Dict[int, QWidget] = {}
+        self._active = False
+
+        self._tick_timer = QTimer(self)
+        self._tick_timer.setSingleShot(True)
+        self._tick_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._tick_timer.timeout.connect(self._tick)
+        self._midnight_timer = QTimer(self)
+        self._midnight_timer.setSingleShot(True)
+        self._midnight_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._midnight_timer.timeout.connect(self._check_date)
+
+        self._schedule_midnight()
+        self._update_active()
+
+    def is_active(self) -> bool:
+        return self._active
+
+    def watch(self, widget: QWidget):
+        """seconds are ticking only while a watched widget is visible and its window is not minimized"""
+        key = id(widget)
+        if key in self._watched:
+            return
+        self._watched[key] = widget
+        widget.installEventFilter(self)
+        widget.destroyed.connect(lambda *_: self._unwatch(key))
+        self._update_active()
+
+    def _unwatch(self, key: int):
+        self._watched.pop(key, None)
+        self._update_active()
+
+    def _watch_window(self, widget: QWidget):
+        """the top level window is only known for sure once the widget is shown"""
+        window = widget.window()
+        key = id(window)
+        if window is widget or key in self._windows:
+            return
+        self._windows[key] = window
+        window.installEventFilter(self)
+        window.destroyed.connect(lambda *_: self._windows.pop(key, None))
+
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        event_type = event.type()
+        if event_type == QEvent.Type.Show and id(watched) in self._watched:
+            self._watch_window(watched)
+        if event_type in (QEvent.Type.Show, QEvent.Type.Hide, QEvent.Type.WindowStateChange):
+            self._update_active()
+        return False
+
+    def _visible(self) -> bool:
+        if not self._watched:
+            return True
+        for widget in self._watched.values():
+            if widget.isVisible() and not widget.window().isMinimized():
+                return True
+        return False
+
+    def _update_active(self):
+        active = self._visible()
+        if active == self._active:
+            return
+        self._active = active
+        if active:
+            # the time and possibly the date moved on while paused
+            self._check_date()
+            self._tick()
+        else:
+            self._tick_timer.stop()
+
+    def _schedule_tick(self):
+        self._tick_timer.start(1000 - QTime.currentTime().msec() + _TICK_MARGIN_MS)
+
+    def _tick(self):
+        if not self._active:
+            return
+        self._schedule_tick()
+        self.second.emit(QDateTime.currentDateTime())
+
+    def _schedule_midnight(self):
+        now = QDateTime.currentDateTime()
+        midnight = QDateTime(now.date().addDays(1), QTime(0, 0))
+        self._midnight_timer.start(max(0, now.msecsTo(midnight)) + _TICK_MARGIN_MS)
+
+    def _check_date(self):
+        """called at midnight and when ticking resumes, a timer that fired early is simply re-armed"""
+        self._schedule_midnight()
+        date = QDate.currentDate()
+        if date != self._date:
+            self._date = date
+            self.day_changed.emit(date)
+
+
+_TICK_SERVICE: Optional[TickService] = None
+
+
+def get_tick_service() -> TickService:
+    """shared by all widgets, must be called at gui thread after the application is created"""
+    global _TICK_SERVICE
+    if _TICK_SERVICE is None:
+        _TICK_SERVICE = TickService()
+    return _TICK_SERVICE
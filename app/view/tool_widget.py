@@ -1,62 +1,140 @@
 import datetime
 import re
-from typing import Optional
+import time
+from concurrent.futures import CancelledError
+from typing import Optional, TYPE_CHECKING
 
-from PySide6.QtCore import Qt, QDate, QTimer, QObject, Signal, QThread
-from PySide6.QtWidgets import QWidget, QTableWidgetItem, QMessageBox, QApplication
+from PySide6.QtCore import Qt, QDate, QTimer, QObject, Signal
+from PySide6.QtWidgets import QWidget, QTableWidgetItem, QMessageBox, QApplication, QFileDialog
 from PySide6.QtGui import QSyntaxHighlighter, QTextCharFormat
-from PySide6.QtWidgets import QVBoxLayout, QCalendarWidget, QLabel
-from requests import ConnectTimeout, ReadTimeout, Timeout
-from urllib3 import request
+from PySide6.QtWidgets import QVBoxLayout, QCalendarWidget, QLabel, QSpinBox, QComboBox, QPushButton, \
+    QProgressBar, QHBoxLayout, QPlainTextEdit, QCheckBox, QLineEdit
 
 from .component.analog_clock import AnalogClock
+from .component.body_source import BodySourceEditor
+from .component.body_viewer import BodyViewer
 from .component.digital_clock import DigitalClock
+from .component.request_queue import RequestQueueWidget
+from .component.text_viewer import TextViewer
+from .tick import get_tick_service
 from .ui.tool_widget import Ui_ToolWidget
 from app import util
-from app.util import time as timeutil, json_pretty
-from app.service.request import Request, RequestMethod, Response, RequestSettings
-from app.service.logger import LOGGER
-from .worker.request import RequestProgressEvent, RequestFinishEvent, RequestWorkerThread
+from app.util import time as timeutil
+from app.service import perf
+from app.service.logrewrite import RewriteMode, RewriteSettings, RewriteStats
+from app.service.logger import get_logger, Truncated
+from .worker.logrewrite import LogRewriteWorker
+from .worker.convert import ConvertWorker, ConvertType, ConvertPhase, ConvertProgressEvent, ConvertFinishEvent, \
+    TimeBatchWorker, TimeBatchResult
+from .worker.query import QueryWorker, QueryPhase, QueryProgressEvent, QueryFinishEvent, clear_documents
+
+# requests, urllib3 and everything built on them take longer to import than the rest of the app,
+# they are imported when the request tab is first shown
+if TYPE_CHECKING:
+    from app.service.compression import TransferStats
+    from app.service.request import Request, RequestTimings
+    from app.service.session import ConnectionTrace
+    from .worker.request import RequestProgressEvent, RequestChunkEvent, RequestFinishEvent
+    from .worker.scheduler import RequestScheduler, RequestJob
+
+
+LOGGER = get_logger(__name__)
+
+_RESP_DETAIL_BODY_PREVIEW = 4096
 
 
 class ToolWidget(QWidget):
+    tab_initialized = Signal(int)
+
     def __init__(self):
         super(ToolWidget, self).__init__()
         self.ui = Ui_ToolWidget()
         self.ui.setupUi(self)
 
-        # request
-        self._request_worker: Optional[RequestWorkerThread] = None
-
-        # init actions and widget
-        self._init_actions()
-        self._init_widget()
-
-    def _init_actions(self):
         # time
-        self.ui.currentTimeButton.clicked.connect(self.show_current_time)
-        self.ui.timestampConvertButton.clicked.connect(self.convert_timestamp)
-        self.ui.timestrConvertButton.clicked.connect(self.convert_timestr)
+        self._log_rewrite_worker: Optional[LogRewriteWorker] = None
+        self._time_batch_worker: Optional[TimeBatchWorker] = None
 
         # json
-        self.ui.jsonFormatButton.clicked.connect(self.format_json)
-        self.ui.jsonToYamlButton.clicked.connect(self.json_to_yaml)
-        self.ui.jsonFromYamlButton.clicked.connect(self.json_from_yaml)
-        self.ui.jsonResultCopyButton.clicked.connect(self.copy_json_result)
+        self._json_convert_worker: Optional[ConvertWorker] = None
+        self._json_query_worker: Optional[QueryWorker] = None
 
         # request
-        self.ui.requestInvokeButton.clicked.connect(self.invoke_request)
-        self.ui.requestExportCurlButton.clicked.connect(self.export_request_curl)
-        self.ui.requestHeadersResetButton.clicked.connect(self.reset_request_headers)
-        self.ui.requestHeadersAddButton.clicked.connect(self.add_request_header)
-        self.ui.requestHeadersRemoveButton.clicked.connect(self.remove_request_header)
-
-
-    def _init_widget(self):
-        # calendar
-        self._timerCalendar = QTimer(self)
-        self._timerCalendar.timeout.connect(self._ensure_current_date)
-        self._timerCalendar.start(100)
+        self._request_scheduler: Optional['RequestScheduler'] = None
+        self._request_current_job = 0
+        self._request_finish_evt: Optional['RequestFinishEvent'] = None
+        self._request_format_seconds = 0.0  # pretty printing ends after the response is shown
+        self._request_cache_hits = 0  # served from the cache, with or without a 304 revalidation, counted per job
+        self._request_cache_lookups = 0
+        self._request_cache_bytes_saved = 0
+
+        # tabs are built the first time they are shown, the current one right after the window is first painted
+        self._tab_initializers = {
+            self.ui.timeWidget: self._init_time_tab,
+            self.ui.jsonWidget: self._init_json_tab,
+            self.ui.requestWidget: self._init_request_tab,
+        }
+        self._painted = False
+        self.ui.tabWidget.currentChanged.connect(self._ensure_tab)
+
+    def paintEvent(self, event):
+        super(ToolWidget, self).paintEvent(event)
+        if not self._painted:
+            self._painted = True
+            QTimer.singleShot(0, lambda: self._ensure_tab(self.ui.tabWidget.currentIndex()))
+
+    def _ensure_tab(self, index: int):
+        init = self._tab_initializers.pop(self.ui.tabWidget.widget(index), None)
+        if init is None:
+            return
+        start = time.perf_counter()
+        init()
+        LOGGER.debug('tab %s initialized -> seconds: %.3f', index, time.perf_counter() - start)
+        self.tab_initialized.emit(index)
+
+    def _init_time_tab(self):
+        # time batch conversion, takes the place of the bottom spacer
+        self.timeBatchWidget = QWidget(self.ui.timeWidget)
+        self.timeBatchDirectionComboBox = QComboBox(self.timeBatchWidget)
+        self.timeBatchDirectionComboBox.addItem('时间戳 → 时间字符串', True)
+        self.timeBatchDirectionComboBox.addItem('时间字符串 → 时间戳', False)
+        self.timeBatchConvertButton = QPushButton('批量转换', self.timeBatchWidget)
+        self.timeBatchResultLabel = QLabel(self.timeBatchWidget)
+        self.timeBatchInputTextEdit = QPlainTextEdit(self.timeBatchWidget)
+        self.timeBatchInputTextEdit.setPlaceholderText('每行一个时间戳或时间字符串，精度与格式同上方设置')
+        self.timeBatchOutputViewer = TextViewer(self.timeBatchWidget)
+        self.timeBatchOutputViewer.setPlaceholderText('此处展示批量转换结果')
+        batch_action_layout = QHBoxLayout()
+        batch_action_layout.addWidget(self.timeBatchDirectionComboBox)
+        batch_action_layout.addWidget(self.timeBatchConvertButton)
+        batch_action_layout.addWidget(self.timeBatchResultLabel, 1)
+        batch_edit_layout = QHBoxLayout()
+        batch_edit_layout.addWidget(self.timeBatchInputTextEdit)
+        batch_edit_layout.addWidget(self.timeBatchOutputViewer)
+        self.timeLogRewriteModeComboBox = QComboBox(self.timeBatchWidget)
+        self.timeLogRewriteModeComboBox.addItem('日志：时间戳后标注时间', RewriteMode.ANNOTATE)
+        self.timeLogRewriteModeComboBox.addItem('日志：时间统一为当前格式', RewriteMode.NORMALIZE)
+        self.timeLogRewriteButton = QPushButton('改写日志文件...', self.timeBatchWidget)
+        self.timeLogRewriteProgressBar = QProgressBar(self.timeBatchWidget)
+        self.timeLogRewriteProgressBar.setRange(0, 1000)
+        self.timeLogRewriteProgressBar.setMaximumWidth(160)
+        self.timeLogRewriteProgressBar.setVisible(False)
+        self.timeLogRewriteResultLabel = QLabel(self.timeBatchWidget)
+        log_action_layout = QHBoxLayout()
+        log_action_layout.addWidget(self.timeLogRewriteModeComboBox)
+        log_action_layout.addWidget(self.timeLogRewriteButton)
+        log_action_layout.addWidget(self.timeLogRewriteProgressBar)
+        log_action_layout.addWidget(self.timeLogRewriteResultLabel, 1)
+        batch_layout = QVBoxLayout(self.timeBatchWidget)
+        batch_layout.setContentsMargins(0, 0, 0, 0)
+        batch_layout.addLayout(batch_action_layout)
+        batch_layout.addLayout(log_action_layout)
+        batch_layout.addLayout(batch_edit_layout)
+        self.ui.verticalLayout.removeItem(self.ui.timeVerticalSpacer)
+        self.ui.verticalLayout.addWidget(self.timeBatchWidget, 1)
+
+        # calendar, follows the date instead of polling it
+        get_tick_service().day_changed.connect(self._ensure_current_date)
 
         # individual clocks：AnalogClock + DigitalClock + 当前时间戳
         self._timeClockLayout = QVBoxLayout(self.ui.timeClockWidget)
@@ -71,9 +149,77 @@ class ToolWidget(QWidget):
         # set clocks to current time
         self.show_current_time()  # set current date here
 
-        # json
+        # actions
+        self.ui.currentTimeButton.clicked.connect(self.show_current_time)
+        self.ui.timestampConvertButton.clicked.connect(self.convert_timestamp)
+        self.ui.timestrConvertButton.clicked.connect(self.convert_timestr)
+        self.timeBatchConvertButton.clicked.connect(self.convert_time_batch)
+        self.timeLogRewriteButton.clicked.connect(self.rewrite_time_log)
+
+    def _init_json_tab(self):
+        # convert progress
+        self.jsonConvertProgressBar = QProgressBar(self.ui.jsonActionWidget)
+        self.jsonConvertProgressBar.setRange(0, 0)  # busy indicator, parsers do not report progress
+        self.jsonConvertProgressBar.setTextVisible(True)
+        self.jsonConvertProgressBar.setMaximumWidth(160)
+        self.jsonConvertProgressBar.setVisible(False)
+        self.jsonConvertCancelButton = QPushButton('取消', self.ui.jsonActionWidget)
+        self.jsonConvertCancelButton.setEnabled(False)
+        spacer_index = self.ui.horizontalLayout_2.indexOf(self.ui.jsonInputActionHorizontalSpacer)
+        self.ui.horizontalLayout_2.insertWidget(spacer_index, self.jsonConvertCancelButton)
+        self.ui.horizontalLayout_2.insertWidget(spacer_index, self.jsonConvertProgressBar)
+
+        # query
+        self.jsonQueryLineEdit = QLineEdit(self.ui.jsonActionWidget)
+        self.jsonQueryLineEdit.setPlaceholderText('JSONPath（$开头）或jq（.开头），如 $..id、.items[] | select(.ok) | .name')
+        self.jsonQueryLineEdit.setClearButtonEnabled(True)
+        self.jsonQueryLineEdit.setMinimumWidth(280)
+        self.jsonQueryButton = QPushButton('查询', self.ui.jsonActionWidget)
+        self.jsonQueryStatusLabel = QLabel(self.ui.jsonActionWidget)
+        progress_index = self.ui.horizontalLayout_2.indexOf(self.jsonConvertProgressBar)
+        self.ui.horizontalLayout_2.insertWidget(progress_index, self.jsonQueryStatusLabel)
+        self.ui.horizontalLayout_2.insertWidget(progress_index, self.jsonQueryButton)
+        self.ui.horizontalLayout_2.insertWidget(progress_index, self.jsonQueryLineEdit)
+
         self.ui.jsonFormatIndentComboBox.setCurrentText("4")  # default indent is 4
 
+        # actions
+        self.ui.jsonFormatButton.clicked.connect(self.format_json)
+        self.ui.jsonToYamlButton.clicked.connect(self.json_to_yaml)
+        self.ui.jsonFromYamlButton.clicked.connect(self.json_from_yaml)
+        self.ui.jsonResultCopyButton.clicked.connect(self.copy_json_result)
+        self.jsonConvertCancelButton.clicked.connect(self.cancel_json_convert)
+        self.jsonQueryButton.clicked.connect(self.query_json)
+        self.jsonQueryLineEdit.returnPressed.connect(self.query_json)
+        # the document parsed for the last query is stale once the input changes
+        self.ui.jsonTextEdit.textChanged.connect(clear_documents)
+
+    def _init_request_tab(self):
+        from app.service.request import Request
+        from .worker.scheduler import RequestScheduler, QueueOrder
+
+        self._request_scheduler = RequestScheduler(parent=self)
+
+        # extra actions
+        self.requestLoadTestButton = QPushButton('压测', self.ui.requestReqWidget)
+        self.requestLoadTestButton.setSizePolicy(self.ui.requestExportCurlButton.sizePolicy())
+        export_index = self.ui.verticalLayout_5.indexOf(self.ui.requestExportCurlButton)
+        self.ui.verticalLayout_5.insertWidget(export_index + 1, self.requestLoadTestButton)
+        self.requestHistoryButton = QPushButton('历史', self.ui.requestReqWidget)
+        self.requestHistoryButton.setSizePolicy(self.ui.requestExportCurlButton.sizePolicy())
+        self.ui.verticalLayout_5.insertWidget(export_index + 2, self.requestHistoryButton)
+        self.requestCollectionButton = QPushButton('集合', self.ui.requestReqWidget)
+        self.requestCollectionButton.setSizePolicy(self.ui.requestExportCurlButton.sizePolicy())
+        self.ui.verticalLayout_5.insertWidget(export_index + 3, self.requestCollectionButton)
+
+        # response body, QTextEdit lays out the whole document and cannot hold huge bodies
+        self.requestRespBodyViewer = BodyViewer(self.ui.requestRespBodyWidget)
+        self.requestRespBodyViewer.setFont(self.ui.requestRespBodyTextEdit.font())
+        self.requestRespBodyViewer.setPlaceholderText(self.ui.requestRespBodyTextEdit.placeholderText())
+        self.ui.requestRespBodyTextEdit.setVisible(False)
+        self.ui.verticalLayout_7.replaceWidget(self.ui.requestRespBodyTextEdit, self.requestRespBodyViewer)
+        self.requestRespBodyViewer.formatted.connect(self.on_request_body_formatted)
+
         # request
         default_request = Request()
         self.ui.requestMethodComboBox.setCurrentText(default_request.method)
@@ -81,11 +227,82 @@ class ToolWidget(QWidget):
         # request headers
         self.reset_request_headers()
 
+        # request body source, the text edit holds inline text only
+        self.requestBodySourceEditor = BodySourceEditor(self.ui.requestReqBodyWidget)
+        self.ui.verticalLayout_3.insertWidget(0, self.requestBodySourceEditor)
+        self.requestBodySourceEditor.kind_changed.connect(self.on_request_body_kind_changed)
+
         # request settings
         default_request_settings = default_request.settings
         self.ui.requestSettingsConnectTimeoutLineEdit.setText(str(default_request_settings.connect_timeout))
         self.ui.requestSettingsReadTimeoutLineEdit.setText(str(default_request_settings.read_timeout))
 
+        # response body settings
+        self.requestSettingsBodyMemorySpinBox = QSpinBox(self.ui.requestSettingsWidget)
+        self.requestSettingsBodyMemorySpinBox.setRange(1, 1024)
+        self.requestSettingsBodyMemorySpinBox.setValue(default_request_settings.body_memory_limit // (1024 * 1024))
+        self.ui.formLayout.addRow('响应内存上限（MB）', self.requestSettingsBodyMemorySpinBox)
+        self.requestSettingsCacheCheckBox = QCheckBox('使用缓存', self.ui.requestSettingsWidget)
+        self.requestSettingsCacheCheckBox.setToolTip('仅GET请求，遵循Cache-Control，过期后通过ETag/Last-Modified验证')
+        self.requestSettingsCacheCheckBox.setChecked(default_request_settings.use_cache)
+        self.ui.formLayout.addRow('缓存', self.requestSettingsCacheCheckBox)
+        from app.service import compression
+        self.requestSettingsCompressionCheckBox = QCheckBox('压缩传输', self.ui.requestSettingsWidget)
+        self.requestSettingsCompressionCheckBox.setToolTip(f'Accept-Encoding: {compression.accept_encoding()}')
+        self.requestSettingsCompressionCheckBox.setChecked(default_request_settings.compression)
+        self.requestSettingsCompressBodyCheckBox = QCheckBox('gzip压缩请求Body', self.ui.requestSettingsWidget)
+        self.requestSettingsCompressBodyCheckBox.setToolTip(
+            f'Body不小于{util.format_bytes(compression.MIN_COMPRESS_BODY_SIZE)}时压缩，'
+            f'服务端需支持Content-Encoding: gzip')
+        self.requestSettingsCompressBodyCheckBox.setChecked(default_request_settings.compress_body)
+        compression_layout = QHBoxLayout()
+        compression_layout.addWidget(self.requestSettingsCompressionCheckBox)
+        compression_layout.addWidget(self.requestSettingsCompressBodyCheckBox)
+        compression_layout.addStretch(1)
+        self.ui.formLayout.addRow('压缩', compression_layout)
+
+        # request queue settings
+        self.requestSettingsConcurrencySpinBox = QSpinBox(self.ui.requestSettingsWidget)
+        self.requestSettingsConcurrencySpinBox.setRange(1, 32)
+        self.requestSettingsConcurrencySpinBox.setValue(self._request_scheduler.max_concurrency)
+        self.ui.formLayout.addRow('并发数', self.requestSettingsConcurrencySpinBox)
+        self.requestSettingsPerHostSpinBox = QSpinBox(self.ui.requestSettingsWidget)
+        self.requestSettingsPerHostSpinBox.setRange(1, 32)
+        self.requestSettingsPerHostSpinBox.setValue(self._request_scheduler.max_per_host)
+        self.ui.formLayout.addRow('单主机并发数', self.requestSettingsPerHostSpinBox)
+        self.requestSettingsOrderComboBox = QComboBox(self.ui.requestSettingsWidget)
+        self.requestSettingsOrderComboBox.addItem('先进先出', QueueOrder.FIFO)
+        self.requestSettingsOrderComboBox.addItem('按优先级', QueueOrder.PRIORITY)
+        self.ui.formLayout.addRow('排队方式', self.requestSettingsOrderComboBox)
+        self.requestSettingsPrioritySpinBox = QSpinBox(self.ui.requestSettingsWidget)
+        self.requestSettingsPrioritySpinBox.setRange(-100, 100)
+        self.ui.formLayout.addRow('优先级', self.requestSettingsPrioritySpinBox)
+        self.requestSettingsConcurrencySpinBox.valueChanged.connect(self._update_request_queue_settings)
+        self.requestSettingsPerHostSpinBox.valueChanged.connect(self._update_request_queue_settings)
+        self.requestSettingsOrderComboBox.currentIndexChanged.connect(self._update_request_queue_settings)
+
+        # request queue
+        self.requestQueueWidget = RequestQueueWidget()
+        self.ui.requestRespTabWidget.addTab(self.requestQueueWidget, '请求队列')
+        self.requestQueueWidget.job_selected.connect(self.on_request_job_selected)
+        self.requestQueueWidget.cancel_requested.connect(self._request_scheduler.cancel)
+        self.requestQueueWidget.clear_requested.connect(self.clear_request_jobs)
+
+        # actions
+        self.ui.requestInvokeButton.clicked.connect(self.invoke_request)
+        self.ui.requestExportCurlButton.clicked.connect(self.export_request_curl)
+        self.requestLoadTestButton.clicked.connect(self.show_request_load_test)
+        self.requestHistoryButton.clicked.connect(self.show_request_history)
+        self.requestCollectionButton.clicked.connect(self.show_request_collection)
+        self.ui.requestHeadersResetButton.clicked.connect(self.reset_request_headers)
+        self.ui.requestHeadersAddButton.clicked.connect(self.add_request_header)
+        self.ui.requestHeadersRemoveButton.clicked.connect(self.remove_request_header)
+        self._request_scheduler.job_added.connect(self.on_request_job_added)
+        self._request_scheduler.job_started.connect(self.on_request_job_started)
+        self._request_scheduler.job_progress.connect(self.on_request_job_progress)
+        self._request_scheduler.job_chunk.connect(self.on_request_job_chunk)
+        self._request_scheduler.job_finished.connect(self.on_request_job_finished)
+
     def _get_time_precision(self):
         precision_type = self.ui.timeSettingsPrecisionComboBox.currentText()
         if precision_type == '毫秒':
@@ -112,7 +329,7 @@ class ToolWidget(QWidget):
     def _set_current_date(self):
         self.ui.timeCalendarWidget.setSelectedDate(QDate.currentDate())
 
-    def _ensure_current_date(self):
+    def _ensure_current_date(self, *_):
         if self.ui.timeCalendarWidget.selectedDate() != QDate.currentDate():
             self._set_current_date()
 
@@ -194,6 +411,108 @@ class ToolWidget(QWidget):
         else:
             self.ui.timestrConvertResultLineEdit.setText(f'{timestamp}')
 
+    def convert_time_batch(self):
+        if self._time_batch_worker is not None:
+            self._time_batch_worker.cancel()
+            return
+        content = self.timeBatchInputTextEdit.toPlainText()
+        if not content:
+            self.timeBatchResultLabel.setText('未输入内容')
+            return
+        fmt = self._get_time_format()
+        if fmt == '':
+            self.timeBatchResultLabel.setText('不支持当前转换格式')
+            return
+        precision = self._get_time_precision()
+
+        to_strings = self.timeBatchDirectionComboBox.currentData()
+        self._time_batch_worker = TimeBatchWorker(content, to_strings, precision, fmt, parent=self)
+        self._time_batch_worker.signals.progress.connect(self.on_time_batch_progress)
+        self._time_batch_worker.signals.finish.connect(self.on_time_batch_finish)
+        self.timeBatchConvertButton.setText('取消')
+        self.timeBatchResultLabel.setText('转换中...')
+        self._time_batch_worker.start()
+
+    def on_time_batch_progress(self, evt: ConvertProgressEvent):
+        if evt.phase == ConvertPhase.DUMP:
+            self.timeBatchResultLabel.setText('生成结果中...')
+
+    def on_time_batch_finish(self, evt: ConvertFinishEvent):
+        LOGGER.debug('time batch finish -> phase: %s, seconds: %.3f', evt.phase, evt.seconds)
+        if self._time_batch_worker is not None:
+            self._time_batch_worker.deleteLater()
+            self._time_batch_worker = None
+        self.timeBatchConvertButton.setText('批量转换')
+        if evt.cancelled:
+            self.timeBatchResultLabel.setText('已取消')
+            return
+        if evt.err is not None:
+            self.timeBatchResultLabel.setText(f'转换失败：{evt.err}')
+            return
+        result: TimeBatchResult = evt.result
+        self.timeBatchOutputViewer.set_buffer(result.buffer)
+        self.timeBatchResultLabel.setText(
+            f'共 {result.total} 行，失败 {result.failed} 行，用时 {result.convert_seconds:.3f}s'
+            f'（{timeutil.BATCH_BACKEND}，总用时 {evt.seconds:.3f}s）')
+
+    def _get_log_rewrite_settings(self) -> RewriteSettings:
+        settings = RewriteSettings(self.timeLogRewriteModeComboBox.currentData())
+        format_type_lower = self.ui.timeSettingsFormatComboBox.currentText().lower()
+        if format_type_lower.startswith('默认'):
+            settings.fmt_type = 'default'
+        elif format_type_lower.startswith('rfc3339'):
+            settings.fmt_type = 'rfc3339'
+        else:
+            settings.custom_format = self.ui.timeSettingsCustomFormatLineEdit.text()
+        return settings
+
+    def rewrite_time_log(self):
+        if self._log_rewrite_worker is not None:
+            self._log_rewrite_worker.stop()
+            self.timeLogRewriteButton.setEnabled(False)
+            return
+        settings = self._get_log_rewrite_settings()
+        if settings.fmt_type == '' and settings.custom_format == '':
+            self.timeLogRewriteResultLabel.setText('不支持当前转换格式')
+            return
+        src_path, _ = QFileDialog.getOpenFileName(self, '选择日志文件', '', '日志文件 (*.log *.txt *.jsonl);;所有文件 (*)')
+        if not src_path:
+            return
+        dst_path, _ = QFileDialog.getSaveFileName(self, '保存改写结果', src_path + '.rewritten', '所有文件 (*)')
+        if not dst_path:
+            return
+
+        self._log_rewrite_worker = LogRewriteWorker(src_path, dst_path, settings, self)
+        self._log_rewrite_worker.signals.progress.connect(self.on_time_log_rewrite_progress)
+        self._log_rewrite_worker.signals.finish.connect(self.on_time_log_rewrite_finish)
+        self.timeLogRewriteButton.setText('停止')
+        self.timeLogRewriteProgressBar.setValue(0)
+        self.timeLogRewriteProgressBar.setVisible(True)
+        self.timeLogRewriteResultLabel.setText('改写中...')
+        self._log_rewrite_worker.start()
+
+    def on_time_log_rewrite_progress(self, stats: RewriteStats):
+        if stats.total_bytes > 0:
+            self.timeLogRewriteProgressBar.setValue(int(stats.read_bytes * 1000 / stats.total_bytes))
+        self.timeLogRewriteResultLabel.setText(
+            f'{util.format_bytes(stats.read_bytes)} / {util.format_bytes(stats.total_bytes)}，{stats.lines} 行')
+
+    def on_time_log_rewrite_finish(self, stats: RewriteStats, err: Optional[Exception]):
+        dst_path = self._log_rewrite_worker.dst_path
+        self._log_rewrite_worker.deleteLater()
+        self._log_rewrite_worker = None
+        self.timeLogRewriteButton.setText('改写日志文件...')
+        self.timeLogRewriteButton.setEnabled(True)
+        self.timeLogRewriteProgressBar.setVisible(False)
+        if isinstance(err, InterruptedError):
+            self.timeLogRewriteResultLabel.setText('已停止，未写入结果')
+        elif err is not None:
+            self.timeLogRewriteResultLabel.setText(f'改写失败：{err}')
+        else:
+            self.timeLogRewriteResultLabel.setText(
+                f'{stats.lines} 行，时间戳 {stats.epochs} 个，时间字符串 {stats.strings} 个，'
+                f'失败 {stats.failed} 个，用时 {stats.seconds:.3f}s，已写入 {dst_path}')
+
     def _get_json_indent(self):
         indent_text = self.ui.jsonFormatIndentComboBox.currentText()
         try:
@@ -209,46 +528,112 @@ class ToolWidget(QWidget):
 
 
     def format_json(self):
-        content = self.ui.jsonTextEdit.toPlainText()
-        obj, e = util.json_load(content)
-        if e is not None:
-            self.ui.jsonResultTextEdit.setText(f'解析JSON失败：{e}')
-            return
-
-        indent = self._get_json_indent()
-        format_content, e = util.json_dump(obj, indent=indent, ensure_ascii=False)
-        if e is not None:
-            self.ui.jsonResultTextEdit.setText(f'格式化JSON失败：{e}')
-        else:
-            self.ui.jsonResultTextEdit.setText(f'{format_content}')
+        self._start_json_convert(ConvertType.JSON_FORMAT)
 
     def json_to_yaml(self):
+        self._start_json_convert(ConvertType.JSON_TO_YAML)
+
+    def json_from_yaml(self):
+        self._start_json_convert(ConvertType.JSON_FROM_YAML)
+
+    def _start_json_convert(self, convert_type: str):
+        self.cancel_json_convert()
         content = self.ui.jsonTextEdit.toPlainText()
-        obj, e = util.json_load(content)
-        if e is not None:
-            self.ui.jsonResultTextEdit.setText(f'解析JSON失败：{e}')
+        self._json_convert_worker = ConvertWorker(convert_type, content, self._get_json_indent(), parent=self)
+        self._json_convert_worker.signals.progress.connect(self.on_json_convert_progress)
+        self._json_convert_worker.signals.finish.connect(self.on_json_convert_finish)
+        self.jsonConvertProgressBar.setVisible(True)
+        self.jsonConvertProgressBar.setFormat('解析中')
+        self.jsonConvertCancelButton.setEnabled(True)
+        self.jsonQueryStatusLabel.clear()
+        self._json_convert_worker.start()
+
+    def cancel_json_convert(self):
+        if self._json_convert_worker is not None:
+            self._json_convert_worker.cancel()
+        if self._json_query_worker is not None:
+            self._json_query_worker.cancel()
+
+    def query_json(self):
+        expression = self.jsonQueryLineEdit.text().strip()
+        if not expression:
             return
-
-        indent = self._get_json_indent()
-        format_content, e = util.yaml_dump(obj, indent=indent, allow_unicode=True)
-        if e is not None:
-            self.ui.jsonResultTextEdit.setText(f'JSON转YAML失败：{e}')
+        self.cancel_json_convert()
+        content = self.ui.jsonTextEdit.toPlainText()
+        self._json_query_worker = QueryWorker(
+            expression, content, dump=True, indent=self._get_json_indent(), parent=self)
+        self._json_query_worker.signals.progress.connect(self.on_json_query_progress)
+        self._json_query_worker.signals.finish.connect(self.on_json_query_finish)
+        self.jsonConvertProgressBar.setVisible(True)
+        self.jsonConvertProgressBar.setFormat('查询中')
+        self.jsonConvertCancelButton.setEnabled(True)
+        self.jsonQueryStatusLabel.clear()
+        self._json_query_worker.start()
+
+    def on_json_query_progress(self, evt: QueryProgressEvent):
+        if evt.phase == QueryPhase.PARSE:
+            self.jsonConvertProgressBar.setFormat('解析中')
         else:
-            self.ui.jsonResultTextEdit.setText(f'{format_content}')
+            self.jsonConvertProgressBar.setFormat(f'查询中 {evt.count}')
+
+    def on_json_query_finish(self, evt: QueryFinishEvent):
+        LOGGER.debug('json query finish -> count: %s, seconds: %.3f', evt.count, evt.seconds)
+        if self._json_query_worker is not None:
+            self._json_query_worker.deleteLater()
+            self._json_query_worker = None
+        self.jsonConvertProgressBar.setVisible(False)
+        self.jsonConvertCancelButton.setEnabled(False)
+        if evt.cancelled:
+            return
 
-    def json_from_yaml(self):
-        content = self.ui.jsonTextEdit.toPlainText()
-        obj, e = util.yaml_load(content)
-        if e is not None:
-            self.ui.jsonResultTextEdit.setText(f'解析YAML失败：{e}')
+        if evt.err is not None and evt.phase == QueryPhase.PARSE:
+            self.ui.jsonResultTextEdit.setText(f'解析JSON失败：{evt.err}')
+            return
+        if evt.err is not None and not evt.results:
+            self.ui.jsonResultTextEdit.setText(f'查询失败：{evt.err}')
+            return
+        self.ui.jsonResultTextEdit.setPlainText(evt.text)
+        status = f'{evt.count} 个结果'
+        if evt.truncated:
+            status += f'，仅展示前 {len(evt.results)} 个'
+        if evt.err is not None:
+            status = f'查询中断：{evt.err}，已有' + status
+        self.jsonQueryStatusLabel.setText(status)
+
+    def on_json_convert_progress(self, evt: ConvertProgressEvent):
+        if evt.phase == ConvertPhase.PARSE:
+            self.jsonConvertProgressBar.setFormat('解析中')
+        elif evt.phase == ConvertPhase.DUMP:
+            self.jsonConvertProgressBar.setFormat('格式化中')
+
+    def on_json_convert_finish(self, evt: ConvertFinishEvent):
+        LOGGER.debug('json convert finish -> type: %s, seconds: %.3f', evt.convert_type, evt.seconds)
+        if self._json_convert_worker is not None:
+            self._json_convert_worker.deleteLater()
+            self._json_convert_worker = None
+        self.jsonConvertProgressBar.setVisible(False)
+        self.jsonConvertCancelButton.setEnabled(False)
+        if evt.cancelled:
             return
 
-        indent = self._get_json_indent()
-        format_content, e = util.json_dump(obj, indent=indent, ensure_ascii=False)
-        if e is not None:
-            self.ui.jsonResultTextEdit.setText(f'YAML转JSON失败：{e}')
-        else:
-            self.ui.jsonResultTextEdit.setText(f'{format_content}')
+        if evt.err is None:
+            self.ui.jsonResultTextEdit.setPlainText(evt.result)
+            return
+        if evt.convert_type == ConvertType.JSON_FORMAT:
+            if evt.phase == ConvertPhase.PARSE:
+                self.ui.jsonResultTextEdit.setText(f'解析JSON失败：{evt.err}')
+            else:
+                self.ui.jsonResultTextEdit.setText(f'格式化JSON失败：{evt.err}')
+        elif evt.convert_type == ConvertType.JSON_TO_YAML:
+            if evt.phase == ConvertPhase.PARSE:
+                self.ui.jsonResultTextEdit.setText(f'解析JSON失败：{evt.err}')
+            else:
+                self.ui.jsonResultTextEdit.setText(f'JSON转YAML失败：{evt.err}')
+        elif evt.convert_type == ConvertType.JSON_FROM_YAML:
+            if evt.phase == ConvertPhase.PARSE:
+                self.ui.jsonResultTextEdit.setText(f'解析YAML失败：{evt.err}')
+            else:
+                self.ui.jsonResultTextEdit.setText(f'YAML转JSON失败：{evt.err}')
 
     def copy_json_result(self):
         result_text = self.ui.jsonResultTextEdit.toPlainText()
@@ -261,15 +646,17 @@ class ToolWidget(QWidget):
         if not isinstance(headers, dict):
             self.ui.requestHeadersTableWidget.setRowCount(0)
             return
-        self.ui.requestHeadersTableWidget.setRowCount(len(headers))
-        r = 0
-        for k in sorted(headers.keys()):
-            v = headers[k]
-            self.ui.requestHeadersTableWidget.setItem(r, 0, QTableWidgetItem(k))
-            self.ui.requestHeadersTableWidget.setItem(r, 1, QTableWidgetItem(v))
-            r += 1
+        with perf.span('render.request_headers', perf.SpanCategory.RENDER, rows=len(headers)):
+            self.ui.requestHeadersTableWidget.setRowCount(len(headers))
+            r = 0
+            for k in sorted(headers.keys()):
+                v = headers[k]
+                self.ui.requestHeadersTableWidget.setItem(r, 0, QTableWidgetItem(k))
+                self.ui.requestHeadersTableWidget.setItem(r, 1, QTableWidgetItem(v))
+                r += 1
 
     def reset_request_headers(self):
+        from app.service.request import Request
         req = Request()
         self._set_request_headers(req.headers)
 
@@ -289,20 +676,78 @@ class ToolWidget(QWidget):
     def _set_request_status(self, status: str):
         self.ui.requestStatusLabel.setText(f'状态：{status}')
 
-    def _set_request_duration(self, seconds: float):
-        self.ui.requestDurationLabel.setText(f'用时：{seconds:.3f}s')
+    def _set_request_duration(self, seconds: float, trace: Optional['ConnectionTrace'] = None,
+                              cached: bool = False, transfer: Optional['TransferStats'] = None):
+        if cached:
+            text = f'用时：{seconds:.3f}s（缓存）'
+        elif trace is None:
+            text = f'用时：{seconds:.3f}s'
+        elif trace.reused:
+            text = f'用时：{seconds:.3f}s（复用连接）'
+        else:
+            text = f'用时：{seconds:.3f}s（握手 {trace.connect_seconds:.3f}s）'
+        if transfer is not None and transfer.content_encoding and transfer.wire_bytes:
+            text += f'  传输 {util.format_bytes(transfer.wire_bytes)}' \
+                    f'（{transfer.content_encoding}，解压后 {util.format_bytes(transfer.decoded_bytes)}，' \
+                    f'解压 {transfer.decompress_seconds * 1e3:.1f}ms）'
+        self.ui.requestDurationLabel.setText(text)
+
+    def _get_request_status(self, evt: 'RequestFinishEvent') -> str:
+        from requests import ConnectTimeout, ReadTimeout, Timeout
+        if evt.resp is None:
+            if evt.err is None:
+                return '无响应'
+            if isinstance(evt.err, CancelledError):
+                return '已取消'
+            if isinstance(evt.err, (Timeout, ConnectTimeout, ReadTimeout)):
+                return '请求超时'
+            return '请求异常'
+        status_code = evt.resp.status_code
+        if 200 <= status_code < 300:
+            return f'{status_code} 成功'
+        elif 300 <= status_code < 400:
+            return f'{status_code} 重定向'
+        elif 400 <= status_code < 500:
+            return f'{status_code} 客户端错误'
+        elif 500 <= status_code < 600:
+            return f'{status_code} 服务器错误'
+        else:
+            return f'{status_code} 未知'
 
     def on_request_start(self, _):
-        LOGGER.debug(f'request start')
-        self.ui.requestInvokeButton.setEnabled(False)
+        LOGGER.debug('request start')
         self._set_request_status('执行中')
         self._set_request_duration(0)
 
-    def on_request_progress(self, evt: RequestProgressEvent):
-        LOGGER.debug(f'request progress -> seconds: {evt.seconds}')
-        self._set_request_duration(evt.seconds)
+    def on_request_progress(self, evt: 'RequestProgressEvent'):
+        if evt.bytes_received <= 0 and evt.bytes_total > 0:
+            percent = evt.bytes_sent * 100 / evt.bytes_total
+            self.ui.requestDurationLabel.setText(
+                f'用时：{evt.seconds:.3f}s  已发送 {util.format_bytes(evt.bytes_sent)}'
+                f'/{util.format_bytes(evt.bytes_total)}（{percent:.1f}%，{util.format_bytes(evt.upload_throughput)}/s）'
+            )
+            return
+        if evt.bytes_received <= 0:
+            self._set_request_duration(evt.seconds)
+            return
+        self.ui.requestDurationLabel.setText(
+            f'用时：{evt.seconds:.3f}s  已接收 {util.format_bytes(evt.bytes_received)}'
+            f'（{util.format_bytes(evt.throughput)}/s）'
+        )
 
-    def _gen_resp_detail(self, evt: RequestFinishEvent):
+    def on_request_chunk(self, evt: 'RequestChunkEvent'):
+        if evt.json_index is not None:
+            self.requestRespBodyViewer.set_stream_index(evt.json_index)
+        self.requestRespBodyViewer.append_text(evt.text)
+
+    def _gen_resp_waterfall(self, timings: 'RequestTimings'):
+        rows = timings.phases()
+        if self._request_format_seconds > 0:
+            rows.append(('format', timings.total_seconds, self._request_format_seconds))
+        return util.format_waterfall(rows)
+
+    @perf.traced('render.gen_resp_detail', perf.SpanCategory.RENDER)
+    def _gen_resp_detail(self, evt: 'RequestFinishEvent'):
         lines = []
         # indent = ' ' * 2
 
@@ -320,6 +765,8 @@ class ToolWidget(QWidget):
                 lines.append(f'{k}: {v}')
             lines.append(''),
             lines.append(f'{"-" * 15} Body ({len(evt.req.body)}) {"-" * 15}')
+            if evt.req.body_source.streamed:
+                lines.append(f'({evt.req.body_source.describe()})')
             lines.append(str(evt.req.body))
         lines.append('\n')
 
@@ -329,13 +776,25 @@ class ToolWidget(QWidget):
             lines.append('无')
         else:
             lines.append(f'Status Code：{evt.resp.status_code}')
+            if evt.trace is not None:
+                lines.append(f'Connection: {"reused" if evt.trace.reused else "new"}, '
+                             f'handshake {evt.trace.connect_seconds:.3f}s')
+            lines.append(f'Transfer: {evt.resp.transfer.summary()}')
+            lines.append(''),
+            lines.append(f'{"-" * 15} Timings ({evt.resp.timings.total_seconds:.3f}s) {"-" * 15}')
+            lines.extend(self._gen_resp_waterfall(evt.resp.timings))
             lines.append(''),
             lines.append(f'{"-" * 15} Headers ({len(evt.resp.headers)}) {"-" * 15}'),
             for k, v in evt.resp.headers.items():
                 lines.append(f'{k}: {v}')
             lines.append(''),
-            lines.append(f'{"-" * 15} Body ({len(evt.resp.body)}) {"-" * 15}')
-            lines.append(str(evt.resp.body))
+            lines.append(f'{"-" * 15} Body ({evt.resp.body_size}) {"-" * 15}')
+            if evt.resp.truncated:
+                lines.append(f'(truncated, full body saved to {evt.resp.body_file})')
+            # the body tab already shows the body, keep only a preview here
+            lines.append(evt.resp.body[:_RESP_DETAIL_BODY_PREVIEW])
+            if len(evt.resp.body) > _RESP_DETAIL_BODY_PREVIEW:
+                lines.append('...... 见 Body 标签页')
         lines.append('\n')
 
         # err
@@ -347,40 +806,60 @@ class ToolWidget(QWidget):
 
         return '\n'.join(lines)
 
-    def on_request_finish(self, evt: RequestFinishEvent):
-        LOGGER.debug(f'request finish -> resp: {str(evt.resp)}, err: {evt.err}')
+    def _count_request_cache(self, evt: Optional['RequestFinishEvent']):
+        """once per finished job, a process pool worker keeps cache stats of its own so they are counted here"""
+        from app.service.cache import CacheStatus
+        if evt is None or evt.resp is None or evt.resp.cache_status == CacheStatus.NONE:
+            return
+        self._request_cache_lookups += 1
+        if evt.resp.cache_status != CacheStatus.MISS:
+            self._request_cache_hits += 1
+            self._request_cache_bytes_saved += evt.resp.body_size
+
+    def _get_request_cache_note(self, evt: 'RequestFinishEvent') -> str:
+        from app.service.cache import CacheStatus
+        if evt.resp is None or evt.resp.cache_status == CacheStatus.NONE:
+            return ''
+        if evt.resp.cache_status == CacheStatus.MISS:
+            note = '缓存未命中'
+        else:
+            note = '缓存命中' if evt.resp.cache_status == CacheStatus.HIT else '缓存验证未变更（304）'
+        return f'（{note}，累计命中 {self._request_cache_hits}/{self._request_cache_lookups}，' \
+               f'节省 {util.format_bytes(self._request_cache_bytes_saved)}）'
+
+    def on_request_finish(self, evt: 'RequestFinishEvent'):
+        LOGGER.debug('request finish -> status: %s, size: %s, err: %s',
+                     evt.resp.status_code if evt.resp is not None else None,
+                     evt.resp.body_size if evt.resp is not None else 0, evt.err)
+        with perf.span('render.request_finish', perf.SpanCategory.RENDER):
+            self._render_request_finish(evt)
+
+    def _render_request_finish(self, evt: 'RequestFinishEvent'):
+        self._request_finish_evt = evt
+        self._request_format_seconds = 0.0
 
         # set resp status
-        if evt.resp is None:
-            if evt.err is None:
-                self._set_request_status('无响应')
-            else:
-                if isinstance(evt.err, (Timeout, ConnectTimeout, ReadTimeout)):
-                    self._set_request_status('请求超时')
-                else:
-                    self._set_request_status('请求异常')
-        else:
-            status_code = evt.resp.status_code
-            if 200 <= status_code < 300:
-                self._set_request_status(f'{status_code} 成功')
-            elif 300 <= status_code < 400:
-                self._set_request_status(f'{status_code} 重定向')
-            elif 400 <= status_code < 500:
-                self._set_request_status(f'{status_code} 客户端错误')
-            elif 500 <= status_code < 600:
-                self._set_request_status(f'{status_code} 服务器错误')
-            else:
-                self._set_request_status(f'{status_code} 未知')
+        self._set_request_status(self._get_request_status(evt) + self._get_request_cache_note(evt))
 
         # set resp duration
-        self._set_request_duration(evt.seconds)
+        from app.service.cache import CacheStatus
+        cached = evt.resp is not None and evt.resp.cache_status == CacheStatus.HIT
+        transfer = evt.resp.transfer if evt.resp is not None else None
+        self._set_request_duration(evt.seconds, evt.trace, cached, transfer)
 
         # set resp body
-        if evt.resp is None:
-            self.ui.requestRespBodyTextEdit.clear()
-        else:
-            body = json_pretty(evt.resp.body)
-            self.ui.requestRespBodyTextEdit.setText(body)
+        with perf.span('render.resp_body', perf.SpanCategory.RENDER):
+            if evt.resp is None:
+                self.requestRespBodyViewer.clear()
+            elif evt.resp.truncated:
+                note = f'内容过大（{util.format_bytes(evt.resp.body_size)}），直接展示文件：{evt.resp.body_file}'
+                err = self.requestRespBodyViewer.set_file(evt.resp.body_file, note, evt.json_index)
+                if err is not None:
+                    LOGGER.debug('map response body failed -> file: %s, err: %s', evt.resp.body_file, err)
+                    self.requestRespBodyViewer.set_text(
+                        evt.resp.body, f'内容过大，仅展示前 {util.format_bytes(len(evt.resp.body))}')
+            else:
+                self.requestRespBodyViewer.set_text(evt.resp.body, json_index=evt.json_index)
 
         # set resp headers
         if evt.resp is None:
@@ -388,39 +867,101 @@ class ToolWidget(QWidget):
         else:
             headers = evt.resp.headers
             headers_size = len(headers.keys())
-            self.ui.requestRespHeadersTableWidget.setRowCount(headers_size)
-            r = 0
-            for k in sorted(headers.keys()):
-                v = headers[k]
-                self.ui.requestRespHeadersTableWidget.setItem(r, 0, QTableWidgetItem(k))
-                self.ui.requestRespHeadersTableWidget.setItem(r, 1, QTableWidgetItem(v))
-                r += 1
+            with perf.span('render.resp_headers', perf.SpanCategory.RENDER, rows=headers_size):
+                self.ui.requestRespHeadersTableWidget.setRowCount(headers_size)
+                r = 0
+                for k in sorted(headers.keys()):
+                    v = headers[k]
+                    self.ui.requestRespHeadersTableWidget.setItem(r, 0, QTableWidgetItem(k))
+                    self.ui.requestRespHeadersTableWidget.setItem(r, 1, QTableWidgetItem(v))
+                    r += 1
 
         # set resp detail
         detail = self._gen_resp_detail(evt)
         self.ui.requestRespDetailTextEdit.setText(detail)
 
-        # clear all states
-        if self._request_worker:
-            self._request_worker.quit()
-            self._request_worker.wait()
-            self._request_worker.deleteLater()
-            self._request_worker = None
-        self.ui.requestInvokeButton.setEnabled(True)
+    def on_request_body_formatted(self, seconds: float):
+        evt = self._request_finish_evt
+        if evt is None or evt.resp is None:
+            return
+        self._request_format_seconds = seconds
+        self.ui.requestRespDetailTextEdit.setText(self._gen_resp_detail(evt))
+
+    def _get_job_status(self, job: 'RequestJob') -> str:
+        from .worker.scheduler import JobState
+        if job.evt is not None:
+            return self._get_request_status(job.evt)
+        if job.state == JobState.RUNNING:
+            return '执行中'
+        return '排队中'
+
+    def on_request_job_added(self, job: 'RequestJob'):
+        self._request_current_job = job.id
+        self.requestQueueWidget.add_job(job.id, job.req.method, job.req.url, self._get_job_status(job))
+        self._set_request_status(self._get_job_status(job))
+        self._set_request_duration(0)
+
+    def on_request_job_started(self, job: 'RequestJob'):
+        self.requestQueueWidget.update_job(job.id, self._get_job_status(job))
+        if job.id == self._request_current_job:
+            self.on_request_start(None)
+
+    def on_request_job_progress(self, job: 'RequestJob', evt: 'RequestProgressEvent'):
+        self.requestQueueWidget.update_job(job.id, seconds=evt.seconds)
+        if job.id == self._request_current_job:
+            self.on_request_progress(evt)
+
+    def on_request_job_chunk(self, job: 'RequestJob', evt: 'RequestChunkEvent'):
+        if job.id == self._request_current_job:
+            self.on_request_chunk(evt)
+
+    def on_request_job_finished(self, job: 'RequestJob'):
+        self._record_request_history(job.evt)
+        self._count_request_cache(job.evt)
+        seconds = job.evt.seconds if job.evt is not None else -1
+        self.requestQueueWidget.update_job(job.id, self._get_job_status(job), seconds)
+        if job.id == self._request_current_job and job.evt is not None:
+            self.on_request_finish(job.evt)
+
+    def on_request_job_selected(self, job_id: int):
+        job = self._request_scheduler.job(job_id)
+        if job is None or job_id == self._request_current_job:
+            return
+        self._request_current_job = job_id
+        self._reset_request_state()
+        if job.evt is not None:
+            self.on_request_finish(job.evt)
+        else:
+            self._set_request_status(self._get_job_status(job))
+
+    def clear_request_jobs(self):
+        current = self._request_scheduler.job(self._request_current_job)
+        if current is not None and current.is_done():
+            # the viewer may still map the spill file that goes away with the job
+            self._request_current_job = 0
+            self._reset_request_state()
+        removed = self._request_scheduler.remove_done()
+        self.requestQueueWidget.remove_jobs(removed)
+
+    def _update_request_queue_settings(self):
+        self._request_scheduler.set_limits(
+            self.requestSettingsConcurrencySpinBox.value(),
+            self.requestSettingsPerHostSpinBox.value()
+        )
+        self._request_scheduler.set_order(self.requestSettingsOrderComboBox.currentData())
 
     def _reset_request_state(self):
         """clear all previous request states"""
-        if self._request_worker is not None:
-            self._request_worker.quit()
-            self._request_worker.wait()
-            self._request_worker.deleteLater()
-            self._request_worker = None
-
-        self.ui.requestRespBodyTextEdit.clear()
+        self._request_finish_evt = None
+        self._request_format_seconds = 0.0
+        self.requestRespBodyViewer.clear()
         self.ui.requestRespHeadersTableWidget.setRowCount(0)
         self.ui.requestRespDetailTextEdit.clear()
 
-    def _gen_request(self) -> Request:
+    def _gen_request(self) -> 'Request':
+        from app.service.body import BodyKind
+        from app.service.request import Request, RequestSettings
+
         # load headers
         headers = {}
         for r in range(self.ui.requestHeadersTableWidget.rowCount()):
@@ -439,31 +980,92 @@ class ToolWidget(QWidget):
             settings.read_timeout = int(self.ui.requestSettingsReadTimeoutLineEdit.text())
         except Exception:
             pass
+        settings.body_memory_limit = self.requestSettingsBodyMemorySpinBox.value() * 1024 * 1024
+        settings.use_cache = self.requestSettingsCacheCheckBox.isChecked()
+        settings.compression = self.requestSettingsCompressionCheckBox.isChecked()
+        settings.compress_body = self.requestSettingsCompressBodyCheckBox.isChecked()
+
+        # load body, the text is ignored for files and forms
+        body_source = self.requestBodySourceEditor.source()
+        body = self.ui.requestReqBodyTextEdit.toPlainText().strip() if body_source.kind == BodyKind.TEXT else ''
 
         # generate request
         req = Request(
             method=self.ui.requestMethodComboBox.currentText(),
             url = self.ui.requestUrlLineEdit.text(),
             headers=headers,
-            body=self.ui.requestReqBodyTextEdit.toPlainText().strip(),
-            settings=settings
+            body=body,
+            settings=settings,
+            body_source=body_source
         )
         return req
 
     def invoke_request(self):
         LOGGER.debug('invoke request -> triggered')
-        if self._request_worker is not None and self._request_worker.isRunning():
-            LOGGER.warning(f'cannot invoke request, request worker is active')
-            return
         self._reset_request_state()
         req = self._gen_request()
-        LOGGER.debug(f'invoke request -> req: {req.args()}')
-        self._request_worker = RequestWorkerThread(req, parent=self)
-        self._request_worker.signals.start.connect(self.on_request_start)
-        self._request_worker.signals.progress.connect(self.on_request_progress)
-        self._request_worker.signals.finish.connect(self.on_request_finish)
-        self._request_worker.start(priority=QThread.Priority.LowPriority)
-        LOGGER.debug(f'invoke request -> thread started')
+        LOGGER.debug('invoke request -> %s %s, headers: %s, body: %s',
+                     req.method, req.url, len(req.headers), Truncated(req.body))
+        job = self._request_scheduler.submit(req, priority=self.requestSettingsPrioritySpinBox.value())
+        LOGGER.debug('invoke request -> job %s queued', job.id)
+
+    def _record_request_history(self, evt: Optional['RequestFinishEvent']):
+        if evt is None or evt.req is None or isinstance(evt.err, CancelledError):
+            return
+        from app.service.history import HistoryEntry, get_history_store
+        store, err = get_history_store()
+        if err is not None:
+            LOGGER.warning('record request history failed -> err: %s', err)
+            return
+        store.append(HistoryEntry.from_request(evt.req, evt.resp, evt.err, evt.seconds, evt.trace))
+
+    def on_request_body_kind_changed(self, kind: str):
+        from app.service.body import BodyKind
+        self.ui.requestReqBodyTextEdit.setVisible(kind == BodyKind.TEXT)
+
+    def show_request_history(self):
+        from app.service.history import get_history_store
+        from .history_dialog import HistoryDialog
+        store, err = get_history_store()
+        if err is not None:
+            QMessageBox.critical(self, '请求历史', f'打开请求历史失败！错误信息：{err}')
+            return
+        dialog = HistoryDialog(store, parent=self)
+        dialog.rerun_requested.connect(self.rerun_request)
+        dialog.show()
+
+    def _set_request(self, req: 'Request'):
+        self.ui.requestMethodComboBox.setCurrentText(req.method)
+        self.ui.requestUrlLineEdit.setText(req.url)
+        self._set_request_headers(req.headers)
+        self.ui.requestReqBodyTextEdit.setPlainText(req.body)
+        self.requestBodySourceEditor.set_source(req.body_source)
+        self.ui.requestSettingsConnectTimeoutLineEdit.setText(str(req.settings.connect_timeout))
+        self.ui.requestSettingsReadTimeoutLineEdit.setText(str(req.settings.read_timeout))
+        self.requestSettingsBodyMemorySpinBox.setValue(req.settings.body_memory_limit // (1024 * 1024))
+        self.requestSettingsCacheCheckBox.setChecked(req.settings.use_cache)
+        self.requestSettingsCompressionCheckBox.setChecked(req.settings.compression)
+        self.requestSettingsCompressBodyCheckBox.setChecked(req.settings.compress_body)
+
+    def rerun_request(self, req: 'Request'):
+        self._set_request(req)
+        self.invoke_request()
+
+    def show_request_load_test(self):
+        req = self._gen_request()
+        err = req.validate()
+        if err is not None:
+            QMessageBox.critical(self, '压测', f'请求参数错误：{err}')
+            return
+        from .load_test_dialog import LoadTestDialog
+        dialog = LoadTestDialog(req, parent=self)
+        dialog.show()
+
+    def show_request_collection(self):
+        from .collection_dialog import CollectionDialog
+        dialog = CollectionDialog(self._gen_request, parent=self)
+        dialog.load_requested.connect(self._set_request)
+        dialog.show()
 
     def export_request_curl(self):
         req = self._gen_request()
@@ -0,0 +1,55 @@
+from threading import Thread
+from typing import Optional
+
+from PySide6.QtCore import QObject, Signal, QTimer
+
+from app.service.collection import Collection, CollectionRunner, CollectionRunSettings, CollectionRunStats
+from app.service.logger import get_logger
+
+
+LOGGER = get_logger(__name__)
+
+_DEFAULT_REFRESH_INTERVAL = 500
+
+
+class CollectionRunSignals(QObject):
+    progress = Signal(CollectionRunStats)
+    finish = Signal(CollectionRunStats, object)
+
+
+class CollectionRunWorker(QObject):
+    """run a collection over its data file on its own threads and publish live stats snapshots"""
+    def __init__(self, collection: Collection, settings: CollectionRunSettings, parent=None):
+        super(CollectionRunWorker, self).__init__(parent)
+        self.signals = CollectionRunSignals()
+        self._runner = CollectionRunner(collection, settings)
+        self._thread: Optional[Thread] = None
+        self._timer = QTimer(self)
+        self._timer.setInterval(_DEFAULT_REFRESH_INTERVAL)
+        self._timer.timeout.connect(self._refresh)
+        self.signals.finish.connect(self._on_finish)
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        LOGGER.info('collection run start -> collection: %s, settings: %s',
+                    self._runner.collection.name, self._runner.settings)
+        self._thread = Thread(target=self._run, name='collection', daemon=True)
+        self._thread.start()
+        self._timer.start()
+
+    def stop(self):
+        self._runner.stop()
+
+    def _refresh(self):
+        self.signals.progress.emit(self._runner.snapshot())
+
+    def _run(self):
+        """called at collection thread, the finish signal is queued to the gui thread"""
+        stats, err = self._runner.run()
+        LOGGER.info('collection run finish -> %s', stats.summary() if stats is not None else err)
+        self.signals.finish.emit(stats if stats is not None else CollectionRunStats(finished=True), err)
+
+    def _on_finish(self, *_):
+        self._timer.stop()
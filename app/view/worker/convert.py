@@ -0,0 +1,212 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Optional
+
+from PySide6.QtCore import QObject, Signal
+
+from app import util
+from app.service import perf
+from app.service.logger import get_logger
+from app.util import time as timeutil
+from ..component.text_viewer import TextBuffer
+
+
+LOGGER = get_logger(__name__)
+
+_CONVERT_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix='convert')
+
+
+class ConvertType:
+    JSON_FORMAT = 'json_format'
+    JSON_TO_YAML = 'json_to_yaml'
+    JSON_FROM_YAML = 'json_from_yaml'
+    TIME_BATCH = 'time_batch'
+
+
+class ConvertPhase:
+    PARSE = 'parse'
+    DUMP = 'dump'
+    CANCEL = 'cancel'
+
+
+class ConvertProgressEvent:
+    def __init__(self, phase: str):
+        self.phase = phase
+
+
+class ConvertFinishEvent:
+    def __init__(self,
+                 convert_type: str,
+                 result: Any,
+                 phase: str,
+                 err: Optional[Exception],
+                 seconds: float):
+        self.convert_type = convert_type
+        self.result = result
+        self.phase = phase  # the phase where err happened
+        self.err = err
+        self.seconds = seconds
+
+    @property
+    def cancelled(self) -> bool:
+        return self.phase == ConvertPhase.CANCEL
+
+
+class ConvertSignals(QObject):
+    progress = Signal(ConvertProgressEvent)
+    finish = Signal(ConvertFinishEvent)
+
+
+def _convert(convert_type: str, content: str, indent: Optional[int], cancelled: threading.Event, on_phase):
+    on_phase(ConvertPhase.PARSE)
+    with perf.span(f'convert.{ConvertPhase.PARSE}', perf.SpanCategory.PARSE, type=convert_type, size=len(content)):
+        if convert_type == ConvertType.JSON_FROM_YAML:
+            obj, e = util.yaml_load(content)
+        else:
+            obj, e = util.json_load(content)
+    if e is not None:
+        return '', ConvertPhase.PARSE, e
+    if cancelled.is_set():
+        return '', ConvertPhase.CANCEL, None
+
+    on_phase(ConvertPhase.DUMP)
+    with perf.span(f'convert.{ConvertPhase.DUMP}', perf.SpanCategory.PARSE, type=convert_type):
+        if convert_type == ConvertType.JSON_TO_YAML:
+            large = len(content) > util.LARGE_INPUT_THRESHOLD
+            result, e = util.yaml_dump(obj, indent=indent, allow_unicode=True, fast=large)
+        else:
+            result, e = util.json_dump(obj, indent=indent, ensure_ascii=False)
+    if e is not None:
+        return '', ConvertPhase.DUMP, e
+    return result, '', None
+
+
+_TIME_BATCH_BLOCK = 100000  # lines converted between two checks for cancel
+
+
+class TimeBatchResult:
+    def __init__(self,
+                 buffer: Optional[TextBuffer] = None,
+                 total: int = 0,
+                 failed: int = 0,
+                 convert_seconds: float = 0.0):
+        # one result per input line, failed ones read 转换失败. lines are indexed here rather than at gui thread
+        self.buffer = buffer if isinstance(buffer, TextBuffer) else TextBuffer()
+        self.total = total
+        self.failed = failed
+        self.convert_seconds = convert_seconds  # the conversion alone, without splitting and joining lines
+
+    def __str__(self):
+        return str(self.__dict__)
+
+
+def _convert_time_batch(content: str, to_strings: bool, precision: str, fmt: str,
+                        cancelled: threading.Event, on_phase):
+    on_phase(ConvertPhase.PARSE)
+    values = [line.strip() for line in content.splitlines()]
+    lines = []
+    failed = 0
+    convert_seconds = 0.0
+    with perf.span(f'convert.{ConvertType.TIME_BATCH}', perf.SpanCategory.PARSE, lines=len(values)):
+        for i in range(0, len(values), _TIME_BATCH_BLOCK):
+            if cancelled.is_set():
+                return None, ConvertPhase.CANCEL, None
+            block = values[i:i + _TIME_BATCH_BLOCK]
+            start = time.perf_counter()
+            if to_strings:
+                results, e = timeutil.timestamps_to_strings(block, precision, fmt)
+            else:
+                results, e = timeutil.strings_to_timestamps(block, fmt, precision)
+            convert_seconds += time.perf_counter() - start
+            if e is not None:
+                return None, ConvertPhase.PARSE, e
+            for v, r in zip(block, results):
+                if r is None and v:
+                    failed += 1
+                    lines.append('转换失败')
+                else:
+                    lines.append('' if r is None else str(r))
+    if cancelled.is_set():
+        return None, ConvertPhase.CANCEL, None
+
+    on_phase(ConvertPhase.DUMP)
+    buffer = TextBuffer.from_text('\n'.join(lines))
+    return TimeBatchResult(buffer, len(values), failed, convert_seconds), '', None
+
+
+class ConvertWorker(QObject):
+    """run a json/yaml conversion at background thread, the result comes back by the finish signal"""
+    def __init__(self, convert_type: str, content: str, indent: Optional[int], parent=None):
+        super(ConvertWorker, self).__init__(parent)
+        self.convert_type = convert_type
+        self.signals = ConvertSignals()
+        self._content = content
+        self._indent = indent
+        self._cancelled = threading.Event()
+        self._finish_lock = threading.Lock()
+        self._finished = False
+        self._start_time = 0.0
+
+    def is_running(self) -> bool:
+        return self._start_time > 0 and not self._finished
+
+    def start(self):
+        LOGGER.debug('convert start -> type: %s, size: %s', self.convert_type, len(self._content))
+        self._start_time = time.perf_counter()
+        future = _CONVERT_POOL.submit(
+            _convert, self.convert_type, self._content, self._indent, self._cancelled, self._on_phase)
+        future.add_done_callback(self._on_done)
+
+    def cancel(self) -> bool:
+        """the parser itself cannot be interrupted, its result is dropped instead"""
+        if not self.is_running():
+            return False
+        self._cancelled.set()
+        return self._finish('', ConvertPhase.CANCEL, None)
+
+    def _on_phase(self, phase: str):
+        if not self._cancelled.is_set():
+            self.signals.progress.emit(ConvertProgressEvent(phase))
+
+    def _on_done(self, future: Future):
+        """called at convert thread"""
+        try:
+            result, phase, err = future.result()
+        except BaseException as e:
+            result, phase, err = '', ConvertPhase.PARSE, e
+        self._finish(result, phase, err)
+
+    def _finish(self, result: str, phase: str, err: Optional[Exception]) -> bool:
+        with self._finish_lock:
+            if self._finished:
+                return False
+            self._finished = True
+        # release the input as soon as possible, it may be huge
+        self._content = ''
+        evt = ConvertFinishEvent(
+            convert_type=self.convert_type,
+            result=result,
+            phase=phase,
+            err=err,
+            seconds=time.perf_counter() - self._start_time
+        )
+        LOGGER.debug('convert finish -> type: %s, phase: %s, err: %s', self.convert_type, phase, err)
+        self.signals.finish.emit(evt)
+        return True
+
+
+class TimeBatchWorker(ConvertWorker):
+    """convert a column of timestamps or time strings at background thread, the result is a TimeBatchResult"""
+    def __init__(self, content: str, to_strings: bool, precision: str, fmt: str, parent=None):
+        super(TimeBatchWorker, self).__init__(ConvertType.TIME_BATCH, content, None, parent)
+        self._to_strings = to_strings
+        self._precision = precision
+        self._fmt = fmt
+
+    def start(self):
+        LOGGER.debug('time batch start -> size: %s, to strings: %s', len(self._content), self._to_strings)
+        self._start_time = time.perf_counter()
+        future = _CONVERT_POOL.submit(_convert_time_batch, self._content, self._to_strings, self._precision,
+                                      self._fmt, self._cancelled, self._on_phase)
+        future.add_done_callback(self._on_done)
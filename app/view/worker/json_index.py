@@ -0,0 +1,88 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Optional, Union
+
+from PySide6.QtCore import QObject, Signal
+
+from app.service import perf
+from app.service.logger import get_logger
+from app.util.json_stream import JsonIndex, LazyNode, index_children
+
+
+LOGGER = get_logger(__name__)
+
+_INDEX_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix='json-index')
+
+
+class JsonIndexFinishEvent:
+    def __init__(self, err: Optional[Exception], seconds: float, cancelled: bool = False):
+        self.err = err
+        self.seconds = seconds
+        self.cancelled = cancelled
+
+
+class JsonIndexSignals(QObject):
+    finish = Signal(JsonIndexFinishEvent)
+
+
+def _index(source, index: Optional[JsonIndex], node: Optional[LazyNode], cancelled: threading.Event):
+    if node is not None:
+        with perf.span('json_index.expand', perf.SpanCategory.PARSE, size=node.end - node.start):
+            return index_children(node, source, cancelled.is_set)
+    # a streamed index goes on from where the download left it
+    with perf.span('json_index.document', perf.SpanCategory.PARSE, size=len(source) - index.position):
+        return index.feed_all(source, index.position, cancelled=cancelled.is_set)
+
+
+class JsonIndexWorker(QObject):
+    """index a json document, or the byte range of one of its containers, at background thread"""
+    def __init__(self,
+                 source: Union[bytes, memoryview],
+                 index: Optional[JsonIndex] = None,
+                 node: Optional[LazyNode] = None,
+                 parent=None):
+        super(JsonIndexWorker, self).__init__(parent)
+        self.signals = JsonIndexSignals()
+        self._source = source
+        self._index = index
+        self._node = node
+        self._cancelled = threading.Event()
+        self._finish_lock = threading.Lock()
+        self._finished = False
+        self._start_time = 0.0
+
+    def is_running(self) -> bool:
+        return self._start_time > 0 and not self._finished
+
+    def start(self):
+        LOGGER.debug('json index start -> size: %s, node: %s', len(self._source), self._node is not None)
+        self._start_time = time.perf_counter()
+        future = _INDEX_POOL.submit(_index, self._source, self._index, self._node, self._cancelled)
+        future.add_done_callback(self._on_done)
+
+    def cancel(self) -> bool:
+        """the parser stops at the next block it would read"""
+        if not self.is_running():
+            return False
+        self._cancelled.set()
+        return self._finish(None, True)
+
+    def _on_done(self, future: Future):
+        """called at index thread"""
+        try:
+            err = future.result()
+        except BaseException as e:
+            err = e
+        self._finish(err, False)
+
+    def _finish(self, err: Optional[Exception], cancelled: bool) -> bool:
+        with self._finish_lock:
+            if self._finished:
+                return False
+            self._finished = True
+        self._source = None
+        evt = JsonIndexFinishEvent(err, time.perf_counter() - self._start_time, cancelled)
+        LOGGER.debug('json index finish -> seconds: %.3f, err: %s, cancelled: %s', evt.seconds, err, cancelled)
+        self.signals.finish.emit(evt)
+        return True
@@ -0,0 +1,55 @@
+from threading import Thread
+from typing import Optional
+
+from PySide6.QtCore import QObject, Signal, QTimer
+
+from app.service.loadtest import LoadTestRunner, LoadTestSettings, LoadTestStats
+from app.service.logger import get_logger
+from app.service.request import Request
+
+
+LOGGER = get_logger(__name__)
+
+_DEFAULT_REFRESH_INTERVAL = 250
+
+
+class LoadTestSignals(QObject):
+    progress = Signal(LoadTestStats)
+    finish = Signal(LoadTestStats, object)
+
+
+class LoadTestWorker(QObject):
+    """run a load test on its own threads and publish live stats snapshots"""
+    def __init__(self, req: Request, settings: LoadTestSettings, parent=None):
+        super(LoadTestWorker, self).__init__(parent)
+        self.signals = LoadTestSignals()
+        self._runner = LoadTestRunner(req, settings)
+        self._thread: Optional[Thread] = None
+        self._timer = QTimer(self)
+        self._timer.setInterval(_DEFAULT_REFRESH_INTERVAL)
+        self._timer.timeout.connect(self._refresh)
+        self.signals.finish.connect(self._on_finish)
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        LOGGER.info('load test start -> settings: %s', self._runner.settings)
+        self._thread = Thread(target=self._run, name='loadtest', daemon=True)
+        self._thread.start()
+        self._timer.start()
+
+    def stop(self):
+        self._runner.stop()
+
+    def _refresh(self):
+        self.signals.progress.emit(self._runner.snapshot())
+
+    def _run(self):
+        """called at load test thread, the finish signal is queued to the gui thread"""
+        stats, err = self._runner.run()
+        LOGGER.info('load test finish -> %s', stats.summary() if stats is not None else err)
+        self.signals.finish.emit(stats if stats is not None else LoadTestStats(finished=True), err)
+
+    def _on_finish(self, *_):
+        self._timer.stop()
@@ -0,0 +1,48 @@
+from threading import Thread
+from typing import Optional
+
+from PySide6.QtCore import QObject, Signal
+
+from app.service.logger import get_logger
+from app.service.logrewrite import LogRewriter, RewriteSettings, RewriteStats
+
+
+LOGGER = get_logger(__name__)
+
+
+class LogRewriteSignals(QObject):
+    progress = Signal(RewriteStats)
+    finish = Signal(RewriteStats, object)
+
+
+class LogRewriteWorker(QObject):
+    """rewrite the timestamps of a log file at background thread"""
+    def __init__(self, src_path: str, dst_path: str, settings: RewriteSettings, parent=None):
+        super(LogRewriteWorker, self).__init__(parent)
+        self.signals = LogRewriteSignals()
+        self.src_path = src_path
+        self.dst_path = dst_path
+        self._rewriter = LogRewriter(settings)
+        self._thread: Optional[Thread] = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        LOGGER.info('log rewrite start -> %s to %s, settings: %s',
+                    self.src_path, self.dst_path, self._rewriter.settings)
+        self._thread = Thread(target=self._run, name='logrewrite', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._rewriter.stop()
+
+    def _run(self):
+        """called at rewrite thread, signals are queued to the gui thread"""
+        err = self._rewriter.rewrite_file(self.src_path, self.dst_path, self._on_progress)
+        stats = self._rewriter.stats
+        LOGGER.info('log rewrite finish -> %s', stats.summary() if err is None else err)
+        self.signals.finish.emit(stats, err)
+
+    def _on_progress(self, stats: RewriteStats):
+        self.signals.progress.emit(stats)
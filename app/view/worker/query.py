@@ -0,0 +1,243 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, List, Optional, Tuple, Union
+
+from PySide6.QtCore import QObject, Signal
+
+from app import util
+from app.service import perf
+from app.service.logger import get_logger
+from app.util.json_query import compile_query
+
+
+LOGGER = get_logger(__name__)
+
+_QUERY_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix='query')
+_PROGRESS_INTERVAL = 0.1
+
+MAX_RESULTS = 10000  # results kept for display, the rest are only counted
+_MAX_CACHED_SIZE = 4 * 1024 * 1024  # larger documents are parsed again rather than kept around
+
+
+class QueryPhase:
+    PARSE = 'parse'
+    QUERY = 'query'
+    CANCEL = 'cancel'
+
+
+class QueryProgressEvent:
+    def __init__(self, phase: str, count: int = 0):
+        self.phase = phase
+        self.count = count  # results so far
+
+
+class QueryFinishEvent:
+    def __init__(self,
+                 results: List[Any],
+                 count: int,
+                 phase: str,
+                 err: Optional[Exception],
+                 seconds: float,
+                 text: str = ''):
+        self.results = results  # the first MAX_RESULTS results
+        self.text = text  # the results dumped as a json array, when asked for
+        self.count = count
+        self.phase = phase  # the phase where err happened
+        self.err = err
+        self.seconds = seconds
+
+    @property
+    def cancelled(self) -> bool:
+        return self.phase == QueryPhase.CANCEL
+
+    @property
+    def truncated(self) -> bool:
+        return self.count > len(self.results)
+
+
+class QuerySignals(QObject):
+    progress = Signal(QueryProgressEvent)
+    finish = Signal(QueryFinishEvent)
+
+
+class _DocumentCache:
+    """
+    the last parsed document, queries are usually refined several times against the same one.
+    a document parsed while the cache was cleared is not kept
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key: Optional[Tuple] = None
+        self._document: Any = None
+        self._generation = 0
+
+    def get(self, key: Tuple) -> Tuple[bool, Any, int]:
+        """(found, document, generation), the generation goes to put"""
+        with self._lock:
+            if key == self._key:
+                return True, self._document, self._generation
+            return False, None, self._generation
+
+    def put(self, key: Tuple, document: Any, generation: int):
+        with self._lock:
+            if generation == self._generation:
+                self._key = key
+                self._document = document
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._key = None
+            self._document = None
+
+
+_DOCUMENTS = _DocumentCache()
+
+
+def clear_documents():
+    """drop the cached document once its text is gone from the view"""
+    _DOCUMENTS.clear()
+
+
+def _load_document(text: Union[str, bytes], file_path: str) -> (Any, Exception):
+    """the json backends parse utf-8 bytes as they are, a file is never decoded into a str"""
+    if file_path:
+        try:
+            stat = os.stat(file_path)
+        except OSError as e:
+            return None, e
+        key = ('file', file_path, stat.st_size, stat.st_mtime_ns)
+    else:
+        # the hash of a str or bytes is computed once and kept by the object itself
+        key = ('text', type(text).__name__, len(text), hash(text))
+    found, document, generation = _DOCUMENTS.get(key)
+    if found:
+        return document, None
+    if file_path:
+        try:
+            with open(file_path, 'rb') as f:
+                text = f.read()
+        except OSError as e:
+            return None, e
+    with perf.span(f'query.{QueryPhase.PARSE}', perf.SpanCategory.PARSE, size=len(text)):
+        document, err = util.json_load(text)
+    if err is None and len(text) <= _MAX_CACHED_SIZE:
+        _DOCUMENTS.put(key, document, generation)
+    return document, err
+
+
+def _query(expression: str, text: Union[str, bytes], file_path: str, dump: bool, indent: Optional[int],
+           cancelled: threading.Event, on_progress):
+    results, count, phase, err = _evaluate(expression, text, file_path, cancelled, on_progress)
+    if not dump or phase == QueryPhase.CANCEL:
+        return results, count, phase, err, ''
+    dumped, dump_err = util.json_dump(results, indent=indent, ensure_ascii=False)
+    return results, count, phase, err or dump_err, dumped
+
+
+def _evaluate(expression: str, text: Union[str, bytes], file_path: str, cancelled: threading.Event, on_progress):
+    query, err = compile_query(expression)
+    if err is not None:
+        return [], 0, QueryPhase.QUERY, err
+    on_progress(QueryPhase.PARSE, 0)
+    document, err = _load_document(text, file_path)
+    if err is not None:
+        return [], 0, QueryPhase.PARSE, err
+    if cancelled.is_set():
+        return [], 0, QueryPhase.CANCEL, None
+
+    on_progress(QueryPhase.QUERY, 0)
+    results = []
+    count = 0
+    last_progress = time.perf_counter()
+    with perf.span(f'query.{QueryPhase.QUERY}', perf.SpanCategory.PARSE, syntax=query.syntax):
+        try:
+            for result in query.evaluate(document):
+                if count < MAX_RESULTS:
+                    results.append(result)
+                count += 1
+                if count & 0x3ff == 0:
+                    if cancelled.is_set():
+                        return [], count, QueryPhase.CANCEL, None
+                    now = time.perf_counter()
+                    if now - last_progress >= _PROGRESS_INTERVAL:
+                        last_progress = now
+                        on_progress(QueryPhase.QUERY, count)
+        except Exception as e:
+            return results, count, QueryPhase.QUERY, e
+    return results, count, '', None
+
+
+class QueryWorker(QObject):
+    """
+    evaluate a JSONPath/jq query against a json text (or its utf-8 bytes) or file at background thread,
+    with dump the results kept are also turned into json text there
+    """
+    def __init__(self,
+                 expression: str,
+                 text: Union[str, bytes] = '',
+                 file_path: str = '',
+                 dump: bool = False,
+                 indent: Optional[int] = 2,
+                 parent=None):
+        super(QueryWorker, self).__init__(parent)
+        self.expression = expression
+        self.signals = QuerySignals()
+        self._text = text
+        self._file_path = file_path
+        self._dump = dump
+        self._indent = indent
+        self._cancelled = threading.Event()
+        self._finish_lock = threading.Lock()
+        self._finished = False
+        self._start_time = 0.0
+
+    def is_running(self) -> bool:
+        return self._start_time > 0 and not self._finished
+
+    def start(self):
+        LOGGER.debug('query start -> expression: %s, size: %s, file: %s',
+                     self.expression, len(self._text), self._file_path)
+        self._start_time = time.perf_counter()
+        future = _QUERY_POOL.submit(_query, self.expression, self._text, self._file_path, self._dump, self._indent,
+                                    self._cancelled, self._on_progress)
+        future.add_done_callback(self._on_done)
+
+    def cancel(self) -> bool:
+        """evaluation stops at the next thousand results, parsing runs to its end and is dropped"""
+        if not self.is_running():
+            return False
+        self._cancelled.set()
+        return self._finish([], 0, QueryPhase.CANCEL, None)
+
+    def _on_progress(self, phase: str, count: int):
+        if not self._cancelled.is_set():
+            self.signals.progress.emit(QueryProgressEvent(phase, count))
+
+    def _on_done(self, future: Future):
+        """called at query thread"""
+        try:
+            results, count, phase, err, text = future.result()
+        except BaseException as e:
+            results, count, phase, err, text = [], 0, QueryPhase.QUERY, e, ''
+        self._finish(results, count, phase, err, text)
+
+    def _finish(self, results: List[Any], count: int, phase: str, err: Optional[Exception], text: str = '') -> bool:
+        with self._finish_lock:
+            if self._finished:
+                return False
+            self._finished = True
+        self._text = ''
+        evt = QueryFinishEvent(
+            results=results,
+            count=count,
+            phase=phase,
+            err=err,
+            seconds=time.perf_counter() - self._start_time,
+            text=text
+        )
+        LOGGER.debug('query finish -> count: %s, phase: %s, err: %s', count, phase, err)
+        self.signals.finish.emit(evt)
+        return True
@@ -1,22 +1,33 @@
-import random
+import codecs
+import multiprocessing
 import time
-from datetime import datetime
-from threading import Thread
+from concurrent.futures import Future, CancelledError
+from threading import Lock
 from typing import Optional
-from concurrent.futures import ProcessPoolExecutor
 
-from PySide6.QtCore import QObject, Signal, QThread
+from PySide6.QtCore import QObject, Signal, QThread, QTimer
 
-from app.service.logger import LOGGER
-from app.service.request import Request, RequestMethod, Response
-from app.util import time as timeutil
+from app.service import executor as request_executor
+from app.service.cache import get_response_cache
+from app.service.logger import get_logger
+from app.service.request import Request, Response
+from app.service.session import ConnectionTrace
+from app.util.json_stream import JsonIndex
 
 
-_REQUEST_POOL = ProcessPoolExecutor(max_workers=3)
+LOGGER = get_logger(__name__)
+
+_MIN_PROGRESS_INTERVAL = 16
+_DEFAULT_PROGRESS_INTERVAL = 100
+
+_CHUNK_EMIT_INTERVAL = 0.05
+_CHUNK_EMIT_SIZE = 256 * 1024
+_STREAM_DISPLAY_LIMIT = 4 * 1024 * 1024  # characters appended to the viewer while streaming
+_STREAM_INDEX_LIMIT = 16 * 1024 * 1024  # bytes of a json body indexed while streaming, the viewer does the rest
 
 
 def _executor():
-    return _REQUEST_POOL
+    return request_executor.get_executor()
 
 
 class RequestStartEvent:
@@ -24,36 +35,176 @@ class RequestStartEvent:
         pass
 
 class RequestProgressEvent:
-    def __init__(self, seconds: float):
+    def __init__(self, seconds: float, bytes_received: int = 0, bytes_sent: int = 0, bytes_total: int = 0,
+                 upload_seconds: float = 0.0):
         self.seconds = seconds
+        self.bytes_received = bytes_received
+        self.bytes_sent = bytes_sent  # of a streamed request body
+        self.bytes_total = bytes_total
+        self.upload_seconds = upload_seconds  # since the body started to be sent
+
+    @property
+    def throughput(self) -> float:
+        """bytes per second"""
+        return self.bytes_received / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def upload_throughput(self) -> float:
+        return self.bytes_sent / self.upload_seconds if self.upload_seconds > 0 else 0.0
+
+class RequestChunkEvent:
+    def __init__(self, text: str, bytes_received: int, json_index: Optional[JsonIndex] = None):
+        self.text = text
+        self.bytes_received = bytes_received
+        self.json_index = json_index  # of a json body, still being fed at executor thread
 
 class RequestFinishEvent:
     def __init__(self,
                  req: Optional[Request],
                  resp: Optional[Response],
                  err: Optional[Exception],
-                 seconds: float):
+                 seconds: float,
+                 trace: Optional[ConnectionTrace] = None,
+                 json_index: Optional[JsonIndex] = None):
         self.req = req
         self.resp = resp
         self.err = err
         self.seconds = seconds
+        self.json_index = json_index  # built while the body was streamed
+        if not isinstance(trace, ConnectionTrace) and resp is not None:
+            trace = resp.trace
+        self.trace = trace
 
 
 class RequestSignals(QObject):
     start = Signal(RequestStartEvent)
     progress = Signal(RequestProgressEvent)
+    chunk = Signal(RequestChunkEvent)
     finish = Signal(RequestFinishEvent)
 
 
-class RequestWorkerThread(QThread):
-    """refer to https://www.cnblogs.com/dnxrzl/p/17096668.html"""
+class RequestTicker(QObject):
+    """one shared timer driving the progress events of every active request worker"""
+    def __init__(self, interval_ms: int = _DEFAULT_PROGRESS_INTERVAL, parent=None):
+        super(RequestTicker, self).__init__(parent)
+        self._workers = set()
+        self._timer = QTimer(self)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self._tick)
+
+    def set_interval(self, interval_ms: int):
+        self._timer.setInterval(max(_MIN_PROGRESS_INTERVAL, interval_ms))
+
+    def add(self, worker):
+        self._workers.add(worker)
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def remove(self, worker):
+        self._workers.discard(worker)
+        if not self._workers:
+            self._timer.stop()
+
+    def _tick(self):
+        for worker in list(self._workers):
+            worker.tick()
+
+
+_TICKER: Optional[RequestTicker] = None
+
+
+def _ticker() -> RequestTicker:
+    """must be called from the gui thread, the timer lives there"""
+    global _TICKER
+    if _TICKER is None:
+        _TICKER = RequestTicker()
+    return _TICKER
+
+
+def set_progress_interval(interval_ms: int):
+    _ticker().set_interval(interval_ms)
+
+
+def _same_bytes(resp: Response) -> bool:
+    """
+    whether the viewer sees the bytes the streamed index was fed with: a spill file holds them as received,
+    a body text only when it was decoded as utf-8 without replacing anything
+    """
+    if resp.truncated:
+        return True
+    try:
+        utf8 = codecs.lookup(resp.encoding).name == 'utf-8'
+    except LookupError:
+        return False
+    return utf8 and '\ufffd' not in (resp.body or '')
+
+
+def _timed_invoke(req: Request, on_chunk=None, on_upload=None):
+    start = time.perf_counter()
+    # a process pool worker has a cache of its own
+    cache = get_response_cache() if req.settings.use_cache else None
+    resp, err = req.invoke(on_chunk=on_chunk, cache=cache, on_upload=on_upload)
+    if resp is not None and multiprocessing.parent_process() is not None:
+        # the gui process takes the spill file over and removes it with the job
+        resp.release_body_file()
+    return resp, err, time.perf_counter() - start
+
+
+class RequestWorker(QObject):
+    """submit a request to the executor and emit finish as soon as its future resolves"""
     def __init__(self, req: Request, parent=None):
-        QThread.__init__(self, parent)
+        super(RequestWorker, self).__init__(parent)
         self.req = req
         self.signals = RequestSignals()
+        self.signals.finish.connect(self._on_finish)
+        self._future: Optional[Future] = None
+        self._start_time = 0.0
+        self._in_process = True
+        self._finish_lock = Lock()
+        self._finished = False
+        self.cancelled = False
 
-    def run(self):
-        LOGGER.info(f'do request at thread: {str(QThread.currentThread())}')
+        # streaming state, written at executor thread
+        self._bytes_received = 0
+        self._bytes_sent = 0
+        self._bytes_total = 0
+        self._upload_start_time = 0.0
+        self._upload_end_time = 0.0
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._pending_text = []
+        self._pending_size = 0
+        self._displayed_size = 0
+        self._last_chunk_time = 0.0
+        self._json_checked = False
+        self._json_index: Optional[JsonIndex] = None
+
+    def is_running(self) -> bool:
+        return self._future is not None and not self._finished
+
+    def cancel(self) -> bool:
+        """stop waiting for the request, a call already on the wire still runs to its end"""
+        if not self.is_running():
+            return False
+        self.cancelled = True
+        self._future.cancel()
+        evt = RequestFinishEvent(
+            req=self.req,
+            resp=None,
+            err=CancelledError('request cancelled'),
+            seconds=time.perf_counter() - self._start_time
+        )
+        return self._finish(evt)
+
+    def _finish(self, evt: RequestFinishEvent) -> bool:
+        with self._finish_lock:
+            if self._finished:
+                return False
+            self._finished = True
+        self.signals.finish.emit(evt)
+        return True
+
+    def start(self):
+        LOGGER.debug('do request at thread: %s', QThread.currentThread())
         req = self.req
         if not isinstance(req, Request):
             evt = RequestFinishEvent(
@@ -62,7 +213,7 @@ class RequestWorkerThread(QThread):
                 err=ValueError('req must be Request instance'),
                 seconds=0
             )
-            self.signals.finish.emit(evt)
+            self._finish(evt)
             return
         validate_err = req.validate()
         if validate_err:
@@ -72,29 +223,103 @@ class RequestWorkerThread(QThread):
                 err=validate_err,
                 seconds=0
             )
-            self.signals.finish.emit(evt)
+            self._finish(evt)
             return
         self.signals.start.emit(RequestStartEvent())
 
-        executor = _executor()
-        start_time = timeutil.now()
-        future = executor.submit(req.invoke)
-        while not future.done():
-            cur_time = timeutil.now()
-            seconds = (cur_time - start_time).total_seconds()
-            evt = RequestProgressEvent(
-                seconds=seconds
-            )
-            self.signals.progress.emit(evt)
-            sleep_ms = random.randint(50, 150)
-            QThread.msleep(sleep_ms)
-        resp, err = future.result()
-        end_time = timeutil.now()
-        seconds = (end_time - start_time).total_seconds()
+        self._start_time = time.perf_counter()
+        self._last_chunk_time = self._start_time
+        self._in_process = request_executor.in_process()
+        if self._in_process:
+            self._future = _executor().submit(_timed_invoke, req, self._on_chunk, self._on_upload)
+        else:
+            # callbacks cannot cross process boundaries
+            self._future = _executor().submit(_timed_invoke, req)
+        _ticker().add(self)
+        self._future.add_done_callback(self._on_done)
+
+    def tick(self):
+        now = time.perf_counter()
+        evt = RequestProgressEvent(
+            seconds=now - self._start_time,
+            bytes_received=self._bytes_received,
+            bytes_sent=self._bytes_sent,
+            bytes_total=self._bytes_total,
+            upload_seconds=(self._upload_end_time or now) - self._upload_start_time if self._upload_start_time else 0.0
+        )
+        self.signals.progress.emit(evt)
+
+    def _on_upload(self, bytes_sent: int, bytes_total: int):
+        """called at executor thread for every block of a streamed request body"""
+        now = time.perf_counter()
+        if not self._upload_start_time:
+            self._upload_start_time = now
+        self._bytes_sent = bytes_sent
+        self._bytes_total = bytes_total
+        if bytes_sent >= bytes_total:
+            # waiting for the response is not part of the upload
+            self._upload_end_time = now
+
+    def _index_chunk(self, chunk: bytes):
+        if not self._json_checked:
+            head = chunk.lstrip()[:1]
+            if not head:
+                return
+            self._json_checked = True
+            if head in (b'{', b'['):
+                self._json_index = JsonIndex()
+        index = self._json_index
+        if index is not None and not index.done and index.position < _STREAM_INDEX_LIMIT:
+            index.feed(chunk)
+
+    def _on_chunk(self, chunk: bytes, bytes_received: int):
+        """called at executor thread for every chunk of the response body"""
+        self._bytes_received = bytes_received
+        self._index_chunk(chunk)
+        if self._displayed_size >= _STREAM_DISPLAY_LIMIT:
+            return
+        text = self._decoder.decode(chunk)
+        if not text:
+            return
+        text = text[:_STREAM_DISPLAY_LIMIT - self._displayed_size]
+        self._displayed_size += len(text)
+        self._pending_text.append(text)
+        self._pending_size += len(text)
+        now = time.perf_counter()
+        if (now - self._last_chunk_time < _CHUNK_EMIT_INTERVAL and self._pending_size < _CHUNK_EMIT_SIZE
+                and self._displayed_size < _STREAM_DISPLAY_LIMIT):
+            return
+        evt = RequestChunkEvent(
+            text=''.join(self._pending_text),
+            bytes_received=bytes_received,
+            json_index=self._json_index
+        )
+        self._pending_text = []
+        self._pending_size = 0
+        self._last_chunk_time = now
+        self.signals.chunk.emit(evt)
+
+    def _on_done(self, future: Future):
+        """called at executor thread, the finish signal is queued to the gui thread"""
+        try:
+            resp, err, seconds = future.result()
+        except CancelledError:
+            return
+        except BaseException as e:
+            resp, err, seconds = None, e, time.perf_counter() - self._start_time
+        if resp is not None and not self._in_process:
+            resp.adopt_body_file()
         evt = RequestFinishEvent(
-            req=req,
+            req=self.req,
             resp=resp,
             err=err,
-            seconds=seconds
+            seconds=seconds,
+            # offsets of an index over other bytes would point into the wrong places
+            json_index=self._json_index if resp is not None and _same_bytes(resp) else None
         )
-        self.signals.finish.emit(evt)
+        if not self._finish(evt) and resp is not None:
+            # cancelled while on the wire, nobody will look at the response
+            resp.discard()
+
+    def _on_finish(self, _):
+        _ticker().remove(self)
@@ -0,0 +1,163 @@
+import itertools
+from concurrent.futures import CancelledError
+from typing import Optional, Dict, List
+from urllib.parse import urlsplit
+
+from PySide6.QtCore import QObject, Signal
+
+from app.service.logger import get_logger
+from app.service.request import Request
+from .request import RequestWorker, RequestProgressEvent, RequestChunkEvent, RequestFinishEvent
+
+
+LOGGER = get_logger(__name__)
+
+
+class QueueOrder:
+    FIFO = 'fifo'
+    PRIORITY = 'priority'
+
+
+class JobState:
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FINISHED = 'finished'
+    CANCELLED = 'cancelled'
+
+
+class RequestJob:
+    def __init__(self, job_id: int, req: Request, priority: int = 0):
+        self.id = job_id
+        self.req = req
+        self.priority = priority
+        self.host = (urlsplit(req.url).netloc or '').lower()
+        self.state = JobState.PENDING
+        self.worker: Optional[RequestWorker] = None
+        self.evt: Optional[RequestFinishEvent] = None
+
+    def is_done(self) -> bool:
+        return self.state in (JobState.FINISHED, JobState.CANCELLED)
+
+
+_DEFAULT_MAX_CONCURRENCY = 4
+_DEFAULT_MAX_PER_HOST = 2
+
+
+class RequestScheduler(QObject):
+    """run queued requests concurrently, bounded overall and per host"""
+    job_added = Signal(object)
+    job_started = Signal(object)
+    job_progress = Signal(object, RequestProgressEvent)
+    job_chunk = Signal(object, RequestChunkEvent)
+    job_finished = Signal(object)
+
+    def __init__(self,
+                 max_concurrency: int = _DEFAULT_MAX_CONCURRENCY,
+                 max_per_host: int = _DEFAULT_MAX_PER_HOST,
+                 order: str = QueueOrder.FIFO,
+                 parent=None):
+        super(RequestScheduler, self).__init__(parent)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_per_host = max(1, max_per_host)
+        self.order = order
+        self._seq = itertools.count(1)
+        self._jobs: Dict[int, RequestJob] = {}
+        self._pending: List[RequestJob] = []
+        self._running: Dict[int, RequestJob] = {}
+        self._host_running: Dict[str, int] = {}
+
+    def set_limits(self, max_concurrency: int, max_per_host: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_per_host = max(1, max_per_host)
+        self._schedule()
+
+    def set_order(self, order: str):
+        self.order = order
+        self._schedule()
+
+    def job(self, job_id: int) -> Optional[RequestJob]:
+        return self._jobs.get(job_id)
+
+    def submit(self, req: Request, priority: int = 0) -> RequestJob:
+        job = RequestJob(next(self._seq), req, priority)
+        self._jobs[job.id] = job
+        self._pending.append(job)
+        LOGGER.debug('request scheduler -> job %s queued, host: %s, priority: %s', job.id, job.host, priority)
+        self.job_added.emit(job)
+        self._schedule()
+        return job
+
+    def cancel(self, job_id: int) -> bool:
+        job = self._jobs.get(job_id)
+        if job is None or job.is_done():
+            return False
+        if job.state == JobState.PENDING:
+            self._pending.remove(job)
+            job.state = JobState.CANCELLED
+            job.evt = RequestFinishEvent(
+                req=job.req,
+                resp=None,
+                err=CancelledError('request cancelled'),
+                seconds=0
+            )
+            self.job_finished.emit(job)
+            return True
+        return job.worker.cancel()
+
+    def cancel_all(self):
+        for job_id in list(self._jobs.keys()):
+            self.cancel(job_id)
+
+    def remove_done(self) -> List[int]:
+        """forget finished jobs and remove the spill files of their responses"""
+        removed = [job_id for job_id, job in self._jobs.items() if job.is_done()]
+        for job_id in removed:
+            job = self._jobs.pop(job_id)
+            if job.evt is not None and job.evt.resp is not None:
+                job.evt.resp.discard()
+        return removed
+
+    def _sort_key(self, job: RequestJob):
+        if self.order == QueueOrder.PRIORITY:
+            return -job.priority, job.id
+        return job.id
+
+    def _schedule(self):
+        if not self._pending or len(self._running) >= self.max_concurrency:
+            return
+        self._pending.sort(key=self._sort_key)
+        for job in list(self._pending):
+            if len(self._running) >= self.max_concurrency:
+                break
+            if job.state != JobState.PENDING:
+                continue
+            if self._host_running.get(job.host, 0) >= self.max_per_host:
+                continue
+            self._pending.remove(job)
+            self._start(job)
+
+    def _start(self, job: RequestJob):
+        job.state = JobState.RUNNING
+        self._running[job.id] = job
+        self._host_running[job.host] = self._host_running.get(job.host, 0) + 1
+
+        worker = RequestWorker(job.req, parent=self)
+        worker.signals.start.connect(lambda _: self.job_started.emit(job))
+        worker.signals.progress.connect(lambda evt: self.job_progress.emit(job, evt))
+        worker.signals.chunk.connect(lambda evt: self.job_chunk.emit(job, evt))
+        worker.signals.finish.connect(lambda evt: self._on_job_finish(job, evt))
+        job.worker = worker
+        worker.start()
+
+    def _on_job_finish(self, job: RequestJob, evt: RequestFinishEvent):
+        if self._running.pop(job.id, None) is not None:
+            self._host_running[job.host] -= 1
+            if self._host_running[job.host] <= 0:
+                del self._host_running[job.host]
+        job.evt = evt
+        job.state = JobState.CANCELLED if job.worker.cancelled else JobState.FINISHED
+        job.worker.deleteLater()
+        job.worker = None
+        LOGGER.debug('request scheduler -> job %s %s, seconds: %s', job.id, job.state, evt.seconds)
+        self.job_finished.emit(job)
+        self._schedule()
@@ -0,0 +1,51 @@
+import argparse
+import os
+import sys
+import time
+
+"""
+EXECUTE THIS SCRIPT IN PROJECT ROOT DIRECTORY!
+
+AnalogClock paint time with the dial drawn on every frame (before) and blitted from the cached pixmap (after),
+set QT_QPA_PLATFORM=offscreen to run without a display
+"""
+
+sys.path.insert(0, os.getcwd())
+
+from PySide6.QtCore import QTime  # noqa: E402
+from PySide6.QtGui import QImage, QPainter  # noqa: E402
+from PySide6.QtWidgets import QApplication  # noqa: E402
+
+
+def _measure(clock, image: QImage, cached: bool, frames: int) -> float:
+    """microseconds per frame"""
+    t = QTime(10, 8, 0)
+    start = time.perf_counter()
+    for i in range(frames):
+        with QPainter(image) as painter:
+            clock.paint(painter, t.addMSecs(i * 33), cached)
+    return (time.perf_counter() - start) / frames * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=2000, help='frames per measurement')
+    parser.add_argument('--sizes', default='200,400', help='clock sides in pixels, comma separated')
+    args = parser.parse_args()
+
+    app = QApplication([])  # noqa: F841
+    from app.view.component.analog_clock import AnalogClock
+
+    print(f'{"side":>6}{"before us":>12}{"after us":>12}{"x":>7}')
+    for side in [int(s) for s in args.sizes.split(',')]:
+        clock = AnalogClock()
+        clock.resize(side, side)
+        image = QImage(side, side, QImage.Format.Format_ARGB32_Premultiplied)
+        _measure(clock, image, True, 10)  # renders the dial
+        before = _measure(clock, image, False, args.frames)
+        after = _measure(clock, image, True, args.frames)
+        print(f'{side:>6}{before:>12.1f}{after:>12.1f}{before / after:>7.1f}')
+
+
+if __name__ == '__main__':
+    main()
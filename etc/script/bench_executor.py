@@ -0,0 +1,143 @@
+import argparse
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+"""
+EXECUTE THIS SCRIPT IN PROJECT ROOT DIRECTORY!
+
+compare per-request overhead and peak RSS of the request executor backends,
+each backend runs in a fresh interpreter so that peak RSS is not shared.
+large bodies are kept in memory whatever their size, so the process backend pickles them across processes
+"""
+
+sys.path.insert(0, os.getcwd())
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # headers and body are written separately, avoid nagle + delayed ack stalls
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        size = 0
+        if self.path.startswith('/size/'):
+            size = int(self.path[len('/size/'):])
+        body = b'{"data": "' + b'x' * size + b'"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _start_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def _peak_rss_mb() -> float:
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return kb / 1024
+
+
+def _invoke(req):
+    """runs in the pool, the spill file of a pool process would outlive it"""
+    resp, err = req.invoke()
+    if resp is not None:
+        resp.release_body_file()
+    return resp, err
+
+
+def _submit(pool, req):
+    resp, err = pool.submit(_invoke, req).result()
+    if err is not None:
+        raise err
+    resp.adopt_body_file()
+    resp.discard()
+    return resp
+
+
+def _run_backend(backend: str, url: str, count: int, large_count: int, large_size: int):
+    from app.service import executor
+    from app.service.request import Request, RequestSettings
+
+    err = executor.set_executor_backend(backend)
+    if err is not None:
+        raise err
+    pool = executor.get_executor()
+
+    # warm up workers and connections
+    _submit(pool, Request(url=f'{url}/size/0'))
+
+    start = time.perf_counter()
+    for _ in range(count):
+        _submit(pool, Request(url=f'{url}/size/0'))
+    small_seconds = time.perf_counter() - start
+
+    # a body beyond the memory limit would be spilled, and only its path and preview pickled
+    settings = RequestSettings(body_memory_limit=large_size + 1024)
+    start = time.perf_counter()
+    for _ in range(large_count):
+        resp = _submit(pool, Request(url=f'{url}/size/{large_size}', settings=settings))
+        if resp.truncated:
+            raise RuntimeError(f'large body spilled to {resp.body_file}')
+    large_seconds = time.perf_counter() - start
+
+    pool.shutdown(wait=True)
+    return {
+        'backend': backend,
+        'small_ms_per_request': small_seconds / count * 1e3,
+        'large_ms_per_request': large_seconds / large_count * 1e3,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backend', default='')
+    parser.add_argument('--url', default='')
+    parser.add_argument('--count', type=int, default=500)
+    parser.add_argument('--large-count', type=int, default=5)
+    parser.add_argument('--large-size', type=int, default=8 * 1024 * 1024)
+    args = parser.parse_args()
+
+    if args.backend:
+        result = _run_backend(args.backend, args.url, args.count, args.large_count, args.large_size)
+        print(json.dumps(result))
+        return
+
+    from app.service import executor
+    server, url = _start_server()
+    print(f'{"backend":<10}{"small ms/req":>15}{"large ms/req":>15}{"peak RSS MB":>15}')
+    for backend in executor.backends():
+        cmd = [
+            sys.executable, __file__,
+            '--backend', backend,
+            '--url', url,
+            '--count', str(args.count),
+            '--large-count', str(args.large_count),
+            '--large-size', str(args.large_size),
+        ]
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        print(f'{backend:<10}{result["small_ms_per_request"]:>15.3f}'
+              f'{result["large_ms_per_request"]:>15.3f}{result["peak_rss_mb"]:>15.1f}')
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+
+"""
+EXECUTE THIS SCRIPT IN PROJECT ROOT DIRECTORY!
+
+parse/dump/pretty throughput of every available json backend in app.util.json_backend.
+dump is the indented output the json tab produces, compact output always goes through stdlib
+(the fast backends cannot match its separators) so it is not measured per backend
+"""
+
+sys.path.insert(0, os.getcwd())
+
+from app.util import json_backend  # noqa: E402
+
+
+def _record(i: int) -> dict:
+    return {
+        'id': i,
+        'name': f'user-{i}',
+        'email': f'user-{i}@example.com',
+        'active': i % 3 == 0,
+        'score': i * 1.25,
+        'tags': ['a', 'b', 'c'],
+        'profile': {'city': '上海', 'zip': f'{i:06d}', 'note': None},
+    }
+
+
+def _nested(depth: int) -> dict:
+    o = {'leaf': [1, 2, 3]}
+    for i in range(depth):
+        o = {'level': i, 'child': o, 'items': [i, str(i)]}
+    return o
+
+
+def _documents(scale: float) -> dict:
+    return {
+        'small': _record(1),
+        'medium': [_record(i) for i in range(int(5000 * scale))],
+        'huge': [_record(i) for i in range(int(200000 * scale))],
+        'deep': [_nested(200) for _ in range(int(200 * scale))],
+        'wide': {f'key-{i}': i for i in range(int(200000 * scale))},
+    }
+
+
+def _measure(fn, arg, min_seconds: float) -> float:
+    """seconds per call, repeated until min_seconds elapsed"""
+    gc.collect()
+    count = 0
+    start = time.perf_counter()
+    while True:
+        fn(arg)
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplier of document sizes')
+    parser.add_argument('--min-seconds', type=float, default=0.5, help='minimal time spent per measurement')
+    parser.add_argument('--indent', type=int, default=2, help='indent of pretty output')
+    parser.add_argument('--only', default='', help='comma separated document names')
+    args = parser.parse_args()
+
+    docs = _documents(args.scale)
+    if args.only:
+        docs = {k: v for k, v in docs.items() if k in args.only.split(',')}
+
+    print(f'{"document":<10}{"size":>12}{"backend":>10}{"parse MB/s":>14}{"dump MB/s":>14}{"pretty MB/s":>14}')
+    for doc_name, doc in docs.items():
+        text = json.dumps(doc, ensure_ascii=False)
+        mb = len(text.encode('utf-8')) / 1024 / 1024
+        for backend_name in json_backend.backends():
+            backend, _ = json_backend.get_backend(backend_name)
+            parse = _measure(backend.loads, text, args.min_seconds)
+            dump = _measure(lambda o: backend.dumps(o, args.indent, False), doc, args.min_seconds)
+            pretty = _measure(lambda s: backend.dumps(backend.loads(s), args.indent, False), text, args.min_seconds)
+            print(f'{doc_name:<10}{mb:>10.2f}MB{backend_name:>10}'
+                  f'{mb / parse:>14.1f}{mb / dump:>14.1f}{mb / pretty:>14.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+"""
+EXECUTE THIS SCRIPT IN PROJECT ROOT DIRECTORY!
+
+app.util.time parse/format against plain strptime/strftime, per format, plus the batch api
+"""
+
+sys.path.insert(0, os.getcwd())
+
+from app.util import time as timeutil  # noqa: E402
+
+
+_CUSTOM_FORMAT = '%d/%m/%Y %H-%M-%S'
+
+
+def _measure(fn, args, min_seconds: float) -> float:
+    """nanoseconds per call, repeated over args until min_seconds elapsed"""
+    count = 0
+    start = time.perf_counter()
+    while True:
+        for a in args:
+            fn(a)
+        count += len(args)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / count * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--samples', type=int, default=10000, help='distinct times per format')
+    parser.add_argument('--min-seconds', type=float, default=0.5, help='minimal time spent per measurement')
+    parser.add_argument('--batch', type=int, default=1000000, help='values of the batch measurement, 0 to skip')
+    args = parser.parse_args()
+
+    random.seed(0)
+    base = datetime.datetime(2024, 1, 1)
+    times = [base + datetime.timedelta(seconds=random.randint(0, 365 * 86400), microseconds=random.randint(0, 999999))
+             for _ in range(args.samples)]
+    formats = [
+        ('SECONDS', timeutil.Format.SECONDS),
+        ('MILLISECONDS', timeutil.Format.MILLISECONDS),
+        ('SECONDS_RFC3339', timeutil.Format.SECONDS_RFC3339),
+        ('MILLISECONDS_RFC3339', timeutil.Format.MILLISECONDS_RFC3339),
+        ('custom', _CUSTOM_FORMAT),
+    ]
+
+    print(f'{"format":<22}{"strptime ns":>14}{"from_string ns":>16}{"x":>7}'
+          f'{"strftime ns":>14}{"to_string ns":>14}{"x":>7}')
+    for name, fmt in formats:
+        strs = [tm.strftime(fmt) for tm in times]
+        strptime = _measure(lambda s: datetime.datetime.strptime(s, fmt), strs, args.min_seconds)
+        parse = _measure(lambda s: timeutil.from_string(s, fmt), strs, args.min_seconds)
+        strftime = _measure(lambda tm: tm.strftime(fmt), times, args.min_seconds)
+        fmt_ = _measure(lambda tm: timeutil.to_string(tm, fmt), times, args.min_seconds)
+        print(f'{name:<22}{strptime:>14.0f}{parse:>16.0f}{strptime / parse:>7.1f}'
+              f'{strftime:>14.0f}{fmt_:>14.0f}{strftime / fmt_:>7.1f}')
+
+    if args.batch <= 0:
+        return
+    print()
+    print(f'batch of {args.batch} millisecond timestamps, format {timeutil.Format.MILLISECONDS}')
+    values = [str(random.randint(1_600_000_000_000, 1_750_000_000_000)) for _ in range(args.batch)]
+    backends = [timeutil.BatchBackend.PYTHON]
+    if timeutil.BATCH_BACKEND == timeutil.BatchBackend.NUMPY:
+        backends.append(timeutil.BatchBackend.NUMPY)
+    for backend in backends:
+        start = time.perf_counter()
+        strs, _ = timeutil.timestamps_to_strings(
+            values, timeutil.Precision.MILLISECOND, timeutil.Format.MILLISECONDS, backend)
+        to_strings = time.perf_counter() - start
+        start = time.perf_counter()
+        timeutil.strings_to_timestamps(strs, timeutil.Format.MILLISECONDS, timeutil.Precision.MILLISECOND, backend)
+        to_timestamps = time.perf_counter() - start
+        print(f'{backend:<8} timestamps_to_strings {to_strings:.3f}s, strings_to_timestamps {to_timestamps:.3f}s')
+
+
+if __name__ == '__main__':
+    main()
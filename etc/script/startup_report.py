@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+"""
+EXECUTE THIS SCRIPT IN PROJECT ROOT DIRECTORY!
+
+cold start report: the slowest imports of the app (python -X importtime) and the time from process launch to
+the first paint of the main window and to the current tab being ready. exits with 1 when the median first paint
+exceeds --budget-ms, QT_QPA_PLATFORM defaults to offscreen so it also runs without a display
+"""
+
+_PROBE = r'''
+import os, sys, time, json
+sys.path.insert(0, sys.argv[1])
+from PySide6.QtCore import QObject, QEvent
+from PySide6.QtWidgets import QApplication
+
+marks = {'imported': 0.0, 'painted': 0.0, 'ready': 0.0}
+
+
+class Probe(QObject):
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Type.Paint and not marks['painted']:
+            marks['painted'] = time.time()
+        return False
+
+
+def ready(_):
+    marks['ready'] = time.time()
+    print(json.dumps(marks), flush=True)
+    os._exit(0)  # skip joining the request worker threads
+
+
+app = QApplication([])
+import app as homemade  # noqa: E402
+from app.view.main_window import MainWindow  # noqa: E402
+marks['imported'] = time.time()
+window = MainWindow()
+probe = Probe()
+window.installEventFilter(probe)
+window.centralWidget().tab_initialized.connect(ready)
+window.show()
+app.exec()
+'''
+
+
+def _import_times(env: dict) -> list:
+    """(cumulative us, self us, module) of every import, slowest first"""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app.view.main_window'],
+                          env=env, capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        rows.append((int(cumulative_us), int(self_us), module.rstrip()))
+    return sorted(rows, reverse=True)
+
+
+def _launch(env: dict) -> dict:
+    """milliseconds since launch of each mark"""
+    start = time.time()
+    proc = subprocess.run([sys.executable, '-c', _PROBE, os.getcwd()], env=env, capture_output=True, text=True)
+    marks = json.loads(proc.stdout.strip().splitlines()[-1])
+    return {k: (v - start) * 1000 for k, v in marks.items()}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5, help='launches to take the median of')
+    parser.add_argument('--top', type=int, default=20, help='imports listed')
+    parser.add_argument('--budget-ms', type=float, default=300, help='median first paint allowed, 0 to disable')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    env['PYTHONPATH'] = os.getcwd()
+
+    rows = _import_times(env)
+    print(f'slowest imports (python -X importtime)')
+    print(f'{"cumulative ms":>14}{"self ms":>10}  module')
+    for cumulative_us, self_us, module in rows[:args.top]:
+        print(f'{cumulative_us / 1000:>14.1f}{self_us / 1000:>10.1f}  {module}')
+    print()
+
+    launches = [_launch(env) for _ in range(args.runs)]
+    print(f'launch to mark, median of {args.runs} runs')
+    for mark in ('imported', 'painted', 'ready'):
+        values = [launch[mark] for launch in launches]
+        print(f'{mark:>10}: {statistics.median(values):8.1f}ms  (min {min(values):.1f}, max {max(values):.1f})')
+
+    painted = statistics.median(launch['painted'] for launch in launches)
+    if 0 < args.budget_ms < painted:
+        print(f'first paint {painted:.1f}ms exceeds the budget of {args.budget_ms:.0f}ms')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,52 @@
+import argparse
+import sys
+
+from app.service.logrewrite import RewriteMode, RewriteSettings, RewriteStats, rewrite_file
+from app.util import format_bytes
+
+
+"""
+rewrite the timestamps of a log file without the gui, e.g.
+
+python rewrite_log.py app.log -o app.annotated.log
+python rewrite_log.py app.log --mode normalize --format default --in-place
+"""
+
+
+def _print_progress(stats: RewriteStats):
+    percent = stats.read_bytes * 100 / stats.total_bytes if stats.total_bytes else 100
+    print(f'\r{percent:5.1f}% {format_bytes(stats.read_bytes)} / {format_bytes(stats.total_bytes)}, '
+          f'{stats.lines} lines', end='', file=sys.stderr, flush=True)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='annotate or normalize epochs and time strings of a log file')
+    parser.add_argument('src', help='log file to read')
+    parser.add_argument('-o', '--output', default='', help='output file, default: <src>.rewritten')
+    parser.add_argument('-i', '--in-place', action='store_true', help='replace src with the rewritten copy')
+    parser.add_argument('-m', '--mode', choices=[RewriteMode.ANNOTATE, RewriteMode.NORMALIZE],
+                        default=RewriteMode.ANNOTATE, help='append time strings after epochs, or replace timestamps')
+    parser.add_argument('-f', '--format', default='rfc3339',
+                        help='default, rfc3339 or a strftime format such as "%%d/%%m/%%Y %%H:%%M:%%S"')
+    parser.add_argument('-q', '--quiet', action='store_true', help='no progress output')
+    args = parser.parse_args()
+
+    settings = RewriteSettings(args.mode)
+    if args.format.lower() in ('default', 'rfc3339'):
+        settings.fmt_type = args.format.lower()
+    else:
+        settings.custom_format = args.format
+    dst = args.src if args.in_place else (args.output or args.src + '.rewritten')
+
+    stats, err = rewrite_file(args.src, dst, settings, None if args.quiet else _print_progress)
+    if not args.quiet:
+        print(file=sys.stderr)
+    if err is not None:
+        print(f'rewrite failed: {err}', file=sys.stderr)
+        return 1
+    print(f'{stats.summary()} -> {dst}', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import os
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from app.service.cache import ResponseCache, CacheSettings, CacheStatus
+from app.service.request import Request, RequestSettings
+
+
+_HEADERS = {'Cache-Control': 'max-age=60', 'ETag': '"v1"'}
+_GBK_TEXT = '中文内容，缓存命中' * 2000
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = _GBK_TEXT.encode('gbk')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=gbk')
+        self.send_header('Content-Length', str(len(body)))
+        for k, v in _HEADERS.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def _cache(tmp_path, **kwargs) -> ResponseCache:
+    return ResponseCache(CacheSettings(memory_entry_bytes=8, directory=str(tmp_path / 'cache'), **kwargs))
+
+
+def test_body_larger_than_disk_tier_is_not_stored(tmp_path):
+    cache = _cache(tmp_path, disk_bytes=1000)
+    for i in range(5):
+        assert cache.store('GET', f'http://a/{i}', {}, 200, _HEADERS, 'x' * 100, 100) is not None
+    assert cache.sizes() == (0, 500)
+    assert cache.store('GET', 'http://a/big', {}, 200, _HEADERS, 'y' * 5000, 5000) is None
+    assert cache.sizes() == (0, 500)
+    assert cache.lookup('GET', 'http://a/0', {})[0] is not None
+    assert cache.lookup('GET', 'http://a/big', {})[0] is None
+    assert len(os.listdir(tmp_path / 'cache')) == 10
+
+
+def test_evicted_entry_is_not_returned(tmp_path):
+    cache = _cache(tmp_path, memory_bytes=50)
+    cache.settings.memory_entry_bytes = 100
+    assert cache.store('GET', 'http://a/big', {}, 200, _HEADERS, 'y' * 80, 80) is None
+    assert cache.sizes() == (0, 0)
+    assert cache.stats.stored == 0
+
+
+def test_spilled_body_keeps_its_charset(tmp_path):
+    raw = _GBK_TEXT.encode('gbk')
+    spill = tmp_path / 'spill'
+    spill.write_bytes(raw)
+    cache = _cache(tmp_path)
+    entry = cache.store('GET', 'http://a/gbk', {}, 200, _HEADERS, _GBK_TEXT[:10], len(raw), str(spill), 'gbk')
+    assert entry.encoding == 'gbk'
+    body, body_file, err = cache.read_body(entry, len(raw))
+    assert err is None and body_file == '' and body == _GBK_TEXT
+    # a preview cut in the middle of a character leaves it out
+    body, body_file, err = cache.read_body(entry, 101)
+    assert err is None and body_file == entry.body_file and body == _GBK_TEXT[:50]
+    # a later run finds the charset in the metadata
+    entry, _ = _cache(tmp_path).lookup('GET', 'http://a/gbk', {})
+    assert entry.encoding == 'gbk'
+
+
+def test_cache_hit_matches_network(tmp_path, server_url):
+    cache = _cache(tmp_path)
+    req = Request(url=server_url, settings=RequestSettings(body_memory_limit=1024))
+    first, err = req.invoke(cache=cache)
+    assert err is None and first.cache_status == CacheStatus.MISS and first.truncated
+    second, err = req.invoke(cache=cache)
+    assert err is None and second.cache_status == CacheStatus.HIT and second.truncated
+    assert second.encoding == first.encoding
+    assert second.read_body() == first.read_body() == (_GBK_TEXT, None)
+    first.discard()
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from app.util import json_backend
+from app.util.json_backend import JsonBackendName
+
+
+def _backends():
+    return [name for name in json_backend.backends() if name != JsonBackendName.STDLIB]
+
+
+def _stdlib_loads(s):
+    try:
+        return json.loads(s), None
+    except ValueError as e:
+        return None, type(e)
+
+
+@pytest.mark.parametrize('name', _backends())
+@pytest.mark.parametrize('s', [
+    '01',
+    '-01',
+    '00',
+    '1.',
+    '"a\x01b"',
+    '"a\tb"',
+    '"a\nb"',
+    '[1,]',
+    '{"a": 1,}',
+    '[1] x',
+])
+def test_loads_rejects_what_stdlib_rejects(name, s):
+    backend, _ = json_backend.get_backend(name)
+    assert _stdlib_loads(s)[0] is None
+    for source in (s, s.encode('utf-8')):
+        with pytest.raises(ValueError):
+            backend.loads(source)
+
+
+@pytest.mark.parametrize('name', _backends())
+@pytest.mark.parametrize('s', [
+    '9223372036854775807',
+    '9223372036854775808',
+    '18446744073709551615',
+    '18446744073709551616',
+    '-9223372036854775808',
+    '-9223372036854775809',
+    '-18446744073709551616',
+    '[1234567890123456789012345678901234567890, -99999999999999999999]',
+    '{"id": -9223372036854775809, "pi": 3.14159265358979323846}',
+    '[NaN, Infinity, -Infinity, 1e400]',
+    '"\\ud800"',
+    '-0',
+])
+def test_loads_matches_stdlib(name, s):
+    backend, _ = json_backend.get_backend(name)
+    expected = json.loads(s)
+    for source in (s, s.encode('utf-8')):
+        got = backend.loads(source)
+        assert repr(got) == repr(expected)
+
+
+@pytest.mark.parametrize('name', _backends())
+@pytest.mark.parametrize('o', [
+    [float('nan'), 1],
+    {'a': [1, {'b': float('inf')}]},
+    [None, -float('inf')],
+    (1.5, float('nan')),
+    {'n': None, 'v': [1, 2.5, 'x']},
+    [-9223372036854775809, 18446744073709551616],
+])
+@pytest.mark.parametrize('indent', [2, 4])
+def test_dumps_matches_stdlib(name, o, indent):
+    backend, _ = json_backend.get_backend(name)
+    assert backend.dumps(o, indent, False) == json.dumps(o, indent=indent, ensure_ascii=False)
+
+
+def test_pretty_keeps_non_finite_floats():
+    from app.util import json_pretty
+    for name in json_backend.backends():
+        assert json_backend.set_backend(name) is None
+        try:
+            s = json_pretty('[NaN, 1e400, -9223372036854775809]')
+        finally:
+            json_backend.set_backend(JsonBackendName.AUTO)
+        assert '\n' in s
+        assert json.loads(s)[2] == -9223372036854775809
+        assert 'NaN' in s and 'Infinity' in s
@@ -0,0 +1,113 @@
+import socket
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from app.service.loadtest import LoadTestRunner, LoadTestSettings, LatencyHistogram
+from app.service.request import Request
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """200 for every path except /error, which answers 500"""
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        status = 500 if self.path.startswith('/error') else 200
+        body = b'{"ok": true}'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture(scope='module')
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def _run(url: str, settings: LoadTestSettings):
+    stats, err = LoadTestRunner(Request(url=url), settings).run()
+    assert err is None
+    assert stats.finished
+    return stats
+
+
+def _assert_percentiles_ordered(stats):
+    p = stats.percentiles()
+    assert 0 < stats.histogram.min <= p['p50'] <= p['p90'] <= p['p99'] <= p['p999'] <= stats.histogram.max
+
+
+def test_count(server_url):
+    stats = _run(f'{server_url}/', LoadTestSettings(concurrency=4, duration=0, count=200))
+    assert stats.total == 200
+    assert stats.status_codes == {200: 200}
+    assert stats.errors == 0
+    assert stats.error_rate == 0
+    assert stats.throughput > 0
+    _assert_percentiles_ordered(stats)
+
+
+def test_error_rate(server_url):
+    stats = _run(f'{server_url}/error', LoadTestSettings(concurrency=4, duration=0, count=50))
+    assert stats.total == 50
+    assert stats.status_codes == {500: 50}
+    assert stats.failed == 50
+    assert stats.error_rate == 1
+    _assert_percentiles_ordered(stats)
+
+
+def test_connection_errors():
+    # nothing listens on a port the os just handed out and released
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    stats = _run(f'http://127.0.0.1:{port}/', LoadTestSettings(concurrency=2, duration=0, count=10))
+    assert stats.total == 10
+    assert stats.errors == 10
+    assert stats.error_rate == 1
+
+
+def test_rate_limit(server_url):
+    stats = _run(f'{server_url}/', LoadTestSettings(rps=100, concurrency=4, duration=0, count=50))
+    assert stats.total == 50
+    # 50 requests spaced 10ms apart cannot finish in much less than half a second
+    assert stats.elapsed >= 0.45
+    _assert_percentiles_ordered(stats)
+
+
+def test_duration(server_url):
+    stats = _run(f'{server_url}/', LoadTestSettings(concurrency=2, duration=0.5))
+    assert stats.total > 0
+    assert 0.5 <= stats.elapsed < 2
+    assert stats.error_rate == 0
+
+
+def test_settings_require_a_limit():
+    stats, err = LoadTestRunner(Request(url='http://127.0.0.1/'), LoadTestSettings(duration=0, count=0)).run()
+    assert stats is None
+    assert isinstance(err, ValueError)
+
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for ms in range(1, 1001):
+        histogram.record(ms / 1000)
+    assert histogram.total == 1000
+    # buckets are 2% wide
+    assert histogram.percentile(50) == pytest.approx(0.5, rel=0.02)
+    assert histogram.percentile(99) == pytest.approx(0.99, rel=0.02)
+    assert histogram.percentile(100) == histogram.max == 1.0
@@ -0,0 +1,27 @@
+from app.view.worker import query
+
+
+def test_documents_are_dropped_on_clear():
+    text = b'{"a": [1, 2]}'
+    document, err = query._load_document(text, '')
+    assert err is None
+    assert query._DOCUMENTS.get(('text', 'bytes', len(text), hash(text)))[0]
+    query.clear_documents()
+    assert not query._DOCUMENTS.get(('text', 'bytes', len(text), hash(text)))[0]
+
+
+def test_document_parsed_across_a_clear_is_not_kept():
+    key = ('text', 'str', 1, 1)
+    found, _, generation = query._DOCUMENTS.get(key)
+    assert not found
+    query.clear_documents()
+    query._DOCUMENTS.put(key, [1], generation)
+    assert not query._DOCUMENTS.get(key)[0]
+
+
+def test_large_documents_are_not_kept():
+    query.clear_documents()
+    text = b'[' + b'0,' * (query._MAX_CACHED_SIZE // 2) + b'0]'
+    document, err = query._load_document(text, '')
+    assert err is None and len(document) == query._MAX_CACHED_SIZE // 2 + 1
+    assert not query._DOCUMENTS.get(('text', 'bytes', len(text), hash(text)))[0]
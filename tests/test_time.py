@@ -0,0 +1,77 @@
+import datetime
+
+import pytest
+
+from app.util import time as timeutil
+from app.util.time import Format, Precision
+
+
+_FIXED_FORMATS = [Format.SECONDS, Format.MILLISECONDS, Format.SECONDS_RFC3339, Format.MILLISECONDS_RFC3339]
+
+
+@pytest.mark.parametrize('s', [
+    '2024-01-01 00:00:00.1Z',
+    '2024-01-01 00:00:00.1+08',
+    '2024-01-01 00:00:00.1-0800',
+    '2024-01-01 00:00:00.123+08:00',
+    '2024-01-01 00:00:00Z',
+    '2024-01-01 00:00:00+08',
+])
+def test_utc_offsets_are_rejected(s):
+    # fromisoformat takes these as aware datetimes, strptime does not
+    for fmt in (Format.SECONDS, Format.MILLISECONDS):
+        tm, e = timeutil.from_string(s, fmt)
+        assert tm is None
+        assert isinstance(e, ValueError)
+        with pytest.raises(ValueError):
+            datetime.datetime.strptime(s, fmt)
+
+
+@pytest.mark.parametrize('s', [
+    '2024-01-01T00:00:00.1+08Z',
+    '2024-01-01T00:00:00-0800Z',
+])
+def test_rfc3339_offsets_are_rejected(s):
+    for fmt in (Format.SECONDS_RFC3339, Format.MILLISECONDS_RFC3339):
+        tm, e = timeutil.from_string(s, fmt)
+        assert tm is None
+        assert isinstance(e, ValueError)
+
+
+@pytest.mark.parametrize('s, fmt', [
+    ('2024-02-29 23:59:59', Format.SECONDS),
+    ('2024-02-29 23:59:59.5', Format.MILLISECONDS),
+    ('2024-02-29 23:59:59.123456', Format.MILLISECONDS),
+    ('2024-02-29T23:59:59Z', Format.SECONDS_RFC3339),
+    ('2024-02-29T23:59:59.042Z', Format.MILLISECONDS_RFC3339),
+    ('0999-01-01 00:00:00', Format.SECONDS),
+])
+def test_fixed_formats_match_strptime(s, fmt):
+    tm, e = timeutil.from_string(s, fmt)
+    assert e is None
+    assert tm == datetime.datetime.strptime(s, fmt)
+    assert tm.tzinfo is None
+
+
+@pytest.mark.parametrize('s', [
+    '2023-02-29 00:00:00',
+    '2024-01-01 24:00:00',
+    '2024-01-01 00:00:00.',
+    '2024-01-01 00:00:00.1234567',
+    '2024/01/01 00:00:00',
+])
+def test_invalid_values_report_strptime_errors(s):
+    for fmt in _FIXED_FORMATS:
+        tm, e = timeutil.from_string(s, fmt)
+        assert tm is None
+        with pytest.raises(ValueError) as info:
+            datetime.datetime.strptime(s, fmt)
+        assert str(e) == str(info.value)
+
+
+def test_timestamps_are_local_time():
+    s = '2024-01-01 08:00:00.250'
+    expected = int(datetime.datetime.strptime(s, Format.MILLISECONDS).timestamp() * 1000)
+    tm, e = timeutil.from_string(s, Format.MILLISECONDS)
+    assert e is None
+    assert timeutil.to_timestamp(tm, Precision.MILLISECOND) == (expected, None)